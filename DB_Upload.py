@@ -103,34 +103,48 @@ COLUMN_MAPPING = {
     'OpdIpd': 'OpdIpd',
 }
 
+DATE_COLUMNS = [
+    'ENCOUNTER_DATE_DD_MM_YYYY', 'DATE_CLAIM_RECEIVED',
+    'ReviewedDate', 'PostedDate', 'PaidDate',
+]
+
+NUMERIC_COLUMNS = {
+    'PA_AMOUNT': 'DECIMAL(18,2)',
+    'AMOUNT_CLAIMED': 'DECIMAL(18,2)',
+    'NO_OF_UNITS': 'INT',
+    'CLAIMS_OFFICER_RECOMMD_AMT': 'DECIMAL(18,2)',
+    'DIFF_BTW_CO_RECOMMEND_CLAIMED': 'DECIMAL(18,2)',
+    'MGR_RECOMMD_AMT': 'DECIMAL(18,2)',
+    'DIFF_BTW_MGR_RECOMMD_CLAIMED': 'DECIMAL(18,2)',
+    'HOD_RECOMMD_AMOUNT': 'DECIMAL(18,2)',
+    'DIFF_BTW_HOD_RECOMMD_CLAIMED': 'DECIMAL(18,2)',
+    'DIFF_BTW_PA_AMOUNT_AMOUNT_RECOMMENDED': 'DECIMAL(18,2)',
+    'APPLICABLE_LIMIT_UNITS': 'INT',
+    'CUMMUL_UNIT_USED_PTD': 'INT',
+    'UNITS_IN_THIS_CLAIM': 'INT',
+    'BAL_UNIT_LEFT_AFTER_THIS_CLAIM': 'INT',
+    'APPLICABLE_LIMITS_NAIRA': 'DECIMAL(18,2)',
+    'CUMMUL_NAIRA_VALUE_USED_PTD': 'DECIMAL(18,2)',
+    'NAIRA_VALUE_OF_THIS_REQUEST': 'DECIMAL(18,2)',
+    'BAL_NAIRA_LEFT_AFTER_THIS_CLAIM': 'DECIMAL(18,2)',
+}
+
+# Columns identifying a row across weekly files, hashed into ROW_KEY for incremental loads
+NATURAL_KEY = ['SCH_NO', 'MEMBER_NO', 'ENCOUNTER_DATE_DD_MM_YYYY', 'SERVICE_DESCRIPTION']
+
+# Columns downstream queries filter and join on; each gets a nonclustered index
+INDEX_COLUMNS = ['SCH_NO', 'MEMBER_NO', 'ClaimNo', 'Correct_ClaimNo']
+
 def render_dbpage():
     render_generic_upload(
         table_name='claimstbl',
         column_mapping=COLUMN_MAPPING,
-        date_columns=[
-            'ENCOUNTER_DATE_DD_MM_YYYY', 'DATE_CLAIM_RECEIVED',
-            'ReviewedDate', 'PostedDate', 'PaidDate',
-        ],
-        numeric_columns={
-            'PA_AMOUNT': 'DECIMAL(18,2)',
-            'AMOUNT_CLAIMED': 'DECIMAL(18,2)',
-            'NO_OF_UNITS': 'INT',
-            'CLAIMS_OFFICER_RECOMMD_AMT': 'DECIMAL(18,2)',
-            'DIFF_BTW_CO_RECOMMEND_CLAIMED': 'DECIMAL(18,2)',
-            'MGR_RECOMMD_AMT': 'DECIMAL(18,2)',
-            'DIFF_BTW_MGR_RECOMMD_CLAIMED': 'DECIMAL(18,2)',
-            'HOD_RECOMMD_AMOUNT': 'DECIMAL(18,2)',
-            'DIFF_BTW_HOD_RECOMMD_CLAIMED': 'DECIMAL(18,2)',
-            'DIFF_BTW_PA_AMOUNT_AMOUNT_RECOMMENDED': 'DECIMAL(18,2)',
-            'APPLICABLE_LIMIT_UNITS': 'INT',
-            'CUMMUL_UNIT_USED_PTD': 'INT',
-            'UNITS_IN_THIS_CLAIM': 'INT',
-            'BAL_UNIT_LEFT_AFTER_THIS_CLAIM': 'INT',
-            'APPLICABLE_LIMITS_NAIRA': 'DECIMAL(18,2)',
-            'CUMMUL_NAIRA_VALUE_USED_PTD': 'DECIMAL(18,2)',
-            'NAIRA_VALUE_OF_THIS_REQUEST': 'DECIMAL(18,2)',
-            'BAL_NAIRA_LEFT_AFTER_THIS_CLAIM': 'DECIMAL(18,2)',
-        },
+        date_columns=DATE_COLUMNS,
+        numeric_columns=NUMERIC_COLUMNS,
         consolidate_target='[Claims Schedules Consolidated Mastersheet]',
-        file_label="Claims (Please truncate claimstbl before uploading)",
+        file_label="Claims (For a full reload, please truncate claimstbl before uploading)",
+        natural_key=NATURAL_KEY,
+        index_columns=INDEX_COLUMNS,
+        consolidate_columnstore=True,
+        dedup_claims=True,
     )
@@ -11,6 +11,12 @@ COLUMN_MAPPING = {
     'Paiddate': 'Paiddate', 'SCH_NO': 'SCH_NO', 'APPEAL_NO': 'APPEAL_NO', 'SCH_NUM': 'SCH_NUM',
 }
 
+# Columns identifying a row across weekly files, hashed into ROW_KEY for incremental loads
+NATURAL_KEY = ['Source_File', 'BATCH_NUMBER', 'PROVIDER_CODE', 'S_N']
+
+# Columns downstream queries filter and join on; each gets a nonclustered index
+INDEX_COLUMNS = ['SCH_NO', 'BATCH_NUMBER', 'PROVIDER_CODE']
+
 def render_telemedicine_upload():
     render_generic_upload(
         table_name='telemedicinetbl',
@@ -24,5 +30,7 @@ def render_telemedicine_upload():
             'NUMBER_OF_CLAIMS': 'INT',
         },
         consolidate_target='Compiled_Telemedicine',
-        file_label="Telemedicine (Please truncate telemedicinetbl before uploading)",
+        file_label="Telemedicine (For a full reload, please truncate telemedicinetbl before uploading)",
+        natural_key=NATURAL_KEY,
+        index_columns=INDEX_COLUMNS,
     )
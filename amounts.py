@@ -0,0 +1,145 @@
+import math
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Amounts are carried as whole kobo (1/100 naira) in int64 so sums and differences are exact
+MINOR_UNITS = 100
+CENT = Decimal("0.01")
+
+_AMOUNT_RE = re.compile(r"^(?P<sign>[+-]?)(?P<whole>\d*)(?:\.(?P<frac>\d*))?$")
+# Thousands separators, spaces and the naira sign/code, removed before parsing text
+_NOISE_RE = r"[\s,₦]|NGN"
+# Longer whole parts would overflow int64 kobo; they are left to _scalar_kobo
+_MAX_WHOLE_DIGITS = 16
+_ARROW_STRING = pd.ArrowDtype(pa.string())
+
+
+def to_kobo(values):
+    """
+    Parse amounts into whole kobo, rounding half away from zero at the third decimal place.
+
+    Accepts numbers, Decimals and strings such as "1,234.50", " 1234.5 ", "₦1,234.50" or "(1,234.50)"
+    (negative). Unparseable or blank values become <NA>.
+
+    Args:
+        values (pandas.Series or list): Amounts
+
+    Returns:
+        pandas.Series: Nullable Int64 kobo, aligned with the input index
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    if series.empty:
+        return pd.Series([], index=series.index, dtype="Int64")
+    if pd.api.types.is_bool_dtype(series):
+        series = series.astype(object)
+    if pd.api.types.is_numeric_dtype(series):
+        return _float_to_kobo(series.astype(float))
+
+    # Object columns (text, or numbers mixed with text as Excel delivers them): text is parsed with
+    # Arrow-backed string operations into whole and fraction digits combined as int64, so nothing
+    # passes through float; numbers, Decimals and text in any other form ("1e3", "NIL") go to _scalar_kobo
+    cells = series.astype(object).reset_index(drop=True)
+    text = (cells.where(cells.map(type).eq(str)).astype(_ARROW_STRING)
+            .str.replace(_NOISE_RE, "", regex=True))
+    bracketed = (text.str.startswith("(") & text.str.endswith(")")).fillna(False).astype(bool)
+    text = text.mask(bracketed, text.str.slice(1, -1))
+    parts = text.str.extract(_AMOUNT_RE.pattern)
+    whole, frac = parts["whole"], parts["frac"].fillna("")
+    digits = whole.str.len()
+    parsed = (((digits > 0) | ((digits == 0) & (frac.str.len() > 0))) & (digits <= _MAX_WHOLE_DIGITS))
+    parsed = parsed.fillna(False).astype(bool)
+
+    whole, frac = whole[parsed], frac[parsed]
+    kobo = (whole.mask(whole == "", "0").astype("int64[pyarrow]") * MINOR_UNITS
+            + frac.str.slice(0, 2).str.ljust(2, "0").astype("int64[pyarrow]")
+            + (frac.str.slice(2, 3) >= "5").astype("int64[pyarrow]")).astype("int64")
+    negative = (parts["sign"][parsed] == "-").astype(bool) != bracketed[parsed]
+    result = pd.Series(pd.NA, index=cells.index, dtype="Int64")
+    result[parsed] = kobo.mask(negative, -kobo)
+    if not parsed.all():
+        result[~parsed] = pd.array([_scalar_kobo(v) for v in cells[~parsed].tolist()], dtype="Int64")
+    result.index = series.index
+    return result
+
+def _scalar_kobo(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value) * MINOR_UNITS
+    if isinstance(value, (float, np.floating)):
+        if not math.isfinite(value):
+            return None
+        scaled = abs(float(value)) * MINOR_UNITS
+        return int(math.copysign(math.floor(scaled + 0.5 + 1e-9), value))
+    text = str(value).strip().replace(",", "").replace(" ", "")
+    negative = text[:1] == "(" and text[-1:] == ")"
+    if negative:
+        text = text[1:-1]
+    match = _AMOUNT_RE.match(text)
+    if match is None or not (match.group("whole") or match.group("frac")):
+        # Blank, 'NIL', or anything else Python reads as a number, e.g. "1e3"
+        try:
+            number = float(text)
+        except ValueError:
+            return None
+        kobo = _scalar_kobo(number)
+        return -kobo if negative and kobo is not None else kobo
+    # Integer arithmetic on the digit strings themselves, so nothing passes through float
+    frac = match.group("frac") or ""
+    kobo = int(match.group("whole") or 0) * MINOR_UNITS + int(frac[:2].ljust(2, "0")) + (frac[2:3] >= "5")
+    return -kobo if (match.group("sign") == "-") != negative else kobo
+
+def _float_to_kobo(values):
+    # Round half away from zero, like Decimal ROUND_HALF_UP on the value's shortest repr
+    scaled = values.to_numpy(dtype=float) * MINOR_UNITS
+    rounded = np.sign(scaled) * np.floor(np.abs(scaled) + 0.5 + 1e-9)
+    result = pd.Series(rounded, index=values.index)
+    return result.where(np.isfinite(result)).astype("Int64")
+
+def from_kobo(kobo):
+    """Kobo back to a float64 amount (for display and Excel), NaN where missing."""
+    return pd.Series(kobo, dtype="Int64").astype("Float64").div(MINOR_UNITS).astype(float)
+
+def kobo_to_decimal(kobo):
+    """One kobo value as a Decimal with two places, e.g. for DECIMAL(18,2) parameters."""
+    return (Decimal(int(kobo)) / MINOR_UNITS).quantize(CENT)
+
+def to_decimal(value):
+    """
+    Parse one amount into a two-place Decimal, rounding half away from zero.
+
+    Raises:
+        ValueError: If the value is not a number
+    """
+    text = str(value).strip().replace(",", "")
+    negative = text.startswith("(") and text.endswith(")")
+    if negative:
+        text = text[1:-1]
+    try:
+        amount = Decimal(text).quantize(CENT, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"Not an amount: '{value}'")
+    if not amount.is_finite():
+        raise ValueError(f"Not an amount: '{value}'")
+    return -amount if negative else amount
+
+def amounts_differ(left, right):
+    """
+    Row-wise exact comparison of two amount columns: True where both are present and the kobo differ.
+    """
+    left_kobo, right_kobo = to_kobo(left), to_kobo(right)
+    both = left_kobo.notna() & right_kobo.notna()
+    return (both & (left_kobo.fillna(0) != right_kobo.fillna(0))).astype(bool)
+
+def amounts_match(left, right):
+    """Row-wise exact comparison: True where both amounts are present and equal to the kobo."""
+    left_kobo, right_kobo = to_kobo(left), to_kobo(right)
+    both = left_kobo.notna() & right_kobo.notna()
+    return (both & (left_kobo.fillna(0) == right_kobo.fillna(0))).astype(bool)
+
+def total_amount(values):
+    """Exact sum of an amount column, returned as a 2-place float."""
+    return int(to_kobo(values).sum()) / MINOR_UNITS
@@ -0,0 +1,108 @@
+"""
+Scale-tiered pytest-benchmark suite over the reconciliation, compilation, export and upload-cleaning
+steps, on seeded synthetic data (benchmarks/synthetic_data.py).
+
+    pip install -r requirements-dev.txt
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-storage=benchmarks/baselines \\
+        --benchmark-compare --benchmark-compare-fail=mean:25%
+
+BENCH_TIERS picks the tiers (default "1k,10k"; add 100k and 1m for production-size runs, which
+take minutes). Save a new baseline after an intentional change with --benchmark-save=<name>;
+baselines are kept per machine under benchmarks/baselines/<machine id>/.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import prefetch
+import synthetic_data
+from compilation_common import COMPILATION_CONFIGS, compile_files, compare_with_finance
+from db_upload_common import _clean_rows
+from DB_Upload import COLUMN_MAPPING, DATE_COLUMNS, NUMERIC_COLUMNS
+from upload_handle import spool_upload
+from utils import (
+    extract_schedule_data, calculate_schedule_amounts, generate_reconciliation_report,
+    generate_enhanced_claims_excel,
+)
+
+TIERS = [t.strip() for t in os.getenv("BENCH_TIERS", "1k,10k").split(",") if t.strip()]
+
+# Openpyxl exports and per-row cleaning are the slow paths; fewer rounds keep big tiers tolerable
+HEAVY = {"rounds": 3, "iterations": 1, "warmup_rounds": 0}
+
+
+@pytest.fixture(scope="module", params=TIERS)
+def tier(request):
+    return request.param
+
+@pytest.fixture(scope="module")
+def claims_df(tier):
+    return synthetic_data.claims_schedule(synthetic_data.tier_rows(tier))
+
+@pytest.fixture(scope="module")
+def reconciliation_inputs(claims_df):
+    finance_df = synthetic_data.finance_weekly_report(synthetic_data.schedule_totals(claims_df))
+    claims_amounts = calculate_schedule_amounts(
+        extract_schedule_data(claims_df, synthetic_data.SCHEDULE_COL, synthetic_data.AMOUNT_COL))
+    finance_amounts = calculate_schedule_amounts(
+        extract_schedule_data(finance_df, synthetic_data.FINANCE_SCHEDULE_COL, synthetic_data.FINANCE_AMOUNT_COL))
+    return claims_amounts, finance_amounts
+
+@pytest.fixture(scope="module")
+def summary_uploads(tier):
+    summaries = synthetic_data.provider_summaries(synthetic_data.tier_rows(tier))
+    handles = [
+        spool_upload(synthetic_data.summary_workbook(frame, frame["PROVIDER NAME"].iloc[0]), name=name)
+        for name, frame in summaries
+    ]
+    finance = synthetic_data.finance_weekly_report(synthetic_data.summary_totals(summaries))
+    finance_handle = spool_upload(synthetic_data.workbook_bytes({synthetic_data.FINANCE_SHEET: finance}),
+                                  name="finance.xlsx")
+    return handles, finance_handle
+
+
+def _fresh_prefetch_cache():
+    # compile_files and workbook_sheets reuse earlier parses; each round should do the work
+    prefetch._futures.clear()
+
+
+def test_extract_schedule_data(benchmark, claims_df):
+    result = benchmark(extract_schedule_data, claims_df, synthetic_data.SCHEDULE_COL, synthetic_data.AMOUNT_COL)
+    assert len(result) == len(claims_df)
+
+def test_generate_reconciliation_report(benchmark, reconciliation_inputs):
+    claims_amounts, finance_amounts = reconciliation_inputs
+    report = benchmark(generate_reconciliation_report, claims_amounts, finance_amounts)
+    assert (report["Difference"].fillna(0) != 0).any()
+
+def test_compile_files(benchmark, summary_uploads):
+    handles, _ = summary_uploads
+    compiled, summary = benchmark.pedantic(compile_files, args=(handles,), setup=_fresh_prefetch_cache, **HEAVY)
+    assert all(s["Status"] == "Success" for s in summary)
+
+def test_compare_with_finance(benchmark, summary_uploads):
+    handles, finance_handle = summary_uploads
+    compiled, _ = compile_files(handles)
+    config = COMPILATION_CONFIGS["appeals"]
+    # Times the comparison itself; in the app the finance workbook is parsed when it is uploaded
+    prefetch.workbook_sheets(finance_handle)
+    comparison = benchmark(compare_with_finance, compiled, finance_handle, config)
+    assert len(comparison) == len(handles)
+
+def test_generate_enhanced_claims_excel(benchmark, claims_df):
+    data = benchmark.pedantic(
+        generate_enhanced_claims_excel, args=(claims_df, synthetic_data.SCHEDULE_COL, synthetic_data.AMOUNT_COL),
+        **HEAVY,
+    )
+    assert data[:2] == b"PK"
+
+def test_clean_rows(benchmark, claims_df):
+    db_columns = list(COLUMN_MAPPING.values())
+    rows, _, failed = benchmark.pedantic(
+        _clean_rows, args=(claims_df, COLUMN_MAPPING, db_columns, DATE_COLUMNS, NUMERIC_COLUMNS), **HEAVY,
+    )
+    assert len(rows) == len(claims_df) and not failed
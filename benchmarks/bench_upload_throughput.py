@@ -0,0 +1,102 @@
+"""
+Upload throughput against the local SQLite backend (db_backend.SqliteBackend), so the upload
+engine can be measured without a SQL Server.
+
+    python benchmarks/bench_upload_throughput.py --rows 20000 --workers 1 2 4 --latency-ms 2
+
+Compares the row-by-row insert loop with parallel partitioned loads using the claimstbl column set.
+SQLite serialises writers and has no network hop, so --latency-ms adds a simulated round trip per
+statement (sleeping, like pyodbc, without holding the GIL) to approximate a remote SQL Server.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from DB_Upload import COLUMN_MAPPING
+from db_backend import SqliteBackend
+from ddl_planner import column_definitions
+from parallel_upload import parallel_load
+
+DB_COLUMNS = list(COLUMN_MAPPING.values())
+COLUMN_TYPES = {col: "VARCHAR(MAX)" for col in DB_COLUMNS}
+COL_DEFS = column_definitions(COLUMN_TYPES)
+
+
+SIMULATED_LATENCY = 0.0
+
+
+class _LatencyCursor(sqlite3.Cursor):
+    def execute(self, *args):
+        time.sleep(SIMULATED_LATENCY)
+        return super().execute(*args)
+
+    def executemany(self, query, params):
+        # One round trip per packet of rows, roughly what fast_executemany does
+        time.sleep(SIMULATED_LATENCY * max(1, len(params) // 100))
+        return super().executemany(query, params)
+
+
+class _LatencyConnection(sqlite3.Connection):
+    def cursor(self, factory=_LatencyCursor):
+        return super().cursor(factory)
+
+
+def make_rows(n):
+    return [tuple(f"{col[:8]}-{i}" for col in DB_COLUMNS) for i in range(n)]
+
+def fresh_db(directory, name):
+    backend = SqliteBackend(os.path.join(directory, name))
+    conn = backend.connect()
+    backend.create_table(conn, "claimstbl", COLUMN_TYPES)
+    conn.commit()
+    conn.close()
+    return lambda: backend.connect(factory=_LatencyConnection)
+
+def bench_row_by_row(connect, rows):
+    conn = connect()
+    insert_query = f"INSERT INTO claimstbl ({', '.join(DB_COLUMNS)}) VALUES ({', '.join(['?'] * len(DB_COLUMNS))})"
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    for values in rows:
+        cursor.execute(insert_query, values)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+def bench_parallel(connect, rows, workers):
+    start = time.perf_counter()
+    loaded, failed = parallel_load(connect, "claimstbl", DB_COLUMNS, COL_DEFS, rows, list(range(1, len(rows) + 1)),
+                                   workers=workers)
+    elapsed = time.perf_counter() - start
+    assert loaded == len(rows) and not failed
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    global SIMULATED_LATENCY
+    SIMULATED_LATENCY = args.latency_ms / 1000
+    rows = make_rows(args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        results = [("row by row", bench_row_by_row(fresh_db(directory, "serial.db"), rows))]
+        for workers in args.workers:
+            connect = fresh_db(directory, f"parallel_{workers}.db")
+            results.append((f"parallel x{workers}", bench_parallel(connect, rows, workers)))
+
+    print(f"{args.rows} rows x {len(DB_COLUMNS)} columns, {args.latency_ms}ms simulated latency")
+    for label, elapsed in results:
+        print(f"  {label:<14} {elapsed:8.2f}s  {args.rows / elapsed:12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
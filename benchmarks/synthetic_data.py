@@ -0,0 +1,259 @@
+"""
+Seeded synthetic workbooks shaped like production uploads, for benchmarks and load testing.
+
+    python benchmarks/synthetic_data.py --tier 10k --out synthetic/
+
+writes a Claims PAYMENT SCHEDULE workbook (the DB_Upload column set), the matching Finance
+"Claims received weekly report" and a batch of provider PAYMENT SUMMARY workbooks. The same seed
+always produces the same data. Finance totals are derived from the claims so reconciliation finds a
+realistic mix of matches, amount variances and schedules missing on either side.
+"""
+import argparse
+import io
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from DB_Upload import COLUMN_MAPPING, DATE_COLUMNS, NUMERIC_COLUMNS
+
+TIERS = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+DEFAULT_SEED = 20240101
+
+CLAIMS_SHEET = "PAYMENT SCHEDULE"
+FINANCE_SHEET = "Claims received weekly report"
+SUMMARY_SHEET = "PAYMENT SUMMARY"
+SCHEDULE_COL = "SCH NO"
+AMOUNT_COL = "AMOUNT PAID"
+FINANCE_SCHEDULE_COL = "Claim Batch No/Sch No"
+FINANCE_AMOUNT_COL = "Claims_Advised_Amount"
+
+CLAIMS_PER_SCHEDULE = 200
+FIRST_SCHEDULE = 9000
+
+_FIRST_NAMES = ["ADEBAYO", "CHIOMA", "IBRAHIM", "NGOZI", "OLUWASEUN", "FATIMA", "EMEKA", "AISHA", "TUNDE", "BLESSING"]
+_SURNAMES = ["OKAFOR", "ADEYEMI", "BELLO", "EZE", "MUSA", "OGUNLEYE", "NWOSU", "ABUBAKAR", "BALOGUN", "UCHE"]
+_PROVIDERS = [f"{name} {kind}" for name in ["LIFELINE", "ST. MARY", "CEDARCREST", "REDDINGTON", "EVERCARE",
+                                             "GRACELAND", "KINGS CARE", "HARMONY", "UNITY", "MERCY"]
+              for kind in ["HOSPITAL", "CLINIC", "MEDICAL CENTRE"]]
+_PLANS = ["BRONZE", "SILVER", "GOLD", "PLATINUM", "NHIS"]
+_SERVICES = ["CONSULTATION", "MALARIA PARASITE TEST", "FULL BLOOD COUNT", "X-RAY CHEST", "ADMISSION PER DAY",
+             "ANTENATAL VISIT", "DENTAL SCALING", "PHYSIOTHERAPY SESSION", "ULTRASOUND ABDOMEN", "DRUGS"]
+_DIAGNOSES = [("B54", "MALARIA"), ("J06.9", "URTI"), ("I10", "HYPERTENSION"), ("E11", "DIABETES MELLITUS"),
+              ("A09", "GASTROENTERITIS"), ("Z34", "NORMAL PREGNANCY"), ("K02", "DENTAL CARIES")]
+_CLAIM_TYPES = ["FFS", "CAPITATION", "TELEMEDICINE", "AMBULANCE", "APPEAL"]
+_YES_NO = ["YES", "NO"]
+
+
+def tier_rows(tier):
+    """Row count for a tier name ('1k', '10k', '100k', '1m') or a plain integer."""
+    return TIERS[tier.lower()] if isinstance(tier, str) and tier.lower() in TIERS else int(tier)
+
+def _pick(rng, pool, n):
+    return np.asarray(pool, dtype=object)[rng.integers(0, len(pool), n)]
+
+def _amounts(rng, n, low=1_000, high=250_000):
+    # Whole-kobo amounts, like real schedules
+    return np.round(rng.uniform(low, high, n), 2)
+
+def _dates(rng, n, start, days):
+    return pd.Series(pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, n), unit="D"))
+
+def claims_schedule(rows, seed=DEFAULT_SEED):
+    """
+    A Claims PAYMENT SCHEDULE sheet with every DB_Upload column (Excel headers), about
+    CLAIMS_PER_SCHEDULE claims per schedule number.
+
+    Returns:
+        pandas.DataFrame: One row per claim line
+    """
+    rng = np.random.default_rng(seed)
+    n = int(rows)
+    db_to_excel = {db: excel for excel, db in COLUMN_MAPPING.items()}
+    schedules = FIRST_SCHEDULE + np.sort(rng.integers(0, max(1, n // CLAIMS_PER_SCHEDULE), n))
+    first, middle, surname = _pick(rng, _FIRST_NAMES, n), _pick(rng, _FIRST_NAMES, n), _pick(rng, _SURNAMES, n)
+    provider_idx = rng.integers(0, len(_PROVIDERS), n)
+    diagnosis_idx = rng.integers(0, len(_DIAGNOSES), n)
+    claimed = _amounts(rng, n)
+    paid = np.round(claimed * rng.choice([1.0, 1.0, 1.0, 0.9, 0.75], n), 2)
+    encounter = _dates(rng, n, "2024-01-01", 365)
+
+    columns = {
+        "S/N": np.arange(1, n + 1),
+        "DCO NAME": _pick(rng, ["DCO LAGOS", "DCO ABUJA", "DCO PH", "DCO KANO"], n),
+        "PROVIDER NAME": np.asarray(_PROVIDERS, dtype=object)[provider_idx],
+        "PROVIDER CODE": 10_000 + provider_idx,
+        "FIRST NAME": first,
+        "MIDDLE NAME": middle,
+        "SURNAME": surname,
+        "ENROLLEE NAME": surname + " " + first + " " + middle,
+        "MEMBER NO": pd.Series(rng.integers(100_000, 999_999, n)).map("AVN/{}/A".format).to_numpy(dtype=object),
+        "PLAN NAME": _pick(rng, _PLANS, n),
+        "SEX": _pick(rng, ["M", "F"], n),
+        "ICD Codes": np.asarray([d[0] for d in _DIAGNOSES], dtype=object)[diagnosis_idx],
+        "DIAGNOSIS": np.asarray([d[1] for d in _DIAGNOSES], dtype=object)[diagnosis_idx],
+        "CPT CODES": pd.Series(rng.integers(99_000, 99_500, n)).astype(str).to_numpy(dtype=object),
+        "SERVICE DESCRIPTION": _pick(rng, _SERVICES, n),
+        "PA AMOUNT": claimed,
+        # Entered by hand in production, so a text date column rather than Excel dates
+        "ENCOUNTER DATE (DD/MM/YYYY)": encounter.dt.strftime("%d/%m/%Y").to_numpy(dtype=object),
+        "NO. OF UNITS": rng.integers(1, 10, n),
+        "AMOUNT CLAIMED": claimed,
+        "DATE CLAIM RECEIVED": (encounter + pd.to_timedelta(rng.integers(1, 60, n), unit="D")).to_numpy(),
+        "AVONPACODE": pd.Series(rng.integers(1, 10**7, n)).map("PA{:07d}".format).to_numpy(dtype=object),
+        AMOUNT_COL: paid,
+        "DIFF BTW CO RECOMMEND. &  CLAIMED": np.round(paid - claimed, 2),
+        SCHEDULE_COL: schedules,
+        "ClaimBatch": schedules,
+    }
+
+    frame = {}
+    for excel_col, db_col in COLUMN_MAPPING.items():
+        if excel_col in columns:
+            frame[excel_col] = columns[excel_col]
+        elif db_col in DATE_COLUMNS:
+            frame[excel_col] = _dates(rng, n, "2024-03-01", 300).to_numpy()
+        elif NUMERIC_COLUMNS.get(db_col) == "INT":
+            frame[excel_col] = rng.integers(0, 20, n)
+        elif db_col in NUMERIC_COLUMNS:
+            frame[excel_col] = _amounts(rng, n, 0, 50_000)
+        elif "MATCH" in db_col or db_col.startswith(("IS_", "WAS_")):
+            frame[excel_col] = _pick(rng, _YES_NO, n)
+        else:
+            frame[excel_col] = _pick(rng, ["NIL", "", f"{db_to_excel[db_col][:12]} NOTE"], n)
+    return pd.DataFrame(frame)
+
+def schedule_totals(claims_df, schedule_col=SCHEDULE_COL, amount_col=AMOUNT_COL):
+    """Total amount per schedule number, summed in kobo."""
+    kobo = np.round(claims_df[amount_col].astype(float) * 100).astype("int64")
+    return (kobo.groupby(claims_df[schedule_col]).sum() / 100).rename("Amount")
+
+def finance_weekly_report(totals, seed=DEFAULT_SEED, variance_rate=0.05, missing_rate=0.02, extra_rate=0.01):
+    """
+    A Finance "Claims received weekly report" sheet for the given schedule totals.
+
+    Args:
+        totals (pandas.Series): Amount per schedule number (e.g. from schedule_totals)
+        variance_rate (float): Share of schedules whose advised amount differs from the claims total
+        missing_rate (float): Share of schedules Finance has not received
+        extra_rate (float): Share of additional schedules only Finance has
+
+    Returns:
+        pandas.DataFrame: One row per schedule received
+    """
+    rng = np.random.default_rng(seed + 1)
+    totals = totals.astype(float)
+    keep = rng.random(len(totals)) >= missing_rate
+    received = totals[keep]
+    advised = received.to_numpy().copy()
+    varied = rng.random(len(advised)) < variance_rate
+    advised[varied] = np.round(advised[varied] + rng.choice([-1, 1], varied.sum()) * rng.uniform(0.01, 5_000, varied.sum()), 2)
+
+    n_extra = int(round(len(totals) * extra_rate))
+    extra_schedules = (int(totals.index.max()) if len(totals) else FIRST_SCHEDULE) + 1 + np.arange(n_extra)
+    schedule_numbers = np.concatenate([received.index.to_numpy(), extra_schedules])
+    advised = np.concatenate([advised, _amounts(rng, n_extra, 10_000, 2_000_000)])
+    n = len(schedule_numbers)
+    return pd.DataFrame({
+        "S/N": np.arange(1, n + 1),
+        "Date Received": _dates(rng, n, "2024-06-01", 7).to_numpy(),
+        "Provider": _pick(rng, _PROVIDERS, n),
+        FINANCE_SCHEDULE_COL: schedule_numbers,
+        "Claim Type": _pick(rng, _CLAIM_TYPES, n),
+        FINANCE_AMOUNT_COL: advised,
+        "Remark": _pick(rng, ["", "RECEIVED", "QUERIED"], n),
+    })
+
+def provider_summaries(rows, seed=DEFAULT_SEED, rows_per_file=None):
+    """
+    Provider PAYMENT SUMMARY sheets totalling about `rows` data rows.
+
+    Returns:
+        list: (file_name, DataFrame) pairs; file names carry the schedule number
+            ("SCH 9001 LIFELINE HOSPITAL.xlsx") as compare_with_finance expects
+    """
+    rng = np.random.default_rng(seed + 2)
+    rows = int(rows)
+    rows_per_file = rows_per_file or max(50, rows // 200)
+    summaries = []
+    for i, start in enumerate(range(0, rows, rows_per_file)):
+        n = min(rows_per_file, rows - start)
+        provider = _PROVIDERS[i % len(_PROVIDERS)]
+        pa_value = _amounts(rng, n, 5_000, 500_000)
+        recommended = np.round(pa_value * rng.choice([1.0, 1.0, 0.95], n), 2)
+        summaries.append((f"SCH {FIRST_SCHEDULE + i} {provider}.xlsx", pd.DataFrame({
+            "S/N": np.arange(1, n + 1),
+            "PROVIDER NAME": provider,
+            "PROVIDER CODE": 10_000 + i % len(_PROVIDERS),
+            "CLAIM TYPE": _pick(rng, _CLAIM_TYPES, n),
+            "BATCH NUMBER": 500_000 + rng.integers(0, 10_000, n),
+            "NUMBER OF CLAIMS": rng.integers(1, 40, n),
+            "ENCOUNTER MONTH": _pick(rng, ["JANUARY 2024", "FEBRUARY 2024", "MARCH 2024"], n),
+            "DATE OF RECEIPT": (datetime(2024, 4, 1) + timedelta(days=i % 30)).strftime("%d/%m/%Y"),
+            "APPROVED PA VALUE (N)": pa_value,
+            "AMOUNT RECOMMENDED FOR PAYMENT (N)": recommended,
+            "VARIANCE": np.round(pa_value - recommended, 2),
+            "NARRATION": _pick(rng, ["", "TARIFF APPLIED", "UNITS REDUCED"], n),
+        })))
+    return summaries
+
+def summary_totals(summaries):
+    """Total recommended amount per schedule number across provider summaries."""
+    totals = {FIRST_SCHEDULE + i: df["AMOUNT RECOMMENDED FOR PAYMENT (N)"].sum() for i, (_, df) in enumerate(summaries)}
+    return pd.Series(totals, name="Amount").round(2)
+
+def workbook_bytes(sheets, title_rows=None):
+    """
+    Write {sheet_name: DataFrame} to an .xlsx in memory.
+
+    Args:
+        title_rows (dict): Optional {sheet_name: title} written above the header, as provider
+            PAYMENT SUMMARY sheets have (read back with header=1)
+    """
+    title_rows = title_rows or {}
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for name, frame in sheets.items():
+            start = 1 if name in title_rows else 0
+            frame.to_excel(writer, sheet_name=name, index=False, startrow=start)
+            if start:
+                writer.sheets[name].cell(row=1, column=1, value=title_rows[name])
+    return buffer.getvalue()
+
+def summary_workbook(frame, provider=None):
+    return workbook_bytes({SUMMARY_SHEET: frame}, {SUMMARY_SHEET: f"PAYMENT SUMMARY - {provider or ''}".strip(" -")})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tier", default="1k", help=f"One of {', '.join(TIERS)} or a row count")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--out", default="synthetic")
+    args = parser.parse_args()
+
+    rows = tier_rows(args.tier)
+    os.makedirs(args.out, exist_ok=True)
+    claims = claims_schedule(rows, args.seed)
+    finance = finance_weekly_report(schedule_totals(claims), args.seed)
+    with open(os.path.join(args.out, f"claims_{args.tier}.xlsx"), "wb") as f:
+        f.write(workbook_bytes({CLAIMS_SHEET: claims}))
+    with open(os.path.join(args.out, f"finance_{args.tier}.xlsx"), "wb") as f:
+        f.write(workbook_bytes({FINANCE_SHEET: finance}))
+
+    summary_dir = os.path.join(args.out, f"summaries_{args.tier}")
+    os.makedirs(summary_dir, exist_ok=True)
+    summaries = provider_summaries(rows, args.seed)
+    for name, frame in summaries:
+        with open(os.path.join(summary_dir, name), "wb") as f:
+            f.write(summary_workbook(frame, frame["PROVIDER NAME"].iloc[0]))
+    summary_finance = finance_weekly_report(summary_totals(summaries), args.seed)
+    with open(os.path.join(args.out, f"finance_summaries_{args.tier}.xlsx"), "wb") as f:
+        f.write(workbook_bytes({FINANCE_SHEET: summary_finance}))
+    print(f"Wrote {rows} claim rows, {len(finance)} finance rows and {len(summaries)} provider summaries to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
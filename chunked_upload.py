@@ -0,0 +1,181 @@
+import hashlib
+import uuid
+from datetime import datetime
+from config import logger
+from db_backend import create_table_if_missing, table_exists, plain_name
+from ddl_planner import apply_column_widening
+
+CHECKPOINT_TABLE = "upload_checkpoints"
+CHECKPOINT_COLUMN_DEFS = [
+    "load_id VARCHAR(64) NOT NULL PRIMARY KEY",
+    "table_name VARCHAR(256) NOT NULL",
+    "file_name VARCHAR(512)",
+    "file_hash VARCHAR(64) NOT NULL",
+    "total_rows INT NOT NULL",
+    "chunk_size INT NOT NULL",
+    "chunks_done INT NOT NULL",
+    "status VARCHAR(16) NOT NULL",
+    "last_error VARCHAR(4000)",
+    "updated_at datetime2",
+]
+LOAD_COLUMN_DEFS = ["load_id VARCHAR(64) NOT NULL", "chunk_no INT NOT NULL", "row_no INT NOT NULL"]
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def load_stage_name(table):
+    return f"[{plain_name(table)}_load_stage]" if table.strip().startswith("[") else f"{table}_load_stage"
+
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def chunk_count(total_rows, chunk_size):
+    return (total_rows + chunk_size - 1) // chunk_size
+
+def ensure_load_tables(conn, table_name, col_defs):
+    create_table_if_missing(conn, CHECKPOINT_TABLE, CHECKPOINT_COLUMN_DEFS)
+    stage = load_stage_name(table_name)
+    if table_exists(conn, stage):
+        # A stage left by an earlier load may predate columns that have since been widened
+        apply_column_widening(conn, stage, dict(d.split(" ", 1) for d in col_defs))
+    else:
+        create_table_if_missing(conn, stage, LOAD_COLUMN_DEFS + list(col_defs))
+
+def _update_checkpoint(conn, load_id, **fields):
+    fields["updated_at"] = datetime.now()
+    assignments = ", ".join(f"{k} = ?" for k in fields)
+    conn.cursor().execute(f"UPDATE {CHECKPOINT_TABLE} SET {assignments} WHERE load_id = ?",
+                          list(fields.values()) + [load_id])
+
+def find_resumable_loads(conn, table_name):
+    """
+    Incomplete loads for a table, newest first.
+
+    Returns:
+        list: dicts with load_id, file_name, file_hash, total_rows, chunk_size, chunks_done, status, last_error
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT load_id, file_name, file_hash, total_rows, chunk_size, chunks_done, status, last_error
+        FROM {CHECKPOINT_TABLE}
+        WHERE table_name = ? AND status IN ('running', 'failed')
+        ORDER BY updated_at DESC
+    """, (table_name,))
+    keys = ["load_id", "file_name", "file_hash", "total_rows", "chunk_size", "chunks_done", "status", "last_error"]
+    return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+def start_or_resume_load(conn, table_name, file_name, file_hash, total_rows, chunk_size=DEFAULT_CHUNK_SIZE,
+                         resume_load_id=None):
+    """
+    Return the checkpoint to continue from. An incomplete load of the same file (by content hash)
+    is resumed automatically; resume_load_id resumes a chosen load whose file was since corrected.
+    Commits the checkpoint row.
+
+    Returns:
+        dict: Checkpoint with load_id, chunk_size and chunks_done
+    """
+    for load in find_resumable_loads(conn, table_name):
+        if load["load_id"] == resume_load_id or (resume_load_id is None and load["file_hash"] == file_hash):
+            if load["total_rows"] == total_rows:
+                _update_checkpoint(conn, load["load_id"], status="running", file_hash=file_hash, last_error=None)
+                conn.commit()
+                logger.info(f"Resuming load {load['load_id']} into {table_name} at chunk {load['chunks_done']}",
+                            extra={"table": table_name, "load_id": load["load_id"]})
+                return load
+            logger.warning(f"Load {load['load_id']} had {load['total_rows']} rows, file now has {total_rows}; starting over")
+
+    load_id = uuid.uuid4().hex
+    conn.cursor().execute(
+        f"INSERT INTO {CHECKPOINT_TABLE} (load_id, table_name, file_name, file_hash, total_rows, chunk_size, "
+        f"chunks_done, status, updated_at) VALUES (?, ?, ?, ?, ?, ?, 0, 'running', ?)",
+        (load_id, table_name, file_name, file_hash, total_rows, chunk_size, datetime.now()),
+    )
+    conn.commit()
+    return {"load_id": load_id, "file_name": file_name, "file_hash": file_hash, "total_rows": total_rows,
+            "chunk_size": chunk_size, "chunks_done": 0, "status": "running", "last_error": None}
+
+def find_bad_rows(conn, insert_query, params, row_numbers):
+    """Retry a failed chunk row by row to attribute the error to source row numbers."""
+    cursor = conn.cursor()
+    failed = []
+    for row_no, values in zip(row_numbers, params):
+        try:
+            cursor.execute(insert_query, values)
+        except Exception as e:
+            failed.append((row_no, str(e)))
+    conn.rollback()
+    return failed
+
+def load_chunks(conn, table_name, checkpoint, columns, rows, row_numbers, on_progress=None):
+    """
+    Insert rows into the load stage one committed chunk at a time, advancing the checkpoint.
+    Stops at the first failing chunk and marks the load 'failed' so it can be resumed.
+
+    Args:
+        conn: DB-API connection with autocommit off
+        table_name (str): Target table the load is destined for
+        checkpoint (dict): From start_or_resume_load
+        columns (list): Column names for each row tuple
+        rows (list): Cleaned row tuples
+        row_numbers (list): Source row number of each row
+        on_progress (callable): Called with (chunks_done, total_chunks)
+
+    Returns:
+        list: (row_number, error) pairs for the failing chunk, empty when every chunk loaded
+    """
+    load_id = checkpoint["load_id"]
+    chunk_size = checkpoint["chunk_size"]
+    stage = load_stage_name(table_name)
+    total_chunks = chunk_count(len(rows), chunk_size)
+    insert_query = (f"INSERT INTO {stage} (load_id, chunk_no, row_no, {', '.join(columns)}) "
+                    f"VALUES ({', '.join(['?'] * (len(columns) + 3))})")
+    cursor = conn.cursor()
+    if hasattr(cursor, "fast_executemany"):
+        cursor.fast_executemany = True
+
+    for chunk_no in range(checkpoint["chunks_done"], total_chunks):
+        start = chunk_no * chunk_size
+        chunk_rows = rows[start:start + chunk_size]
+        chunk_row_numbers = row_numbers[start:start + chunk_size]
+        params = [(load_id, chunk_no, row_no) + tuple(values) for row_no, values in zip(chunk_row_numbers, chunk_rows)]
+        try:
+            # Clear any rows left by a previous attempt at this chunk so retries are idempotent
+            cursor.execute(f"DELETE FROM {stage} WHERE load_id = ? AND chunk_no >= ?", (load_id, chunk_no))
+            cursor.executemany(insert_query, params)
+            _update_checkpoint(conn, load_id, chunks_done=chunk_no + 1)
+            conn.commit()
+            checkpoint["chunks_done"] = chunk_no + 1
+        except Exception as e:
+            conn.rollback()
+            failed = find_bad_rows(conn, insert_query, params, chunk_row_numbers) or [(chunk_row_numbers[0], str(e))]
+            _update_checkpoint(conn, load_id, status="failed", last_error=str(e)[:4000])
+            conn.commit()
+            logger.warning(f"Load {load_id} into {table_name} failed at chunk {chunk_no + 1}/{total_chunks}: {e}",
+                           extra={"table": table_name, "load_id": load_id, "chunk": chunk_no + 1})
+            return failed
+        if on_progress:
+            on_progress(chunk_no + 1, total_chunks)
+    return []
+
+def finalize_load(conn, table_name, checkpoint, columns):
+    """
+    Move a fully staged load into the target table in one transaction and mark it done.
+
+    Returns:
+        int: Number of rows moved
+    """
+    load_id = checkpoint["load_id"]
+    stage = load_stage_name(table_name)
+    cols = ", ".join(columns)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {stage} WHERE load_id = ?", (load_id,))
+        moved = cursor.fetchone()[0]
+        cursor.execute(f"INSERT INTO {table_name} ({cols}) SELECT {cols} FROM {stage} WHERE load_id = ? ORDER BY row_no",
+                       (load_id,))
+        cursor.execute(f"DELETE FROM {stage} WHERE load_id = ?", (load_id,))
+        _update_checkpoint(conn, load_id, status="done")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return moved
@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import io
+from functools import cached_property
 from datetime import datetime
 import re
 import html
@@ -11,9 +13,19 @@ import os
 from dotenv import load_dotenv
 from config import get_cc_list, get_to_email, logger
 from utils import validate_email_list
+from amounts import to_kobo, from_kobo
+from prefetch import prefetch, prefetch_workbook, workbook_sheets
+from upload_handle import spool_upload, open_upload
+from file_readers import UPLOAD_TYPES, FLAT_TYPES, upload_format, read_tables
+from job_runner import submit_job, render_job_panel, list_jobs, job_result, session_owner, DONE
+from session_store import session_store
+from metrics import track, instrumented
+from exports import render_export_buttons, parquet_bytes, bundle_bytes, PARQUET_MIME, ZIP_MIME
 
 load_dotenv('secrets.env')
 
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
 COMPILATION_CONFIGS = {
     "telemedicine": {
         "label": "Telemedicine",
@@ -67,6 +79,7 @@ TEMPLATE_COLUMNS = [
     'SCH_NO', 'APPEAL_NO', 'SCH_NUM'
 ]
 BLANK_COLUMNS = ['Paiddate', 'SCH_NO', 'APPEAL_NO', 'SCH_NUM']
+COMPILED_AMOUNT_COLUMN = 'AMOUNT_RECOMMENDED_FOR_PAYMENT_N'
 
 COLUMN_MAPPING = {
     'S/N': 'S_N',
@@ -90,73 +103,186 @@ COLUMN_MAPPING = {
     'NARRATIVE': 'NARRATION',
 }
 
-def compile_files(uploaded_files):
-    compiled_data = []
-    file_summary = []
+def compile_file(name, data):
+    """
+    Standardize the PAYMENT SUMMARY sheet of one workbook (an UploadHandle or raw bytes). A CSV or
+    Parquet export is taken to be the PAYMENT SUMMARY table itself, with headers on its first row.
 
-    for uploaded_file in uploaded_files:
-        try:
-            excel_file = pd.ExcelFile(uploaded_file)
+    Returns:
+        tuple: (DataFrame in TEMPLATE_COLUMNS, or None if nothing was compiled; summary dict)
+    """
+    try:
+        if upload_format(data) in FLAT_TYPES:
+            df = next(iter(read_tables(data).values()))
+        else:
+            excel_file = pd.ExcelFile(open_upload(data))
             if 'PAYMENT SUMMARY' not in excel_file.sheet_names:
-                file_summary.append({'File': uploaded_file.name, 'Rows': 0, 'Status': 'No PAYMENT SUMMARY sheet found'})
+                return None, {'File': name, 'Rows': 0, 'Status': 'No PAYMENT SUMMARY sheet found'}
+            df = pd.read_excel(excel_file, sheet_name='PAYMENT SUMMARY', header=1)
+        if df.empty:
+            return None, {'File': name, 'Rows': 0, 'Status': 'Empty sheet'}
+
+        df = df.dropna(how='all')
+        data_rows = []
+        for i in range(len(df)):
+            row = df.iloc[i]
+            first_col = str(row.iloc[0]).strip() if pd.notna(row.iloc[0]) else ""
+            if any(w in first_col.upper() for w in ['TOTAL', 'SUM', 'GRAND', 'SUBTOTAL', 'SUMMARY']):
                 continue
-
-            df = pd.read_excel(uploaded_file, sheet_name='PAYMENT SUMMARY', header=1)
-            if df.empty:
-                file_summary.append({'File': uploaded_file.name, 'Rows': 0, 'Status': 'Empty sheet'})
+            if first_col == "" and row.isna().all():
                 continue
-
-            df = df.dropna(how='all')
-            data_rows = []
-            for i in range(len(df)):
-                row = df.iloc[i]
-                first_col = str(row.iloc[0]).strip() if pd.notna(row.iloc[0]) else ""
-                if any(w in first_col.upper() for w in ['TOTAL', 'SUM', 'GRAND', 'SUBTOTAL', 'SUMMARY']):
-                    continue
-                if first_col == "" and row.isna().all():
-                    continue
-                try:
-                    float(first_col)
+            try:
+                float(first_col)
+                data_rows.append(i)
+            except ValueError:
+                non_empty = sum(1 for val in row if pd.notna(val) and str(val).strip() != "")
+                if non_empty >= 3:
                     data_rows.append(i)
-                except ValueError:
-                    non_empty = sum(1 for val in row if pd.notna(val) and str(val).strip() != "")
-                    if non_empty >= 3:
-                        data_rows.append(i)
 
-            if not data_rows:
-                file_summary.append({'File': uploaded_file.name, 'Rows': 0, 'Status': 'No valid data rows found'})
-                continue
-            df_clean = df.iloc[data_rows].copy()
+        if not data_rows:
+            return None, {'File': name, 'Rows': 0, 'Status': 'No valid data rows found'}
+        df_clean = df.iloc[data_rows].copy()
+
+        data_dict = {}
+        for col in TEMPLATE_COLUMNS:
+            data_dict[col] = [''] * len(df_clean)
+        standardized_df = pd.DataFrame(data_dict)
+
+        for orig_col, new_col in COLUMN_MAPPING.items():
+            if orig_col in df_clean.columns and new_col not in BLANK_COLUMNS:
+                # Whole numbers lose their '.0'; decimals (kobo amounts) are kept as written
+                standardized_df[new_col] = df_clean[orig_col].apply(
+                    lambda x: str(int(float(x))) if pd.notna(x) and str(x).replace('.', '', 1).isdigit()
+                    and float(x).is_integer() else str(x) if pd.notna(x) else ''
+                ).values
+
+        standardized_df['Source_File'] = name
+        return standardized_df, {'File': name, 'Schedule': extract_schedule_from_filename(name),
+                                 'Rows': len(df_clean), 'Status': 'Success'}
+
+    except Exception as e:
+        logger.warning(f"Compile failed for {name}: {e}")
+        return None, {'File': name, 'Rows': 0, 'Status': f'Error: {str(e)}'}
 
-            data_dict = {}
-            for col in TEMPLATE_COLUMNS:
-                data_dict[col] = [''] * len(df_clean)
-            standardized_df = pd.DataFrame(data_dict)
+def prefetch_compiled_files(uploaded_files):
+    """Start compiling each file on the prefetch pool (reusing any compile already started)."""
+    futures = []
+    for uploaded_file in uploaded_files:
+        handle = spool_upload(uploaded_file)
+        futures.append(prefetch(("compiled", handle.digest, handle.name), compile_file, handle.name, handle))
+    return futures
 
-            for orig_col, new_col in COLUMN_MAPPING.items():
-                if orig_col in df_clean.columns and new_col not in BLANK_COLUMNS:
-                    standardized_df[new_col] = df_clean[orig_col].apply(
-                        lambda x: str(int(float(x))) if pd.notna(x) and str(x).replace('.', '').isdigit()
-                        else str(x) if pd.notna(x) else ''
-                    )
+class CompiledDataset:
+    """
+    The files of one compilation as a single frame in TEMPLATE_COLUMNS, concatenated once. Each
+    row's schedule (taken from its file name when the file was compiled) and its amount in kobo are
+    kept as typed columns beside it, and the per-schedule views are computed on first use.
 
-            standardized_df['Source_File'] = uploaded_file.name
-            compiled_data.append(standardized_df)
-            file_summary.append({'File': uploaded_file.name, 'Rows': len(df_clean), 'Status': 'Success'})
+    Args:
+        frames (list): compile_file DataFrames, one per file
+        schedules (list): Schedule number of each frame; defaults to parsing each frame's Source_File once
+    """
 
-        except Exception as e:
-            file_summary.append({'File': uploaded_file.name, 'Rows': 0, 'Status': f'Error: {str(e)}'})
-            logger.warning(f"Compile failed for {uploaded_file.name}: {e}")
+    def __init__(self, frames=(), schedules=None):
+        frames = list(frames)
+        if schedules is None:
+            schedules = [extract_schedule_from_filename(str(f['Source_File'].iloc[0])) if len(f) else None for f in frames]
+        self.file_count = len(frames)
+        self.frame = (pd.concat(frames, ignore_index=True) if frames
+                      else pd.DataFrame({col: pd.Series(dtype=object) for col in TEMPLATE_COLUMNS}))
+        self.schedule = pd.Series(np.repeat(np.array(schedules, dtype=object), [len(f) for f in frames]),
+                                  index=self.frame.index, dtype="category")
+        self.amount_kobo = to_kobo(self.frame[COMPILED_AMOUNT_COLUMN]) if len(self.frame) else pd.Series(dtype="Int64")
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __bool__(self):
+        return self.file_count > 0
+
+    @cached_property
+    def source_files(self):
+        return self.frame['Source_File'].unique().tolist()
+
+    @cached_property
+    def schedule_totals(self):
+        """Schedule_Number, Kobo (int64) and Source_Files for every file named after a schedule."""
+        tagged = pd.DataFrame({
+            'Schedule_Number': self.schedule.astype(object),
+            'Kobo': self.amount_kobo,
+            'Source_File': self.frame['Source_File'],
+        }).dropna(subset=['Schedule_Number', 'Kobo'])
+        grouped = tagged.groupby('Schedule_Number', sort=True).agg(
+            Kobo=('Kobo', 'sum'),
+            Source_Files=('Source_File', lambda x: ', '.join(x.unique())),
+        ).reset_index()
+        grouped['Kobo'] = grouped['Kobo'].astype('int64')
+        return grouped
+
+def compile_files(uploaded_files, on_progress=None, category=""):
+    """
+    Compile uploads concurrently.
+
+    Args:
+        uploaded_files (list): Uploads or UploadHandles
+        on_progress (callable): Called with (files done, total files) after each file
+        category (str): Compilation category (a config's label_lower), the target of the compile metrics
 
-    return compiled_data, file_summary
+    Returns:
+        tuple: (CompiledDataset of the files that compiled, list of per-file summary dicts)
+    """
+    frames, schedules = [], []
+    file_summary = []
 
-def create_compiled_excel(compiled_data, sheet_name="Compiled Data"):
-    if not compiled_data:
+    # The same workbook uploaded twice (under any name) is compiled once; its copies would double the totals
+    handles, first_by_digest, duplicates = [], {}, {}
+    for uploaded_file in uploaded_files:
+        handle = spool_upload(uploaded_file)
+        if handle.digest in first_by_digest:
+            duplicates[len(handles)] = first_by_digest[handle.digest]
+        else:
+            first_by_digest[handle.digest] = handle.name
+        handles.append(handle)
+
+    with track("compile", target=category) as op:
+        # Files are compiled concurrently; most were already started when they were uploaded
+        futures = prefetch_compiled_files([h for i, h in enumerate(handles) if i not in duplicates])
+        results = iter(futures)
+        for done, handle in enumerate(handles, 1):
+            if done - 1 in duplicates:
+                file_summary.append({'File': handle.name, 'Schedule': extract_schedule_from_filename(handle.name),
+                                     'Rows': 0, 'Status': f'Skipped: duplicate of {duplicates[done - 1]}'})
+                if on_progress:
+                    on_progress(done, len(handles))
+                continue
+            standardized_df, summary = next(results).result()
+            if standardized_df is not None:
+                frames.append(standardized_df)  # concatenated into a new frame, so the shared prefetched one is untouched
+                schedules.append(summary.get('Schedule'))
+            file_summary.append(summary)
+            if on_progress:
+                on_progress(done, len(handles))
+
+        compiled = CompiledDataset(frames, schedules)
+        op.add_rows(len(compiled))
+        if handles and not compiled:
+            op.fail()
+    return compiled, file_summary
+
+def create_compiled_excel(compiled, sheet_name="Compiled Data"):
+    if not compiled:
         return None
-    combined_df = pd.concat(compiled_data, ignore_index=True)
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        combined_df.to_excel(writer, sheet_name=sheet_name, index=False)
+        compiled.frame.to_excel(writer, sheet_name=sheet_name, index=False)
+    output.seek(0)
+    return output.getvalue()
+
+def create_comparison_excel(comparison_df, compiled, sheet_name="Compiled Data"):
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        comparison_df.to_excel(writer, sheet_name='Finance Comparison', index=False)
+        compiled.frame.to_excel(writer, sheet_name=sheet_name, index=False)
     output.seek(0)
     return output.getvalue()
 
@@ -165,79 +291,68 @@ def extract_schedule_from_filename(filename):
     match = re.search(pattern, filename, re.IGNORECASE)
     return match.group(1) if match else None
 
-def compare_with_finance(compiled_data, finance_file, config):
-    if not compiled_data or not finance_file:
+def compare_with_finance(compiled, finance_file, config):
+    """
+    finance_comparison for the page: errors are shown with st.error and give None.
+    """
+    try:
+        return finance_comparison(compiled, finance_file, config)
+    except Exception as e:
+        st.error(f"Error comparing with finance data: {str(e)}")
+        logger.error(f"compare_with_finance error for {config['label_lower']}: {e}", exc_info=True)
+        return None
+
+def finance_comparison(compiled, finance_file, config):
+    """
+    Compiled schedule totals against the finance workbook's. Raises on errors, so background jobs
+    can fail with them instead of drawing on a page they are not running in.
+
+    Returns:
+        pandas.DataFrame: One row per schedule, or None if either input is missing or the finance
+        file has no CLAIMS RECEIVED / WEEKLY REPORT sheet
+    """
+    if not compiled or not finance_file:
         return None
+    return _compare_with_finance(compiled, finance_file, config)
 
-    label_lower = config["label_lower"]
+@instrumented("finance_comparison", failed=lambda comparison: comparison is None, rows=len)
+def _compare_with_finance(compiled, finance_file, config):
     amount_label = config["amount_label"]
 
-    try:
-        finance_xls = pd.ExcelFile(finance_file)
-        finance_sheet = None
-        for sheet in finance_xls.sheet_names:
-            if 'CLAIMS RECEIVED' in sheet.upper() or 'WEEKLY REPORT' in sheet.upper():
-                finance_sheet = sheet
-                break
-        if not finance_sheet:
-            return None
-
-        finance_df = pd.read_excel(finance_file, sheet_name=finance_sheet)
-        combined = pd.concat(compiled_data, ignore_index=True)
-
-        summary = []
-        for _, row in combined.iterrows():
-            fname = row.get('Source_File', '')
-            schedule_num = extract_schedule_from_filename(fname)
-            amt_col = 'AMOUNT_RECOMMENDED_FOR_PAYMENT_N'
-            if schedule_num and amt_col in row:
-                try:
-                    amount = float(str(row[amt_col]).replace(',', ''))
-                    summary.append({'Schedule_Number': schedule_num, amount_label: amount, 'Source_File': fname})
-                except (ValueError, TypeError):
-                    continue
-
-        if not summary:
-            return None
-
-        summary_df = pd.DataFrame(summary)
-        grouped = summary_df.groupby('Schedule_Number').agg({
-            amount_label: 'sum',
-            'Source_File': lambda x: ', '.join(x.unique())
-        }).reset_index()
-
-        results = []
-        for _, crow in grouped.iterrows():
-            sch = crow['Schedule_Number']
-            cat_amt = crow[amount_label]
-            finance_df['_sch_num'] = pd.to_numeric(finance_df['Claim Batch No/Sch No'], errors='coerce')
-            ffiltered = finance_df[finance_df['_sch_num'] == float(sch)]
-            if not ffiltered.empty:
-                fin_amt = pd.to_numeric(ffiltered['Claims_Advised_Amount'], errors='coerce').sum()
-                variance = cat_amt - fin_amt
-                results.append({
-                    'Schedule_Number': sch,
-                    amount_label: cat_amt,
-                    'Finance_Amount': fin_amt,
-                    'Variance': variance,
-                    'Source_Files': crow['Source_File']
-                })
-            else:
-                results.append({
-                    'Schedule_Number': sch,
-                    amount_label: cat_amt,
-                    'Finance_Amount': 0,
-                    'Variance': cat_amt,
-                    'Source_Files': crow['Source_File']
-                })
-
-        return pd.DataFrame(results)
+    finance_sheets = workbook_sheets(finance_file)
+    finance_sheet = None
+    for sheet in finance_sheets:
+        if 'CLAIMS RECEIVED' in sheet.upper() or 'WEEKLY REPORT' in sheet.upper():
+            finance_sheet = sheet
+            break
+    if not finance_sheet and upload_format(finance_file) in FLAT_TYPES:
+        finance_sheet = next(iter(finance_sheets))
+    if not finance_sheet:
+        return None
 
-    except Exception as e:
-        st.error(f"Error comparing with finance data: {str(e)}")
-        logger.error(f"compare_with_finance error for {label_lower}: {e}", exc_info=True)
+    finance_df = finance_sheets[finance_sheet]
+    grouped = compiled.schedule_totals
+    if grouped.empty:
         return None
 
+    # Finance totals per numeric schedule number, summed exactly in kobo
+    finance_kobo = to_kobo(finance_df['Claims_Advised_Amount']).fillna(0)
+    finance_totals = finance_kobo.groupby(
+        pd.to_numeric(finance_df['Claim Batch No/Sch No'], errors='coerce')
+    ).sum()
+    fin_kobo = pd.to_numeric(grouped['Schedule_Number'], errors='coerce').map(finance_totals).fillna(0)
+    fin_kobo = fin_kobo.astype('int64')
+    cat_kobo = grouped['Kobo']
+
+    return pd.DataFrame({
+        'Schedule_Number': grouped['Schedule_Number'],
+        amount_label: from_kobo(cat_kobo),
+        'Finance_Amount': from_kobo(fin_kobo),
+        'Variance': from_kobo(cat_kobo - fin_kobo),
+        'Source_Files': grouped['Source_Files'],
+    })
+
+@instrumented("email", target="finance_comparison", failed=lambda sent: not sent)
 def send_notification_email(missing_schedules, amount_mismatches, config):
     sender_email = os.getenv("OFFICE_SENDER_EMAIL")
     password = os.getenv("OUTLOOK_APP_PASSWORD")
@@ -329,6 +444,47 @@ def send_notification_email(missing_schedules, amount_mismatches, config):
         logger.error(f"send_notification_email failed for {label}: {e}", exc_info=True)
         return False
 
+def run_compilation_job(job, files, finance_file, config, compare):
+    """
+    Background version of the Process button: compile the files, write the workbooks as job
+    artifacts and optionally compare with Finance. Comparison errors fail the job rather than
+    calling st.error, which has no page to draw on from a job thread.
+
+    Returns:
+        dict: compiled_data, file_summary and comparison_df (None if not compared)
+    """
+    compiled, file_summary = compile_files(
+        files, on_progress=lambda done, total: job.progress(0.8 * done / total, f"Compiled {done}/{total} files"),
+        category=config["label_lower"],
+    )
+    result = {"compiled_data": compiled, "file_summary": file_summary, "comparison_df": None}
+    if not compiled:
+        job.progress(1.0, "No valid data found in the files")
+        return result
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    job.progress(0.85, "Writing compiled workbook")
+    job.save_artifact(f"{config['compiled_filename_prefix']}_{timestamp}.xlsx",
+                      create_compiled_excel(compiled, config["sheet_name"]), XLSX_MIME)
+    job.save_artifact(f"{config['compiled_filename_prefix']}_{timestamp}.parquet",
+                      parquet_bytes(compiled.frame), PARQUET_MIME)
+    message = f"Compiled {len(compiled)} rows from {compiled.file_count} files"
+    if compare and finance_file is not None:
+        job.progress(0.9, "Comparing with finance data")
+        comparison_df = finance_comparison(compiled, finance_file, config)
+        if comparison_df is None:
+            message += "; not compared, the finance file has no CLAIMS RECEIVED or WEEKLY REPORT sheet"
+        elif not comparison_df.empty:
+            result["comparison_df"] = comparison_df
+            job.save_artifact(f"{config['finance_comparison_filename']}_{timestamp}.xlsx",
+                              create_comparison_excel(comparison_df, compiled, config["sheet_name"]), XLSX_MIME)
+            job.save_artifact(f"{config['finance_comparison_filename']}_{timestamp}.zip",
+                              bundle_bytes({'Finance Comparison': comparison_df,
+                                            config["sheet_name"]: compiled.frame}), ZIP_MIME)
+
+    job.progress(1.0, message)
+    return result
+
 def show_compilation_page(config):
     label = config["label"]
     label_lower = config["label_lower"]
@@ -338,31 +494,43 @@ def show_compilation_page(config):
     session_comparison = config["session_comparison"]
     session_uploader = config["session_uploader"]
     session_finance_uploader = config["session_finance_uploader"]
+    job_kind = f"compilation_{label_lower}"
 
     st.header(config["page_header"])
     st.markdown(f"""
     Upload multiple {label} Excel files to compile their PAYMENT SUMMARY sheets and compare with finance data.
     """)
 
+    # Compile/parse uploads in the background as soon as they arrive, before Process is clicked
+    def _prefetch_uploaded_files():
+        prefetch_compiled_files(st.session_state.get(session_uploader) or [])
+
+    def _prefetch_finance_file():
+        if st.session_state.get(session_finance_uploader) is not None:
+            prefetch_workbook(st.session_state[session_finance_uploader])
+
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader(f"{label} Files")
         uploaded_files = st.file_uploader(
             f"Upload {label} Excel Files",
-            type=['xlsx', 'xls'],
+            type=UPLOAD_TYPES,
             accept_multiple_files=True,
-            help=f"Select multiple Excel files containing {label} data with PAYMENT SUMMARY sheets",
-            key=session_uploader
+            help=f"Select multiple Excel files containing {label} data with PAYMENT SUMMARY sheets "
+                 "(or CSV/Parquet exports of those sheets)",
+            key=session_uploader,
+            on_change=_prefetch_uploaded_files,
         )
 
     with col2:
         st.subheader("Finance File")
         finance_file = st.file_uploader(
             "Upload Finance Excel File",
-            type=['xlsx', 'xls'],
-            help="Upload the finance file containing 'CLAIMS RECEIVED WEEKLY REPORT' sheet",
-            key=session_finance_uploader
+            type=UPLOAD_TYPES,
+            help="Upload the finance file containing 'CLAIMS RECEIVED WEEKLY REPORT' sheet, or a CSV/Parquet export of it",
+            key=session_finance_uploader,
+            on_change=_prefetch_finance_file,
         )
 
     if uploaded_files:
@@ -377,21 +545,37 @@ def show_compilation_page(config):
             [f"Compile {label} Only", f"Compile {label} + Compare with Finance"],
         )
 
-        if st.button(f"Process {label} Files", type="primary"):
+        run_in_background = st.checkbox(
+            "Run in background",
+            help="Queue the work and keep using the app; progress and downloads appear below and on the "
+                 "Background Jobs page.",
+            key=f"run_in_background_{label_lower}",
+        )
+        process_clicked = st.button(f"Process {label} Files", type="primary")
+        if process_clicked and run_in_background:
+            submit_job(
+                job_kind, f"Compile {len(uploaded_files)} {label} file(s)", run_compilation_job,
+                [spool_upload(f) for f in uploaded_files],
+                spool_upload(finance_file) if finance_file else None,
+                config, compare=process_option == f"Compile {label} + Compare with Finance",
+                owner=session_owner(),
+            )
+            st.info(f"{label} compilation queued.")
+        elif process_clicked:
             with st.spinner(f"Processing {label} files..."):
-                compiled_data, file_summary = compile_files(uploaded_files)
+                compiled, file_summary = compile_files(uploaded_files, category=label_lower)
 
                 st.subheader("Processing Summary")
                 st.dataframe(pd.DataFrame(file_summary), use_container_width=True)
 
-                if compiled_data:
-                    excel_bytes = create_compiled_excel(compiled_data, sheet_name)
+                if compiled:
+                    excel_bytes = create_compiled_excel(compiled, sheet_name)
                     if excel_bytes:
-                        total_rows = sum(len(d) for d in compiled_data)
+                        total_rows = len(compiled)
                         successful = sum(1 for s in file_summary if s['Status'] == 'Success')
                         st.success(f"Successfully compiled {successful} files with {total_rows} total rows")
 
-                        st.session_state[session_compiled] = compiled_data
+                        session_store().put(session_compiled, compiled)
 
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                         compiled_filename = f"{config['compiled_filename_prefix']}_{timestamp}.xlsx"
@@ -401,15 +585,17 @@ def show_compilation_page(config):
                             file_name=compiled_filename,
                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                         )
+                        render_export_buttons({sheet_name: compiled.frame},
+                                              compiled_filename[:-len(".xlsx")], f"compiled_{label_lower}")
 
                         if process_option == f"Compile {label} + Compare with Finance" and finance_file:
                             st.subheader("Finance Comparison")
                             with st.spinner("Comparing with finance data..."):
-                                comparison_df = compare_with_finance(compiled_data, finance_file, config)
+                                comparison_df = compare_with_finance(compiled, finance_file, config)
 
                                 if comparison_df is not None and not comparison_df.empty:
                                     st.success("Finance comparison completed!")
-                                    st.session_state[session_comparison] = comparison_df
+                                    session_store().put(session_comparison, comparison_df)
                                     st.dataframe(comparison_df, use_container_width=True)
 
                                     total_variance = comparison_df['Variance'].sum()
@@ -442,18 +628,16 @@ def show_compilation_page(config):
                                     else:
                                         st.success("No discrepancies found!")
 
-                                    comparison_output = io.BytesIO()
-                                    with pd.ExcelWriter(comparison_output, engine='openpyxl') as writer:
-                                        comparison_df.to_excel(writer, sheet_name='Finance Comparison', index=False)
-                                        pd.concat(compiled_data, ignore_index=True).to_excel(writer, sheet_name=sheet_name, index=False)
-                                    comparison_output.seek(0)
-
                                     st.download_button(
                                         label="📥 Download Comparison Report",
-                                        data=comparison_output.getvalue(),
+                                        data=create_comparison_excel(comparison_df, compiled, sheet_name),
                                         file_name=f"{config['finance_comparison_filename']}_{timestamp}.xlsx",
                                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                                     )
+                                    render_export_buttons(
+                                        {'Finance Comparison': comparison_df, sheet_name: compiled.frame},
+                                        f"{config['finance_comparison_filename']}_{timestamp}", f"comparison_{label_lower}",
+                                    )
                                 else:
                                     st.warning("Could not perform finance comparison. Check that the finance file contains 'CLAIMS RECEIVED WEEKLY REPORT' sheet.")
 
@@ -461,13 +645,27 @@ def show_compilation_page(config):
                             st.warning("Please upload a finance file to perform comparison.")
 
                         if st.checkbox("Show Preview of Compiled Data"):
-                            combined = pd.concat(compiled_data, ignore_index=True)
-                            st.dataframe(combined.head(20), use_container_width=True)
-
-    if session_comparison in st.session_state:
+                            st.dataframe(compiled.frame.head(20), use_container_width=True)
+
+    from watch_ingest import render_watch_store  # watch_ingest compiles through this module
+    render_watch_store(config, finance_file)
+
+    render_job_panel(kind=job_kind, title=f"Background {label} Jobs", limit=5, owner=session_owner())
+    finished = [job for job in list_jobs(job_kind, limit=5, owner=session_owner()) if job["status"] == DONE]
+    if finished and st.button("Use latest background results", key=f"load_job_{label_lower}"):
+        result = job_result(finished[0]["job_id"])
+        if result and result["compiled_data"]:
+            compiled = result["compiled_data"]
+            if isinstance(compiled, list):  # results saved before CompiledDataset
+                compiled = CompiledDataset(compiled)
+            session_store().put(session_compiled, compiled)
+        if result and result["comparison_df"] is not None:
+            session_store().put(session_comparison, result["comparison_df"])
+
+    if session_comparison in session_store():
         st.markdown("---")
         st.subheader("📧 Manual Email Notification")
-        comparison_df = st.session_state[session_comparison]
+        comparison_df = session_store().get(session_comparison)
         missing_in_finance = len(comparison_df[comparison_df['Finance_Amount'] == 0])
         amount_mismatches = len(comparison_df[(comparison_df['Finance_Amount'] != 0) & (comparison_df['Variance'] != 0)])
 
@@ -0,0 +1,238 @@
+import os
+import re
+import sqlite3
+from decimal import Decimal
+
+# Which database the upload engine talks to: 'sqlserver' (default) or 'sqlite' for local runs and tests
+DB_BACKEND_ENV = "DB_BACKEND"
+DB_SQLITE_PATH_ENV = "DB_SQLITE_PATH"
+DEFAULT_SQLITE_PATH = "local_uploads.db"
+BULK_INSERT_BATCH_SIZE = 10000
+
+_MAX_TEXT_RE = re.compile(r"\bN?VARCHAR\s*\(\s*MAX\s*\)", re.IGNORECASE)
+
+
+def plain_name(table):
+    """Table name without [bracket] quoting, e.g. for catalog lookups and index names."""
+    return table.strip()[1:-1] if table.strip().startswith("[") else table.strip()
+
+def index_name(table, columns):
+    slug = re.sub(r"\W+", "_", plain_name(table)).strip("_")
+    return f"IX_{slug}_{'_'.join(columns)}"
+
+
+class SqlServerBackend:
+    """
+    SQL Server over pyodbc: the production database behind every upload page.
+    """
+    name = "sqlserver"
+    supports_alter_column = True
+    supports_columnstore = True
+    max_index_key_bytes = 1700  # nonclustered index key limit
+
+    def connect(self):
+        import pyodbc
+        return pyodbc.connect(
+            "DRIVER={ODBC Driver 17 for SQL Server};"
+            f"SERVER={os.getenv('server')};"
+            f"DATABASE={os.getenv('database')};"
+            f"UID={os.getenv('dbusername')};"
+            f"PWD={os.getenv('password')}",
+            autocommit=False,
+        )
+
+    def temp_table(self, name):
+        return f"#{name}"
+
+    def column_type(self, type_name):
+        """Native type for a planned column type (the planner already speaks T-SQL)."""
+        return type_name
+
+    def create_table(self, conn, table, column_types):
+        cols = ", ".join(f"{col} {self.column_type(type_name)}" for col, type_name in column_types.items())
+        conn.cursor().execute(f"CREATE TABLE {table} ({cols})")
+
+    def table_exists(self, conn, table):
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sysobjects WHERE name = ? AND xtype = 'U'", (plain_name(table),))
+        return cursor.fetchone() is not None
+
+    def column_exists(self, conn, table, column):
+        cursor = conn.cursor()
+        cursor.execute("SELECT COL_LENGTH(?, ?)", (plain_name(table), column))
+        row = cursor.fetchone()
+        return row is not None and row[0] is not None
+
+    def column_types(self, conn, table):
+        """
+        Read the current column types of a table.
+
+        Returns:
+            dict: {column: type} such as 'VARCHAR(64)', 'NVARCHAR(MAX)' or 'datetime2'
+        """
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_NAME = ?
+        """, (plain_name(table),))
+        types = {}
+        for name, data_type, max_length in cursor.fetchall():
+            if max_length is not None:
+                types[name] = f"{data_type.upper()}({'MAX' if max_length == -1 else max_length})"
+            else:
+                types[name] = data_type
+        return types
+
+    def create_index_if_missing(self, conn, table, columns, unique=False):
+        name = index_name(table, columns)
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        conn.cursor().execute(f"""
+        IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('{table}'))
+        CREATE {kind} {name} ON {table} ({', '.join(columns)})
+        """)
+
+    def create_columnstore_if_missing(self, conn, table):
+        """
+        Convert a table to a clustered columnstore, if it has no clustered index yet.
+
+        Returns:
+            bool: True if the index was created
+        """
+        name = f"CCI_{re.sub(r'[^0-9A-Za-z]+', '_', plain_name(table)).strip('_')}"
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sys.indexes WHERE object_id = OBJECT_ID(?) AND type IN (1, 5)", (table,))
+        if cursor.fetchone():
+            return False
+        cursor.execute(f"CREATE CLUSTERED COLUMNSTORE INDEX {name} ON {table}")
+        return True
+
+    def bulk_insert(self, conn, table, columns, rows, batch_size=BULK_INSERT_BATCH_SIZE):
+        """Insert row tuples in executemany batches. Does not commit."""
+        cursor = conn.cursor()
+        if hasattr(cursor, "fast_executemany"):
+            cursor.fast_executemany = True
+        insert_query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(insert_query, rows[start:start + batch_size])
+
+    def consolidate(self, conn, source, target, columns):
+        """Append every row of source to target. Does not commit."""
+        cols = ", ".join(columns)
+        conn.cursor().execute(f"INSERT INTO {target} ({cols}) SELECT {cols} FROM {source}")
+
+    def merge_statements(self, target, stage, key, digest, columns, update_columns):
+        """Statements that update changed rows and insert unseen keys from stage into target."""
+        cols = ", ".join(columns)
+        set_clause = ", ".join(f"{c} = s.{c}" for c in update_columns)
+        return [f"""
+            MERGE INTO {target} WITH (HOLDLOCK) AS t
+            USING {stage} AS s
+            ON t.{key} = s.{key}
+            WHEN MATCHED AND (t.{digest} IS NULL OR t.{digest} <> s.{digest}) THEN
+                UPDATE SET {set_clause}
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT ({cols}) VALUES ({', '.join(f's.{c}' for c in columns)});
+        """]
+
+
+class SqliteBackend(SqlServerBackend):
+    """
+    Embedded SQLite file: runs the same upload pipeline offline, in tests and in benchmarks.
+
+    Types are declared with their SQL Server names (SQLite accepts any declared type) except
+    (N)VARCHAR(MAX), which it cannot parse; text lengths are not enforced, so columns never need
+    widening. Decimal parameters are stored as REAL.
+    """
+    name = "sqlite"
+    supports_alter_column = False
+    supports_columnstore = False
+    max_index_key_bytes = None
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv(DB_SQLITE_PATH_ENV, DEFAULT_SQLITE_PATH)
+
+    def connect(self, **kwargs):
+        # Parallel uploads open one connection per worker thread
+        kwargs.setdefault("timeout", 60)
+        kwargs.setdefault("check_same_thread", False)
+        return sqlite3.connect(self.path, **kwargs)
+
+    def temp_table(self, name):
+        return f"temp.{name}"
+
+    def column_type(self, type_name):
+        return _MAX_TEXT_RE.sub("TEXT", type_name)
+
+    def table_exists(self, conn, table):
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (plain_name(table),))
+        return cursor.fetchone() is not None
+
+    def column_exists(self, conn, table, column):
+        return column in self.column_types(conn, table)
+
+    def column_types(self, conn, table):
+        cursor = conn.cursor()
+        cursor.execute(f"PRAGMA table_info({table})")
+        return {row[1]: row[2] for row in cursor.fetchall()}
+
+    def create_index_if_missing(self, conn, table, columns, unique=False):
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        conn.cursor().execute(
+            f"CREATE {kind} IF NOT EXISTS {index_name(table, columns)} ON {table} ({', '.join(columns)})"
+        )
+
+    def create_columnstore_if_missing(self, conn, table):
+        return False
+
+    def merge_statements(self, target, stage, key, digest, columns, update_columns):
+        cols = ", ".join(columns)
+        set_clause = ", ".join(f"{c} = s.{c}" for c in update_columns)
+        return [f"""
+            UPDATE {target} AS t SET {set_clause}
+            FROM {stage} AS s
+            WHERE t.{key} = s.{key}
+              AND (t.{digest} IS NULL OR t.{digest} <> s.{digest})
+        """, f"""
+            INSERT INTO {target} ({cols})
+            SELECT {cols} FROM {stage} s
+            WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE t.{key} = s.{key})
+        """]
+
+
+sqlite3.register_adapter(Decimal, float)
+
+BACKENDS = {
+    SqlServerBackend.name: SqlServerBackend,
+    SqliteBackend.name: SqliteBackend,
+}
+
+
+def get_backend(name=None):
+    """
+    The configured backend: name, else the DB_BACKEND environment variable, else SQL Server.
+    """
+    name = (name or os.getenv(DB_BACKEND_ENV) or SqlServerBackend.name).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown database backend '{name}'; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+def backend_for(conn):
+    """The backend whose dialect matches an open connection."""
+    if isinstance(conn, sqlite3.Connection):
+        return SqliteBackend()
+    return SqlServerBackend()
+
+def column_exists(conn, table, column):
+    return backend_for(conn).column_exists(conn, table, column)
+
+def create_index_if_missing(conn, table, columns, unique=False):
+    backend_for(conn).create_index_if_missing(conn, table, columns, unique)
+
+def table_exists(conn, table):
+    return backend_for(conn).table_exists(conn, table)
+
+def create_table_if_missing(conn, table, col_defs):
+    if not table_exists(conn, table):
+        conn.cursor().execute(f"CREATE TABLE {table} ({', '.join(backend_for(conn).column_type(d) for d in col_defs)})")
@@ -0,0 +1,345 @@
+import streamlit as st
+import pandas as pd
+import io
+from datetime import datetime
+from config import logger
+from db_backend import backend_for
+from amounts import to_kobo, from_kobo, kobo_to_decimal, amounts_differ
+from utils import extract_schedule_data, calculate_schedule_amounts, generate_reconciliation_report
+from prefetch import workbook_sheets
+from exports import render_export_buttons
+from history_store import record_run
+from schedule_matching import render_candidate_matches
+from file_readers import UPLOAD_TYPES, FLAT_TYPES, upload_format
+from metrics import instrumented
+
+# Tables populated by render_generic_upload that can be reconciled in the database.
+RECON_SOURCES = {
+    "claims_mastersheet": {
+        "label": "Claims Schedules Consolidated Mastersheet",
+        "table": "[Claims Schedules Consolidated Mastersheet]",
+        "schedule_col": "SCH_NO",
+        "amount_col": "HOD_RECOMMD_AMOUNT",
+        "date_col": "DATE_CLAIM_RECEIVED",
+    },
+    "claims": {
+        "label": "claimstbl (current upload)",
+        "table": "claimstbl",
+        "schedule_col": "SCH_NO",
+        "amount_col": "HOD_RECOMMD_AMOUNT",
+        "date_col": "DATE_CLAIM_RECEIVED",
+    },
+    "appeals": {
+        "label": "Compiled_Appeals",
+        "table": "Compiled_Appeals",
+        "schedule_col": "SCH_NO",
+        "amount_col": "AMOUNT_RECOMMENDED_FOR_PAYMENT_N",
+        "date_col": "DATE_OF_RECEIPT",
+    },
+    "telemedicine": {
+        "label": "Compiled_Telemedicine",
+        "table": "Compiled_Telemedicine",
+        "schedule_col": "SCH_NO",
+        "amount_col": "AMOUNT_RECOMMENDED_FOR_PAYMENT_N",
+        "date_col": "DATE_OF_RECEIPT",
+    },
+    "ambulance": {
+        "label": "Compiled_ambulance",
+        "table": "Compiled_ambulance",
+        "schedule_col": "SCH_NO",
+        "amount_col": "AMOUNT_RECOMMENDED_FOR_PAYMENT_N",
+        "date_col": "DATE_OF_RECEIPT",
+    },
+}
+
+FETCH_CHUNK_SIZE = 5000
+FINANCE_STAGE_TABLE = "recon_finance_stage"
+
+
+def _finance_stage_name(conn):
+    # Session-scoped temp table: '#name' on SQL Server, the temp schema on SQLite
+    return backend_for(conn).temp_table(FINANCE_STAGE_TABLE)
+
+def _schedule_expr(col, alias=None):
+    # SCH_NO is stored as VARCHAR(MAX); cast to a bounded type so it can be grouped and compared
+    ref = f"{alias}.{col}" if alias else col
+    return f"LTRIM(RTRIM(CAST({ref} AS VARCHAR(64))))"
+
+def _source_filter(source, date_from=None, date_to=None, alias=None):
+    """Build the WHERE clause and parameters that select the source rows to reconcile."""
+    prefix = f"{alias}." if alias else ""
+    clauses = [f"{prefix}{source['schedule_col']} IS NOT NULL", f"{prefix}{source['amount_col']} IS NOT NULL"]
+    params = []
+    if date_from is not None and source.get("date_col"):
+        clauses.append(f"{prefix}{source['date_col']} >= ?")
+        params.append(date_from)
+    if date_to is not None and source.get("date_col"):
+        clauses.append(f"{prefix}{source['date_col']} <= ?")
+        params.append(date_to)
+    return " AND ".join(clauses), params
+
+def _grouped_source_sql(source, date_from=None, date_to=None):
+    """SQL for per-schedule SUM/COUNT over a source table."""
+    where, params = _source_filter(source, date_from, date_to)
+    sch = _schedule_expr(source["schedule_col"])
+    query = f"""
+        SELECT {sch} AS schedule_no,
+               SUM({source['amount_col']}) AS amount,
+               COUNT(*) AS line_count
+        FROM {source['table']}
+        WHERE {where}
+        GROUP BY {sch}
+    """
+    return query, params
+
+def fetch_frame(cursor, columns, chunk_size=FETCH_CHUNK_SIZE):
+    """
+    Stream the current result set into a DataFrame in fetchmany chunks.
+
+    Args:
+        cursor: DB-API cursor with an executed query
+        columns (list): Column names for the resulting DataFrame
+        chunk_size (int): Rows per fetchmany call
+
+    Returns:
+        pandas.DataFrame: All fetched rows
+    """
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        chunks.append(pd.DataFrame.from_records([tuple(r) for r in rows], columns=columns))
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+def fetch_schedule_amounts(conn, source, date_from=None, date_to=None, chunk_size=FETCH_CHUNK_SIZE):
+    """
+    Aggregate amounts per schedule number inside the database.
+
+    Args:
+        conn: DB-API connection
+        source (dict): Entry from RECON_SOURCES
+        date_from, date_to: Optional bounds on the source's date column
+
+    Returns:
+        pandas.DataFrame: "Schedule Number", "Amount" and "Lines" per schedule
+    """
+    query, params = _grouped_source_sql(source, date_from, date_to)
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    df = fetch_frame(cursor, ["Schedule Number", "Amount", "Lines"], chunk_size)
+    df["Schedule Number"] = df["Schedule Number"].astype(str)
+    df["Amount"] = from_kobo(to_kobo(df["Amount"])).values
+    df["Lines"] = df["Lines"].astype(int)
+    return df[df["Schedule Number"] != ""].reset_index(drop=True)
+
+def stage_finance_amounts(conn, finance_amounts):
+    """
+    Load per-schedule Finance amounts into a session temp table so they can be anti-joined in SQL.
+
+    Args:
+        conn: DB-API connection
+        finance_amounts (pandas.DataFrame): Output of calculate_schedule_amounts
+
+    Returns:
+        str: Name of the staged table
+    """
+    stage = _finance_stage_name(conn)
+    backend = backend_for(conn)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+    cursor.execute(f"CREATE TABLE {stage} (schedule_no VARCHAR(64) NOT NULL, amount DECIMAL(18,2))")
+    kobo = to_kobo(finance_amounts["Amount"])
+    rows = [(str(s).strip(), None if pd.isna(k) else kobo_to_decimal(k))
+            for s, k in zip(finance_amounts["Schedule Number"], kobo)]
+    if rows:
+        backend.bulk_insert(conn, stage, ["schedule_no", "amount"], rows)
+    return stage
+
+def fetch_missing_in_finance(conn, source, stage, date_from=None, date_to=None, chunk_size=FETCH_CHUNK_SIZE):
+    """Schedules present in the source table but absent from the staged Finance amounts."""
+    grouped, params = _grouped_source_sql(source, date_from, date_to)
+    query = f"""
+        SELECT c.schedule_no, c.amount, c.line_count
+        FROM ({grouped}) c
+        WHERE c.schedule_no <> ''
+          AND NOT EXISTS (SELECT 1 FROM {stage} f WHERE f.schedule_no = c.schedule_no)
+        ORDER BY c.schedule_no
+    """
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    df = fetch_frame(cursor, ["Schedule Number", "Amount", "Lines"], chunk_size)
+    df["Amount"] = from_kobo(to_kobo(df["Amount"])).values
+    return df
+
+def fetch_missing_in_claims(conn, source, stage, date_from=None, date_to=None, chunk_size=FETCH_CHUNK_SIZE):
+    """Staged Finance schedules with no matching rows in the source table."""
+    where, params = _source_filter(source, date_from, date_to, alias="s")
+    sch = _schedule_expr(source["schedule_col"], alias="s")
+    query = f"""
+        SELECT f.schedule_no, f.amount
+        FROM {stage} f
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {source['table']} s
+            WHERE {where} AND {sch} = f.schedule_no
+        )
+        ORDER BY f.schedule_no
+    """
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    df = fetch_frame(cursor, ["Schedule Number", "Amount"], chunk_size)
+    df["Amount"] = from_kobo(to_kobo(df["Amount"])).values
+    return df
+
+@instrumented("reconciliation", target="database", rows=lambda result: len(result["claims_amounts"]) + len(result["finance_amounts"]))
+def reconcile_in_database(conn, source, finance_amounts, date_from=None, date_to=None, chunk_size=FETCH_CHUNK_SIZE):
+    """
+    Run the reconciliation as set-based SQL and return the same structures as the pandas flow.
+
+    Args:
+        conn: DB-API connection
+        source (dict): Entry from RECON_SOURCES describing the Claims-side table
+        finance_amounts (pandas.DataFrame): Finance per-schedule amounts
+        date_from, date_to: Optional bounds (e.g. year-to-date) on the source's date column
+        chunk_size (int): Rows per fetchmany call when streaming results back
+
+    Returns:
+        dict: claims_amounts, finance_amounts, missing_in_finance, missing_in_claims, reconciliation_report
+    """
+    stage = stage_finance_amounts(conn, finance_amounts)
+    claims = fetch_schedule_amounts(conn, source, date_from, date_to, chunk_size)
+    missing_in_finance = fetch_missing_in_finance(conn, source, stage, date_from, date_to, chunk_size)
+    missing_in_claims = fetch_missing_in_claims(conn, source, stage, date_from, date_to, chunk_size)
+    conn.cursor().execute(f"DROP TABLE IF EXISTS {stage}")
+
+    claims_amounts = claims[["Schedule Number", "Amount"]]
+    report = generate_reconciliation_report(claims_amounts, finance_amounts[["Schedule Number", "Amount"]])
+    return {
+        "claims_amounts": claims_amounts,
+        "finance_amounts": finance_amounts,
+        "missing_in_finance": missing_in_finance,
+        "missing_in_claims": missing_in_claims,
+        "reconciliation_report": report,
+    }
+
+def render_db_reconciliation_page():
+    st.header("Database Reconciliation")
+    st.markdown("""
+    Reconcile Finance's weekly report against data already uploaded to the database.
+    Totals per schedule and missing schedules are computed in SQL; only the aggregated results are downloaded.
+    """)
+
+    source_key = st.selectbox(
+        "Claims-side table",
+        list(RECON_SOURCES.keys()),
+        format_func=lambda k: RECON_SOURCES[k]["label"],
+    )
+    source = RECON_SOURCES[source_key]
+
+    col1, col2 = st.columns(2)
+    with col1:
+        date_from = st.date_input("From", value=datetime(datetime.now().year, 1, 1))
+    with col2:
+        date_to = st.date_input("To", value=datetime.now())
+
+    finance_file = st.file_uploader(
+        "Upload Finance Department Excel Report (Finance claims reconciliation)",
+        type=UPLOAD_TYPES,
+        key="db_recon_finance_uploader",
+    )
+    if finance_file is None:
+        st.info("Please upload the Finance department Excel file to begin.")
+        return
+
+    finance_sheets = workbook_sheets(finance_file)
+    if upload_format(finance_file) in FLAT_TYPES:
+        finance_sheet = next(iter(finance_sheets))
+    else:
+        finance_sheet = st.selectbox("Select the sheet with claims received:", list(finance_sheets))
+    finance_df = finance_sheets[finance_sheet].copy()
+
+    schedule_default = next((c for c in ["Claim Batch No/Sch No", "SCH NO", "Schedule No", "Schedule Number", "SCH_NO"]
+                             if c in finance_df.columns), finance_df.columns[0])
+    amount_default = next((c for c in ["Claims_Advised_Amount", "Advised_Amount", "Claim Amount", "AMOUNT"]
+                           if c in finance_df.columns), finance_df.columns[0])
+    col1, col2 = st.columns(2)
+    with col1:
+        finance_schedule_col = st.selectbox("Schedule Number Column (Finance):", finance_df.columns,
+                                            index=finance_df.columns.get_loc(schedule_default))
+    with col2:
+        finance_amount_col = st.selectbox("Amount Column (Finance):", finance_df.columns,
+                                          index=finance_df.columns.get_loc(amount_default))
+
+    if not st.button("Run Database Reconciliation", type="primary"):
+        return
+
+    finance_amounts = calculate_schedule_amounts(
+        extract_schedule_data(finance_df, finance_schedule_col, finance_amount_col)
+    )
+
+    from db_upload_common import _get_connection
+
+    with st.spinner(f"Reconciling against {source['label']}..."):
+        try:
+            conn = _get_connection()
+            try:
+                result = reconcile_in_database(
+                    conn, source, finance_amounts,
+                    date_from=datetime.combine(date_from, datetime.min.time()),
+                    date_to=datetime.combine(date_to, datetime.max.time()),
+                )
+            finally:
+                conn.close()
+        except Exception as e:
+            st.error(f"Database error: {e}")
+            logger.error(f"DB reconciliation failed for {source['table']}: {e}", exc_info=True)
+            return
+
+    report = result["reconciliation_report"]
+    try:
+        record_run(report, source["label"], period=date_to)
+    except Exception as e:
+        logger.warning(f"Could not record reconciliation history: {e}")
+    missing_in_finance = result["missing_in_finance"]
+    missing_in_claims = result["missing_in_claims"]
+    amount_mismatch = report[amounts_differ(report["Claims Amount"], report["Finance Amount"])]
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Claims Schedules", len(result["claims_amounts"]))
+    c2.metric("Missing in Finance", len(missing_in_finance))
+    c3.metric("Missing in Claims", len(missing_in_claims))
+    c4.metric("Amount Mismatches", len(amount_mismatch))
+
+    st.subheader("Claims Schedules Missing in Finance (Critical)")
+    st.dataframe(missing_in_finance, use_container_width=True)
+    render_candidate_matches(missing_in_finance, missing_in_claims, f"db_{source['label']}")
+    st.subheader("Finance Schedules Missing in Claims")
+    st.dataframe(missing_in_claims, use_container_width=True)
+    st.subheader("Amount Reconciliation")
+    st.dataframe(report, use_container_width=True)
+
+    excel_output = io.BytesIO()
+    with pd.ExcelWriter(excel_output, engine='openpyxl') as writer:
+        report.to_excel(writer, sheet_name='Reconciliation', index=False)
+        if not missing_in_finance.empty:
+            missing_in_finance.to_excel(writer, sheet_name='Missing in Finance', index=False)
+        if not missing_in_claims.empty:
+            missing_in_claims.to_excel(writer, sheet_name='Missing in Claims', index=False)
+        if not amount_mismatch.empty:
+            amount_mismatch.to_excel(writer, sheet_name='Amount Discrepancies', index=False)
+    excel_output.seek(0)
+
+    st.download_button(
+        label="📊 Download Excel Report",
+        data=excel_output,
+        file_name=f"DB Reconciliation {source['label']} {pd.Timestamp.now().strftime('%d %b %Y')}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+    render_export_buttons({
+        'Reconciliation': report,
+        'Missing in Finance': missing_in_finance,
+        'Missing in Claims': missing_in_claims,
+        'Amount Discrepancies': amount_mismatch,
+    }, f"DB Reconciliation {source['label']} {pd.Timestamp.now().strftime('%d %b %Y')}", f"db_reconcile_{source['label']}")
@@ -1,24 +1,35 @@
 import streamlit as st
-import pyodbc
 from dotenv import load_dotenv
 import math
-import os
 import pandas as pd
 from datetime import datetime
 from openpyxl import load_workbook
-import io
 from config import logger
+from log_setup import flush_log_summaries, log_timing
+from metrics import track, start_operation
+from amounts import to_decimal
+from delta_load import load_delta, ensure_hash_columns, hashed_rows, HASH_COLUMNS, HASH_COLUMN_DEFS
+from chunked_upload import (
+    DEFAULT_CHUNK_SIZE, CHECKPOINT_TABLE, chunk_count, ensure_load_tables,
+    find_resumable_loads, start_or_resume_load, load_chunks, finalize_load,
+)
+from parallel_upload import parallel_load, DEFAULT_WORKERS
+from job_runner import submit_job, render_job_panel, session_owner
+from session_store import session_store
+from upload_handle import spool_upload
+from file_readers import FLAT_TYPES, upload_format, read_tables
+from db_backend import table_exists, backend_for, get_backend
+from dedup_index import claim_index, find_known_claims, rebuild_claim_index
+from ddl_planner import (
+    profile_text_columns, plan_column_types, column_definitions,
+    apply_column_widening, apply_indexes, apply_columnstore,
+)
 
 load_dotenv('secrets.env')
 
 def _get_connection():
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={os.getenv('server')};"
-        f"DATABASE={os.getenv('database')};"
-        f"UID={os.getenv('dbusername')};"
-        f"PWD={os.getenv('password')}"
-    )
+    # SQL Server by default; DB_BACKEND=sqlite runs the whole upload path against a local file
+    return get_backend().connect()
 
 def _convert_date(date_val):
     if pd.isna(date_val) or date_val in ['', 'NIL']:
@@ -44,7 +55,8 @@ def _clean_value(val, col_name, date_columns, numeric_columns):
                 col_type = numeric_columns[col_name]
                 if col_type == 'INT':
                     return int(float(clean))
-                return float(clean)
+                # DECIMAL(18,2) columns get an exact Decimal parameter, not a float
+                return to_decimal(clean)
             return None
         except (ValueError, TypeError):
             return str(val).strip()
@@ -58,16 +70,137 @@ def _clean_value(val, col_name, date_columns, numeric_columns):
         result = str(int(val))
     return result
 
-def _build_column_definitions(db_columns, date_columns, numeric_columns):
-    defs = []
-    for col in db_columns:
-        if col in date_columns:
-            defs.append(f'{col} datetime2')
-        elif col in numeric_columns:
-            defs.append(f'{col} {numeric_columns[col]}')
-        else:
-            defs.append(f'{col} VARCHAR(MAX)')
-    return defs
+def _plan_column_types(rows, db_columns, date_columns, numeric_columns):
+    text_columns = [c for c in db_columns if c not in date_columns and c not in numeric_columns]
+    profile = profile_text_columns(rows, db_columns, text_columns)
+    return plan_column_types(db_columns, date_columns, numeric_columns, profile)
+
+def _prepare_table(conn, table, column_types, index_columns, columnstore=False):
+    """Create the table from the planned types, or widen it so this file's values fit; then index it."""
+    if table_exists(conn, table):
+        for statement in apply_column_widening(conn, table, column_types, index_columns):
+            st.info(f"Schema change on '{table}': {statement}")
+    else:
+        backend_for(conn).create_table(conn, table, column_types)
+    if columnstore and apply_columnstore(conn, table):
+        st.info(f"Created clustered columnstore index on '{table}'.")
+    skipped = apply_indexes(conn, table, index_columns)
+    if skipped:
+        st.warning(f"Could not index {skipped} on '{table}' (column missing or too wide for an index key).")
+
+def _clean_rows(df, column_mapping, db_columns, date_columns, numeric_columns):
+    """
+    Clean every row of the uploaded frame into a tuple ordered like db_columns.
+
+    Returns:
+        tuple: (rows, row_numbers, failed_rows) where row_numbers gives the 1-based source row of
+        each cleaned row and failed_rows holds (row_number, error) pairs
+    """
+    source_cols = []
+    for db_col in db_columns:
+        excel_col = next(k for k, v in column_mapping.items() if v == db_col)
+        source_cols.append(excel_col if excel_col in df.columns else None)
+
+    rows = []
+    row_numbers = []
+    failed_rows = []
+    for i, row in df.iterrows():
+        try:
+            rows.append(tuple(
+                _clean_value(row[excel_col], db_col, date_columns, numeric_columns) if excel_col else None
+                for excel_col, db_col in zip(source_cols, db_columns)
+            ))
+            row_numbers.append(i + 1)
+        except Exception as e:
+            failed_rows.append((i + 1, str(e)))
+            logger.warning(f"Row {i+1} failed cleaning: {e}", extra={"aggregate": "row_cleaning_failed", "row": i + 1})
+    if failed_rows:
+        flush_log_summaries()
+    return rows, row_numbers, failed_rows
+
+def _insert_rows_job(job, table_name, columns, rows, row_numbers, claim_keys=None):
+    """
+    Background row-by-row insert on its own connection, in a single transaction: every row is
+    committed, or nothing if any row fails. claim_keys are added to the claim index once committed.
+    """
+    insert_query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+    conn = _get_connection()
+    try:
+        with track("db_upload", target=table_name) as op:
+            cursor = conn.cursor()
+            failed_rows = []
+            step = max(1, len(rows) // 100)
+            for i, (row_no, values) in enumerate(zip(row_numbers, rows)):
+                try:
+                    cursor.execute(insert_query, values)
+                except Exception as e:
+                    failed_rows.append((row_no, str(e)))
+                    logger.warning(f"Row {row_no} failed in {table_name}: {e}",
+                                   extra={"aggregate": "row_insert_failed", "table": table_name, "row": row_no,
+                                          "job_id": job.job_id})
+                if (i + 1) % step == 0:
+                    job.progress((i + 1) / len(rows), f"Inserted {i + 1}/{len(rows)} rows")
+            if failed_rows:
+                flush_log_summaries()
+                conn.rollback()
+                details = "; ".join(f"Row {idx}: {err}" for idx, err in failed_rows[:5])
+                raise RuntimeError(f"{len(failed_rows)} row(s) failed, nothing was loaded into '{table_name}'. {details}")
+            conn.commit()
+            if claim_keys is not None:
+                claim_index().add(claim_keys)
+            job.progress(1.0, f"Uploaded {len(rows)} rows to '{table_name}'")
+            op.add_rows(len(rows))
+            return {"success_count": len(rows)}
+    finally:
+        conn.close()
+
+def _select_resumable_load(table_name, file_hash):
+    """Let the user pick an incomplete chunked load to continue with a corrected file."""
+    try:
+        conn = _get_connection()
+        try:
+            loads = find_resumable_loads(conn, table_name) if table_exists(conn, CHECKPOINT_TABLE) else []
+        finally:
+            conn.close()
+    except Exception as e:
+        st.warning(f"Could not read upload checkpoints: {e}")
+        return None
+
+    if any(load["file_hash"] == file_hash for load in loads):
+        st.info("An incomplete load of this exact file was found; it will resume from its last good chunk.")
+        return None
+    if not loads:
+        return None
+
+    options = [None] + [load["load_id"] for load in loads]
+    labels = {load["load_id"]: (f"Resume {load['file_name']} — {load['chunks_done']}/"
+                                f"{chunk_count(load['total_rows'], load['chunk_size'])} chunks, {load['status']}")
+              for load in loads}
+    return st.selectbox(
+        "Incomplete loads",
+        options,
+        format_func=lambda load_id: "Start a new load" if load_id is None else labels[load_id],
+        help="Resume a failed load with a corrected file that has the same number of rows.",
+        key=f"_resume_load_{table_name}",
+    )
+
+def _render_claim_index(table):
+    """Size of the claim index, with a rebuild from the claims already in the database."""
+    with st.expander("🧾 Duplicate claim check"):
+        st.caption(f"{len(claim_index()):,} claims are indexed. Uploads are checked against them by Correct_ClaimNo "
+                   f"before anything is inserted.")
+        if st.button(f"Rebuild index from '{table}'", key=f"_rebuild_claim_index_{table}"):
+            try:
+                conn = _get_connection()
+                try:
+                    with st.spinner("Reading claim numbers..."):
+                        count = rebuild_claim_index(conn, table)
+                finally:
+                    conn.close()
+                st.success(f"Claim index rebuilt with {count:,} claims.")
+            except Exception as e:
+                st.error(f"Could not rebuild the claim index: {e}")
+                logger.error(f"Claim index rebuild from {table} failed: {e}", exc_info=True)
 
 def render_generic_upload(
     table_name,
@@ -77,40 +210,55 @@ def render_generic_upload(
     consolidate_target=None,
     file_label="file",
     uploader_help="",
+    natural_key=None,
+    index_columns=None,
+    consolidate_columnstore=False,
+    dedup_claims=False,
 ):
     if date_columns is None:
         date_columns = []
     if numeric_columns is None:
         numeric_columns = {}
+    if index_columns is None:
+        index_columns = []
 
     db_columns = list(column_mapping.values())
 
     uploaded_file = st.file_uploader(
         f"Upload {file_label} file",
-        type=["xlsx"],
+        type=["xlsx"] + FLAT_TYPES,
         help=uploader_help,
     )
 
+    job_kind = f"upload_{table_name}"
+    render_job_panel(kind=job_kind, title="Background Uploads", limit=5, owner=session_owner())
+    if dedup_claims:
+        _render_claim_index(consolidate_target or table_name)
+
     if uploaded_file is None:
         return
 
     # --- Cache parsed dataframe so reruns don't re-read/re-parse the file ---
     cache_key = f"_parsed_df_{table_name}"
     file_id_key = f"_parsed_file_id_{table_name}"
+    file_hash_key = f"_parsed_file_hash_{table_name}"
 
-    if st.session_state.get(file_id_key) != uploaded_file.file_id:
-        excel_bytes = uploaded_file.read()
-        workbook = load_workbook(io.BytesIO(excel_bytes), data_only=True)
-        sheet = workbook.active
-        data = list(sheet.values)
-        headers = [str(h).strip() if h else '' for h in data[0]]
-        rows = data[1:]
-        df = pd.DataFrame(rows, columns=headers)
+    df = session_store().get(cache_key) if st.session_state.get(file_id_key) == uploaded_file.file_id else None
+    if df is None:
+        handle = spool_upload(uploaded_file)
+        if upload_format(handle) in FLAT_TYPES:
+            df = next(iter(read_tables(handle).values()))
+        else:
+            with handle.open() as excel_file:
+                workbook = load_workbook(excel_file, data_only=True)
+                sheet = workbook.active
+                data = list(sheet.values)
+            headers = [str(h).strip() if h else '' for h in data[0]]
+            df = pd.DataFrame(data[1:], columns=headers)
         df.columns = df.columns.str.strip()
-        st.session_state[cache_key] = df
+        session_store().put(cache_key, df)
         st.session_state[file_id_key] = uploaded_file.file_id
-    else:
-        df = st.session_state[cache_key]
+        st.session_state[file_hash_key] = handle.digest
 
     st.write("Preview of uploaded data:")
     st.write(df.head())
@@ -132,13 +280,86 @@ def render_generic_upload(
         st.error(f"Required columns missing from Excel: {missing_required}. Refusing to proceed.")
         return
 
-    truncate_ok = st.checkbox(f"I have truncated table '{table_name}' before uploading", value=False)
-    if not truncate_ok:
-        st.warning(f"Please confirm that '{table_name}' has been truncated before uploading.")
-        proceed = st.checkbox("Proceed without truncation confirmation", value=False)
-        if not proceed:
-            st.info("Check the box above to confirm truncation or proceed anyway.")
-            return
+    incremental = False
+    if natural_key:
+        load_mode = st.radio(
+            "Load mode",
+            ["Incremental (merge new or changed rows)", "Full reload (truncate first)"],
+            help=f"Incremental mode matches rows on {', '.join(natural_key)} and only inserts or updates what changed.",
+            key=f"_load_mode_{table_name}",
+        )
+        incremental = load_mode.startswith("Incremental")
+
+    # Claims already loaded by an earlier upload would be counted twice
+    claim_keys = None
+    if dedup_claims:
+        # Identities are rebuilt only for a new file, and lookups redone only when the index changes
+        index = claim_index()
+        known_key = f"_known_claims_{table_name}"
+        cache_id = (st.session_state.get(file_hash_key), index.stamp)
+        cached = session_store().get(known_key)
+        if cached is not None and cached[0] == cache_id:
+            _, identities, known = cached
+        else:
+            identities, known = find_known_claims(df, index)
+            session_store().put(known_key, (cache_id, identities, known))
+        if known.any():
+            st.warning(f"{int(known.sum())} of {len(df)} claim(s) in this file were already loaded "
+                       f"(same Correct_ClaimNo).")
+            st.dataframe(df[known].head(20), use_container_width=True)
+            if incremental:
+                st.info("Incremental mode updates these claims in place instead of adding them again.")
+            elif st.checkbox("Skip claims that were already loaded", value=True, key=f"_skip_known_{table_name}"):
+                df = df[~known]
+                identities = identities[~known]
+                if df.empty:
+                    st.info("Every claim in this file was already loaded; nothing to upload.")
+                    return
+        claim_keys = identities
+
+    if not incremental:
+        truncate_ok = st.checkbox(f"I have truncated table '{table_name}' before uploading", value=False)
+        if not truncate_ok:
+            st.warning(f"Please confirm that '{table_name}' has been truncated before uploading.")
+            proceed = st.checkbox("Proceed without truncation confirmation", value=False)
+            if not proceed:
+                st.info("Check the box above to confirm truncation or proceed anyway.")
+                return
+
+    chunked = False
+    parallel = False
+    background = False
+    chunk_size = DEFAULT_CHUNK_SIZE
+    workers = DEFAULT_WORKERS
+    resume_load_id = None
+    if not incremental:
+        strategy = st.radio(
+            "Insert strategy",
+            ["Row by row (single transaction)", "Chunked, resumable", "Parallel (multiple connections)"],
+            help="Chunked commits rows to a staging table chunk by chunk, so a dropped connection or bad row only "
+                 "loses the current chunk. Parallel inserts partitions of the file concurrently on separate "
+                 "connections. Both move the staged rows into the table in a single final transaction.",
+            key=f"_insert_strategy_{table_name}",
+        )
+        chunked = strategy.startswith("Chunked")
+        parallel = strategy.startswith("Parallel")
+        if strategy.startswith("Row by row"):
+            background = st.checkbox(
+                "Run in background",
+                help="Queue the insert and keep using the app. Consolidation is not offered for background uploads.",
+                key=f"_background_{table_name}",
+            )
+        if parallel:
+            workers = int(st.number_input("Connections", min_value=2, max_value=16, value=DEFAULT_WORKERS,
+                                          key=f"_workers_{table_name}"))
+            if not st.button(f"Start parallel upload to '{table_name}'", type="primary"):
+                return
+        if chunked:
+            chunk_size = int(st.number_input("Rows per chunk", min_value=100, value=DEFAULT_CHUNK_SIZE, step=500,
+                                             key=f"_chunk_size_{table_name}"))
+            resume_load_id = _select_resumable_load(table_name, st.session_state.get(file_hash_key))
+            if not st.button(f"Start chunked upload to '{table_name}'", type="primary"):
+                return
 
     # --- Guard: skip insert if this exact file was already inserted this session ---
     inserted_key = f"_inserted_{table_name}"
@@ -147,66 +368,150 @@ def render_generic_upload(
         st.info(f"'{uploaded_file.name}' was already uploaded to '{table_name}' this session. "
                 f"Upload a different file, or refresh the page to reset, before uploading again.")
     else:
+        op = start_operation("db_upload", target=table_name)
         try:
             conn = _get_connection()
             cursor = conn.cursor()
-            conn.autocommit = False
 
-            col_defs = _build_column_definitions(db_columns, date_columns, numeric_columns)
-            create_query = f"""
-            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{table_name}' AND xtype='U')
-            CREATE TABLE {table_name} (
-                {', '.join(col_defs)}
-            )
-            """
-            cursor.execute(create_query)
+            rows, row_numbers, failed_rows = _clean_rows(df, column_mapping, db_columns, date_columns, numeric_columns)
+            total_rows = len(df)
 
-            insert_query = f"""
-            INSERT INTO {table_name} ({', '.join(db_columns)})
-            VALUES ({', '.join(['?'] * len(db_columns))})
-            """
+            column_types = _plan_column_types(rows, db_columns, date_columns, numeric_columns)
+            col_defs = column_definitions(column_types)
+            _prepare_table(conn, table_name, column_types, index_columns)
+
+            if incremental:
+                if failed_rows:
+                    st.error(f"Upload failed — {len(failed_rows)} row(s) had errors. Nothing was loaded.")
+                    for idx, err in failed_rows:
+                        st.write(f"  Row {idx}: {err}")
+                    conn.rollback()
+                    op.fail()
+                    return
+                if consolidate_target:
+                    _prepare_table(conn, consolidate_target, column_types, index_columns, consolidate_columnstore)
+                with st.spinner(f"Merging {len(rows)} rows into '{table_name}'..."), \
+                        log_timing(logger, f"Merged {len(rows)} rows into {table_name}", page="db_upload",
+                                   table=table_name, rows=len(rows), mode="incremental"):
+                    result = load_delta(conn, table_name, db_columns, col_defs, rows, natural_key, consolidate_target)
+                conn.commit()
+                op.add_rows(len(rows))
+                st.session_state[inserted_key] = uploaded_file.file_id
+                if claim_keys is not None:
+                    claim_index().add(claim_keys)
+                for target in [table_name, consolidate_target]:
+                    if target:
+                        counts = result[target]
+                        st.success(f"'{target}': {counts['inserted']} new and {counts['updated']} changed row(s) "
+                                   f"merged from {result['staged']} staged rows.")
+                        if counts["unkeyed"]:
+                            st.warning(f"'{target}' has {counts['unkeyed']} row(s) loaded before incremental mode; "
+                                       f"do one full reload to include them in matching.")
+                return
+
+            insert_columns = list(db_columns)
+            insert_col_defs = list(col_defs)
+            if natural_key:
+                ensure_hash_columns(conn, table_name)
+                insert_columns += HASH_COLUMNS
+                insert_col_defs += HASH_COLUMN_DEFS
+                rows = hashed_rows(rows, db_columns, natural_key)
 
             progress_bar = st.progress(0)
-            total_rows = len(df)
             success_count = 0
-            failed_rows = []
 
-            for i, row in df.iterrows():
-                try:
-                    values = []
-                    for db_col in db_columns:
-                        excel_col = next(k for k, v in column_mapping.items() if v == db_col)
-                        if excel_col in df.columns:
-                            values.append(_clean_value(row[excel_col], db_col, date_columns, numeric_columns))
-                        else:
-                            values.append(None)
-                    cursor.execute(insert_query, values)
-                    success_count += 1
-                except Exception as e:
-                    failed_rows.append((i + 1, str(e)))
-                    logger.warning(f"Row {i+1} failed in {table_name}: {e}")
-                progress_bar.progress((i + 1) / total_rows)
+            if (chunked or parallel or background) and failed_rows:
+                st.error(f"Upload failed — {len(failed_rows)} row(s) had errors. Nothing was loaded.")
+                for idx, err in failed_rows:
+                    st.write(f"  Row {idx}: {err}")
+                conn.rollback()
+                op.fail()
+                return
+
+            if background:
+                conn.commit()
+                op.discard()  # the job records the load
+                submit_job(job_kind, f"Upload {uploaded_file.name} to '{table_name}'", _insert_rows_job,
+                           table_name, insert_columns, rows, row_numbers, claim_keys=claim_keys,
+                           owner=session_owner())
+                st.session_state[inserted_key] = uploaded_file.file_id
+                st.toast(f"Upload of {len(rows)} rows to '{table_name}' queued; progress is shown above.")
+                # The job panel above was drawn before the job existed; rerun so it lists and polls it
+                st.rerun()
+            if parallel:
+                conn.commit()
+                with st.spinner(f"Inserting {len(rows)} rows on {workers} connections..."), \
+                        log_timing(logger, f"Parallel insert of {len(rows)} rows into {table_name}", page="db_upload",
+                                   table=table_name, rows=len(rows), mode="parallel", workers=workers):
+                    success_count, failed_rows = parallel_load(
+                        _get_connection, table_name, insert_columns, insert_col_defs, rows, row_numbers,
+                        workers=workers, on_progress=lambda done, total: progress_bar.progress(done / total),
+                    )
+            elif chunked:
+                ensure_load_tables(conn, table_name, insert_col_defs)
+                conn.commit()
+                checkpoint = start_or_resume_load(conn, table_name, uploaded_file.name,
+                                                  st.session_state.get(file_hash_key), len(rows),
+                                                  chunk_size, resume_load_id)
+                total_chunks = chunk_count(len(rows), checkpoint["chunk_size"])
+                if checkpoint["chunks_done"]:
+                    st.info(f"Resuming load {checkpoint['load_id']} at chunk {checkpoint['chunks_done'] + 1}/{total_chunks}.")
+                failed_rows = load_chunks(conn, table_name, checkpoint, insert_columns, rows, row_numbers,
+                                          on_progress=lambda done, total: progress_bar.progress(done / total))
+                if failed_rows:
+                    st.error(f"Chunk {checkpoint['chunks_done'] + 1}/{total_chunks} failed — {len(failed_rows)} row(s) "
+                             f"had errors. {checkpoint['chunks_done']} chunk(s) are saved in the staging table; "
+                             f"correct the file and upload it again to resume load {checkpoint['load_id']}.")
+                    for idx, err in failed_rows:
+                        st.write(f"  Row {idx}: {err}")
+                    op.fail()
+                    return
+                success_count = finalize_load(conn, table_name, checkpoint, insert_columns)
+            else:
+                insert_query = f"""
+                INSERT INTO {table_name} ({', '.join(insert_columns)})
+                VALUES ({', '.join(['?'] * len(insert_columns))})
+                """
+
+                for i, (row_no, values) in enumerate(zip(row_numbers, rows)):
+                    try:
+                        cursor.execute(insert_query, values)
+                        success_count += 1
+                    except Exception as e:
+                        failed_rows.append((row_no, str(e)))
+                        logger.warning(f"Row {row_no} failed in {table_name}: {e}",
+                                       extra={"aggregate": "row_insert_failed", "table": table_name, "row": row_no})
+                    progress_bar.progress((i + 1) / len(rows))
+                flush_log_summaries()
 
             if failed_rows:
                 st.error(f"Upload failed — {len(failed_rows)} row(s) had errors. Rolling back all changes.")
                 for idx, err in failed_rows:
                     st.write(f"  Row {idx}: {err}")
                 conn.rollback()
+                op.fail()
             elif success_count > 0:
                 conn.commit()
+                op.add_rows(success_count)
                 st.session_state[inserted_key] = uploaded_file.file_id  # mark this file as inserted
+                if claim_keys is not None:
+                    claim_index().add(claim_keys)
                 st.success(f"Uploaded {success_count}/{total_rows} rows successfully to '{table_name}'.")
 
                 if consolidate_target:
                     st.info(f"Consolidate to '{consolidate_target}'?")
-                    cols = ", ".join(db_columns)
+                    cols = ", ".join(insert_columns)
                     if st.checkbox(f"INSERT INTO {consolidate_target} SELECT {cols} FROM {table_name}"):
                         consolidate_key = f"_consolidated_{consolidate_target}_{uploaded_file.file_id}"
                         if st.session_state.get(consolidate_key):
                             st.info(f"Already consolidated into '{consolidate_target}' for this file.")
                         else:
                             try:
-                                cursor.execute(f"INSERT INTO {consolidate_target} ({cols}) SELECT {cols} FROM {table_name}")
+                                _prepare_table(conn, consolidate_target, column_types, index_columns,
+                                               consolidate_columnstore)
+                                if natural_key:
+                                    ensure_hash_columns(conn, consolidate_target)
+                                backend_for(conn).consolidate(conn, table_name, consolidate_target, insert_columns)
                                 conn.commit()
                                 st.session_state[consolidate_key] = True
                                 st.success(f"Data consolidated into '{consolidate_target}' successfully!")
@@ -215,9 +520,11 @@ def render_generic_upload(
                                 conn.rollback()
             else:
                 conn.rollback()
+                op.fail()
                 st.error("No rows were successfully inserted. Transaction rolled back.")
 
         except Exception as e:
+            op.fail()
             st.error(f"Database error: {e}")
             logger.error(f"Database error in {table_name} upload: {e}", exc_info=True)
             if 'conn' in locals():
@@ -226,5 +533,6 @@ def render_generic_upload(
                 except Exception:
                     pass
         finally:
+            op.finish()
             if 'conn' in locals():
                 conn.close()
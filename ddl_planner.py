@@ -0,0 +1,178 @@
+import re
+import pandas as pd
+from config import logger
+from db_backend import backend_for, index_name, create_index_if_missing
+
+# Bounded text lengths; anything longer falls back to (N)VARCHAR(MAX)
+TEXT_LENGTH_BUCKETS = [16, 32, 64, 128, 256, 512, 1024, 2048, 4000]
+DEFAULT_TEXT_LENGTH = 256  # for columns with no values yet (e.g. SCH_NO before it is filled in)
+
+_TEXT_TYPE_RE = re.compile(r"^(N?VARCHAR)\s*\(\s*(\d+|MAX)\s*\)$", re.IGNORECASE)
+
+
+def profile_text_columns(rows, db_columns, text_columns):
+    """
+    Measure the longest value and whether any non-ASCII text occurs in each text column.
+
+    Args:
+        rows (list): Cleaned row tuples ordered like db_columns
+        db_columns (list): Column names
+        text_columns (list): Columns to profile
+
+    Returns:
+        dict: {column: (max_length, needs_unicode)}
+    """
+    frame = pd.DataFrame.from_records(rows, columns=db_columns) if rows else pd.DataFrame(columns=db_columns)
+    profile = {}
+    for col in text_columns:
+        values = frame[col].dropna().astype(str)
+        if values.empty:
+            profile[col] = (0, False)
+        else:
+            profile[col] = (int(values.str.len().max()), not bool(values.map(str.isascii).all()))
+    return profile
+
+def text_type(max_length, needs_unicode):
+    """Smallest bucketed (N)VARCHAR that fits max_length."""
+    base = "NVARCHAR" if needs_unicode else "VARCHAR"
+    target = max_length if max_length else DEFAULT_TEXT_LENGTH
+    for bucket in TEXT_LENGTH_BUCKETS:
+        if target <= bucket:
+            return f"{base}({bucket})"
+    return f"{base}(MAX)"
+
+def parse_text_type(type_name):
+    """
+    Split a text type into (base, length) with length None for MAX; None for non-text types.
+    """
+    match = _TEXT_TYPE_RE.match(type_name.strip())
+    if not match:
+        return None
+    base, length = match.group(1).upper(), match.group(2).upper()
+    return base, None if length == "MAX" else int(length)
+
+def plan_column_types(db_columns, date_columns, numeric_columns, profile=None):
+    """
+    Choose a SQL type per column: datetime2 for dates, the configured numeric type,
+    and a bounded (N)VARCHAR sized from the profiled data for everything else.
+
+    Returns:
+        dict: {column: type}
+    """
+    profile = profile or {}
+    types = {}
+    for col in db_columns:
+        if col in date_columns:
+            types[col] = "datetime2"
+        elif col in numeric_columns:
+            types[col] = numeric_columns[col]
+        elif col in profile:
+            types[col] = text_type(*profile[col])
+        else:
+            types[col] = "VARCHAR(MAX)"
+    return types
+
+def column_definitions(column_types):
+    return [f"{col} {type_name}" for col, type_name in column_types.items()]
+
+def existing_column_types(conn, table):
+    """
+    Read the current column types of a table.
+
+    Returns:
+        dict: {column: type} such as 'VARCHAR(64)', 'NVARCHAR(MAX)' or 'datetime2'
+    """
+    return backend_for(conn).column_types(conn, table)
+
+def _widened_type(existing, planned):
+    """The type an existing text column must become to hold planned values, or None if it already fits."""
+    current, wanted = parse_text_type(existing), parse_text_type(planned)
+    if not current or not wanted:
+        return None
+    base = "NVARCHAR" if "NVARCHAR" in (current[0], wanted[0]) else "VARCHAR"
+    if current[1] is None or wanted[1] is None:
+        length = None
+    else:
+        length = max(current[1], wanted[1])
+    if (base, length) == current:
+        return None
+    return f"{base}({'MAX' if length is None else length})"
+
+def plan_alter_statements(table, existing_types, planned_types, index_columns=()):
+    """
+    ALTER statements that widen existing text columns (never narrow) and add missing columns.
+
+    Returns:
+        list: SQL statements, in execution order
+    """
+    statements = []
+    for col, planned in planned_types.items():
+        if col not in existing_types:
+            statements.append(f"ALTER TABLE {table} ADD {col} {planned}")
+            continue
+        widened = _widened_type(existing_types[col], planned)
+        if not widened:
+            continue
+        if col in index_columns and parse_text_type(existing_types[col])[0] != parse_text_type(widened)[0]:
+            # Changing VARCHAR to NVARCHAR is not allowed while an index depends on the column
+            statements.append(f"DROP INDEX IF EXISTS {index_name(table, [col])} ON {table}")
+        statements.append(f"ALTER TABLE {table} ALTER COLUMN {col} {widened} NULL")
+    return statements
+
+def apply_column_widening(conn, table, planned_types, index_columns=()):
+    """
+    Widen an existing table so the planned values fit. Backends that do not enforce text lengths
+    (and cannot ALTER COLUMN, i.e. SQLite) only get the missing columns added.
+
+    Returns:
+        list: Statements executed
+    """
+    backend = backend_for(conn)
+    statements = plan_alter_statements(table, existing_column_types(conn, table), planned_types, index_columns)
+    if not backend.supports_alter_column:
+        statements = [backend.column_type(s) for s in statements if " ADD " in s]
+    cursor = conn.cursor()
+    for statement in statements:
+        logger.info(f"Schema change: {statement}")
+        cursor.execute(statement)
+    return statements
+
+def _index_key_bytes(type_name):
+    parsed = parse_text_type(type_name)
+    if parsed is None:
+        return 0
+    base, length = parsed
+    if length is None:
+        return None
+    return length * 2 if base == "NVARCHAR" else length
+
+def apply_indexes(conn, table, index_columns):
+    """
+    Create one nonclustered index per configured column, skipping columns that cannot be index keys.
+
+    Returns:
+        list: Columns that were skipped
+    """
+    max_key_bytes = backend_for(conn).max_index_key_bytes
+    types = existing_column_types(conn, table)
+    skipped = []
+    for col in index_columns:
+        if col not in types:
+            skipped.append(col)
+            continue
+        key_bytes = _index_key_bytes(types[col])
+        if max_key_bytes is not None and (key_bytes is None or key_bytes > max_key_bytes):
+            logger.warning(f"Not indexing {table}.{col}: {types[col]} is too wide for an index key")
+            skipped.append(col)
+            continue
+        create_index_if_missing(conn, table, [col])
+    return skipped
+
+def apply_columnstore(conn, table):
+    """
+    Convert a table to a clustered columnstore where the backend supports it (SQL Server).
+
+    Returns:
+        bool: True if the index was created
+    """
+    return backend_for(conn).create_columnstore_if_missing(conn, table)
@@ -0,0 +1,221 @@
+import os
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+from config import logger
+from utils import CLAIM_KEY_COLUMNS
+
+# Duplicate detection for claims. Each claim's identity is its Correct_ClaimNo, built as
+# generate_enhanced_claims_excel's formula does: member number, encounter date as DDMMYY, then the
+# claim's position within its run of consecutive lines for the same enrollee. Identities of every
+# claim ever loaded are kept as a sorted int64 hash array, so checking an upload is one
+# np.searchsorted over it. A hit is confirmed against the stored identity text (kept in the same
+# order, as a fixed-width string array so the file loads without pickle), so a 64-bit hash collision
+# never reports a new claim as a duplicate. claim_index() shares one loaded index per process and
+# reads the file again only when its mtime or size has changed.
+DEDUP_DIR = os.getenv("DEDUP_INDEX_DIR", "dedup_index")
+CLAIM_INDEX = "claims"
+IDENTITY_COLUMNS = ["Correct_ClaimNo", "CORRECT_CLAIMNO"]
+
+_lock = threading.Lock()
+_indexes = {}  # name -> HashIndex, shared by claim_index()
+
+
+def _first_column(df, names):
+    return next((name for name in names if name in df.columns), None)
+
+def _text(series):
+    """Cell values as Excel concatenates them: whole numbers without '.0', blanks as None."""
+    def clean(value):
+        if pd.isna(value) or str(value).strip() == "":
+            return None
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value).strip()
+    return series.map(clean)
+
+def claim_identities(df):
+    """
+    Correct_ClaimNo of every row, taken from the sheet where it is filled in and otherwise built
+    from MEMBER NO, ENCOUNTER DATE and ENROLLEE NAME.
+
+    Args:
+        df (pandas.DataFrame): Claims rows with Excel or DB column names
+
+    Returns:
+        pandas.Series: Identity per row (same index), None where it cannot be formed
+    """
+    identities = pd.Series(None, index=df.index, dtype=object)
+    given = _first_column(df, IDENTITY_COLUMNS)
+    if given:
+        identities = _text(df[given])
+
+    member = _first_column(df, CLAIM_KEY_COLUMNS["MEMBER_NO"])
+    encounter = _first_column(df, CLAIM_KEY_COLUMNS["ENCOUNTER_DATE_DD_MM_YYYY"])
+    enrollee = _first_column(df, CLAIM_KEY_COLUMNS["ENROLLEE_NAME"])
+    if member and encounter and enrollee:
+        dates = pd.to_datetime(df[encounter], dayfirst=True, errors="coerce", format="mixed")
+        names = df[enrollee]
+        # ClaimNoFnx: 1 for an enrollee's first line, +1 for each following line of the same enrollee
+        run = (names != names.shift()).cumsum()
+        sequence = names.groupby(run).cumcount() + 1
+        built = _text(df[member]) + dates.dt.strftime("%d%m%y") + sequence.astype(str)
+        identities = identities.where(identities.notna(), built.where(dates.notna()))
+    return identities.where(identities.notna(), None)
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def hash_keys(keys):
+    """64-bit hashes of identity strings as int64."""
+    values = pd.Series(keys, dtype=object).astype(str).to_numpy(dtype=object)
+    return pd.util.hash_array(values).view("int64")
+
+
+class HashIndex:
+    """
+    Persistent set of identity strings: a sorted int64 hash array plus the identities in the same
+    order, stored as DEDUP_DIR/<name>.npz.
+
+    Args:
+        name (str): Index name, e.g. CLAIM_INDEX
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.path = os.path.join(DEDUP_DIR, f"{name}.npz")
+        self._load()
+
+    # Hashes and identities are swapped as one tuple, so a lookup never pairs mismatched halves
+    @property
+    def hashes(self):
+        return self._arrays[0]
+
+    @hashes.setter
+    def hashes(self, value):
+        self._arrays = (value, self._arrays[1])
+
+    @property
+    def keys(self):
+        return self._arrays[1]
+
+    @keys.setter
+    def keys(self, value):
+        self._arrays = (self._arrays[0], value)
+
+    def _load(self):
+        self.stamp = _file_stamp(self.path)
+        self._arrays = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.str_))
+        if self.stamp is None:
+            return
+        try:
+            with np.load(self.path) as stored:
+                self._arrays = (stored["hashes"], stored["keys"])
+        except ValueError:  # written before identities were stored as fixed-width strings
+            with np.load(self.path, allow_pickle=True) as stored:
+                self._arrays = (stored["hashes"], stored["keys"].astype(np.str_))
+
+    def is_current(self):
+        """True if the file on disk is the one this index was read from (or last wrote)."""
+        return self.stamp == _file_stamp(self.path)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def contains(self, keys):
+        """
+        Args:
+            keys: Identity strings; None/NaN never match
+
+        Returns:
+            numpy.ndarray: bool per key, True if the index holds it
+        """
+        stored_hashes, stored_keys = self._arrays
+        keys = pd.Series(keys, dtype=object).reset_index(drop=True)
+        found = np.zeros(len(keys), dtype=bool)
+        present = keys.notna().to_numpy()
+        if not len(stored_hashes) or not present.any():
+            return found
+        wanted = keys[present].astype(str).to_numpy(dtype=object)
+        hashes = hash_keys(wanted)
+        lo = np.searchsorted(stored_hashes, hashes, "left")
+        hi = np.searchsorted(stored_hashes, hashes, "right")
+        hit = np.flatnonzero(hi > lo)
+        confirmed = np.zeros(len(wanted), dtype=bool)
+        if hit.size:
+            single = hit[hi[hit] - lo[hit] == 1]
+            confirmed[single] = stored_keys[lo[single]].astype(object) == wanted[single]
+            for i in hit[hi[hit] - lo[hit] > 1]:  # colliding hashes
+                confirmed[i] = wanted[i] in stored_keys[lo[i]:hi[i]].tolist()
+        found[present] = confirmed
+        return found
+
+    def add(self, keys):
+        """Add identities (None/NaN skipped) and persist the index. Returns the number newly added."""
+        keys = pd.Series(keys, dtype=object).dropna().astype(str).drop_duplicates()
+        with _lock:
+            if not self.is_current():
+                self._load()  # another process or index instance has written since this one was read
+            new = keys[~self.contains(keys)].to_numpy(dtype=object)
+            if not new.size:
+                return 0
+            hashes = np.concatenate([self.hashes, hash_keys(new)])
+            stored = np.concatenate([self.keys, new.astype(np.str_)])
+            order = np.argsort(hashes, kind="stable")
+            self._arrays = (hashes[order], stored[order])
+            self._save()
+        logger.info(f"Dedup index {self.name}: added {new.size} identities ({len(self)} total)")
+        return int(new.size)
+
+    def _save(self):
+        # Hashes and identities go in one file, swapped in whole, so readers never pair mismatched halves
+        os.makedirs(DEDUP_DIR, exist_ok=True)
+        tmp = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, hashes=self.hashes, keys=self.keys.astype(np.str_))
+        os.replace(tmp, self.path)
+        self.stamp = _file_stamp(self.path)
+
+    def rebuild(self, keys):
+        """Replace the index with exactly these identities, e.g. everything already in the database."""
+        keys = pd.Series(keys, dtype=object).dropna().astype(str).drop_duplicates().to_numpy(dtype=object)
+        hashes = hash_keys(keys)
+        order = np.argsort(hashes, kind="stable")
+        with _lock:
+            self._arrays = (hashes[order], keys[order].astype(np.str_))
+            self._save()
+        logger.info(f"Dedup index {self.name}: rebuilt with {len(self)} identities")
+        return len(self)
+
+
+def shared_index(name):
+    """The process-wide HashIndex for name, read from disk again only if the file has changed."""
+    with _lock:
+        index = _indexes.get(name)
+        if index is None or index.path != os.path.join(DEDUP_DIR, f"{name}.npz") or not index.is_current():
+            index = _indexes[name] = HashIndex(name)
+        return index
+
+def claim_index():
+    return shared_index(CLAIM_INDEX)
+
+def find_known_claims(df, index=None):
+    """
+    Rows of a claims upload whose identity is already in the claim index.
+
+    Returns:
+        tuple: (identities Series, bool numpy array per row)
+    """
+    identities = claim_identities(df)
+    return identities, (index if index is not None else claim_index()).contains(identities)
+
+def rebuild_claim_index(conn, table, column="Correct_ClaimNo"):
+    """Rebuild the claim index from a table's stored identities."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL")
+    return claim_index().rebuild([row[0] for row in cursor.fetchall()])
@@ -0,0 +1,138 @@
+import math
+from datetime import datetime
+from decimal import Decimal
+import pandas as pd
+from config import logger
+from db_backend import backend_for, column_exists, create_index_if_missing, plain_name
+
+ROW_KEY = "ROW_KEY"
+ROW_DIGEST = "ROW_DIGEST"
+HASH_COLUMNS = [ROW_KEY, ROW_DIGEST]
+HASH_COLUMN_DEFS = [f"{ROW_KEY} BIGINT", f"{ROW_DIGEST} BIGINT"]
+STAGE_BATCH_SIZE = 10000
+
+
+def stage_table_name(table):
+    return f"[{plain_name(table)}_stage]" if table.strip().startswith("[") else f"{table}_stage"
+
+def _hash_text(value):
+    """Canonical text for hashing so the same cleaned value always hashes the same way."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and not math.isfinite(value):
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f"{float(value):.2f}"
+    return str(value).strip()
+
+def compute_row_hashes(frame, natural_key):
+    """
+    Compute a natural-key hash and a whole-row digest per row.
+
+    Rows sharing the same natural key within one file get an occurrence ordinal mixed into
+    their key, so legitimately repeated lines stay distinct and reload deterministically.
+
+    Args:
+        frame (pandas.DataFrame): Cleaned rows with DB column names
+        natural_key (list): Columns that identify a row across loads
+
+    Returns:
+        tuple: (keys, digests) as int64 numpy arrays
+    """
+    text = frame.apply(lambda s: s.map(_hash_text))
+    base = pd.util.hash_pandas_object(text[list(natural_key)], index=False)
+    ordinal = base.groupby(base).cumcount()
+    keys = pd.util.hash_pandas_object(pd.DataFrame({"k": base.values, "n": ordinal.values}), index=False)
+    digests = pd.util.hash_pandas_object(text, index=False)
+    return keys.values.astype("uint64").view("int64"), digests.values.astype("uint64").view("int64")
+
+def hashed_rows(rows, db_columns, natural_key):
+    """Append ROW_KEY/ROW_DIGEST to each cleaned row tuple."""
+    frame = pd.DataFrame.from_records(rows, columns=db_columns)
+    keys, digests = compute_row_hashes(frame, natural_key)
+    return [tuple(row) + (int(k), int(d)) for row, k, d in zip(rows, keys, digests)]
+
+def ensure_hash_columns(conn, table):
+    """Add ROW_KEY/ROW_DIGEST (and an index on ROW_KEY) to a table that predates delta loads."""
+    cursor = conn.cursor()
+    for col_def in HASH_COLUMN_DEFS:
+        col = col_def.split()[0]
+        if not column_exists(conn, table, col):
+            cursor.execute(f"ALTER TABLE {table} ADD {col_def}")
+    create_index_if_missing(conn, table, [ROW_KEY])
+
+def count_unkeyed_rows(conn, table):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {ROW_KEY} IS NULL")
+    return cursor.fetchone()[0]
+
+def bulk_load_stage(conn, stage, col_defs, columns, rows, batch_size=STAGE_BATCH_SIZE):
+    """Recreate the staging table and bulk insert the hashed rows into it."""
+    backend = backend_for(conn)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+    col_defs = [backend.column_type(d) for d in list(col_defs) + HASH_COLUMN_DEFS]
+    cursor.execute(f"CREATE TABLE {stage} ({', '.join(col_defs)})")
+    backend.bulk_insert(conn, stage, columns, rows, batch_size)
+
+def merge_stage_into(conn, target, stage, db_columns):
+    """
+    Upsert staged rows into target: insert unseen ROW_KEYs, update rows whose ROW_DIGEST changed.
+
+    Returns:
+        dict: Counts of 'inserted' and 'updated' rows
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT COUNT(*) FROM {stage} s
+        WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE t.{ROW_KEY} = s.{ROW_KEY})
+    """)
+    inserted = cursor.fetchone()[0]
+    cursor.execute(f"""
+        SELECT COUNT(*) FROM {stage} s JOIN {target} t ON t.{ROW_KEY} = s.{ROW_KEY}
+        WHERE t.{ROW_DIGEST} IS NULL OR t.{ROW_DIGEST} <> s.{ROW_DIGEST}
+    """)
+    updated = cursor.fetchone()[0]
+
+    columns = list(db_columns) + HASH_COLUMNS
+    for statement in backend_for(conn).merge_statements(target, stage, ROW_KEY, ROW_DIGEST, columns,
+                                                         list(db_columns) + [ROW_DIGEST]):
+        cursor.execute(statement)
+    return {"inserted": inserted, "updated": updated}
+
+def load_delta(conn, table_name, db_columns, col_defs, rows, natural_key, consolidate_target=None):
+    """
+    Incrementally load cleaned rows: stage them, then MERGE new or changed rows into the
+    working table and (optionally) the consolidated target. Does not commit.
+
+    Args:
+        conn: DB-API connection with autocommit off
+        table_name (str): Working table, e.g. 'claimstbl'
+        db_columns (list): DB column names, in the order of each row tuple
+        col_defs (list): Column definitions used to create the staging table
+        rows (list): Cleaned row tuples
+        natural_key (list): Columns hashed into ROW_KEY
+        consolidate_target (str): Optional consolidated table to merge into as well
+
+    Returns:
+        dict: {'staged': n, table_name: counts, consolidate_target: counts}
+    """
+    stage = stage_table_name(table_name)
+    columns = list(db_columns) + HASH_COLUMNS
+    bulk_load_stage(conn, stage, col_defs, columns, hashed_rows(rows, db_columns, natural_key))
+
+    result = {"staged": len(rows)}
+    for target in [table_name, consolidate_target]:
+        if not target:
+            continue
+        ensure_hash_columns(conn, target)
+        unkeyed = count_unkeyed_rows(conn, target)
+        if unkeyed:
+            logger.warning(f"{target} has {unkeyed} rows without {ROW_KEY}; they cannot be matched by delta loads")
+        result[target] = merge_stage_into(conn, target, stage, db_columns)
+        result[target]["unkeyed"] = unkeyed
+
+    conn.cursor().execute(f"DROP TABLE IF EXISTS {stage}")
+    return result
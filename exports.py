@@ -0,0 +1,192 @@
+import gzip
+import hashlib
+import io
+import json
+import re
+import zipfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import streamlit as st
+from session_store import session_store
+
+# Columnar copies of the Excel reports for BI. Frames are converted to Arrow a slice at a time and
+# streamed into the output (a buffer or a zip member), so a large report is never held twice. Built
+# files are cached by a hash of the frames, so a page rerun for an unrelated widget reuses them.
+PARQUET_MIME = "application/vnd.apache.parquet"
+GZIP_MIME = "application/gzip"
+ZIP_MIME = "application/zip"
+ROW_GROUP_SIZE = 100_000
+
+EXPORT_FORMATS = {
+    "parquet": "Parquet",
+    "csv.gz": "CSV (gzip)",
+    "zip": "All sheets (.zip of Parquet)",
+}
+
+
+def _arrow_schema(df):
+    """Arrow schema for a frame; object columns holding mixed types (as Excel gives) become strings."""
+    fields = []
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        try:
+            arrow_type = pa.array(column, from_pandas=True).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrow_type = pa.string()
+        if pa.types.is_null(arrow_type) or pa.types.is_binary(arrow_type) or pa.types.is_nested(arrow_type):
+            arrow_type = pa.string()
+        fields.append(pa.field(str(df.columns[i]), arrow_type))
+    return pa.schema(fields)
+
+def _as_text(value):
+    if isinstance(value, str) or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return value
+    return str(value)
+
+def _arrow_batches(df, schema):
+    """Arrow tables of at most ROW_GROUP_SIZE rows each, cast to the schema."""
+    for start in range(0, max(len(df), 1), ROW_GROUP_SIZE):
+        chunk = df.iloc[start:start + ROW_GROUP_SIZE]
+        arrays = []
+        for i, field in enumerate(schema):
+            column = chunk.iloc[:, i]
+            if pa.types.is_string(field.type) and column.dtype == object:
+                column = column.map(_as_text)
+            arrays.append(pa.array(column, type=field.type, from_pandas=True))
+        yield pa.Table.from_arrays(arrays, schema=schema)
+
+def write_parquet(df, sink):
+    """Stream a DataFrame into a Parquet file object, one row group per ROW_GROUP_SIZE rows."""
+    schema = _arrow_schema(df)
+    with pq.ParquetWriter(sink, schema, compression="snappy") as writer:
+        for table in _arrow_batches(df, schema):
+            writer.write_table(table)
+
+def write_csv_gz(df, sink):
+    """Stream a DataFrame into a gzip-compressed CSV file object."""
+    schema = _arrow_schema(df)
+    # GzipFile leaves the sink open when Arrow closes the stream, so it can be a zip member or buffer
+    with pa.PythonFile(gzip.GzipFile(fileobj=sink, mode="wb"), mode="w") as stream:
+        with pacsv.CSVWriter(stream, schema) as writer:
+            for table in _arrow_batches(df, schema):
+                writer.write_table(table)
+
+def parquet_bytes(df):
+    buffer = io.BytesIO()
+    write_parquet(df, buffer)
+    return buffer.getvalue()
+
+def csv_gz_bytes(df):
+    buffer = io.BytesIO()
+    write_csv_gz(df, buffer)
+    return buffer.getvalue()
+
+def _member_name(sheet_name):
+    return re.sub(r"[^0-9A-Za-z]+", "_", sheet_name).strip("_").lower() or "sheet"
+
+def bundle_bytes(sheets):
+    """
+    A zip with every sheet of a report as its own Parquet file, plus manifest.json listing each
+    file's sheet name, row count and columns.
+
+    Args:
+        sheets (dict): {sheet_name: DataFrame}
+    """
+    buffer = io.BytesIO()
+    manifest = []
+    # Parquet is already compressed, so members are stored as-is
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as bundle:
+        for sheet_name, df in sheets.items():
+            member = f"{_member_name(sheet_name)}.parquet"
+            with bundle.open(member, "w", force_zip64=True) as f:
+                write_parquet(df, f)
+            manifest.append({"file": member, "sheet": sheet_name, "rows": len(df),
+                             "columns": [str(c) for c in df.columns]})
+        bundle.writestr("manifest.json", json.dumps(manifest, indent=2))
+    return buffer.getvalue()
+
+def export_file(sheets, base_name, fmt):
+    """
+    Build one export of a report.
+
+    Args:
+        sheets (dict): {sheet_name: DataFrame}; the first sheet is the main table
+        base_name (str): File name without extension
+        fmt (str): A key of EXPORT_FORMATS
+
+    Returns:
+        tuple: (bytes, file_name, mime)
+    """
+    main = next(iter(sheets.values()))
+    if fmt == "parquet":
+        return parquet_bytes(main), f"{base_name}.parquet", PARQUET_MIME
+    if fmt == "csv.gz":
+        return csv_gz_bytes(main), f"{base_name}.csv.gz", GZIP_MIME
+    if fmt == "zip":
+        return bundle_bytes(sheets), f"{base_name}.zip", ZIP_MIME
+    raise ValueError(f"Unknown export format '{fmt}'; expected one of {sorted(EXPORT_FORMATS)}")
+
+def frames_digest(sheets):
+    """SHA-256 over sheet names, columns and cell values of {sheet_name: DataFrame}."""
+    sha = hashlib.sha256()
+    for name, df in sheets.items():
+        sha.update(repr((name, [str(c) for c in df.columns])).encode())
+        try:
+            hashed = pd.util.hash_pandas_object(df, index=False)
+        except TypeError:  # unhashable cells, e.g. lists
+            hashed = pd.util.hash_pandas_object(df.astype(str), index=False)
+        sha.update(hashed.to_numpy().tobytes())
+    return sha.hexdigest()
+
+def cached_exports(sheets, base_name, cache, digest=None):
+    """
+    Every EXPORT_FORMATS file of a report, built only if cache has none for the same frames.
+
+    Args:
+        sheets (dict): {sheet_name: DataFrame}
+        base_name (str): File name without extension
+        cache (dict): {(frames digest, fmt): built file}; filled with the files built here
+        digest (str): frames_digest(sheets), when the caller already has it
+
+    Returns:
+        list: (fmt, bytes, file_name, mime) per format
+    """
+    digest = digest or frames_digest(sheets)
+    files = []
+    for fmt in EXPORT_FORMATS:
+        if (digest, fmt) not in cache:
+            cache[(digest, fmt)] = export_file(sheets, base_name, fmt)
+        data, _, mime = cache[(digest, fmt)]
+        files.append((fmt, data, f"{base_name}.{fmt}", mime))  # the format keys are the extensions
+    return files
+
+def render_export_buttons(sheets, base_name, key, cache=None):
+    """
+    Columnar download buttons to sit under a report's Excel download: the main sheet as Parquet
+    and as gzip CSV, and every sheet as a zip of Parquet files.
+
+    Args:
+        sheets (dict): {sheet_name: DataFrame}; the first is the main table, later empty sheets are left out
+        base_name (str): File name without extension
+        key (str): Widget key prefix, unique on the page
+        cache (dict): Where built files are kept (e.g. on a cached view); defaults to one per key in
+            the session store, holding the files of the latest sheets only
+    """
+    main = next(iter(sheets), None)
+    sheets = {name: df for name, df in sheets.items() if df is not None and (name == main or not df.empty)}
+    if not sheets:
+        return
+    if cache is not None:
+        files = cached_exports(sheets, base_name, cache)
+    else:
+        store_key = f"_exports_{key}"
+        digest = frames_digest(sheets)
+        # Only the latest sheets' files are kept, so a run with new inputs replaces rather than adds
+        cache = {k: built for k, built in (session_store().get(store_key) or {}).items() if k[0] == digest}
+        files = cached_exports(sheets, base_name, cache, digest)
+        session_store().put(store_key, cache)
+    for column, (fmt, data, file_name, mime) in zip(st.columns(len(files)), files):
+        column.download_button(f"📥 {EXPORT_FORMATS[fmt]}", data, file_name=file_name, mime=mime,
+                               key=f"export_{key}_{fmt}")
@@ -0,0 +1,86 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from config import logger
+from upload_handle import spool_upload
+
+# Uploaders take CSV and Parquet exports as well as Excel. A flat file is a single table, so it
+# behaves like a workbook with one sheet named after the file; Arrow parses it many times faster.
+EXCEL_TYPES = ["xlsx", "xls"]
+FLAT_TYPES = ["csv", "parquet"]
+UPLOAD_TYPES = EXCEL_TYPES + FLAT_TYPES
+
+# Identifier columns read as text, so '00123' keeps its zeros and schedule numbers don't become floats
+TEXT_COLUMNS = [
+    'SCH NO', 'SCH_NO', 'Claim Batch No/Sch No', 'Schedule No', 'Schedule Number',
+    'PROVIDER CODE', 'PROVIDER_CODE', 'MEMBER NO', 'MEMBER_NO', 'AVON OLD ENROLEEID',
+    'BATCH NUMBER', 'BATCH NO', 'BATCH_NUMBER', 'AVONPACODE', 'ClaimNo', 'Correct_ClaimNo', 'ClaimBatch',
+]
+
+_MAGIC = [(b"PAR1", "parquet"), (b"PK\x03\x04", "xlsx"), (b"\xd0\xcf\x11\xe0", "xls")]
+
+
+def detect_format(name=None, head=b""):
+    """
+    File format from the extension, else from the leading bytes.
+
+    Returns:
+        str: 'xlsx', 'xls', 'csv' or 'parquet'
+    """
+    extension = os.path.splitext(name or "")[1].lower().lstrip(".")
+    if extension in UPLOAD_TYPES:
+        return extension
+    for magic, fmt in _MAGIC:
+        if head.startswith(magic):
+            return fmt
+    return "csv"
+
+def upload_format(file):
+    """Format of an upload (UploadedFile, UploadHandle, bytes, ...)."""
+    handle = spool_upload(file)
+    with handle.open() as f:
+        return detect_format(getattr(file, "name", None) or handle.name, f.read(8))
+
+def is_flat_file(file):
+    return upload_format(file) in FLAT_TYPES
+
+def _table_name(handle):
+    return os.path.splitext(os.path.basename(handle.name))[0] if handle.name != handle.digest else "Data"
+
+def read_csv_table(f, text_columns=TEXT_COLUMNS):
+    """Parse a CSV with Arrow, reading identifier columns as text; falls back to pandas for non-UTF-8 files."""
+    try:
+        table = pacsv.read_csv(f, convert_options=pacsv.ConvertOptions(
+            column_types={col: pa.string() for col in text_columns},
+            strings_can_be_null=True,
+        ))
+        return table.to_pandas()
+    except pa.ArrowInvalid as e:
+        logger.warning(f"Arrow could not parse CSV ({e}); retrying with pandas")
+        f.seek(0)
+        return pd.read_csv(f, dtype={col: str for col in text_columns}, encoding="latin-1")
+
+def read_parquet_table(f):
+    return pq.read_table(f).to_pandas()
+
+def read_tables(file, header=0):
+    """
+    Every table in an upload.
+
+    Args:
+        file: UploadedFile, UploadHandle, bytes, ...
+        header (int): Header row for Excel sheets (flat files always have it on the first line)
+
+    Returns:
+        dict: {sheet_name: DataFrame}; a CSV or Parquet file gives one entry named after the file
+    """
+    handle = spool_upload(file)
+    fmt = upload_format(handle)
+    with handle.open() as f:
+        if fmt == "csv":
+            return {_table_name(handle): read_csv_table(f)}
+        if fmt == "parquet":
+            return {_table_name(handle): read_parquet_table(f)}
+        return pd.read_excel(f, sheet_name=None, header=header)
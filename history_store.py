@@ -0,0 +1,280 @@
+import json
+import os
+import threading
+import uuid
+from datetime import date, datetime
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+from config import logger
+from amounts import to_kobo, from_kobo
+
+# Append-only history of reconciliation runs. Each run's per-schedule rows go to one Parquet file
+# under runs/year=YYYY/week=WW/, listed in manifest.json. Rollups per week, provider and status are
+# kept beside them and updated by each append, so the trends page never scans raw history. A rerun
+# of the same week and source supersedes the earlier run: its file stays, its rollup share is removed.
+HISTORY_DIR = os.getenv("RECON_HISTORY_DIR", "history")
+
+MATCHED = "Matched"
+AMOUNT_MISMATCH = "Amount Mismatch"
+MISSING_IN_FINANCE = "Missing in Finance"
+MISSING_IN_CLAIMS = "Missing in Claims"
+STATUSES = [MATCHED, AMOUNT_MISMATCH, MISSING_IN_FINANCE, MISSING_IN_CLAIMS]
+
+UNKNOWN_PROVIDER = "Unknown"
+PROVIDER_COLUMNS = ["PROVIDER NAME", "PROVIDER_NAME", "HOSPITAL", "Provider", "PROVIDER"]
+
+# Rollup name -> grouping keys; every rollup carries the same measures
+ROLLUPS = {
+    "week": ["source", "year", "week"],
+    "provider": ["source", "year", "week", "provider"],
+    "status": ["source", "year", "week", "status"],
+}
+MEASURES = ["schedules", "claims_kobo", "finance_kobo", "variance_kobo"]
+
+_lock = threading.Lock()
+
+
+def _manifest_path():
+    return os.path.join(HISTORY_DIR, "manifest.json")
+
+def _rollup_path(name):
+    return os.path.join(HISTORY_DIR, "rollups", f"{name}.parquet")
+
+def _partition_dir(year, week):
+    return os.path.join(HISTORY_DIR, "runs", f"year={year}", f"week={week:02d}")
+
+def _atomic_write(path, write):
+    # Readers never see a half-written manifest or rollup
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+def load_manifest():
+    """The manifest: {"runs": [run, ...]} in append order."""
+    if not os.path.exists(_manifest_path()):
+        return {"runs": []}
+    with open(_manifest_path()) as f:
+        return json.load(f)
+
+def _save_manifest(manifest):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+    _atomic_write(_manifest_path(), write)
+
+def live_runs(manifest=None):
+    """Runs not superseded by a later run of the same week and source."""
+    return [run for run in (manifest or load_manifest())["runs"] if not run.get("superseded_by")]
+
+def schedule_providers(claims_df, schedule_col):
+    """
+    Provider of each schedule in a claims extract, from the first provider-name column present.
+
+    Returns:
+        pandas.Series: Provider indexed by schedule number (as text), or None if there is no provider column
+    """
+    provider_col = next((c for c in PROVIDER_COLUMNS if c in claims_df.columns), None)
+    if provider_col is None:
+        return None
+    pairs = claims_df[[schedule_col, provider_col]].dropna()
+    schedules = pairs[schedule_col].map(lambda x: str(int(x)) if isinstance(x, float) and x == int(x) else str(x))
+    return pairs[provider_col].astype(str).str.strip().groupby(schedules.values).first()
+
+def history_rows(report, providers=None):
+    """
+    A reconciliation report as history rows.
+
+    Args:
+        report (pandas.DataFrame): Schedule Number, Claims Amount, Finance Amount (generate_reconciliation_report)
+        providers (pandas.Series): Provider by schedule number (schedule_providers); missing ones are 'Unknown'
+
+    Returns:
+        pandas.DataFrame: schedule, provider, status, claims_kobo, finance_kobo, difference_kobo
+    """
+    claims = to_kobo(report["Claims Amount"]).reset_index(drop=True)
+    finance = to_kobo(report["Finance Amount"]).reset_index(drop=True)
+    schedules = report["Schedule Number"].astype(str).reset_index(drop=True)
+    status = pd.Series(MATCHED, index=schedules.index)
+    status[claims.notna() & finance.notna() & (claims != finance)] = AMOUNT_MISMATCH
+    status[claims.notna() & finance.isna()] = MISSING_IN_FINANCE
+    status[claims.isna() & finance.notna()] = MISSING_IN_CLAIMS
+    provider = schedules.map(providers) if providers is not None else pd.Series(None, index=schedules.index, dtype=object)
+    return pd.DataFrame({
+        "schedule": schedules,
+        "provider": provider.fillna(UNKNOWN_PROVIDER).astype(str),
+        "status": status,
+        "claims_kobo": claims.astype("Int64"),
+        "finance_kobo": finance.astype("Int64"),
+        "difference_kobo": (claims - finance).astype("Int64"),
+    })
+
+def _rollup(rows, keys):
+    measures = pd.DataFrame({
+        "schedules": 1,
+        "claims_kobo": rows["claims_kobo"].fillna(0).astype("int64"),
+        "finance_kobo": rows["finance_kobo"].fillna(0).astype("int64"),
+        # Gross variance: a missing side counts in full
+        "variance_kobo": (rows["claims_kobo"].fillna(0) - rows["finance_kobo"].fillna(0)).abs().astype("int64"),
+    }, index=rows.index)
+    return pd.concat([rows[keys], measures], axis=1).groupby(keys, as_index=False)[MEASURES].sum()
+
+def _combine(existing, delta, keys, sign):
+    if delta.empty:
+        return existing
+    delta = delta.copy()
+    delta[MEASURES] *= sign
+    combined = pd.concat([existing, delta], ignore_index=True).groupby(keys, as_index=False)[MEASURES].sum()
+    return combined[combined["schedules"] != 0].sort_values(keys).reset_index(drop=True)
+
+def read_rollup(name):
+    """A rollup ('week', 'provider' or 'status') with its keys and MEASURES; empty if nothing is recorded."""
+    path = _rollup_path(name)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=ROLLUPS[name] + MEASURES)
+    return pd.read_parquet(path)
+
+def _write_rollup(name, frame):
+    _atomic_write(_rollup_path(name), lambda tmp: frame.to_parquet(tmp, index=False))
+
+def _read_run_rows(run):
+    return pd.read_parquet(os.path.join(HISTORY_DIR, run["path"]))
+
+def record_run(report, source, providers=None, period=None):
+    """
+    Append a reconciliation run and fold it into the rollups.
+
+    Args:
+        report (pandas.DataFrame): Output of generate_reconciliation_report
+        source (str): What was reconciled, e.g. 'Claims Reconciliation' or a DB table's label
+        providers (pandas.Series): Provider by schedule number (schedule_providers)
+        period (date): Day inside the reconciled week; defaults to today
+
+    Returns:
+        dict: The manifest entry for the run
+    """
+    period = period or date.today()
+    year, week, _ = period.isocalendar()
+    rows = history_rows(report, providers)
+    rows.insert(0, "source", source)
+    rows.insert(1, "year", year)
+    rows.insert(2, "week", week)
+
+    run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    relative_path = os.path.relpath(os.path.join(_partition_dir(year, week), f"{run_id}.parquet"), HISTORY_DIR)
+    run = {
+        "run_id": run_id,
+        "source": source,
+        "year": int(year),
+        "week": int(week),
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "path": relative_path,
+        "schedules": len(rows),
+        "claims_kobo": int(rows["claims_kobo"].fillna(0).sum()),
+        "finance_kobo": int(rows["finance_kobo"].fillna(0).sum()),
+    }
+
+    with _lock:
+        _atomic_write(os.path.join(HISTORY_DIR, relative_path), lambda tmp: rows.to_parquet(tmp, index=False))
+        manifest = load_manifest()
+        superseded = [r for r in live_runs(manifest)
+                      if r["source"] == source and r["year"] == year and r["week"] == week]
+        old_rows = [_read_run_rows(r) for r in superseded]
+        for name, keys in ROLLUPS.items():
+            rollup = _combine(read_rollup(name), _rollup(rows, keys), keys, 1)
+            for old in old_rows:
+                rollup = _combine(rollup, _rollup(old, keys), keys, -1)
+            _write_rollup(name, rollup)
+        for r in superseded:
+            r["superseded_by"] = run_id
+        manifest["runs"].append(run)
+        _save_manifest(manifest)
+
+    logger.info(f"Recorded reconciliation history run {run_id} ({source}, {year}-W{week:02d}, {len(rows)} schedules)"
+                + (f", superseding {len(superseded)}" if superseded else ""))
+    return run
+
+def rebuild_rollups():
+    """Recompute every rollup from the live runs' files, e.g. after an interrupted append."""
+    with _lock:
+        runs = live_runs()
+        rows = pd.concat([_read_run_rows(r) for r in runs], ignore_index=True) if runs else None
+        for name, keys in ROLLUPS.items():
+            _write_rollup(name, _rollup(rows, keys) if rows is not None else pd.DataFrame(columns=keys + MEASURES))
+
+def load_week(source, year, week):
+    """Per-schedule rows of the live run for a week, for drilling down from the rollups."""
+    for run in reversed(live_runs()):
+        if run["source"] == source and run["year"] == year and run["week"] == week:
+            return _read_run_rows(run)
+    return None
+
+def _week_label(frame):
+    return frame["year"].astype(int).astype(str) + "-W" + frame["week"].astype(int).map("{:02d}".format)
+
+def _naira(frame):
+    out = frame.copy()
+    for col in ["claims_kobo", "finance_kobo", "variance_kobo", "difference_kobo"]:
+        if col in out.columns:
+            out[col.replace("_kobo", "_amount")] = from_kobo(out.pop(col)).values
+    return out
+
+def render_trends_page():
+    st.header("Reconciliation Trends")
+    st.markdown("Weekly history of reconciliation runs, read from pre-aggregated rollups.")
+
+    weekly = read_rollup("week")
+    if weekly.empty:
+        st.info("No reconciliation runs recorded yet. Runs are recorded when a reconciliation is processed.")
+        return
+
+    source = st.selectbox("Reconciliation", sorted(weekly["source"].unique()))
+    weekly = _naira(weekly[weekly["source"] == source])
+    weekly["Week"] = _week_label(weekly)
+    weeks = weekly["Week"].tolist()
+    if len(weeks) > 1:
+        first, last = st.select_slider("Weeks", options=weeks, value=(weeks[max(0, len(weeks) - 13)], weeks[-1]))
+    else:
+        first = last = weeks[0]
+    in_range = lambda frame: frame[(_week_label(frame) >= first) & (_week_label(frame) <= last)]
+    weekly = in_range(weekly)
+
+    status = read_rollup("status")
+    status = _naira(in_range(status[status["source"] == source]))
+    status["Week"] = _week_label(status)
+    latest = weekly.iloc[-1]
+    latest_missing = status[(status["Week"] == latest["Week"]) & (status["status"] == MISSING_IN_FINANCE)]["schedules"].sum()
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Weeks", len(weekly))
+    c2.metric(f"Schedules ({latest['Week']})", int(latest["schedules"]))
+    c3.metric(f"Missing in Finance ({latest['Week']})", int(latest_missing))
+    c4.metric(f"Gross Variance ({latest['Week']})", f"{latest['variance_amount']:,.2f}")
+
+    st.subheader("Claims vs Finance by Week")
+    st.plotly_chart(px.line(weekly, x="Week", y=["claims_amount", "finance_amount", "variance_amount"], markers=True),
+                    use_container_width=True)
+
+    st.subheader("Schedules by Status")
+    st.plotly_chart(px.bar(status, x="Week", y="schedules", color="status", category_orders={"status": STATUSES}),
+                    use_container_width=True)
+
+    st.subheader("Providers")
+    providers = read_rollup("provider")
+    providers = _naira(in_range(providers[providers["source"] == source]))
+    by_provider = (providers.groupby("provider", as_index=False)[["schedules", "claims_amount", "finance_amount", "variance_amount"]]
+                   .sum().sort_values("variance_amount", ascending=False))
+    st.dataframe(by_provider, use_container_width=True, hide_index=True)
+
+    with st.expander("Week detail"):
+        week = st.selectbox("Week", weekly["Week"].tolist()[::-1])
+        year, number = week.split("-W")
+        rows = load_week(source, int(year), int(number))
+        if rows is not None:
+            st.dataframe(_naira(rows), use_container_width=True, hide_index=True)
+
+    with st.expander("Recorded runs"):
+        runs = pd.DataFrame(load_manifest()["runs"])
+        runs = runs[runs["source"] == source]
+        st.dataframe(_naira(runs).drop(columns=["path"]), use_container_width=True, hide_index=True)
@@ -0,0 +1,315 @@
+import os
+import pickle
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import streamlit as st
+from config import logger
+from session_store import session_store
+
+# Jobs run on a shared thread pool inside the Streamlit server process, so every session sees the
+# same queue; each job records the session that submitted it, and sessions only list (and download
+# the artifacts of) their own jobs. Threads rather than processes: jobs are handed UploadedFile buffers and closures that
+# cannot be pickled, and pandas/openpyxl/pyodbc spend much of their time outside the GIL.
+JOB_DIR = "jobs"
+JOB_DB = os.path.join(JOB_DIR, "jobs.db")
+ARTIFACT_DIR = os.path.join(JOB_DIR, "artifacts")
+MAX_WORKERS = 4
+ARTIFACT_RETENTION_DAYS = 7
+POLL_SECONDS = 2
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        label TEXT NOT NULL,
+        owner TEXT,
+        status TEXT NOT NULL,
+        progress REAL NOT NULL DEFAULT 0,
+        message TEXT,
+        error TEXT,
+        submitted_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS job_artifacts (
+        job_id TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        path TEXT NOT NULL,
+        mime TEXT,
+        size INTEGER,
+        PRIMARY KEY (job_id, file_name)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS IX_jobs_status ON jobs (status)",
+]
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+def _connect():
+    conn = sqlite3.connect(JOB_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_job_store():
+    """Create the job directory, database and artifact folder if needed."""
+    os.makedirs(os.path.dirname(JOB_DB) or ".", exist_ok=True)
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    conn = _connect()
+    try:
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _update_job(job_id, **fields):
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    conn = _connect()
+    try:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class JobContext:
+    """
+    Handed to a running job as its first argument, to report progress and keep output files.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.directory = os.path.join(ARTIFACT_DIR, job_id)
+
+    def progress(self, fraction, message=None):
+        fields = {"progress": max(0.0, min(1.0, float(fraction)))}
+        if message is not None:
+            fields["message"] = message
+        _update_job(self.job_id, **fields)
+
+    def save_artifact(self, file_name, data, mime="application/octet-stream"):
+        """Keep a finished file (e.g. an Excel report) for download from any session."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, os.path.basename(file_name))
+        with open(path, "wb") as f:
+            f.write(data)
+        conn = _connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_artifacts (job_id, file_name, path, mime, size) VALUES (?, ?, ?, ?, ?)",
+                (self.job_id, os.path.basename(file_name), path, mime, len(data)),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return path
+
+
+def _run_job(job_id, func, args, kwargs):
+    _update_job(job_id, status=RUNNING, started_at=_now())
+    context = JobContext(job_id)
+    try:
+        result = func(context, *args, **kwargs)
+        if result is not None:
+            os.makedirs(context.directory, exist_ok=True)
+            with open(os.path.join(context.directory, "result.pkl"), "wb") as f:
+                pickle.dump(result, f)
+        _update_job(job_id, status=DONE, progress=1.0, finished_at=_now())
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+        _update_job(job_id, status=FAILED, error=f"{e}\n{traceback.format_exc()}", finished_at=_now())
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            init_job_store()
+            # Jobs left running by a previous server process will never finish
+            conn = _connect()
+            try:
+                conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status IN (?, ?)",
+                             (FAILED, "Interrupted by a server restart", _now(), *ACTIVE_STATUSES))
+                conn.commit()
+            finally:
+                conn.close()
+            purge_old_jobs()
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="job")
+        return _executor
+
+def submit_job(kind, label, func, *args, owner=None, **kwargs):
+    """
+    Queue func(context, *args, **kwargs) on the background pool.
+
+    Args:
+        kind (str): Job type, used by pages to list their own jobs (e.g. 'compilation')
+        label (str): Human-readable description
+        func (callable): Work to run; gets a JobContext first. Its return value, if any, is
+            pickled and can be read back with job_result
+        owner (str): Submitting session (session_owner()); only that session lists the job
+
+    Returns:
+        str: The new job_id
+    """
+    executor = _get_executor()
+    job_id = uuid.uuid4().hex
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (job_id, kind, label, owner, status, submitted_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, label, owner, QUEUED, _now()),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    executor.submit(_run_job, job_id, func, args, kwargs)
+    logger.info(f"Queued {kind} job {job_id}: {label}")
+    return job_id
+
+def get_job(job_id):
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+def session_owner():
+    """The owner id for jobs submitted from the current Streamlit session."""
+    return session_store().session_id
+
+def list_jobs(kind=None, limit=50, owner=None):
+    """Most recent jobs first, optionally of one kind and/or submitted by one owner."""
+    query = "SELECT * FROM jobs"
+    conditions = []
+    params = []
+    if kind:
+        conditions.append("kind = ?")
+        params.append(kind)
+    if owner:
+        conditions.append("owner = ?")
+        params.append(owner)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY submitted_at DESC, rowid DESC LIMIT ?"
+    params.append(limit)
+    conn = _connect()
+    try:
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+    finally:
+        conn.close()
+
+def wait_for_job(job_id, timeout=None, poll=0.1):
+    """Block until a job has finished (for scripts and tests); returns its final row."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        job = get_job(job_id)
+        if job["status"] not in ACTIVE_STATUSES:
+            return job
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"Job {job_id} still {job['status']} after {timeout}s")
+        time.sleep(poll)
+
+def job_artifacts(job_id):
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT * FROM job_artifacts WHERE job_id = ? ORDER BY file_name", (job_id,)).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+def job_result(job_id):
+    """The pickled return value of a finished job, or None."""
+    path = os.path.join(ARTIFACT_DIR, job_id, "result.pkl")
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def purge_old_jobs(days=ARTIFACT_RETENTION_DAYS):
+    """Delete finished jobs and their artifacts older than the retention period."""
+    cutoff = (datetime.now() - timedelta(days=days)).isoformat(timespec="seconds")
+    conn = _connect()
+    try:
+        old = [row["job_id"] for row in conn.execute(
+            "SELECT job_id FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff))]
+        for job_id in old:
+            shutil.rmtree(os.path.join(ARTIFACT_DIR, job_id), ignore_errors=True)
+            conn.execute("DELETE FROM job_artifacts WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        conn.commit()
+    finally:
+        conn.close()
+    return len(old)
+
+def _render_job(job, key_prefix):
+    icon = {QUEUED: "⏳", RUNNING: "🔄", DONE: "✅", FAILED: "❌"}[job["status"]]
+    st.write(f"{icon} **{job['label']}** — {job['status']} (submitted {job['submitted_at']})")
+    if job["status"] in ACTIVE_STATUSES:
+        st.progress(job["progress"], text=job["message"] or None)
+    elif job["status"] == FAILED:
+        st.error((job["error"] or "").splitlines()[0] if job["error"] else "Failed")
+    else:
+        if job["message"]:
+            st.caption(job["message"])
+        for artifact in job_artifacts(job["job_id"]):
+            with open(artifact["path"], "rb") as f:
+                st.download_button(
+                    label=f"📥 {artifact['file_name']}",
+                    data=f.read(),
+                    file_name=artifact["file_name"],
+                    mime=artifact["mime"],
+                    key=f"{key_prefix}_{job['job_id']}_{artifact['file_name']}",
+                )
+
+def render_job_panel(kind=None, title="Background Jobs", limit=10, owner=None):
+    """
+    List the current session's recent jobs. Queued and running jobs are redrawn every few seconds
+    in a fragment, without rerunning the rest of the page; finished jobs and their download buttons
+    are drawn outside it, so polling never re-reads their artifacts. When a polled job finishes the
+    whole page reruns to show its downloads.
+    """
+    _get_executor()
+    owner = owner or session_owner()
+    jobs = list_jobs(kind, limit, owner)
+    if not jobs:
+        return
+    st.subheader(title)
+    key_prefix = f"job_{kind or 'all'}"
+    active_ids = [job["job_id"] for job in jobs if job["status"] in ACTIVE_STATUSES]
+
+    @st.fragment(run_every=POLL_SECONDS)
+    def _active_jobs():
+        current = [get_job(job_id) for job_id in active_ids]
+        if any(job is None or job["status"] not in ACTIVE_STATUSES for job in current):
+            st.rerun()
+        for job in current:
+            _render_job(job, key_prefix)
+
+    if active_ids:
+        _active_jobs()
+    for job in jobs:
+        if job["status"] not in ACTIVE_STATUSES:
+            _render_job(job, key_prefix)
+
+def render_jobs_page():
+    st.header("Background Jobs")
+    st.markdown("Jobs queued from any page in this session. Finished files stay available for download "
+                f"for {ARTIFACT_RETENTION_DAYS} days.")
+    render_job_panel(title="Recent Jobs", limit=50)
@@ -0,0 +1,231 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Application logging off the request thread. Callers only put records on a queue (QueueHandler);
+# a QueueListener thread formats them and writes the console and a rotating log file. File records
+# are JSON lines carrying any context passed as extra= (page, table, load_id, elapsed, ...).
+# Repeated warnings that differ only in their numbers (per-row upload failures) are let through a
+# few times per window, then counted and written as one summary record per message pattern. Info
+# records (audit lines such as load timings) are only aggregated when they ask for it.
+# Rotating file handlers are not safe across processes, so each process writes its own file: the
+# Streamlit server LOG_FILE, a script run from this folder (the watch_ingest daemon) <script>.log
+# next to it, and pool worker processes no file at all, only the console.
+load_dotenv('secrets.env')
+
+LOG_FILE = os.getenv("LOG_FILE", "claims_reconciler.log")
+LOG_FILE_ENABLED = os.getenv("LOG_FILE_ENABLED", "true").lower() in ("true", "1", "yes")
+# "size" rotates at LOG_MAX_BYTES; "time" rotates at midnight
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+# Per message pattern: the first RATE_LIMIT_BURST records in each RATE_LIMIT_WINDOW seconds are kept
+RATE_LIMIT_BURST = 5
+RATE_LIMIT_WINDOW = 60.0
+# Records at this level are aggregated by pattern; lower levels only with an explicit
+# extra={"aggregate": key}, and errors are always written in full
+RATE_LIMIT_LEVEL = logging.WARNING
+
+# LogRecord attributes that are not caller context
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+_DIGITS = re.compile(r"\d+")
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, caller context and any exception."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items()
+                      if key not in _RECORD_ATTRS and not key.startswith("_")})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class AggregatingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that rate-limits repeated RATE_LIMIT_LEVEL messages, and lower-level ones that carry
+    an extra={"aggregate": key}. Records match when their text is the same after digits are masked,
+    or when they share an aggregate key.
+
+    Args:
+        log_queue (queue.Queue): Queue drained by the QueueListener
+        burst (int): Records of one pattern kept per window
+        window (float): Seconds
+    """
+
+    def __init__(self, log_queue, burst=RATE_LIMIT_BURST, window=RATE_LIMIT_WINDOW):
+        super().__init__(log_queue)
+        self.burst = burst
+        self.window = window
+        self._patterns = {}  # key -> [window start, seen in window, suppressed, last suppressed record]
+        self._patterns_lock = threading.Lock()
+
+    def prepare(self, record):
+        # Like QueueHandler.prepare, but the traceback travels as exc_text instead of being folded into msg
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def _key(self, record):
+        key = getattr(record, "aggregate", None) or _DIGITS.sub("#", str(record.msg))
+        return record.name, record.levelno, key
+
+    def _aggregates(self, record):
+        if record.levelno > RATE_LIMIT_LEVEL:
+            return False
+        return record.levelno == RATE_LIMIT_LEVEL or getattr(record, "aggregate", None) is not None
+
+    def emit(self, record):
+        if not self._aggregates(record):
+            super().emit(record)
+            return
+        key = self._key(record)
+        now = time.monotonic()
+        with self._patterns_lock:
+            state = self._patterns.get(key)
+            if state is None or now - state[0] >= self.window:
+                summary = self._summary(key, state)
+                self._patterns[key] = state = [now, 0, 0, None]
+            else:
+                summary = None
+            state[1] += 1
+            if state[1] > self.burst:
+                state[2] += 1
+                state[3] = record
+                return
+        if summary is not None:
+            super().emit(summary)
+        super().emit(record)
+
+    def _summary(self, key, state):
+        if not state or not state[2]:
+            return None
+        last = state[3]
+        summary = logging.LogRecord(last.name, last.levelno, last.pathname, last.lineno,
+                                    "Suppressed %d similar messages in %.0fs; last: %s",
+                                    (state[2], time.monotonic() - state[0], last.getMessage()), None)
+        summary.suppressed = state[2]
+        summary.pattern = key[2]
+        summary.__dict__.update({k: v for k, v in vars(last).items() if k not in _RECORD_ATTRS})
+        return summary
+
+    def flush(self):
+        """Write the summary of every pattern with suppressed records now, rather than at its next record."""
+        with self._patterns_lock:
+            summaries = [self._summary(key, state) for key, state in self._patterns.items()]
+            self._patterns.clear()
+        for summary in summaries:
+            if summary is not None:
+                super().emit(summary)
+
+
+class _ConsoleHandler(logging.StreamHandler):
+    """StreamHandler on whatever sys.stderr is when a record is written (it is replaced under test runners)."""
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def process_log_file():
+    """This process's log file: LOG_FILE, or <script>.log beside it when a script here is __main__."""
+    main_file = getattr(sys.modules.get("__main__"), "__file__", None)
+    if main_file and os.path.dirname(os.path.abspath(main_file)) == os.path.dirname(os.path.abspath(__file__)):
+        return os.path.join(os.path.dirname(LOG_FILE), f"{os.path.splitext(os.path.basename(main_file))[0]}.log")
+    return LOG_FILE
+
+def _file_handler():
+    log_file = process_log_file()
+    if LOG_ROTATION == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(log_file, when="midnight", backupCount=LOG_BACKUP_COUNT,
+                                                            encoding="utf-8", delay=True)
+    else:
+        handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                                       encoding="utf-8", delay=True)
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+def configure_logging(level=logging.INFO):
+    """
+    Route the root logger through a queue to a console handler and (unless LOG_FILE_ENABLED is off,
+    or this is a pool worker process) a rotating JSON file. Safe to call more than once; only the
+    first call sets anything up.
+
+    Returns:
+        AggregatingQueueHandler: The handler attached to the root logger
+    """
+    global _listener
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, AggregatingQueueHandler):
+            return handler
+
+    console = _ConsoleHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [console]
+    if LOG_FILE_ENABLED and multiprocessing.parent_process() is None:
+        try:
+            handlers.append(_file_handler())
+        except OSError as e:
+            console.handle(logging.makeLogRecord({"msg": f"Log file {process_log_file()} unavailable: {e}",
+                                                  "levelno": logging.WARNING, "levelname": "WARNING"}))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = AggregatingQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    def shutdown():
+        queue_handler.flush()
+        _listener.stop()
+    atexit.register(shutdown)
+    return queue_handler
+
+def flush_log_summaries():
+    """Write pending suppressed-message summaries, e.g. at the end of a load."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, AggregatingQueueHandler):
+            handler.flush()
+
+@contextmanager
+def log_timing(logger, message, **context):
+    """Log message once the block finishes, with its elapsed seconds and context as structured fields."""
+    started = time.perf_counter()
+    try:
+        yield context
+    finally:
+        elapsed = round(time.perf_counter() - started, 3)
+        logger.info(f"{message} in {elapsed:.2f}s", extra={**context, "elapsed": elapsed})
@@ -0,0 +1,275 @@
+import io
+import os
+import re
+import pandas as pd
+import streamlit as st
+from config import logger
+from amounts import to_kobo, from_kobo
+from utils import extract_schedule_data
+from prefetch import prefetch_workbook, workbook_sheets
+from file_readers import UPLOAD_TYPES
+from session_manager import get_available_sessions, get_session_data
+from session_store import session_store
+from upload_handle import spool_upload
+from exports import cached_exports, render_export_buttons
+from reconciliation_view import SCHEDULE_COLUMNS, CLAIMS_AMOUNT_COLUMNS, FINANCE_AMOUNT_COLUMNS
+from history_store import MATCHED, AMOUNT_MISMATCH, MISSING_IN_FINANCE, MISSING_IN_CLAIMS
+
+# Several weeks reconciled together (e.g. for month-end close). Claims and finance rows from every
+# period are stacked with a Period tag and summed per (period, schedule, side) in one groupby; the
+# cumulative view and the cross-period timing checks are derived from that single table. The page
+# keeps the latest run (result, Excel and exports) keyed by its inputs' digests and period labels.
+SETTLED_LATER = "Settled in Later Period"
+TIMING_DIFFERENCE = "Timing Difference"
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+_RUN_KEY = "_multi_period_run"
+
+
+def _stack(claims_data, finance_data, periods):
+    frames = []
+    for side, data in (("claims", claims_data), ("finance", finance_data)):
+        frames.append(pd.DataFrame({
+            "Period": data["Period"].astype(str).values,
+            "Schedule Number": data["Schedule Number"].astype(str).values,
+            "side": side,
+            "kobo": to_kobo(data["Amount"]).values,
+        }))
+    stacked = pd.concat(frames, ignore_index=True)
+    order = periods or sorted(stacked["Period"].unique())
+    unknown = set(stacked["Period"]) - set(order)
+    if unknown:
+        raise ValueError(f"Rows tagged with periods not in the period list: {sorted(unknown)}")
+    stacked["Period"] = pd.Categorical(stacked["Period"], categories=order, ordered=True)
+    return stacked
+
+def multi_period_reconciliation(claims_data, finance_data, periods=None):
+    """
+    Reconcile several periods at once.
+
+    Args:
+        claims_data (pandas.DataFrame): Schedule Number, Amount and Period rows from every claims extract
+        finance_data (pandas.DataFrame): The same for finance
+        periods (list): Period labels in chronological order; defaults to the sorted labels
+
+    Returns:
+        dict: per_period (one row per period and schedule, with Status), cumulative (one row per
+        schedule over all periods, with first periods, Lag (periods) and Status) and summary
+        (schedules per period and status, with totals)
+    """
+    stacked = _stack(claims_data, finance_data, periods)
+    grouped = (stacked.groupby(["Period", "Schedule Number", "side"], observed=True)["kobo"]
+               .agg(["sum", "count"]).unstack("side"))
+    sums = grouped["sum"].reindex(columns=["claims", "finance"])
+    present = grouped["count"].reindex(columns=["claims", "finance"]).fillna(0) > 0
+
+    per_period = pd.DataFrame({
+        "claims_kobo": sums["claims"].where(present["claims"]).astype("Int64"),
+        "finance_kobo": sums["finance"].where(present["finance"]).astype("Int64"),
+    }).reset_index()
+    per_period["rank"] = per_period["Period"].cat.codes
+
+    in_claims, in_finance = per_period["claims_kobo"].notna(), per_period["finance_kobo"].notna()
+
+    # First and last period each side of a schedule appears in
+    schedule = per_period.groupby("Schedule Number")
+    first_claims = per_period["rank"].where(in_claims).groupby(per_period["Schedule Number"]).transform("min")
+    first_finance = per_period["rank"].where(in_finance).groupby(per_period["Schedule Number"]).transform("min")
+    last_finance = per_period["rank"].where(in_finance).groupby(per_period["Schedule Number"]).transform("max")
+    status = pd.Series(MATCHED, index=per_period.index)
+    status[in_claims & in_finance & (per_period["claims_kobo"] != per_period["finance_kobo"])] = AMOUNT_MISMATCH
+    status[in_claims & ~in_finance] = MISSING_IN_FINANCE
+    status[in_claims & ~in_finance & (last_finance > per_period["rank"])] = SETTLED_LATER
+    status[~in_claims & in_finance] = MISSING_IN_CLAIMS
+    per_period["Status"] = status
+
+    totals = schedule[["claims_kobo", "finance_kobo"]].sum(min_count=1)
+    cumulative = pd.DataFrame({
+        "claims_kobo": totals["claims_kobo"],
+        "finance_kobo": totals["finance_kobo"],
+        "first_claims": first_claims.groupby(per_period["Schedule Number"]).first(),
+        "first_finance": first_finance.groupby(per_period["Schedule Number"]).first(),
+    })
+    both = cumulative["claims_kobo"].notna() & cumulative["finance_kobo"].notna()
+    cumulative_status = pd.Series(MATCHED, index=cumulative.index)
+    cumulative_status[both & (cumulative["first_claims"] != cumulative["first_finance"])] = TIMING_DIFFERENCE
+    cumulative_status[both & (cumulative["claims_kobo"] != cumulative["finance_kobo"])] = AMOUNT_MISMATCH
+    cumulative_status[cumulative["finance_kobo"].isna()] = MISSING_IN_FINANCE
+    cumulative_status[cumulative["claims_kobo"].isna()] = MISSING_IN_CLAIMS
+    categories = per_period["Period"].cat.categories
+    period_name = lambda ranks: ranks.map(lambda r: categories[int(r)] if pd.notna(r) else None)
+    cumulative = pd.DataFrame({
+        "Schedule Number": cumulative.index,
+        "First Claims Period": period_name(cumulative["first_claims"]).values,
+        "First Finance Period": period_name(cumulative["first_finance"]).values,
+        "Lag (periods)": (cumulative["first_finance"] - cumulative["first_claims"]).astype("Int64").values,
+        "Claims Amount": from_kobo(cumulative["claims_kobo"]).values,
+        "Finance Amount": from_kobo(cumulative["finance_kobo"]).values,
+        "Difference": from_kobo(cumulative["claims_kobo"] - cumulative["finance_kobo"]).values,
+        "Status": cumulative_status.values,
+    }).reset_index(drop=True)
+
+    summary = (per_period.assign(claims=per_period["claims_kobo"].fillna(0), finance=per_period["finance_kobo"].fillna(0))
+               .groupby(["Period", "Status"], observed=True)
+               .agg(Schedules=("Schedule Number", "size"), claims=("claims", "sum"), finance=("finance", "sum"))
+               .reset_index())
+    summary["Claims Amount"] = from_kobo(summary.pop("claims")).values
+    summary["Finance Amount"] = from_kobo(summary.pop("finance")).values
+    summary["Period"] = summary["Period"].astype(str)
+
+    per_period = pd.DataFrame({
+        "Period": per_period["Period"].astype(str),
+        "Schedule Number": per_period["Schedule Number"],
+        "Claims Amount": from_kobo(per_period["claims_kobo"]).values,
+        "Finance Amount": from_kobo(per_period["finance_kobo"]).values,
+        "Difference": from_kobo(per_period["claims_kobo"] - per_period["finance_kobo"]).values,
+        "Status": per_period["Status"],
+    })
+    return {"per_period": per_period, "cumulative": cumulative, "summary": summary}
+
+def _first_present(columns, candidates):
+    return next((c for c in candidates if c in columns), None)
+
+def period_extract(sheets, amount_candidates, period, sheet_name=None, schedule_col=None, amount_col=None):
+    """
+    Schedule Number, Amount and Period rows from one parsed workbook. Without a sheet name, the
+    first sheet having a known schedule and amount column is used.
+    """
+    names = [sheet_name] if sheet_name else list(sheets)
+    for name in names:
+        df = sheets[name]
+        schedule = schedule_col or _first_present(df.columns, SCHEDULE_COLUMNS)
+        amount = amount_col or _first_present(df.columns, amount_candidates)
+        if schedule in df.columns and amount in df.columns:
+            extract = extract_schedule_data(df, schedule, amount)
+            extract["Period"] = period
+            return extract
+    raise ValueError(f"No sheet with a schedule and amount column found for period {period}")
+
+def period_from_filename(name):
+    """A week label like '2024-W05' or 'W05' from a file name, else the file name without extension."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    match = re.search(r"(\d{4})[-_ ]?W(?:EEK)?[-_ ]?(\d{1,2})", stem, re.IGNORECASE)
+    if match:
+        return f"{match.group(1)}-W{int(match.group(2)):02d}"
+    match = re.search(r"W(?:EEK)?[-_ ]?(\d{1,2})\b", stem, re.IGNORECASE)
+    return f"W{int(match.group(1)):02d}" if match else stem
+
+def _load_sessions(session_ids):
+    """Claims and finance extracts of saved sessions, and (session, department, digest, choices) per upload."""
+    claims, finance, sources = [], [], []
+    for session_id in session_ids:
+        session = get_session_data(session_id)
+        for department, extracts, candidates in (("claims", claims, CLAIMS_AMOUNT_COLUMNS),
+                                                 ("finance", finance, FINANCE_AMOUNT_COLUMNS)):
+            upload = session.get(department)
+            if upload is None:
+                continue
+            handle = spool_upload(upload["file_data"])
+            try:
+                sheets = workbook_sheets(handle)
+            except FileNotFoundError:
+                name = getattr(upload["file_data"], "name", "workbook")
+                raise ValueError(f"Session {session_id}: the {department} workbook '{name}' is no longer on disk. "
+                                 f"Upload it again for that week, or leave the session out.")
+            extracts.append(period_extract(sheets, candidates, session_id,
+                                           upload["sheet_name"], upload["schedule_col"], upload["amount_col"]))
+            sources.append((session_id, department, handle.digest,
+                            upload["sheet_name"], upload["schedule_col"], upload["amount_col"]))
+    return claims, finance, sources
+
+def _load_files(files, candidates, key):
+    """Extracts of uploaded files, each with a period label input, and (digest, period) per file."""
+    extracts, sources = [], []
+    handles = [spool_upload(f) for f in files]
+    for handle in handles:
+        prefetch_workbook(handle)
+    for i, (f, handle) in enumerate(zip(files, handles)):
+        period = st.text_input(f"Period for {f.name}", value=period_from_filename(f.name), key=f"{key}_{i}_{f.name}")
+        extracts.append(period_extract(workbook_sheets(handle), candidates, period))
+        sources.append((handle.digest, period))
+    return extracts, sources
+
+def _export_sheets(result):
+    return {"Cumulative": result["cumulative"], "Per Period": result["per_period"], "Period Summary": result["summary"]}
+
+def multi_period_excel(result):
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        result["cumulative"].to_excel(writer, sheet_name='Cumulative', index=False)
+        result["per_period"].to_excel(writer, sheet_name='Per Period', index=False)
+        result["summary"].to_excel(writer, sheet_name='Period Summary', index=False)
+    output.seek(0)
+    return output.getvalue()
+
+def render_multi_period_page():
+    st.header("Multi-Period Reconciliation")
+    st.markdown("""
+    Reconcile several weeks together, e.g. for month-end close. Schedules advised in one week and
+    recognised by Finance in a later week are reported as timing differences rather than as missing.
+    """)
+
+    mode = st.radio("Load periods from", ["Saved weekly sessions", "Uploaded files"], horizontal=True)
+    try:
+        if mode == "Saved weekly sessions":
+            sessions = get_available_sessions()
+            if not sessions:
+                st.info("No saved sessions yet.")
+                return
+            selected = st.multiselect("Sessions", sessions, default=sessions[:min(5, len(sessions))])
+            periods = sorted(selected)
+            claims, finance, sources = _load_sessions(periods)
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                claims_files = st.file_uploader("Claims files (one per period)", type=UPLOAD_TYPES,
+                                                accept_multiple_files=True, key="multi_period_claims")
+                claims, claims_sources = _load_files(claims_files or [], CLAIMS_AMOUNT_COLUMNS,
+                                                     "multi_period_claims_period")
+            with col2:
+                finance_files = st.file_uploader("Finance files (one per period)", type=UPLOAD_TYPES,
+                                                 accept_multiple_files=True, key="multi_period_finance")
+                finance, finance_sources = _load_files(finance_files or [], FINANCE_AMOUNT_COLUMNS,
+                                                       "multi_period_finance_period")
+            sources = [("claims", *source) for source in claims_sources] + \
+                      [("finance", *source) for source in finance_sources]
+            periods = sorted({e["Period"].iloc[0] for e in claims + finance if not e.empty})
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    if not claims or not finance:
+        st.info("Select at least one claims and one finance period.")
+        return
+
+    name = f"Multi-Period Reconciliation {periods[0]} to {periods[-1]}"
+    run_key = (tuple(sources), tuple(periods))
+    run = session_store().get(_RUN_KEY)
+    if run is None or run[0] != run_key:
+        with st.spinner(f"Reconciling {len(periods)} periods..."):
+            result = multi_period_reconciliation(pd.concat(claims, ignore_index=True),
+                                                 pd.concat(finance, ignore_index=True), periods)
+            exports = {}
+            cached_exports(_export_sheets(result), name, exports)
+            run = (run_key, result, multi_period_excel(result), exports)
+        session_store().put(_RUN_KEY, run)
+        logger.info(f"Multi-period reconciliation over {periods}: {len(result['cumulative'])} schedules")
+    _, result, excel, exports = run
+
+    cumulative = result["cumulative"]
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Schedules", len(cumulative))
+    c2.metric("Timing Differences", int((cumulative["Status"] == TIMING_DIFFERENCE).sum()))
+    c3.metric("Missing in Finance", int((cumulative["Status"] == MISSING_IN_FINANCE).sum()))
+    c4.metric("Amount Mismatches", int((cumulative["Status"] == AMOUNT_MISMATCH).sum()))
+
+    st.subheader("Cumulative")
+    st.dataframe(cumulative, use_container_width=True, hide_index=True)
+    st.subheader("Per Period")
+    st.dataframe(result["summary"].pivot_table(index="Period", columns="Status", values="Schedules", fill_value=0),
+                 use_container_width=True)
+    with st.expander("Per-period schedules"):
+        st.dataframe(result["per_period"], use_container_width=True, hide_index=True)
+
+    st.download_button("📊 Download Excel Report", excel, file_name=f"{name}.xlsx", mime=XLSX_MIME)
+    render_export_buttons(_export_sheets(result), name, "multi_period", cache=exports)
@@ -0,0 +1,99 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import logger
+from chunked_upload import ensure_load_tables, load_stage_name, find_bad_rows, finalize_load
+
+DEFAULT_WORKERS = 4
+PARTITION_BATCH_SIZE = 2000
+
+
+def partition_bounds(total_rows, partitions):
+    """Split range(total_rows) into at most `partitions` contiguous (start, stop) slices."""
+    partitions = max(1, min(partitions, total_rows))
+    size, extra = divmod(total_rows, partitions)
+    bounds = []
+    start = 0
+    for p in range(partitions):
+        stop = start + size + (1 if p < extra else 0)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+def _load_partition(connect, table_name, load_id, partition_no, columns, rows, row_numbers, batch_size):
+    """
+    Insert one partition into the load stage on its own connection and commit it.
+
+    Returns:
+        list: (row_number, error) pairs, empty on success
+    """
+    stage = load_stage_name(table_name)
+    insert_query = (f"INSERT INTO {stage} (load_id, chunk_no, row_no, {', '.join(columns)}) "
+                    f"VALUES ({', '.join(['?'] * (len(columns) + 3))})")
+    params = [(load_id, partition_no, row_no) + tuple(values) for row_no, values in zip(row_numbers, rows)]
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        if hasattr(cursor, "fast_executemany"):
+            cursor.fast_executemany = True
+        try:
+            for start in range(0, len(params), batch_size):
+                cursor.executemany(insert_query, params[start:start + batch_size])
+            conn.commit()
+            return []
+        except Exception as e:
+            conn.rollback()
+            logger.warning(f"Partition {partition_no} of load {load_id} into {table_name} failed: {e}",
+                           extra={"table": table_name, "load_id": load_id, "partition": partition_no})
+            return find_bad_rows(conn, insert_query, params, row_numbers) or [(row_numbers[0], str(e))]
+    finally:
+        conn.close()
+
+def parallel_load(connect, table_name, columns, col_defs, rows, row_numbers, workers=DEFAULT_WORKERS,
+                  batch_size=PARTITION_BATCH_SIZE, on_progress=None):
+    """
+    Load rows into table_name by inserting N partitions concurrently, each on its own connection,
+    then moving the staged rows into the table in one final transaction.
+
+    pyodbc releases the GIL while a statement executes, so partitions overlap their round trips;
+    connect() is cheap because the ODBC driver manager pools connections.
+
+    Args:
+        connect (callable): Returns a new DB-API connection with autocommit off
+        table_name (str): Target table
+        columns (list): Column names for each row tuple
+        col_defs (list): Column definitions, used to create the load stage if needed
+        rows (list): Cleaned row tuples
+        row_numbers (list): Source row number of each row, for error attribution
+        workers (int): Number of partitions / connections
+        on_progress (callable): Called with (partitions_done, total_partitions)
+
+    Returns:
+        tuple: (rows_loaded, failed_rows) — nothing reaches table_name if failed_rows is non-empty
+    """
+    conn = connect()
+    try:
+        ensure_load_tables(conn, table_name, col_defs)
+        conn.commit()
+
+        load_id = uuid.uuid4().hex
+        bounds = partition_bounds(len(rows), workers)
+        failed_rows = []
+        with ThreadPoolExecutor(max_workers=len(bounds), thread_name_prefix=f"upload-{table_name}") as pool:
+            futures = [
+                pool.submit(_load_partition, connect, table_name, load_id, p, columns,
+                            rows[start:stop], row_numbers[start:stop], batch_size)
+                for p, (start, stop) in enumerate(bounds)
+            ]
+            for done, future in enumerate(futures, 1):
+                failed_rows.extend(future.result())
+                if on_progress:
+                    on_progress(done, len(futures))
+
+        stage = load_stage_name(table_name)
+        if failed_rows:
+            conn.cursor().execute(f"DELETE FROM {stage} WHERE load_id = ?", (load_id,))
+            conn.commit()
+            return 0, sorted(failed_rows)
+        return finalize_load(conn, table_name, {"load_id": load_id}, columns), []
+    finally:
+        conn.close()
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from upload_handle import spool_upload
+from file_readers import read_tables
+from session_store import estimate_size
+
+# Uploaded workbooks are parsed on this pool as soon as they arrive, so the parse overlaps with the
+# user choosing sheets and columns. Futures are shared by content hash across reruns and sessions.
+# Finished results are held outside the session store's budgets, so the cache is bounded by the
+# estimated size of its results as well as their number; the oldest go first, the newest always stays.
+PREFETCH_WORKERS = 4
+PREFETCH_CACHE_SIZE = 32
+PREFETCH_MEMORY_BYTES = int(float(os.getenv("PREFETCH_MEMORY_MB", "256")) * 1024 * 1024)
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_futures = OrderedDict()
+_sizes = {}  # key -> estimated bytes of a finished result
+_lock = threading.Lock()
+
+
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def file_bytes(file):
+    """Raw bytes of an UploadedFile, BytesIO or bytes, without moving the caller's read position."""
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    position = file.tell()
+    file.seek(0)
+    data = file.read()
+    file.seek(position)
+    return data
+
+def _evict():
+    # Callers hold _lock
+    while len(_futures) > 1 and (len(_futures) > PREFETCH_CACHE_SIZE or sum(_sizes.values()) > PREFETCH_MEMORY_BYTES):
+        key, _ = _futures.popitem(last=False)
+        _sizes.pop(key, None)
+
+def _run(key, func, args):
+    result = func(*args)
+    size = estimate_size(result)
+    with _lock:
+        if key in _futures:  # not already evicted while it ran
+            _sizes[key] = size
+            _evict()
+    return result
+
+def cached_bytes():
+    """Estimated size of the finished results the prefetch cache holds."""
+    with _lock:
+        return sum(_sizes.values())
+
+def prefetch(key, func, *args):
+    """
+    Start func(*args) on the prefetch pool unless a future for key already exists.
+
+    Returns:
+        concurrent.futures.Future: Shared future for key
+    """
+    with _lock:
+        future = _futures.get(key)
+        if future is not None:
+            _futures.move_to_end(key)
+            return future
+        future = _executor.submit(_run, key, func, args)
+        _futures[key] = future
+        _evict()
+        return future
+
+def prefetch_workbook(file):
+    """Begin parsing every sheet of a workbook, CSV or Parquet file (spooled to disk first) in the background."""
+    handle = spool_upload(file)
+    return prefetch(("workbook", handle.digest), read_tables, handle)
+
+def workbook_sheets(file):
+    """
+    Wait for (or start) the parse of a workbook.
+
+    Returns:
+        dict: {sheet_name: DataFrame} (one entry for CSV/Parquet), shared with other callers — copy a
+            sheet before modifying it
+    """
+    return prefetch_workbook(file).result()
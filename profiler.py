@@ -0,0 +1,261 @@
+import html
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from config import logger
+
+# Sampling profiler for one script rerun, armed from the sidebar. A background thread snapshots the
+# script thread's stack every SAMPLE_INTERVAL seconds until the run finishes, so nothing is hooked
+# into the interpreter and an unarmed rerun pays only a session_state lookup. A fragment rerun does
+# not run the sidebar, so each fragment checks the armed flag itself and is then profiled alone.
+PROFILE_DIR = "profiles"
+SAMPLE_INTERVAL = 0.005
+PROFILES_KEPT = 50
+TOP_N = 25
+
+_ARMED_KEY = "_profiler_armed"
+_ARMING_RUN_KEY = "_profiler_arming_run"
+_TOGGLE_KEY = "_profiler_toggle"
+_PAGE_KEY = "_profiler_page"
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler(threading.Thread):
+    """Collects stack samples of one thread, from the script's own frame down, until it leaves the script."""
+
+    def __init__(self, thread_id, script_file, page=None, interval=SAMPLE_INTERVAL):
+        super().__init__(name="profiler", daemon=True)
+        self.thread_id = thread_id
+        self.script_file = script_file
+        self.page = page
+        self.interval = interval
+        self.path = None
+        self.stacks = Counter()
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.duration = 0.0
+
+    def _stack(self):
+        frame = sys._current_frames().get(self.thread_id)
+        labels = []
+        while frame is not None:
+            labels.append(frame.f_code)
+            frame = frame.f_back
+        labels.reverse()
+        # Drop Streamlit's runner frames above the script itself
+        for i, code in enumerate(labels):
+            if code.co_filename == self.script_file:
+                return tuple(_frame_label(c) for c in labels[i:])
+        return None
+
+    def run(self):
+        while True:
+            stack = self._stack()
+            if stack is None:
+                break
+            self.stacks[stack] += 1
+            time.sleep(self.interval)
+        self.duration = time.perf_counter() - self.started
+        if self.page is not None:
+            self.path = save_profile(self.page, self.stacks, self.duration, self.interval, self.started_at)
+            logger.info(f"Profiled '{self.page}' rerun: {self.duration:.2f}s, "
+                        f"{sum(self.stacks.values())} samples -> {self.path}")
+
+
+def hot_functions(stacks, duration=None, top_n=TOP_N):
+    """
+    Rank functions by samples spent in them (self) and under them (total).
+
+    Args:
+        stacks (dict): {tuple of frame labels (root first): sample count}
+        duration (float): Wall time covered, to convert samples to seconds
+
+    Returns:
+        pandas.DataFrame: Function, Self %, Total %, Self (s), Total (s); top_n rows by total
+    """
+    total_samples = sum(stacks.values())
+    if not total_samples:
+        return pd.DataFrame(columns=["Function", "Self %", "Total %", "Self (s)", "Total (s)"])
+    self_counts, total_counts = Counter(), Counter()
+    for stack, count in stacks.items():
+        self_counts[stack[-1]] += count
+        for label in set(stack):
+            total_counts[label] += count
+    seconds_per_sample = (duration or 0) / total_samples
+    rows = [{
+        "Function": label,
+        "Self %": round(100 * self_counts[label] / total_samples, 1),
+        "Total %": round(100 * total / total_samples, 1),
+        "Self (s)": round(self_counts[label] * seconds_per_sample, 3),
+        "Total (s)": round(total * seconds_per_sample, 3),
+    } for label, total in total_counts.items()]
+    return pd.DataFrame(rows).sort_values(["Total %", "Self %"], ascending=False).head(top_n).reset_index(drop=True)
+
+def collapsed_stacks(stacks):
+    """Stacks in the folded 'a;b;c count' format read by flamegraph.pl, speedscope and similar tools."""
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in sorted(stacks.items()))
+
+def _tree(stacks):
+    root = {"name": "all", "value": 0, "children": {}}
+    for stack, count in stacks.items():
+        root["value"] += count
+        node = root
+        for label in stack:
+            node = node["children"].setdefault(label, {"name": label, "value": 0, "children": {}})
+            node["value"] += count
+    return root
+
+def _flame_rows(node, parent_value, total):
+    share = 100 * node["value"] / total
+    if share < 0.1:
+        return ""
+    # Same file, same colour, so a module's frames are easy to pick out
+    hue = 20 + zlib.crc32(node["name"].split(" (")[-1].encode()) % 40
+    children = "".join(_flame_rows(child, node["value"], total)
+                       for child in sorted(node["children"].values(), key=lambda c: -c["value"]))
+    title = html.escape(f"{node['name']} — {node['value']} samples ({share:.1f}%)")
+    return (f'<div class="node" style="flex-basis:{100 * node["value"] / parent_value:.4f}%">'
+            f'<div class="frame" style="background:hsl({hue},85%,62%)" title="{title}">{html.escape(node["name"])}</div>'
+            f'<div class="kids">{children}</div></div>')
+
+def flamegraph_html(stacks, title="Profile"):
+    """
+    A self-contained HTML icicle graph (root at the top); hover a frame for its sample count.
+    """
+    total = sum(stacks.values())
+    tree = _tree(stacks)
+    body = _flame_rows(tree, total, total) if total else "<p>No samples were collected.</p>"
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>
+body {{ font: 12px sans-serif; margin: 12px; }}
+.kids {{ display: flex; width: 100%; }}
+.node {{ display: flex; flex-direction: column; overflow: hidden; flex-shrink: 0; flex-grow: 0; }}
+.frame {{ height: 18px; line-height: 18px; margin: 0 1px 1px 0; padding-left: 3px; white-space: nowrap;
+          overflow: hidden; text-overflow: ellipsis; border-radius: 2px; cursor: default; }}
+</style></head>
+<body><h3>{html.escape(title)}</h3><div class="kids">{body}</div></body></html>"""
+
+def _slug(text):
+    return re.sub(r"[^0-9A-Za-z]+", "_", text).strip("_").lower() or "page"
+
+def save_profile(page, stacks, duration, interval=SAMPLE_INTERVAL, started_at=None):
+    """Write a profile as JSON to PROFILE_DIR, keeping the newest PROFILES_KEPT; returns its path."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    started_at = started_at or datetime.now()
+    path = os.path.join(PROFILE_DIR, f"{started_at.strftime('%Y%m%d_%H%M%S_%f')}_{_slug(page)}.json")
+    with open(path, "w") as f:
+        json.dump({
+            "page": page,
+            "captured_at": started_at.isoformat(timespec="seconds"),
+            "duration": duration,
+            "interval": interval,
+            "stacks": [[list(stack), count] for stack, count in stacks.items()],
+        }, f)
+    for old in list_profiles()[PROFILES_KEPT:]:
+        os.remove(old)
+    return path
+
+def load_profile(path):
+    with open(path) as f:
+        profile = json.load(f)
+    profile["stacks"] = {tuple(stack): count for stack, count in profile["stacks"]}
+    return profile
+
+def list_profiles():
+    """Saved profile paths, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted((os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR) if name.endswith(".json")),
+                  reverse=True)
+
+def profile_run(page, script_file=None, thread_id=None):
+    """
+    Sample the current script run in the background and save the profile when it finishes.
+
+    Returns:
+        _Sampler: The running sampler (join() it to wait for the profile to be saved)
+    """
+    script_file = script_file or sys._getframe(1).f_code.co_filename
+    sampler = _Sampler(thread_id or threading.get_ident(), script_file, page)
+    sampler.start()
+    return sampler
+
+def _arm():
+    if st.session_state.get(_TOGGLE_KEY):
+        st.session_state[_ARMED_KEY] = True
+        st.session_state[_ARMING_RUN_KEY] = True
+    else:
+        st.session_state[_ARMED_KEY] = False
+
+def _take_armed():
+    """True, once, on the first run after the one that armed the profiler."""
+    if not st.session_state.get(_ARMED_KEY):
+        return False
+    if st.session_state.pop(_ARMING_RUN_KEY, False):
+        return False  # the rerun caused by flipping the toggle itself is not the one of interest
+    st.session_state[_ARMED_KEY] = False
+    st.session_state[_TOGGLE_KEY] = False
+    return True
+
+def render_profiler(page):
+    """
+    Sidebar profiler controls. Call once per rerun, before the page renders: if profiling was armed
+    on an earlier rerun, this rerun is sampled and the toggle switches itself off.
+    """
+    st.session_state[_PAGE_KEY] = page
+    if _take_armed():
+        profile_run(page, script_file=sys._getframe(1).f_code.co_filename)
+        st.toast(f"Profiling this run of {page}…")
+
+    with st.sidebar.expander("⏱️ Profiler"):
+        st.toggle("Profile next rerun", key=_TOGGLE_KEY, on_change=_arm,
+                  help="Samples the next interaction on any page, including one that reruns only a "
+                       "section of it; results appear here afterwards")
+        # Saved profiles are only read while the viewer is open, so it costs nothing otherwise
+        if st.toggle("Show captured profiles", key="_profiler_viewer"):
+            _render_profile_viewer()
+
+def profile_fragment():
+    """
+    Call first thing in an st.fragment: when the fragment reruns on its own (so render_profiler did
+    not run) and profiling is armed, the fragment's run is sampled instead of the whole script's.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None or not ctx.fragment_ids_this_run or not _take_armed():
+        return
+    page = st.session_state.get(_PAGE_KEY, "fragment")
+    caller = sys._getframe(1).f_code
+    profile_run(f"{page} ({caller.co_name})", script_file=caller.co_filename)
+    st.toast(f"Profiling this run of {page}…")
+
+def _render_profile_viewer():
+    profiles = list_profiles()
+    if not profiles:
+        st.caption("No profiles captured yet.")
+        return
+    path = st.selectbox("Captured profiles", profiles, format_func=lambda p: os.path.basename(p)[:-5])
+    profile = load_profile(path)
+    st.caption(f"{profile['page']} · {profile['captured_at']} · {profile['duration']:.2f}s · "
+               f"{sum(profile['stacks'].values())} samples")
+    st.dataframe(hot_functions(profile["stacks"], profile["duration"]), hide_index=True)
+    name = os.path.basename(path)[:-5]
+    st.download_button("📥 Flamegraph (HTML)", flamegraph_html(profile["stacks"], f"{profile['page']} {profile['captured_at']}"),
+                       file_name=f"{name}.html", mime="text/html")
+    st.download_button("📥 Folded stacks", collapsed_stacks(profile["stacks"]),
+                       file_name=f"{name}.folded", mime="text/plain")
+    with open(path, "rb") as f:
+        st.download_button("📥 Raw profile (JSON)", f.read(), file_name=os.path.basename(path),
+                           mime="application/json")
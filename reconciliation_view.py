@@ -0,0 +1,294 @@
+import hashlib
+import io
+from functools import cached_property
+import pandas as pd
+import plotly.express as px
+from openpyxl.styles import Font
+from openpyxl.utils.dataframe import dataframe_to_rows
+from amounts import amounts_differ, amounts_match, total_amount
+from utils import extract_schedule_data, find_missing_schedules, calculate_schedule_amounts, generate_reconciliation_report
+from variance_explainer import explain_variances
+from session_store import estimate_size
+
+# Everything the Claims Reconciliation page shows after "Process Reconciliation", derived from one
+# set of inputs: the two uploads (by content digest) and the sheets and columns chosen for them.
+# A view is built once per distinct set of inputs and kept in the session store; each table, figure
+# and download is computed on first use and reused by every later rerun, so re-rendering one part
+# of the page (a chart selection, an email button) never recomputes the others.
+SCHEDULE_COLUMNS = ["SCH NO", "Claim Batch No/Sch No", "Schedule No", "Schedule Number", "SCH_NO"]
+CLAIMS_AMOUNT_COLUMNS = ["HOD RECOMMD. AMOUNT", "HOD AMOUNT", "RECOMMENDED AMOUNT", "AMOUNT", "AMOUNT PAID"]
+FINANCE_AMOUNT_COLUMNS = ["Claims_Advised_Amount", "Advised_Amount", "Claim Amount", "AMOUNT"]
+
+ENCOUNTER_DATE_COLUMNS = ['ENCOUNTER DATE (DD/MM/YYYY)', 'ENCOUNTER_DATE_DD_MM_YYYY', 'ENCOUNTER_DATE', 'Encounter Date',
+                          'Encounter_Date', 'ENC_DATE']
+CLAIM_RECEIVED_COLUMNS = ['DATE CLAIM RECEIVED ', 'DATE_CLAIM_RECEIVED', 'Date Claim Received', 'Date_Claim_Received',
+                          'CLAIM_RECEIVED_DATE']
+
+# Selection fields, in the order they enter the view key
+SELECTION_FIELDS = ["claims_sheet", "finance_sheet", "claims_schedule_col", "claims_amount_col",
+                    "finance_schedule_col", "finance_amount_col"]
+
+
+def detect_column(df, candidates):
+    """First of candidates present in df, or None."""
+    return next((col for col in candidates if col in df.columns), None)
+
+def view_key(claims_file, finance_file, selection):
+    """
+    Hash of everything a reconciliation depends on.
+
+    Args:
+        claims_file, finance_file (UploadHandle): Spooled uploads
+        selection (dict): SELECTION_FIELDS -> chosen sheet or column
+
+    Returns:
+        str: Hex digest; equal keys give equal views
+    """
+    parts = [claims_file.digest, finance_file.digest] + [str(selection.get(field)) for field in SELECTION_FIELDS]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def date_validation_errors(claims_df, schedule_col):
+    """Claim rows whose encounter date is after the date the claim was received."""
+    errors = []
+    encounter_date_col = detect_column(claims_df, ENCOUNTER_DATE_COLUMNS)
+    claim_received_col = detect_column(claims_df, CLAIM_RECEIVED_COLUMNS)
+    if not encounter_date_col or not claim_received_col:
+        return errors
+    for _, row in claims_df.iterrows():
+        try:
+            encounter_date = pd.to_datetime(row[encounter_date_col], errors='coerce')
+            claim_received_date = pd.to_datetime(row[claim_received_col], errors='coerce')
+            if pd.notna(encounter_date) and pd.notna(claim_received_date) and encounter_date > claim_received_date:
+                errors.append({
+                    'schedule': str(row[schedule_col]) if schedule_col in row else "Unknown",
+                    'encounter_date': encounter_date.strftime('%d/%m/%Y'),
+                    'claim_received_date': claim_received_date.strftime('%d/%m/%Y'),
+                })
+        except Exception:
+            # Skip rows with invalid date formats
+            continue
+    return errors
+
+def _highlight_diff(row):
+    if pd.isna(row['Claims Amount']) or pd.isna(row['Finance Amount']):
+        return ['background-color: yellow'] * len(row)
+    elif row['Difference'] != 0:
+        return ['background-color: lightcoral'] * len(row)
+    return [''] * len(row)
+
+
+class ReconciliationView:
+    """
+    One reconciliation of a Claims sheet against a Finance sheet, with its derived tables, figures
+    and report files computed on first use.
+
+    Args:
+        key (str): view_key of the inputs
+        selection (dict): Sheets and columns the extracts were taken from
+        claims_data, finance_data (pandas.DataFrame): extract_schedule_data output for each side
+        variance_explanations (pandas.DataFrame): explain_variances output, if already computed
+    """
+
+    def __init__(self, key, selection, claims_data, finance_data, variance_explanations=None):
+        self.key = key
+        self.selection = dict(selection)
+        self.claims_data = claims_data
+        self.finance_data = finance_data
+        self.created = pd.Timestamp.now()
+        self.exports = {}  # render_export_buttons cache
+        if variance_explanations is not None:
+            self.variance_explanations = variance_explanations
+
+    def __sizeof__(self):
+        # Extracts, derived tables and report bytes, so the session store budgets the view by its contents
+        return object.__sizeof__(self) + estimate_size(vars(self))
+
+    @classmethod
+    def build(cls, key, selection, claims_df, finance_df):
+        """Extract both sides of the reconciliation from the chosen sheets."""
+        return cls(key, selection,
+                   extract_schedule_data(claims_df, selection["claims_schedule_col"], selection["claims_amount_col"]),
+                   extract_schedule_data(finance_df, selection["finance_schedule_col"], selection["finance_amount_col"]))
+
+    @cached_property
+    def claims_amounts(self):
+        return calculate_schedule_amounts(self.claims_data)
+
+    @cached_property
+    def finance_amounts(self):
+        return calculate_schedule_amounts(self.finance_data)
+
+    @cached_property
+    def report(self):
+        return generate_reconciliation_report(self.claims_amounts, self.finance_amounts)
+
+    @cached_property
+    def missing_in_finance(self):
+        return find_missing_schedules(self.claims_data, self.finance_data)
+
+    @cached_property
+    def missing_in_claims(self):
+        return find_missing_schedules(self.finance_data, self.claims_data)
+
+    @cached_property
+    def variance_explanations(self):
+        return explain_variances(self.report, self.claims_data)
+
+    @cached_property
+    def suggested_lines(self):
+        explanations = self.variance_explanations
+        return dict(zip(explanations["Schedule Number"], explanations["Suggested Lines"]))
+
+    @cached_property
+    def amount_mismatch(self):
+        """Schedules in both reports whose amounts differ, with their suggested claim lines."""
+        report = self.report
+        mismatch = report[amounts_differ(report['Claims Amount'], report['Finance Amount'])]
+        return mismatch.merge(self.variance_explanations[["Schedule Number", "Suggested Lines", "Explanation"]],
+                              on="Schedule Number", how="left")
+
+    @property
+    def styled_report(self):
+        # Not cached: a Styler cannot be pickled when the session store spills the view to disk
+        return self.report.style.apply(_highlight_diff, axis=1)
+
+    @cached_property
+    def summary(self):
+        """Schedule counts and amounts shown in the metrics and the summary section."""
+        report = self.report
+        total_claims_schedules = len(self.claims_amounts)
+        matching_schedules = int(amounts_match(report['Claims Amount'], report['Finance Amount']).sum())
+        total_claims_amount = total_amount(self.claims_amounts["Amount"])
+        matching_finance_amount = total_amount(report.dropna(subset=['Claims Amount', 'Finance Amount'])['Finance Amount'])
+        total_variance = round(total_claims_amount - matching_finance_amount, 2)
+        return {
+            "total_claims_schedules": total_claims_schedules,
+            "matching_schedules": matching_schedules,
+            "discrepancies": total_claims_schedules - matching_schedules,
+            "total_claims_amount": total_claims_amount,
+            "matching_finance_amount": matching_finance_amount,
+            "total_variance": total_variance,
+            "variance_percent": total_variance / total_claims_amount * 100 if total_claims_amount else 0,
+            "missing_amount": total_amount(self.missing_in_finance["Amount"]),
+        }
+
+    @cached_property
+    def scatter_figure(self):
+        """Claims against Finance amount per schedule present in both, or None if there are none."""
+        vis_data = self.report.dropna()
+        if vis_data.empty:
+            return None
+        fig = px.scatter(
+            vis_data,
+            x="Claims Amount",
+            y="Finance Amount",
+            hover_data=["Schedule Number"],
+            custom_data=["Schedule Number"],
+            labels={
+                "Claims Amount": "Amount Sent by Claims",
+                "Finance Amount": "Amount Received by Finance"
+            },
+            title="Claims vs Finance Amounts"
+        )
+        # Diagonal of perfect matches
+        max_val = max(vis_data["Claims Amount"].max(), vis_data["Finance Amount"].max())
+        fig.add_scatter(x=[0, max_val], y=[0, max_val], mode='lines', line=dict(color='green', dash='dash'),
+                        name="Perfect Match")
+        return fig
+
+    @cached_property
+    def mismatch_figure(self):
+        if self.amount_mismatch.empty:
+            return None
+        melted = pd.melt(
+            self.amount_mismatch.reset_index(),
+            id_vars=["Schedule Number"],
+            value_vars=["Claims Amount", "Finance Amount"],
+            var_name="Department",
+            value_name="Amount"
+        )
+        return px.bar(
+            melted,
+            x="Schedule Number",
+            y="Amount",
+            color="Department",
+            barmode="group",
+            title="Schedules with Amount Discrepancies",
+            labels={"Schedule Number": "Schedule Number", "Amount": "Amount"}
+        )
+
+    @cached_property
+    def summary_figure(self):
+        summary = self.summary
+        values = [summary["matching_schedules"], len(self.missing_in_finance),
+                  summary["discrepancies"] - len(self.missing_in_finance)]
+        values = [max(0, v) for v in values]
+        if sum(values) == 0:
+            return None
+        return px.pie(
+            names=['Matching Amounts', 'Missing in Finance', 'Amount Mismatches'],
+            values=values,
+            title="Distribution of Claims Reconciliation Issues",
+            color_discrete_sequence=px.colors.qualitative.Safe
+        )
+
+    @cached_property
+    def weekly_report(self):
+        """Schedules in both reports in the BI Unit weekly report layout."""
+        common_schedules = set(self.claims_amounts["Schedule Number"]).intersection(
+            set(self.finance_amounts["Schedule Number"]))
+        matching_report = self.report[self.report["Schedule Number"].isin(common_schedules)].copy()
+        now = self.created
+        weekly = pd.DataFrame({
+            "Claim Batch No/Sch No": matching_report["Schedule Number"],
+            "Year": now.year,
+            "Week Period": f"{now.strftime('%d %b')} - {(now + pd.Timedelta(days=6)).strftime('%d %b')}",
+            "Processing Platform": "MANUAL",
+            "Claim Type": "FRESH CLAIM",
+            "Claims_Advised_Amount": matching_report["Claims Amount"],
+            "Finance_Recognized_Amount": matching_report["Finance Amount"],
+            "Variance": matching_report["Difference"].apply(lambda x: f"{x:.2f}" if pd.notnull(x) else ""),
+            "Comments": "",
+            "Status": "",
+        })
+
+        if not self.amount_mismatch.empty:
+            mismatched = weekly["Claim Batch No/Sch No"].isin(self.amount_mismatch["Schedule Number"].tolist())
+            weekly.loc[mismatched, "Status"] = "Amount Mismatch"
+            weekly.loc[mismatched, "Comments"] = "Variance in reported amounts"
+            explained_comments = {sch: f"Variance in reported amounts; check claim lines {lines}"
+                                  for sch, lines in self.suggested_lines.items() if lines}
+            explained_rows = weekly["Claim Batch No/Sch No"].isin(explained_comments)
+            weekly.loc[explained_rows, "Comments"] = weekly.loc[explained_rows, "Claim Batch No/Sch No"].map(explained_comments)
+
+        return weekly.sort_values("Claim Batch No/Sch No")
+
+    @property
+    def report_name(self):
+        return f"BI Unit - Claims Reconciliation Weekly Report {self.created.strftime('%d %b %Y')}"
+
+    @cached_property
+    def export_sheets(self):
+        return {
+            'Claims Reconciliation Report': self.weekly_report,
+            'Missing in Finance': self.missing_in_finance,
+            'Missing in Claims': self.missing_in_claims,
+            'Amount Discrepancies': self.amount_mismatch,
+        }
+
+    @cached_property
+    def excel_report(self):
+        """The weekly report workbook, with the detail sheets that are not empty."""
+        excel_output = io.BytesIO()
+        with pd.ExcelWriter(excel_output, engine='openpyxl') as writer:
+            worksheet = writer.book.create_sheet('Claims Reconciliation Report')
+            title_cell = worksheet.cell(row=1, column=1, value='BI Unit - Claims Received Weekly Report')
+            title_cell.font = Font(bold=True)
+            for r_idx, row in enumerate(dataframe_to_rows(self.weekly_report, index=False, header=True), 2):
+                for c_idx, value in enumerate(row, 1):
+                    worksheet.cell(row=r_idx, column=c_idx, value=value)
+
+            for sheet_name in ['Missing in Finance', 'Missing in Claims', 'Amount Discrepancies']:
+                if not self.export_sheets[sheet_name].empty:
+                    self.export_sheets[sheet_name].to_excel(writer, sheet_name=sheet_name, index=False)
+        return excel_output.getvalue()
@@ -0,0 +1,222 @@
+import re
+from collections import defaultdict
+import pandas as pd
+import streamlit as st
+from amounts import to_kobo, from_kobo
+
+# Candidate matches for schedules that exact comparison reports as missing ("SCH 1234" vs "01234"
+# vs "1234.0"). Finance schedules are indexed under a normalized key, their numeric value, their
+# one-character deletions (so keys within edit distance 1 meet in a bucket) and their trigrams.
+# A lookup only scores schedules sharing a bucket, never the whole other side.
+MATCH_EXACT = "Normalized"
+MATCH_NUMERIC = "Same number"
+MATCH_EDIT = "One edit apart"
+MATCH_TRIGRAM = "Similar"
+
+# Key similarity for each kind of match; trigram matches score by Jaccard overlap instead
+MATCH_SCORES = {MATCH_EXACT: 1.0, MATCH_NUMERIC: 0.9, MATCH_EDIT: 0.75}
+TRIGRAM_WEIGHT = 0.6
+MIN_TRIGRAM_JACCARD = 0.4
+# Trigrams shared by more schedules than this block nothing useful ("000", "SCH") and are skipped
+MAX_TRIGRAM_POSTINGS = 200
+KEY_WEIGHT = 0.7
+AMOUNT_WEIGHT = 0.3
+CANDIDATES_PER_SCHEDULE = 3
+
+_PREFIX = re.compile(r"^(?:SCHEDULE|SCHED|SCH|BATCH)(?:\s*(?:NUMBER|NUM|NO)(?![A-Z]))?(?![A-Z])")
+
+
+def normalize_schedule(value):
+    """
+    Comparable form of a schedule number: upper case, no 'SCH'/'Schedule No' prefix, no punctuation
+    or spaces, no trailing '.0' and no leading zeros on numbers.
+
+    Returns:
+        str: The key, '' for blanks
+    """
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip().upper()
+    text = re.sub(r"\.0+$", "", text)
+    text = _PREFIX.sub("", re.sub(r"[^0-9A-Z]+", " ", text).strip())
+    text = re.sub(r"[^0-9A-Z]", "", text)
+    return re.sub(r"(?<![0-9])0+(?=[0-9])", "", text)
+
+def numeric_value(key):
+    """The number in a key if it holds exactly one run of digits, else None."""
+    runs = re.findall(r"[0-9]+", key)
+    return int(runs[0]) if len(runs) == 1 else None
+
+def deletion_variants(key):
+    """The key and every string made by deleting one character of it."""
+    return {key} | {key[:i] + key[i + 1:] for i in range(len(key))}
+
+def trigrams(key):
+    padded = f"^{key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def within_one_edit(a, b):
+    """True if one insertion, deletion or substitution (or none) turns a into b."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+def amount_similarity(left, right):
+    """1.0 for equal kobo amounts, falling towards 0 as the relative difference grows; 0 if either is missing."""
+    if pd.isna(left) or pd.isna(right):
+        return 0.0
+    if left == right:
+        return 1.0
+    largest = max(abs(left), abs(right))
+    return max(0.0, 1.0 - abs(left - right) / largest)
+
+
+class ScheduleIndex:
+    """
+    Blocked index over one side's schedules.
+
+    Args:
+        schedules (pandas.DataFrame): Schedule Number and Amount, one row per schedule
+    """
+
+    def __init__(self, schedules):
+        self.schedules = schedules["Schedule Number"].astype(str).tolist()
+        self.kobo = to_kobo(schedules["Amount"]).tolist()
+        self.keys = [normalize_schedule(s) for s in self.schedules]
+        self.by_key = defaultdict(list)
+        self.by_number = defaultdict(list)
+        self.by_deletion = defaultdict(list)
+        self.by_trigram = defaultdict(list)
+        self.trigrams = []
+        for i, key in enumerate(self.keys):
+            grams = trigrams(key) if key else set()
+            self.trigrams.append(grams)
+            if not key:
+                continue
+            self.by_key[key].append(i)
+            number = numeric_value(key)
+            if number is not None:
+                self.by_number[number].append(i)
+            for variant in deletion_variants(key):
+                self.by_deletion[variant].append(i)
+            for gram in grams:
+                self.by_trigram[gram].append(i)
+
+    def __len__(self):
+        return len(self.schedules)
+
+    def _key_matches(self, key):
+        """{position: (match kind, key score)} for every indexed schedule sharing a block with key."""
+        matches = {}
+
+        def offer(i, kind, score):
+            if i not in matches or matches[i][1] < score:
+                matches[i] = (kind, score)
+
+        for i in self.by_key.get(key, []):
+            offer(i, MATCH_EXACT, MATCH_SCORES[MATCH_EXACT])
+        number = numeric_value(key)
+        for i in self.by_number.get(number, []) if number is not None else []:
+            offer(i, MATCH_NUMERIC, MATCH_SCORES[MATCH_NUMERIC])
+        for variant in deletion_variants(key):
+            for i in self.by_deletion.get(variant, []):
+                if within_one_edit(key, self.keys[i]):
+                    offer(i, MATCH_EDIT, MATCH_SCORES[MATCH_EDIT])
+        grams = trigrams(key)
+        shared = defaultdict(int)
+        for gram in grams:
+            postings = self.by_trigram.get(gram, [])
+            if len(postings) <= MAX_TRIGRAM_POSTINGS:
+                for i in postings:
+                    shared[i] += 1
+        for i, count in shared.items():
+            jaccard = count / len(grams | self.trigrams[i])
+            if jaccard >= MIN_TRIGRAM_JACCARD:
+                offer(i, MATCH_TRIGRAM, TRIGRAM_WEIGHT * jaccard)
+        return matches
+
+    def candidates(self, schedule, amount=None, limit=CANDIDATES_PER_SCHEDULE):
+        """
+        Ranked near-matches for one schedule.
+
+        Args:
+            schedule: Schedule number as written on the other side
+            amount (float): Its amount, to prefer candidates with a similar amount
+            limit (int): Most candidates returned
+
+        Returns:
+            list: dicts with Candidate, Candidate Amount, Match, Key Score, Amount Similarity and Score, best first
+        """
+        key = normalize_schedule(schedule)
+        if not key:
+            return []
+        kobo = to_kobo(pd.Series([amount])).iloc[0] if amount is not None else pd.NA
+        ranked = []
+        for i, (kind, key_score) in self._key_matches(key).items():
+            similarity = amount_similarity(kobo, self.kobo[i])
+            ranked.append({
+                "Candidate": self.schedules[i],
+                "Candidate Amount": self.kobo[i],
+                "Match": kind,
+                "Key Score": round(key_score, 3),
+                "Amount Similarity": round(similarity, 3),
+                "Score": round(KEY_WEIGHT * key_score + AMOUNT_WEIGHT * similarity, 3),
+            })
+        ranked.sort(key=lambda c: (-c["Score"], c["Candidate"]))
+        return ranked[:limit]
+
+
+def _per_schedule(df):
+    kobo = to_kobo(df["Amount"]).fillna(0).astype("int64")
+    totals = kobo.groupby(df["Schedule Number"].astype(str)).sum()
+    return pd.DataFrame({"Schedule Number": totals.index, "Amount": from_kobo(totals).values})
+
+def match_missing_schedules(missing, unmatched, limit=CANDIDATES_PER_SCHEDULE):
+    """
+    Candidate matches for every missing schedule among the other side's unmatched schedules.
+
+    Args:
+        missing (pandas.DataFrame): Schedule Number and Amount rows missing on the other side
+            (e.g. find_missing_schedules(claims_data, finance_data)); several rows per schedule are summed
+        unmatched (pandas.DataFrame): The other side's schedules with no exact match, same columns
+        limit (int): Candidates kept per schedule
+
+    Returns:
+        pandas.DataFrame: Schedule Number, Amount, Rank, Candidate, Candidate Amount, Match, Key Score,
+        Amount Similarity, Score; one row per candidate, schedules without candidates left out
+    """
+    columns = ["Schedule Number", "Amount", "Rank", "Candidate", "Candidate Amount", "Match",
+               "Key Score", "Amount Similarity", "Score"]
+    if missing.empty or unmatched.empty:
+        return pd.DataFrame(columns=columns)
+    index = ScheduleIndex(_per_schedule(unmatched))
+    rows = []
+    for schedule, amount in _per_schedule(missing).itertuples(index=False):
+        for rank, candidate in enumerate(index.candidates(schedule, amount, limit), 1):
+            rows.append({"Schedule Number": schedule, "Amount": amount, "Rank": rank, **candidate})
+    matches = pd.DataFrame(rows, columns=columns)
+    matches["Candidate Amount"] = from_kobo(matches["Candidate Amount"]).values
+    return matches
+
+def render_candidate_matches(missing, unmatched, key):
+    """Expander listing near-matches for schedules reported missing."""
+    if missing.empty or unmatched.empty:
+        return
+    with st.expander("🔎 Possible matches for missing schedules"):
+        matches = match_missing_schedules(missing, unmatched)
+        if matches.empty:
+            st.caption("No near-matches found among the other side's unmatched schedules.")
+            return
+        best = matches[matches["Rank"] == 1]
+        st.caption(f"{best['Schedule Number'].nunique()} missing schedules have a possible match; "
+                   f"{int((best['Amount Similarity'] == 1).sum())} of them with the same amount.")
+        st.dataframe(matches, use_container_width=True, hide_index=True, key=f"candidate_matches_{key}")
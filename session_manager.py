@@ -1,14 +1,17 @@
 import os
-import io
 import pickle
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import datetime
 from config import get_to_email, logger
+from upload_handle import persist_upload
+from metrics import instrumented
 
 # Directory to store session data
 SESSION_DIR = "sessions"
+# Workbooks of saved sessions, by content digest; kept for as long as the sessions that use them
+SESSION_UPLOAD_DIR = os.path.join(SESSION_DIR, "uploads")
 
 # Create the sessions directory if it doesn't exist
 if not os.path.exists(SESSION_DIR):
@@ -20,7 +23,7 @@ def save_upload(department, file_data, sheet_name, schedule_col, amount_col):
     
     Args:
         department (str): "claims" or "finance"
-        file_data (BytesIO): The uploaded Excel file
+        file_data (UploadedFile, BytesIO or UploadHandle): The uploaded Excel file
         sheet_name (str): The selected sheet name
         schedule_col (str): Column name for schedule numbers
         amount_col (str): Column name for amounts
@@ -39,15 +42,13 @@ def save_upload(department, file_data, sheet_name, schedule_col, amount_col):
             'finance': None
         }
     
-    # Create a copy of the file data to avoid memory issues
-    file_copy = io.BytesIO()
-    file_data.seek(0)
-    file_copy.write(file_data.read())
-    file_copy.seek(0)
-    
+    # The session file only pickles a small handle; the workbook is kept under SESSION_UPLOAD_DIR,
+    # not in the temporary upload spool, so month-end runs can still read earlier weeks
+    handle = persist_upload(file_data, SESSION_UPLOAD_DIR)
+
     # Save department data (preserving other department's data if it exists)
     session_data[department] = {
-        'file_data': file_copy,
+        'file_data': handle,
         'sheet_name': sheet_name,
         'schedule_col': schedule_col,
         'amount_col': amount_col,
@@ -112,6 +113,7 @@ def get_available_sessions():
     sessions.sort(reverse=True)
     return sessions
 
+@instrumented("email", target="upload_notification", failed=lambda sent: not sent)
 def send_notification_email(department):
     """
     Send an email notification when a department uploads their file.
@@ -0,0 +1,200 @@
+import io
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+import pandas as pd
+import streamlit as st
+from config import logger
+
+# Large per-session objects (uploads, extracts, compiled frames) live here instead of directly in
+# st.session_state. When a session or the whole server goes over budget, the least recently used
+# objects are written to SPILL_DIR and read back transparently on the next get().
+SESSION_BUDGET_BYTES = int(float(os.getenv("SESSION_MEMORY_MB", "256")) * 1024 * 1024)
+GLOBAL_BUDGET_BYTES = int(float(os.getenv("GLOBAL_SESSION_MEMORY_MB", "1024")) * 1024 * 1024)
+SPILL_DIR = os.getenv("SESSION_SPILL_DIR", os.path.join(tempfile.gettempdir(), "claims_session_spill"))
+
+_SESSION_KEY = "_session_store"
+
+_registry = weakref.WeakValueDictionary()
+_registry_lock = threading.RLock()
+
+
+def estimate_size(obj):
+    """Approximate in-memory size of an object in bytes."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, io.BytesIO):
+        return obj.getbuffer().nbytes
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(estimate_size(item) for item in obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    return sys.getsizeof(obj)
+
+def _write_spill(path_base, value):
+    """Write a value to disk in the cheapest format for its type; returns (path, format)."""
+    if isinstance(value, io.BytesIO):
+        path = f"{path_base}.bin"
+        with open(path, "wb") as f:
+            f.write(value.getbuffer())
+        return path, "bytesio"
+    if isinstance(value, pd.DataFrame):
+        path = f"{path_base}.parquet"
+        try:
+            value.to_parquet(path)
+            return path, "parquet"
+        except Exception:
+            # Mixed-type object columns cannot always be stored as Arrow; fall back to pickle
+            if os.path.exists(path):
+                os.remove(path)
+    path = f"{path_base}.pkl"
+    with open(path, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path, "pickle"
+
+def _read_spill(path, fmt):
+    if fmt == "bytesio":
+        with open(path, "rb") as f:
+            return io.BytesIO(f.read())
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class _Entry:
+    __slots__ = ("value", "size", "path", "fmt", "last_access")
+
+    def __init__(self, value, size):
+        self.value = value
+        self.size = size
+        self.path = None
+        self.fmt = None
+        self.last_access = time.monotonic()
+
+    @property
+    def in_memory(self):
+        return self.path is None
+
+
+class SessionStore:
+    """
+    Per-session object store with LRU spill-to-disk under a session and a global memory budget.
+    """
+
+    def __init__(self, session_id=None, budget_bytes=None, spill_dir=None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.budget_bytes = SESSION_BUDGET_BYTES if budget_bytes is None else budget_bytes
+        self.spill_dir = os.path.join(spill_dir or SPILL_DIR, self.session_id)
+        self._entries = OrderedDict()
+        with _registry_lock:
+            _registry[self.session_id] = self
+        weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def memory_bytes(self):
+        return sum(e.size for e in self._entries.values() if e.in_memory)
+
+    def put(self, key, value):
+        """Store value under key (replacing any previous value), then enforce the budgets."""
+        with _registry_lock:
+            self._discard(key)
+            self._entries[key] = _Entry(value, estimate_size(value))
+            _enforce_budgets(protect=(self, key))
+
+    def get(self, key, default=None):
+        """The value for key, read back from disk if it was spilled."""
+        with _registry_lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if not entry.in_memory:
+                entry.value = _read_spill(entry.path, entry.fmt)
+                os.remove(entry.path)
+                entry.path = entry.fmt = None
+                logger.info(f"Session {self.session_id[:8]}: rehydrated '{key}' ({entry.size / 1e6:.1f} MB)")
+            entry.last_access = time.monotonic()
+            self._entries.move_to_end(key)
+            _enforce_budgets(protect=(self, key))
+            return entry.value
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        with _registry_lock:
+            self._discard(key)
+        return value
+
+    def clear(self):
+        with _registry_lock:
+            for key in list(self._entries):
+                self._discard(key)
+
+    def stats(self):
+        """Per-key size and location, for diagnostics."""
+        return [{"key": key, "bytes": e.size, "spilled": not e.in_memory} for key, e in self._entries.items()]
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.path and os.path.exists(entry.path):
+            os.remove(entry.path)
+
+    def _spill(self, key):
+        entry = self._entries[key]
+        os.makedirs(self.spill_dir, exist_ok=True)
+        entry.path, entry.fmt = _write_spill(os.path.join(self.spill_dir, uuid.uuid4().hex), entry.value)
+        entry.value = None
+        logger.info(f"Session {self.session_id[:8]}: spilled '{key}' ({entry.size / 1e6:.1f} MB) to {entry.fmt}")
+
+    def _lru_in_memory(self, protect_key=None):
+        for key, entry in self._entries.items():
+            if entry.in_memory and key != protect_key:
+                return key, entry
+        return None, None
+
+
+def _enforce_budgets(protect):
+    """Spill least recently used entries: first within the session, then across all sessions."""
+    store, protect_key = protect
+    while store.memory_bytes > store.budget_bytes:
+        key, _ = store._lru_in_memory(protect_key)
+        if key is None:
+            break
+        store._spill(key)
+
+    while total_memory_bytes() > GLOBAL_BUDGET_BYTES:
+        candidates = []
+        for other in list(_registry.values()):
+            key, entry = other._lru_in_memory(protect_key if other is store else None)
+            if key is not None:
+                candidates.append((entry.last_access, other, key))
+        if not candidates:
+            break
+        _, victim, key = min(candidates, key=lambda c: c[0])
+        victim._spill(key)
+
+def total_memory_bytes():
+    """In-memory bytes across every live session store."""
+    with _registry_lock:
+        return sum(store.memory_bytes for store in list(_registry.values()))
+
+def session_store():
+    """The SessionStore of the current Streamlit session, created on first use."""
+    store = st.session_state.get(_SESSION_KEY)
+    if store is None:
+        store = SessionStore()
+        st.session_state[_SESSION_KEY] = store
+    return store
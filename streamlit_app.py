@@ -1,21 +1,11 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import io
-import plotly.express as px
-import openpyxl
 from openpyxl.utils.dataframe import dataframe_to_rows
 from datetime import datetime
 import base64
 
-from utils import (
-    extract_schedule_data,
-    find_missing_schedules,
-    calculate_schedule_amounts,
-    generate_reconciliation_report,
-    generate_enhanced_claims_excel,
-    send_variance_email
-)
+from utils import generate_enhanced_claims_excel, send_variance_email
 from appeals_page import show_appeals_page
 from DB_Upload import render_dbpage
 from AppealsUpload import render_appeals_upload
@@ -23,18 +13,33 @@ from telemedicine import show_telemedicine_page
 from TelemedicineUpload import render_telemedicine_upload
 from ambulance import show_ambulance_page
 from AmbulanceUpload import render_ambulance_upload
+from db_reconcile import render_db_reconciliation_page
+from job_runner import submit_job, render_job_panel, render_jobs_page, session_owner
+from prefetch import prefetch_workbook, workbook_sheets
+from session_store import session_store
+from upload_handle import spool_upload
+from profiler import render_profiler, profile_fragment
+from file_readers import UPLOAD_TYPES, FLAT_TYPES, upload_format
+from exports import render_export_buttons
+from history_store import record_run, schedule_providers, render_trends_page
+from multi_period import render_multi_period_page
+from schedule_matching import render_candidate_matches
+from reconciliation_view import (
+    ReconciliationView, view_key, detect_column, date_validation_errors,
+    SCHEDULE_COLUMNS, CLAIMS_AMOUNT_COLUMNS, FINANCE_AMOUNT_COLUMNS,
+)
+from metrics import track, start_metrics_server
+from config import logger
 
 st.set_page_config(
     page_title="Claims Reconciliation Tool",
     page_icon="📊",
     layout="wide"
 )
+# Once per process; the endpoint outlives reruns and sessions
+start_metrics_server()
 
 def _init_session_state():
-    if 'uploaded_claims_file' not in st.session_state:
-        st.session_state.uploaded_claims_file = None
-    if 'uploaded_finance_file' not in st.session_state:
-        st.session_state.uploaded_finance_file = None
     if 'claims_sheet' not in st.session_state:
         st.session_state.claims_sheet = None
     if 'finance_sheet' not in st.session_state:
@@ -47,13 +52,18 @@ def _init_session_state():
         st.session_state.finance_schedule_col = None
     if 'finance_amount_col' not in st.session_state:
         st.session_state.finance_amount_col = None
-    if 'generate_claims_excel' not in st.session_state:
-        st.session_state.generate_claims_excel = False
     if 'department' not in st.session_state:
         st.session_state.department = 'reconciliation'
     if 'session_loaded' not in st.session_state:
         st.session_state.session_loaded = False
 
+def _enhanced_claims_excel_job(job, claims_df, schedule_col, amount_col):
+    job.progress(0.1, f"Writing {len(claims_df)} claim rows with formula columns")
+    excel_bytes = generate_enhanced_claims_excel(claims_df, schedule_col, amount_col)
+    filename = f"Enhanced Claims Data with Formulas {pd.Timestamp.now().strftime('%d %b %Y')}.xlsx"
+    job.save_artifact(filename, excel_bytes, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    job.progress(1.0, "Enhanced Claims Excel generated successfully!")
+
 try:
     _init_session_state()
 except RuntimeError:
@@ -63,8 +73,9 @@ except RuntimeError:
 # Page navigation
 page = st.sidebar.selectbox(
     "Select Page",
-    ["Claims Reconciliation", "Appeals Compilation","DB_Upload","AppealsUpload","Telemedicine Compilation","Telemedicine Upload","Ambulance Compilation","Ambulance Upload"]
+    ["Claims Reconciliation", "Appeals Compilation","DB_Upload","AppealsUpload","Telemedicine Compilation","Telemedicine Upload","Ambulance Compilation","Ambulance Upload","DB Reconciliation","Multi-Period Reconciliation","Reconciliation Trends","Background Jobs"]
 )
+render_profiler(page)
 
 if page == "Appeals Compilation":
     show_appeals_page()
@@ -87,6 +98,18 @@ elif page == "Ambulance Compilation":
 elif page == "Ambulance Upload":
     render_ambulance_upload()
     st.stop()
+elif page == "DB Reconciliation":
+    render_db_reconciliation_page()
+    st.stop()
+elif page == "Multi-Period Reconciliation":
+    render_multi_period_page()
+    st.stop()
+elif page == "Reconciliation Trends":
+    render_trends_page()
+    st.stop()
+elif page == "Background Jobs":
+    render_jobs_page()
+    st.stop()
 
 st.title("Claims Reconciliation Tool")
 st.markdown("""
@@ -97,602 +120,434 @@ Upload the Excel reports from both departments to identify discrepancies in sche
 # Define file change callbacks
 def on_claims_file_change():
     if 'claims_file_uploader' in st.session_state and st.session_state.claims_file_uploader is not None:
-        # Make a copy to ensure persistence
-        file_copy = io.BytesIO()
-        st.session_state.claims_file_uploader.seek(0)
-        file_copy.write(st.session_state.claims_file_uploader.read())
-        file_copy.seek(0)
-        st.session_state.uploaded_claims_file = file_copy
+        # Spool once to disk; later reads go through a memory map instead of BytesIO copies
+        handle = spool_upload(st.session_state.claims_file_uploader)
+        session_store().put('uploaded_claims_file', handle)
+        # Start parsing now; the sheet and column pickers below wait for the result
+        prefetch_workbook(handle)
 
 def on_finance_file_change():
     if 'finance_file_uploader' in st.session_state and st.session_state.finance_file_uploader is not None:
-        # Make a copy to ensure persistence
-        file_copy = io.BytesIO()
-        st.session_state.finance_file_uploader.seek(0)
-        file_copy.write(st.session_state.finance_file_uploader.read())
-        file_copy.seek(0)
-        st.session_state.uploaded_finance_file = file_copy
-
-# File upload section
-st.header("Upload Files")
-
-col1, col2 = st.columns(2)
+        # Spool once to disk; later reads go through a memory map instead of BytesIO copies
+        handle = spool_upload(st.session_state.finance_file_uploader)
+        session_store().put('uploaded_finance_file', handle)
+        # Start parsing now; the sheet and column pickers below wait for the result
+        prefetch_workbook(handle)
+
+# The page is split into fragments, each rerunning on its own when a widget inside it changes:
+# file intake, the sheet/column form, results, charts and downloads. What they show comes from the
+# ReconciliationView built when the form is submitted, cached per hash of the uploads, sheets and
+# columns, so no fragment recomputes another's tables, figures or report files.
+CLAIMS_FIELDS = ["claims_sheet", "claims_schedule_col", "claims_amount_col"]
+FINANCE_FIELDS = ["finance_sheet", "finance_schedule_col", "finance_amount_col"]
+
+@st.fragment
+def _render_intake():
+    profile_fragment()
+    st.header("Upload Files")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("### Claims Department File")
+        claims_file = st.file_uploader(
+            "Upload Claims Department Excel Report (PAYMENT SCHEDULE)",
+            type=UPLOAD_TYPES,
+            help="Excel workbook, or a CSV/Parquet export of the payment schedule sheet",
+            key="claims_file_uploader",
+            on_change=on_claims_file_change
+        )
+
+    with col2:
+        st.markdown("### Finance Department File")
+        finance_file = st.file_uploader(
+            "Upload Finance Department Excel Report (Finance claims reconciliation)",
+            type=UPLOAD_TYPES,
+            help="Excel workbook, or a CSV/Parquet export of the claims received sheet",
+            key="finance_file_uploader",
+            on_change=on_finance_file_change
+        )
+
+    # Use the spooled uploads (they also persist when the uploader is cleared)
+    if claims_file is not None and 'uploaded_claims_file' not in session_store():
+        on_claims_file_change()
+    if finance_file is not None and 'uploaded_finance_file' not in session_store():
+        on_finance_file_change()
+
+    # A different file changes every section below: forget the choices made for the old one and rerun the page
+    digests = [getattr(session_store().get(key), "digest", None) for key in ('uploaded_claims_file', 'uploaded_finance_file')]
+    previous = st.session_state.get('_intake_digests', [None, None])
+    if digests != previous:
+        for digest, old, fields in zip(digests, previous, [CLAIMS_FIELDS, FINANCE_FIELDS]):
+            if digest != old:
+                for field in fields:
+                    st.session_state[field] = None
+        st.session_state['_intake_digests'] = digests
+        st.rerun()
+
+def _column_index(df, field, candidates):
+    """Position of the chosen column for field, else of the first detected candidate, else 0."""
+    column = st.session_state.get(field)
+    if column not in df.columns:
+        column = detect_column(df, candidates)
+    return df.columns.get_loc(column) if column is not None else 0
+
+def _sheet_picker(label, sheets, workbook, file, applied):
+    # CSV and Parquet files hold a single table, so there is no sheet to pick
+    file_format = upload_format(file)
+    if file_format in FLAT_TYPES:
+        st.caption(f"{file_format.upper()} file: one table, {len(workbook[sheets[0]])} rows")
+        return sheets[0]
+    return st.selectbox(label, sheets, index=sheets.index(applied))
+
+@st.fragment
+def _render_selection(claims_file, finance_file):
+    profile_fragment()
+    st.header("File Analysis")
+
+    # Both workbooks parse concurrently (usually already started by the upload callbacks)
+    prefetch_workbook(claims_file)
+    prefetch_workbook(finance_file)
+    with st.spinner("Reading workbooks..."):
+        claims_workbook = workbook_sheets(claims_file)
+        finance_workbook = workbook_sheets(finance_file)
+
+    claims_sheets, finance_sheets = list(claims_workbook), list(finance_workbook)
+    claims_sheet = st.session_state.claims_sheet if st.session_state.claims_sheet in claims_sheets else claims_sheets[0]
+    finance_sheet = st.session_state.finance_sheet if st.session_state.finance_sheet in finance_sheets else finance_sheets[0]
+    claims_df = claims_workbook[claims_sheet]
+    finance_df = finance_workbook[finance_sheet]
+
+    # Nothing below reruns until the form is submitted; a changed sheet is loaded first, so its columns can be confirmed
+    with st.form("reconciliation_selection"):
+        col1, col2 = st.columns(2)
 
-with col1:
-    st.markdown("### Claims Department File")
-    claims_file = st.file_uploader(
-        "Upload Claims Department Excel Report (PAYMENT SCHEDULE)",
-        type=["xlsx"],
-        key="claims_file_uploader",
-        on_change=on_claims_file_change
-    )
-    if claims_file:
-        claims_file.seek(0)
-
-with col2:
-    st.markdown("### Finance Department File")
-    finance_file = st.file_uploader(
-        "Upload Finance Department Excel Report (Finance claims reconciliation)",
-        type=["xlsx"],
-        key="finance_file_uploader",
-        on_change=on_finance_file_change
-    )
-    if finance_file:
-        finance_file.seek(0)
+        with col1:
+            st.markdown("### Claims File Sheets")
+            picked_claims_sheet = _sheet_picker("Select the sheet with payment schedules:", claims_sheets,
+                                                claims_workbook, claims_file, claims_sheet)
 
-# Use session state files if available
-if claims_file is None and st.session_state.uploaded_claims_file is not None:
-    claims_file = st.session_state.uploaded_claims_file
-    # Need to seek to beginning as the file might have been read already
-    claims_file.seek(0)
+        with col2:
+            st.markdown("### Finance File Sheets")
+            picked_finance_sheet = _sheet_picker("Select the sheet with claims received:", finance_sheets,
+                                                 finance_workbook, finance_file, finance_sheet)
 
-if finance_file is None and st.session_state.uploaded_finance_file is not None:
-    finance_file = st.session_state.uploaded_finance_file
-    # Need to seek to beginning as the file might have been read already
-    finance_file.seek(0)
+        # Display preview of loaded data
+        st.subheader("Data Preview")
+        col1, col2 = st.columns(2)
 
-# Process files when both are uploaded
-if claims_file and finance_file:
-    try:
-        st.header("File Analysis")
+        with col1:
+            st.markdown("#### Claims Department Data")
+            st.dataframe(claims_df.head())
 
-        # Reset file positions before reading
-        claims_file.seek(0)
-        finance_file.seek(0)
+        with col2:
+            st.markdown("#### Finance Department Data")
+            st.dataframe(finance_df.head())
 
-        # Load files with pandas
-        claims_xls = pd.ExcelFile(claims_file)
-        finance_xls = pd.ExcelFile(finance_file)
+        st.subheader("Column Selection")
+        if st.session_state.pop('_sheets_changed', False):
+            st.warning("The sheet selection changed. Confirm the columns of the new sheets, then process again.")
+        else:
+            st.info("Please confirm the columns that contain schedule numbers and amounts in both files.")
 
-        # Display sheets in each file
         col1, col2 = st.columns(2)
 
         with col1:
-            st.markdown("### Claims File Sheets")
-            claims_sheets = claims_xls.sheet_names
-            selected_claims_sheet = st.selectbox(
-                "Select the sheet with payment schedules:", 
-                claims_sheets,
-                index=0
+            st.markdown("#### Claims Department Columns")
+            claims_schedule_col = st.selectbox(
+                "Schedule Number Column (Claims):",
+                claims_df.columns,
+                index=_column_index(claims_df, "claims_schedule_col", SCHEDULE_COLUMNS)
+            )
+            claims_amount_col = st.selectbox(
+                "Amount Column (Claims):",
+                claims_df.columns,
+                index=_column_index(claims_df, "claims_amount_col", CLAIMS_AMOUNT_COLUMNS)
             )
 
         with col2:
-            st.markdown("### Finance File Sheets")
-            finance_sheets = finance_xls.sheet_names
-            selected_finance_sheet = st.selectbox(
-                "Select the sheet with claims received:", 
-                finance_sheets,
-                index=0 if "Claims recei" in finance_sheets[0] else 0
+            st.markdown("#### Finance Department Columns")
+            finance_schedule_col = st.selectbox(
+                "Schedule Number Column (Finance):",
+                finance_df.columns,
+                index=_column_index(finance_df, "finance_schedule_col", SCHEDULE_COLUMNS)
+            )
+            finance_amount_col = st.selectbox(
+                "Amount Column (Finance):",
+                finance_df.columns,
+                index=_column_index(finance_df, "finance_amount_col", FINANCE_AMOUNT_COLUMNS)
             )
 
-        # Load selected sheets
-        with st.spinner("Loading and processing data..."):
-            claims_df = pd.read_excel(claims_file, sheet_name=selected_claims_sheet)
-            finance_df = pd.read_excel(finance_file, sheet_name=selected_finance_sheet)
-
-            # Display preview of loaded data
-            st.subheader("Data Preview")
-            col1, col2 = st.columns(2)
-
-            with col1:
-                st.markdown("#### Claims Department Data")
-                st.dataframe(claims_df.head())
-
-            with col2:
-                st.markdown("#### Finance Department Data")
-                st.dataframe(finance_df.head())
-
-            # Extract schedule data
-            claims_schedule_col, claims_amount_col = None, None
-            finance_schedule_col, finance_amount_col = None, None
-
-            # Detect column names for schedule numbers
-            possible_schedule_cols = ["SCH NO", "Claim Batch No/Sch No", "Schedule No", "Schedule Number", "SCH_NO"]
-            possible_amount_cols_claims = ["HOD RECOMMD. AMOUNT", "HOD AMOUNT", "RECOMMENDED AMOUNT", "AMOUNT"]
-            possible_amount_cols_finance = ["Claims_Advised_Amount", "Advised_Amount", "Claim Amount", "AMOUNT"]
-
-            # Find appropriate columns in claims dataframe
-            for col in possible_schedule_cols:
-                if col in claims_df.columns:
-                    claims_schedule_col = col
-                    break
-
-            for col in possible_amount_cols_claims:
-                if col in claims_df.columns:
-                    claims_amount_col = col
-                    break
-
-            # Find appropriate columns in finance dataframe
-            for col in possible_schedule_cols:
-                if col in finance_df.columns:
-                    finance_schedule_col = col
-                    break
-
-            for col in possible_amount_cols_finance:
-                if col in finance_df.columns:
-                    finance_amount_col = col
-                    break
-
-            # Column selection form
-            st.subheader("Column Selection")
-            st.info("Please confirm the columns that contain schedule numbers and amounts in both files.")
+        submitted = st.form_submit_button("Process Reconciliation")
+
+    # Uploaded Files Status
+    st.subheader("Uploaded Files Status")
+    status_col1, status_col2 = st.columns(2)
+    status_col1.success("✅ Claims Department file loaded successfully")
+    status_col2.success("✅ Finance Department file loaded successfully")
+
+    if not submitted:
+        return
+    if (picked_claims_sheet, picked_finance_sheet) != (claims_sheet, finance_sheet):
+        for fields, old, new in [(CLAIMS_FIELDS, claims_sheet, picked_claims_sheet),
+                                 (FINANCE_FIELDS, finance_sheet, picked_finance_sheet)]:
+            if old != new:
+                st.session_state[fields[0]] = new
+                for field in fields[1:]:
+                    st.session_state[field] = None
+        st.session_state['_sheets_changed'] = True
+        st.rerun()
+
+    selection = {
+        "claims_sheet": claims_sheet, "finance_sheet": finance_sheet,
+        "claims_schedule_col": claims_schedule_col, "claims_amount_col": claims_amount_col,
+        "finance_schedule_col": finance_schedule_col, "finance_amount_col": finance_amount_col,
+    }
+    st.session_state.update(selection)
+    try:
+        _process_reconciliation(claims_file, finance_file, claims_df, finance_df, selection)
+    except Exception as e:
+        # A fragment rerun is not covered by the page-level handler below
+        st.error(f"Error processing files: {str(e)}")
+        st.error("Please ensure you've selected the correct sheets and columns.")
+        return
+    st.rerun()
+
+def _process_reconciliation(claims_file, finance_file, claims_df, finance_df, selection):
+    """Build the view for these inputs unless the stored one was built from the same ones."""
+    key = view_key(claims_file, finance_file, selection)
+    store = session_store()
+    view = store.get('reconciliation_view')
+    if view is None or view.key != key:
+        with track("reconciliation", target="workbook") as op:
+            with st.spinner("Processing reconciliation..."):
+                view = ReconciliationView.build(key, selection, claims_df, finance_df)
+                report = view.report
+            try:
+                record_run(report, "Claims Reconciliation",
+                           providers=schedule_providers(claims_df, selection["claims_schedule_col"]))
+            except Exception as e:
+                logger.warning(f"Could not record reconciliation history: {e}")
+            with st.spinner("Looking for the claim lines behind each amount variance..."):
+                view.amount_mismatch
+            op.add_rows(len(view.claims_data) + len(view.finance_data))
+        store.put('reconciliation_view', view)
+        st.session_state.emails_sent = False  # Reset email flag for new reconciliation
+    st.session_state.reconciliation_processed = True
+
+def _processed_view():
+    if not st.session_state.get('reconciliation_processed', False):
+        return None
+    return session_store().get('reconciliation_view')
+
+def _claims_sheet_frame(view):
+    """The Claims sheet the view was built from, re-read from the (cached) parse of the upload."""
+    claims_file = session_store().get('uploaded_claims_file')
+    return workbook_sheets(claims_file)[view.selection["claims_sheet"]]
+
+def _send_notification_emails(view):
+    # Check for missing schedules and send email
+    if not view.missing_in_finance.empty:
+        try:
+            send_variance_email(
+                variance_type="missing_schedules",
+                missing_schedules=view.missing_in_finance["Schedule Number"].tolist(),
+                amount_variances=None
+            )
+            st.info("📧 Email notification sent for missing schedules")
+        except Exception as e:
+            st.warning(f"Failed to send email notification: {str(e)}")
+
+    # Check for date validation errors (encounter date after claim received date)
+    date_errors = date_validation_errors(_claims_sheet_frame(view), view.selection["claims_schedule_col"])
+    if date_errors:
+        try:
+            send_variance_email(
+                variance_type="date_validation_errors",
+                missing_schedules=None,
+                amount_variances=None,
+                date_errors=date_errors
+            )
+            st.warning(f"📧 Email sent for {len(date_errors)} date validation errors")
+        except Exception as e:
+            st.warning(f"Failed to send email notification for date errors: {str(e)}")
+
+    # Check for amount variances and send email
+    if not view.amount_mismatch.empty:
+        try:
+            variance_details = [{
+                'schedule': row['Schedule Number'],
+                'claims_amount': row['Claims Amount'],
+                'finance_amount': row['Finance Amount'],
+                'difference': row['Difference'],
+                'suggested_lines': view.suggested_lines.get(row['Schedule Number'], ''),
+            } for _, row in view.amount_mismatch.iterrows()]
+            send_variance_email(
+                variance_type="amount_variances",
+                missing_schedules=None,
+                amount_variances=variance_details
+            )
+            st.info("📧 Email notification sent for amount variances")
+        except Exception as e:
+            st.warning(f"Failed to send email notification: {str(e)}")
+
+    # Mark emails as sent
+    st.session_state.emails_sent = True
+
+@st.fragment
+def _render_results():
+    profile_fragment()
+    view = _processed_view()
+    if view is None:
+        return
+    summary = view.summary
+
+    # Display results
+    st.header("Reconciliation Results")
+
+    # Send emails only once per reconciliation (manually triggered)
+    if st.button("Send Notification Emails") and not st.session_state.get('emails_sent', False):
+        _send_notification_emails(view)
+
+    # Missing Schedules
+    st.subheader("Claims Schedules Missing in Finance (Critical)")
+    if view.missing_in_finance.empty:
+        st.success("No schedules missing in Finance - All schedules sent by Claims were received by Finance")
+    else:
+        st.error(f"{len(view.missing_in_finance)} schedules sent by Claims but not found in Finance")
+        st.dataframe(view.missing_in_finance.style.highlight_max(axis=0, color='red'), use_container_width=True)
+
+        # Add total amount for missing schedules
+        st.error(f"Total amount missing: {summary['missing_amount']:,.2f}")
+        render_candidate_matches(view.missing_in_finance, view.missing_in_claims, "reconciliation")
+
+    # Reconciliation Report
+    st.subheader("Amount Reconciliation")
+    st.markdown("This table shows the comparison of amounts for each schedule number between Claims and Finance.")
+
+    # Display metrics
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Claims Schedules", summary["total_claims_schedules"])
+    col2.metric("Matching Amounts", summary["matching_schedules"])
+    col3.metric("Discrepancies", summary["discrepancies"])
+
+    # Display financial metrics
+    st.subheader("Financial Summary")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Claims Amount", f"{summary['total_claims_amount']:,.2f}")
+    col2.metric("Matching Finance Amount", f"{summary['matching_finance_amount']:,.2f}",
+               help="Total amount from Finance where schedules match with Claims")
+    col3.metric("Total Variance", f"{summary['total_variance']:,.2f}", delta=f"{summary['variance_percent']:.2f}%")
+
+    # Show detailed report, highlighting differences (exact comparison in kobo)
+    st.dataframe(view.styled_report)
+
+    if not view.amount_mismatch.empty:
+        st.subheader("Variance Explanations")
+        st.markdown("The fewest claim lines whose amounts add up to each schedule's difference.")
+        explained = view.variance_explanations[view.variance_explanations["Suggested Lines"] != ""]
+        st.caption(f"{len(explained)} of {len(view.variance_explanations)} variances matched to claim lines")
+        st.dataframe(view.variance_explanations, use_container_width=True, hide_index=True)
+
+@st.fragment
+def _render_charts():
+    profile_fragment()
+    view = _processed_view()
+    if view is None:
+        return
+
+    # Visualization
+    st.subheader("Visual Comparison")
+    if view.scatter_figure is None:
+        st.info("No data available for visualization after removing missing values.")
+        return
+
+    # Selecting points lists their schedules; only this section reruns for it
+    event = st.plotly_chart(view.scatter_figure, use_container_width=True, on_select="rerun",
+                            selection_mode=("points", "box", "lasso"), key=f"reconciliation_scatter_{view.key}")
+    selected = [point["customdata"][0] for point in event.selection.points if point.get("customdata")]
+    if selected:
+        st.caption(f"{len(selected)} selected schedule(s)")
+        st.dataframe(view.report[view.report["Schedule Number"].isin(selected)], use_container_width=True,
+                     hide_index=True)
+
+    # Bar chart for discrepancies
+    if view.mismatch_figure is not None:
+        st.plotly_chart(view.mismatch_figure, use_container_width=True)
+
+@st.fragment
+def _render_downloads():
+    profile_fragment()
+    view = _processed_view()
+    if view is None:
+        return
+
+    # Download section
+    st.header("Download Results")
+
+    # Enhanced Claims Excel is built in the background; the download appears when it is ready
+    if st.button("Generate Claims Data with Formula Columns"):
+        submit_job(
+            "enhanced_claims_excel", "Claims data with formula columns",
+            _enhanced_claims_excel_job, _claims_sheet_frame(view).copy(),
+            view.selection["claims_schedule_col"], view.selection["claims_amount_col"],
+            owner=session_owner(),
+        )
+    render_job_panel(kind="enhanced_claims_excel", title="Enhanced Claims Excel", limit=3, owner=session_owner())
+
+    # Excel download, built once per reconciliation
+    st.download_button(
+        label="📊 Download Excel Report",
+        data=view.excel_report,
+        file_name=f"{view.report_name}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    render_export_buttons(view.export_sheets, view.report_name, "reconciliation", cache=view.exports)
+
+def _render_summary():
+    view = _processed_view()
+    if view is None:
+        return
+    summary = view.summary
+    total_claims_schedules = summary["total_claims_schedules"]
+
+    # Summary
+    st.header("Reconciliation Summary")
+    if view.summary_figure is not None:
+        st.plotly_chart(view.summary_figure, use_container_width=True)
+
+    st.markdown(f"""
+    ### Key Metrics:
+    - **Total Claims Schedules**: {total_claims_schedules}
+    - **Schedules with Matching Amounts**: {summary['matching_schedules']} ({summary['matching_schedules']/total_claims_schedules*100:.1f}% of Claims total)
+    - **Total Discrepancies**: {summary['discrepancies']} ({summary['discrepancies']/total_claims_schedules*100:.1f}% of Claims total)
+
+    ### Critical Issues:
+    - **Schedules Missing in Finance**: {len(view.missing_in_finance)}
+      - Total amount missing: {summary['missing_amount']:,.2f}
+
+    ### Financial Analysis:
+    - **Total Claims Amount**: {summary['total_claims_amount']:,.2f}
+    - **Matching Finance Amount**: {summary['matching_finance_amount']:,.2f} (only from schedules present in both)
+    - **Total Amount Variance**: {summary['total_variance']:,.2f} ({summary['variance_percent']:.2f}% of Claims total)
+
+    ### Other Issues:
+    - **Amount Mismatches in Common Schedules**: {len(view.amount_mismatch)}
+    """)
 
-            col1, col2 = st.columns(2)
-
-            with col1:
-                st.markdown("#### Claims Department Columns")
-                claims_schedule_col = st.selectbox(
-                    "Schedule Number Column (Claims):", 
-                    claims_df.columns,
-                    index=claims_df.columns.get_loc(claims_schedule_col) if claims_schedule_col else 0
-                )
-                claims_amount_col = st.selectbox(
-                    "Amount Column (Claims):", 
-                    claims_df.columns,
-                    index=claims_df.columns.get_loc(claims_amount_col) if claims_amount_col else 0
-                )
-
-            with col2:
-                st.markdown("#### Finance Department Columns")
-                finance_schedule_col = st.selectbox(
-                    "Schedule Number Column (Finance):", 
-                    finance_df.columns,
-                    index=finance_df.columns.get_loc(finance_schedule_col) if finance_schedule_col else 0
-                )
-                finance_amount_col = st.selectbox(
-                    "Amount Column (Finance):", 
-                    finance_df.columns,
-                    index=finance_df.columns.get_loc(finance_amount_col) if finance_amount_col else 0
-                )
-
-            # Uploaded Files Status
-            st.subheader("Uploaded Files Status")
-            status_col1, status_col2 = st.columns(2)
-
-            with status_col1:
-                if claims_file:
-                    st.success("✅ Claims Department file loaded successfully")
-                else:
-                    st.warning("⚠️ Claims Department file not available")
-
-            with status_col2:
-                if finance_file:
-                    st.success("✅ Finance Department file loaded successfully")
-                else:
-                    st.warning("⚠️ Finance Department file not available")
-
-            if not claims_file or not finance_file:
-                st.info("You need both Claims and Finance files to perform reconciliation. Either upload them directly or load from a previous session.")
-
-            # Button to process the reconciliation
-            if st.button("Process Reconciliation"):
-                if not claims_file or not finance_file:
-                    st.error("Both Claims and Finance files must be present to process reconciliation.")
-                else:
-                    with st.spinner("Processing reconciliation..."):
-                        # Extract and process data
-                        claims_data = extract_schedule_data(claims_df, claims_schedule_col, claims_amount_col)
-                        finance_data = extract_schedule_data(finance_df, finance_schedule_col, finance_amount_col)
-
-                    # Calculate aggregated amounts for each schedule
-                    claims_amounts = calculate_schedule_amounts(claims_data)
-                    finance_amounts = calculate_schedule_amounts(finance_data)
-
-                # Store variables in session state
-                st.session_state.claims_data = claims_data
-                st.session_state.finance_data = finance_data
-                st.session_state.claims_amounts = claims_amounts
-                st.session_state.finance_amounts = finance_amounts
-                st.session_state.reconciliation_processed = True
-                st.session_state.emails_sent = False  # Reset email flag for new reconciliation
-
-            # Check if reconciliation data is available
-            if ('claims_amounts' in st.session_state and 'finance_amounts' in st.session_state and 
-                st.session_state.get('reconciliation_processed', False)):
-
-                # Define tolerance for floating-point precision issues
-                tolerance = 0.01
-
-                # Find missing schedules
-                missing_in_finance = find_missing_schedules(st.session_state.claims_data, st.session_state.finance_data)
-                missing_in_claims = find_missing_schedules(st.session_state.finance_data, st.session_state.claims_data)
-
-                # Generate reconciliation report
-                reconciliation_report = generate_reconciliation_report(
-                    st.session_state.claims_amounts, st.session_state.finance_amounts
-                )
-
-                # Display results
-                st.header("Reconciliation Results")
-
-                # Send emails only once per reconciliation (manually triggered)
-                if st.button("Send Notification Emails") and not st.session_state.get('emails_sent', False):
-                    # Check for missing schedules and send email
-                    if not missing_in_finance.empty:
-                        try:
-                            send_variance_email(
-                                variance_type="missing_schedules",
-                                missing_schedules=missing_in_finance["Schedule Number"].tolist(),
-                                amount_variances=None
-                            )
-                            st.info("📧 Email notification sent for missing schedules")
-                        except Exception as e:
-                            st.warning(f"Failed to send email notification: {str(e)}")
-
-                    # Check for date validation errors (encounter date after claim received date)
-                    date_validation_errors = []
-                    
-                    # Find encounter date and claim received date columns
-                    encounter_date_col = None
-                    claim_received_col = None
-                    
-                    encounter_date_variations = ['ENCOUNTER DATE (DD/MM/YYYY)', 'ENCOUNTER_DATE_DD_MM_YYYY', 'ENCOUNTER_DATE', 'Encounter Date', 'Encounter_Date', 'ENC_DATE']
-                    claim_received_variations = ['DATE CLAIM RECEIVED ', 'DATE_CLAIM_RECEIVED', 'Date Claim Received', 'Date_Claim_Received', 'CLAIM_RECEIVED_DATE']
-                    
-                    for col in encounter_date_variations:
-                        if col in claims_df.columns:
-                            encounter_date_col = col
-                            break
-                    
-                    for col in claim_received_variations:
-                        if col in claims_df.columns:
-                            claim_received_col = col
-                            break
-                    
-                    if encounter_date_col and claim_received_col:
-                        # Check each row for date validation issues
-                        for idx, row in claims_df.iterrows():
-                            try:
-                                encounter_date = pd.to_datetime(row[encounter_date_col], errors='coerce')
-                                claim_received_date = pd.to_datetime(row[claim_received_col], errors='coerce')
-                                
-                                if pd.notna(encounter_date) and pd.notna(claim_received_date):
-                                    if encounter_date > claim_received_date:
-                                        sch_no = str(row[claims_schedule_col]) if claims_schedule_col in row else "Unknown"
-                                        date_validation_errors.append({
-                                            'schedule': sch_no,
-                                            'encounter_date': encounter_date.strftime('%d/%m/%Y'),
-                                            'claim_received_date': claim_received_date.strftime('%d/%m/%Y')
-                                        })
-                            except Exception:
-                                # Skip rows with invalid date formats
-                                continue
-                    
-                    # Send email for date validation errors
-                    if date_validation_errors:
-                        try:
-                            send_variance_email(
-                                variance_type="date_validation_errors",
-                                missing_schedules=None,
-                                amount_variances=None,
-                                date_errors=date_validation_errors
-                            )
-                            st.warning(f"📧 Email sent for {len(date_validation_errors)} date validation errors")
-                        except Exception as e:
-                            st.warning(f"Failed to send email notification for date errors: {str(e)}")
-
-                    # Check for amount variances and send email
-                    common_schedules = set(st.session_state.claims_amounts["Schedule Number"]).intersection(
-                        set(st.session_state.finance_amounts["Schedule Number"])
-                    )
-                    amount_mismatch = reconciliation_report[
-                        (~reconciliation_report.isna().any(axis=1)) & 
-                        (abs(reconciliation_report['Claims Amount'] - reconciliation_report['Finance Amount']) > tolerance)
-                    ]
-                    
-                    if not amount_mismatch.empty:
-                        # Send email for amount variances
-                        try:
-                            variance_details = []
-                            for _, row in amount_mismatch.iterrows():
-                                variance_details.append({
-                                    'schedule': row['Schedule Number'],
-                                    'claims_amount': row['Claims Amount'],
-                                    'finance_amount': row['Finance Amount'],
-                                    'difference': row['Difference']
-                                })
-                            
-                            send_variance_email(
-                                variance_type="amount_variances",
-                                missing_schedules=None,
-                                amount_variances=variance_details
-                            )
-                            st.info("📧 Email notification sent for amount variances")
-                        except Exception as e:
-                            st.warning(f"Failed to send email notification: {str(e)}")
-
-                    # Mark emails as sent
-                    st.session_state.emails_sent = True
-
-                # Missing Schedules
-                st.subheader("Claims Schedules Missing in Finance (Critical)")
-                if missing_in_finance.empty:
-                    st.success("No schedules missing in Finance - All schedules sent by Claims were received by Finance")
-                else:
-                    st.error(f"{len(missing_in_finance)} schedules sent by Claims but not found in Finance")
-                    st.dataframe(missing_in_finance.style.highlight_max(axis=0, color='red'), use_container_width=True)
-
-                    # Add total amount for missing schedules
-                    total_missing_amount = missing_in_finance["Amount"].sum()
-                    st.error(f"Total amount missing: {total_missing_amount:,.2f}")
-
-                # Reconciliation Report
-                st.subheader("Amount Reconciliation")
-                st.markdown("This table shows the comparison of amounts for each schedule number between Claims and Finance.")
-
-                # Highlight differences in the report (with tolerance for floating-point precision)
-                def highlight_diff(row):
-                    if pd.isna(row['Claims Amount']) or pd.isna(row['Finance Amount']):
-                        return ['background-color: yellow'] * len(row)
-                    elif abs(row['Claims Amount'] - row['Finance Amount']) > tolerance:
-                        return ['background-color: lightcoral'] * len(row)
-                    else:
-                        return [''] * len(row)
-
-                formatted_report = reconciliation_report.style.apply(highlight_diff, axis=1)
-
-                # Calculate discrepancy metrics based on Claims perspective
-                total_claims_schedules = len(st.session_state.claims_amounts)
-
-                # Schedules that are in both Claims and Finance
-                common_schedules = set(st.session_state.claims_amounts["Schedule Number"]).intersection(
-                    set(st.session_state.finance_amounts["Schedule Number"])
-                )
-
-                # Matching amounts (with tolerance for floating-point precision)
-                matching_schedules_df = reconciliation_report.dropna(subset=['Claims Amount', 'Finance Amount'])
-                matching_schedules = sum(abs(matching_schedules_df['Claims Amount'] - matching_schedules_df['Finance Amount']) <= tolerance)
-
-                # Discrepancies
-                discrepancies = total_claims_schedules - matching_schedules
-
-                # Missing values and amount mismatches for other calculations
-                missing_values = reconciliation_report[reconciliation_report.isna().any(axis=1)]
-                amount_mismatch = reconciliation_report[
-                    (~reconciliation_report.isna().any(axis=1)) & 
-                    (abs(reconciliation_report['Claims Amount'] - reconciliation_report['Finance Amount']) > tolerance)
-                ]
-
-                # Display metrics
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Total Claims Schedules", total_claims_schedules)
-                col2.metric("Matching Amounts", matching_schedules)
-                col3.metric("Discrepancies", discrepancies)
-
-                # Calculate financial metrics
-                total_claims_amount = st.session_state.claims_amounts["Amount"].sum()
-
-                # Get only the matching schedules for finance amount
-                matching_schedules_only = reconciliation_report.dropna(subset=['Claims Amount', 'Finance Amount'])
-                matching_finance_amount = matching_schedules_only['Finance Amount'].sum()
-
-                # Calculate variance
-                total_variance = total_claims_amount - matching_finance_amount
-
-                # Display financial metrics
-                st.subheader("Financial Summary")
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Total Claims Amount", f"{total_claims_amount:,.2f}")
-                col2.metric("Matching Finance Amount", f"{matching_finance_amount:,.2f}",
-                           help="Total amount from Finance where schedules match with Claims")
-                col3.metric("Total Variance", f"{total_variance:,.2f}",
-                           delta=f"{(total_variance/total_claims_amount*100 if total_claims_amount else 0):.2f}%")
-
-                # Show detailed report
-                st.dataframe(formatted_report)
-
-                # Visualization
-                st.subheader("Visual Comparison")
-
-                # Filter out missing values for the visualization
-                vis_data = reconciliation_report.dropna()
-
-                if not vis_data.empty:
-                    # Scatter plot comparing amounts
-                    fig = px.scatter(
-                        vis_data, 
-                        x="Claims Amount", 
-                        y="Finance Amount",
-                        hover_data=["Schedule Number"],
-                        labels={
-                            "Claims Amount": "Amount Sent by Claims",
-                            "Finance Amount": "Amount Received by Finance"
-                        },
-                        title="Claims vs Finance Amounts"
-                    )
-
-                    # Add a diagonal line representing perfect match
-                    max_val = max(vis_data["Claims Amount"].max(), vis_data["Finance Amount"].max())
-                    fig.add_scatter(
-                        x=[0, max_val], 
-                        y=[0, max_val], 
-                        mode='lines', 
-                        line=dict(color='green', dash='dash'),
-                        name="Perfect Match"
-                    )
-
-                    st.plotly_chart(fig, use_container_width=True)
-
-                    # Bar chart for discrepancies
-                    if not amount_mismatch.empty:
-                        # Create comparative bar chart
-                        amount_mismatch_melted = pd.melt(
-                            amount_mismatch.reset_index(), 
-                            id_vars=["Schedule Number"],
-                            value_vars=["Claims Amount", "Finance Amount"],
-                            var_name="Department", 
-                            value_name="Amount"
-                        )
-
-                        fig2 = px.bar(
-                            amount_mismatch_melted,
-                            x="Schedule Number",
-                            y="Amount",
-                            color="Department",
-                            barmode="group",
-                            title="Schedules with Amount Discrepancies",
-                            labels={"Schedule Number": "Schedule Number", "Amount": "Amount"}
-                        )
-                        st.plotly_chart(fig2, use_container_width=True)
-                else:
-                    st.info("No data available for visualization after removing missing values.")
-
-                # Download section
-                st.header("Download Results")
-
-                # Enhanced Claims Excel button
-                if st.button("Generate Claims Data with Formula Columns"):
-                    st.session_state.generate_claims_excel = True
-                    st.rerun()
-
-                # Check if claims excel should be generated
-                if st.session_state.generate_claims_excel:
-                    with st.spinner("Generating Claims Excel with formula columns..."):
-                        try:
-                            # Generate the enhanced claims Excel
-                            enhanced_claims_excel = generate_enhanced_claims_excel(claims_df, claims_schedule_col, claims_amount_col)
-
-                            filename = f"Enhanced Claims Data with Formulas {pd.Timestamp.now().strftime('%d %b %Y')}.xlsx"
-
-                            st.download_button(
-                                label="📊 Download Enhanced Claims Excel",
-                                data=enhanced_claims_excel,
-                                file_name=filename,
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            )
-                            st.success("Enhanced Claims Excel generated successfully!")
-
-                            # Reset the flag
-                            st.session_state.generate_claims_excel = False
-                        except Exception as e:
-                            st.error(f"Error generating enhanced claims Excel: {str(e)}")
-                            st.session_state.generate_claims_excel = False
-
-                # Prepare data for Excel report
-                common_schedules = set(st.session_state.claims_amounts["Schedule Number"]).intersection(
-                    set(st.session_state.finance_amounts["Schedule Number"])
-                )
-
-                # Filter the reconciliation report to include only common schedules
-                matching_report = reconciliation_report[
-                    reconciliation_report["Schedule Number"].isin(common_schedules)
-                ].copy()
-
-                # Create a formatted reconciliation report
-                formatted_recon_df = pd.DataFrame({
-                    "Claim Batch No/Sch No": matching_report["Schedule Number"],
-                    "Year": pd.Timestamp.now().year,
-                    "Week Period": f"{pd.Timestamp.now().strftime('%d %b')} - {(pd.Timestamp.now() + pd.Timedelta(days=6)).strftime('%d %b')}",
-                    "Processing Platform": "MANUAL",
-                    "Claim Type": "FRESH CLAIM",
-                    "Claims_Advised_Amount": matching_report["Claims Amount"],
-                    "Finance_Recognized_Amount": matching_report["Finance Amount"],
-                    "Variance": matching_report["Difference"].apply(lambda x: f"{x:.2f}" if pd.notnull(x) else ""),
-                    "Comments": "",
-                    "Status": "",
-                })
-
-                # For amount mismatches among common schedules
-                if not amount_mismatch.empty:
-                    mismatch_schedules = amount_mismatch["Schedule Number"].tolist()
-                    formatted_recon_df.loc[formatted_recon_df["Claim Batch No/Sch No"].isin(mismatch_schedules), "Status"] = "Amount Mismatch"
-                    formatted_recon_df.loc[formatted_recon_df["Claim Batch No/Sch No"].isin(mismatch_schedules), "Comments"] = "Variance in reported amounts"
-
-                # Sort by schedule number
-                formatted_recon_df = formatted_recon_df.sort_values("Claim Batch No/Sch No")
-
-                # Generate Excel file for download
-                excel_output = io.BytesIO()
-                with pd.ExcelWriter(excel_output, engine='openpyxl') as writer:
-                    # Write to Excel - main reconciliation report sheet
-                    workbook = writer.book
-                    worksheet = workbook.create_sheet('Claims Reconciliation Report')
-                    title_cell = worksheet.cell(row=1, column=1, value='BI Unit - Claims Received Weekly Report')
-                    title_cell.font = openpyxl.styles.Font(bold=True)
-
-                    # Add all the data starting from row 2
-                    for r_idx, row in enumerate(openpyxl.utils.dataframe.dataframe_to_rows(formatted_recon_df, index=False, header=True), 2):
-                        for c_idx, value in enumerate(row, 1):
-                            worksheet.cell(row=r_idx, column=c_idx, value=value)
-
-                    # Also include the detailed sheets for reference
-                    if not missing_in_finance.empty:
-                        missing_in_finance.to_excel(writer, sheet_name='Missing in Finance', index=False)
-                    if not missing_in_claims.empty:
-                        missing_in_claims.to_excel(writer, sheet_name='Missing in Claims', index=False)
-                    if not amount_mismatch.empty:
-                        amount_mismatch.to_excel(writer, sheet_name='Amount Discrepancies', index=False)
-
-                excel_output.seek(0)
-
-                # Excel download
-                st.download_button(
-                    label="📊 Download Excel Report",
-                    data=excel_output,
-                    file_name=f"BI Unit - Claims Reconciliation Weekly Report {pd.Timestamp.now().strftime('%d %b %Y')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-
-                # Summary
-                st.header("Reconciliation Summary")
-
-                # Create a DataFrame for the pie chart
-                labels = ['Matching Amounts', 'Missing in Finance', 'Amount Mismatches']
-                values = [
-                    matching_schedules, 
-                    len(missing_in_finance), 
-                    discrepancies - len(missing_in_finance)
-                ]
-                values = [max(0, v) for v in values]
-
-                if sum(values) > 0:
-                    fig = px.pie(
-                        names=labels, 
-                        values=values,
-                        title="Distribution of Claims Reconciliation Issues",
-                        color_discrete_sequence=px.colors.qualitative.Safe
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-
-                st.markdown(f"""
-                ### Key Metrics:
-                - **Total Claims Schedules**: {total_claims_schedules}
-                - **Schedules with Matching Amounts**: {matching_schedules} ({matching_schedules/total_claims_schedules*100:.1f}% of Claims total)
-                - **Total Discrepancies**: {discrepancies} ({discrepancies/total_claims_schedules*100:.1f}% of Claims total)
-
-                ### Critical Issues:
-                - **Schedules Missing in Finance**: {len(missing_in_finance)} 
-                  - Total amount missing: {missing_in_finance["Amount"].sum():,.2f}
-
-                ### Financial Analysis:
-                - **Total Claims Amount**: {total_claims_amount:,.2f}
-                - **Matching Finance Amount**: {matching_finance_amount:,.2f} (only from schedules present in both)
-                - **Total Amount Variance**: {total_variance:,.2f} ({(total_variance/total_claims_amount*100 if total_claims_amount else 0):.2f}% of Claims total)
-
-                ### Other Issues:
-                - **Amount Mismatches in Common Schedules**: {len(amount_mismatch)}
-                """)
+# File upload section
+_render_intake()
+claims_file = session_store().get('uploaded_claims_file')
+finance_file = session_store().get('uploaded_finance_file')
 
+# Process files when both are uploaded
+if claims_file and finance_file:
+    try:
+        _render_selection(claims_file, finance_file)
+        _render_results()
+        _render_charts()
+        _render_downloads()
+        _render_summary()
     except Exception as e:
         st.error(f"Error processing files: {str(e)}")
         st.error("Please ensure you've selected the correct sheets and columns.")
@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pandas as pd
+import numpy as np
+from decimal import Decimal, ROUND_HALF_UP
+from hypothesis import given, strategies as st
+from amounts import to_kobo, from_kobo, kobo_to_decimal, to_decimal, amounts_differ, total_amount
+from utils import calculate_schedule_amounts, generate_reconciliation_report
+
+
+def _reference_kobo(text):
+    return int(Decimal(text).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP) * 100)
+
+
+class TestToKobo:
+    def test_parses_formatted_strings(self):
+        values = pd.Series(["1,234.50", "(1,234.50)", " 12 ", ".5", "1.005", "NIL", "", None, "abc", "1e3"])
+        assert to_kobo(values).tolist() == [123450, -123450, 1200, 50, 101, pd.NA, pd.NA, pd.NA, pd.NA, 100000]
+
+    def test_currency_and_index_are_kept_apart(self):
+        values = pd.Series(["₦1,234.50", "NGN 5", "(₦10)", 7, "NIL"], index=[4, 4, 2, 2, 0], dtype=object)
+        kobo = to_kobo(values)
+        assert kobo.tolist() == [123450, 500, -1000, 700, pd.NA] and kobo.index.tolist() == [4, 4, 2, 2, 0]
+
+    def test_numeric_and_mixed_columns(self):
+        assert to_kobo(pd.Series([0.1, 2.675, np.nan])).tolist() == [10, 268, pd.NA]
+        assert to_kobo(pd.Series([3, "4.10", Decimal("7.125")], dtype=object)).tolist() == [300, 410, 713]
+
+    def test_round_trip_and_decimal(self):
+        assert from_kobo(to_kobo(["0.10", "0.20"])).sum() == 0.30000000000000004  # display floats only
+        assert total_amount(["0.10", "0.20"]) == 0.3
+        assert kobo_to_decimal(-123450) == Decimal("-1234.50")
+        assert to_decimal("(1,234.505)") == Decimal("-1234.51")
+
+    @given(st.lists(st.decimals(min_value=-10**12, max_value=10**12, places=3, allow_nan=False), min_size=1))
+    def test_string_parsing_matches_decimal(self, amounts):
+        texts = [f"{a:,.3f}" for a in amounts]
+        kobo = to_kobo(pd.Series(texts))
+        assert kobo.tolist() == [_reference_kobo(t.replace(",", "")) for t in texts]
+        assert int(kobo.sum()) == sum(_reference_kobo(t.replace(",", "")) for t in texts)
+
+    @given(st.lists(st.decimals(min_value=-10**9, max_value=10**9, places=2, allow_nan=False), min_size=1))
+    def test_float_inputs_match_decimal(self, amounts):
+        kobo = to_kobo(pd.Series([float(a) for a in amounts]))
+        assert kobo.tolist() == [int(a * 100) for a in amounts]
+
+
+class TestExactComparison:
+    def test_float_noise_is_not_a_mismatch(self):
+        claims = pd.DataFrame({"Schedule Number": ["A"] * 3 + ["B"], "Amount": [0.1, 0.1, 0.1, 5.0]})
+        finance = pd.DataFrame({"Schedule Number": ["A", "B"], "Amount": [0.3, 5.01]})
+        report = generate_reconciliation_report(calculate_schedule_amounts(claims), finance)
+        assert report["Difference"].tolist() == [0.0, -0.01]
+        assert amounts_differ(report["Claims Amount"], report["Finance Amount"]).tolist() == [False, True]
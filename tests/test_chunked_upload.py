@@ -0,0 +1,74 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import sqlite3
+import pytest
+from chunked_upload import (
+    ensure_load_tables, start_or_resume_load, load_chunks, finalize_load, find_resumable_loads,
+)
+
+COLUMNS = ['SCH_NO', 'AMOUNT']
+COL_DEFS = ['SCH_NO TEXT', 'AMOUNT DECIMAL(18,2) CHECK (AMOUNT >= 0)']
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE claimstbl ({', '.join(COL_DEFS)})")
+    ensure_load_tables(conn, "claimstbl", COL_DEFS)
+    yield conn
+    conn.close()
+
+
+def _rows(n, bad_row=None):
+    return [(str(i), -1.0 if i == bad_row else float(i)) for i in range(1, n + 1)], list(range(1, n + 1))
+
+
+class TestChunkedUpload:
+    def test_loads_and_finalizes(self, conn):
+        rows, row_numbers = _rows(5)
+        checkpoint = start_or_resume_load(conn, "claimstbl", "a.xlsx", "h1", 5, chunk_size=2)
+        assert load_chunks(conn, "claimstbl", checkpoint, COLUMNS, rows, row_numbers) == []
+        assert conn.execute("SELECT COUNT(*) FROM claimstbl").fetchone()[0] == 0
+        assert finalize_load(conn, "claimstbl", checkpoint, COLUMNS) == 5
+        assert conn.execute("SELECT COUNT(*) FROM claimstbl").fetchone()[0] == 5
+        assert find_resumable_loads(conn, "claimstbl") == []
+
+    def test_failed_chunk_keeps_earlier_chunks_and_resumes(self, conn):
+        rows, row_numbers = _rows(5, bad_row=4)
+        checkpoint = start_or_resume_load(conn, "claimstbl", "a.xlsx", "h1", 5, chunk_size=2)
+        failed = load_chunks(conn, "claimstbl", checkpoint, COLUMNS, rows, row_numbers)
+        assert [row_no for row_no, _ in failed] == [4]
+        assert checkpoint["chunks_done"] == 1
+
+        fixed_rows, _ = _rows(5)
+        resumed = start_or_resume_load(conn, "claimstbl", "a.xlsx", "h2", 5, chunk_size=2,
+                                       resume_load_id=checkpoint["load_id"])
+        assert resumed["chunks_done"] == 1
+        chunks_seen = []
+        load_chunks(conn, "claimstbl", resumed, COLUMNS, fixed_rows, row_numbers,
+                    on_progress=lambda done, total: chunks_seen.append(done))
+        assert chunks_seen == [2, 3]
+        finalize_load(conn, "claimstbl", resumed, COLUMNS)
+        assert conn.execute("SELECT SUM(AMOUNT) FROM claimstbl").fetchone()[0] == 15
+
+    def test_interrupted_load_resumes_same_file(self, conn):
+        rows, row_numbers = _rows(6)
+        checkpoint = start_or_resume_load(conn, "claimstbl", "a.xlsx", "h1", 6, chunk_size=2)
+
+        def interrupt(done, total):
+            raise Interrupted()
+
+        with pytest.raises(Interrupted):
+            load_chunks(conn, "claimstbl", checkpoint, COLUMNS, rows, row_numbers, on_progress=interrupt)
+
+        resumed = start_or_resume_load(conn, "claimstbl", "a.xlsx", "h1", 6, chunk_size=2)
+        assert resumed["load_id"] == checkpoint["load_id"]
+        assert resumed["chunks_done"] == 1
+        load_chunks(conn, "claimstbl", resumed, COLUMNS, rows, row_numbers)
+        assert finalize_load(conn, "claimstbl", resumed, COLUMNS) == 6
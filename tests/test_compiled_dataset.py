@@ -0,0 +1,87 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pandas as pd
+import compilation_common
+from compilation_common import CompiledDataset, compile_files, compare_with_finance, COMPILATION_CONFIGS
+from upload_handle import spool_upload
+
+
+def _summary_csv(name, amounts, providers=None):
+    providers = providers or ["LIFELINE HOSPITAL"] * len(amounts)
+    summary = pd.DataFrame({
+        "S/N": list(range(1, len(amounts) + 1)),
+        "PROVIDER NAME": providers,
+        "AMOUNT RECOMMENDED FOR PAYMENT (N)": amounts,
+    })
+    return spool_upload(summary.to_csv(index=False).encode(), name=name)
+
+def _finance(rows):
+    finance = pd.DataFrame(rows, columns=["Claim Batch No/Sch No", "Claims_Advised_Amount"])
+    return spool_upload(finance.to_csv(index=False).encode(), name="finance.csv")
+
+
+class TestCompileFiles:
+    def test_tags_schedule_at_compile_time(self):
+        compiled, summaries = compile_files([_summary_csv("SCH 9820 LIFELINE.csv", [100, 50]),
+                                             _summary_csv("Appeals Schedule 9821.csv", [5])])
+        assert [s["Schedule"] for s in summaries] == ["9820", "9821"]
+        assert isinstance(compiled, CompiledDataset)
+        assert compiled.file_count == 2 and len(compiled) == 3
+        assert compiled.schedule.astype(str).tolist() == ["9820", "9820", "9821"]
+
+    def test_keeps_decimal_amounts(self):
+        compiled, _ = compile_files([_summary_csv("SCH 1.csv", [1500.75, 200.0])])
+        assert compiled.frame["AMOUNT_RECOMMENDED_FOR_PAYMENT_N"].tolist() == ["1500.75", "200"]
+        assert compiled.amount_kobo.tolist() == [150075, 20000]
+
+    def test_values_stay_aligned_when_rows_are_skipped(self):
+        # The TOTAL row in the middle is dropped; later rows must not shift or go blank
+        handle = _summary_csv("SCH 2.csv", [10, 99, 20], ["A", "TOTAL", "B"])
+        compiled, summaries = compile_files([handle])
+        kept = compiled.frame[compiled.frame["HOSPITAL"] != "TOTAL"]
+        assert dict(zip(kept["HOSPITAL"], kept["AMOUNT_RECOMMENDED_FOR_PAYMENT_N"])) == {"A": "10", "B": "20"}
+
+    def test_no_valid_files_gives_empty_dataset(self):
+        compiled = CompiledDataset()
+        assert not compiled and len(compiled) == 0
+        assert compiled.schedule_totals.empty
+        assert list(compiled.frame.columns) == compilation_common.TEMPLATE_COLUMNS
+
+    def test_duplicate_uploads_compile_once(self):
+        first = _summary_csv("SCH 50.csv", [100])
+        copy = spool_upload(first.open().read(), name="SCH 50 (1).csv")
+        compiled, summaries = compile_files([first, copy])
+        assert compiled.file_count == 1
+        assert summaries[1]["Status"] == "Skipped: duplicate of SCH 50.csv"
+        assert compiled.schedule_totals["Kobo"].tolist() == [10000]
+
+
+class TestDerivedViews:
+    def test_schedule_totals_sum_exact_kobo(self):
+        compiled, _ = compile_files([_summary_csv("SCH 7.csv", [0.10, 0.20]),
+                                     _summary_csv("SCH 7 part 2.csv", [1.05]),
+                                     _summary_csv("no schedule.csv", [9])])
+        totals = compiled.schedule_totals
+        assert totals["Schedule_Number"].tolist() == ["7"]
+        assert totals["Kobo"].tolist() == [135]
+        assert totals["Source_Files"].tolist() == ["SCH 7.csv, SCH 7 part 2.csv"]
+        assert compiled.source_files == ["SCH 7.csv", "SCH 7 part 2.csv", "no schedule.csv"]
+
+    def test_views_are_computed_once(self):
+        compiled, _ = compile_files([_summary_csv("SCH 3.csv", [1])])
+        assert compiled.schedule_totals is compiled.schedule_totals
+
+    def test_schedules_default_to_source_file_names(self):
+        frame = pd.DataFrame({"Source_File": ["SCH 11.xlsx"], "AMOUNT_RECOMMENDED_FOR_PAYMENT_N": ["4.50"]})
+        assert CompiledDataset([frame]).schedule_totals["Kobo"].tolist() == [450]
+
+
+class TestCompareWithFinance:
+    def test_uses_cached_totals(self):
+        compiled, _ = compile_files([_summary_csv("SCH 40.csv", [100.5]), _summary_csv("SCH 41.csv", [20])])
+        comparison = compare_with_finance(compiled, _finance([["40", 100.5], ["41", 15.0], ["41", 2.0]]),
+                                          COMPILATION_CONFIGS["appeals"])
+        assert comparison["Schedule_Number"].tolist() == ["40", "41"]
+        assert comparison["Variance"].tolist() == [0.0, 3.0]
@@ -0,0 +1,86 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pandas as pd
+import pytest
+from decimal import Decimal
+from db_backend import get_backend, backend_for, SqlServerBackend, SqliteBackend
+from db_upload_common import _get_connection, _clean_rows, _plan_column_types, _prepare_table
+from delta_load import load_delta
+
+
+@pytest.fixture
+def sqlite_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("DB_SQLITE_PATH", str(tmp_path / "uploads.db"))
+
+
+class TestGetBackend:
+    def test_defaults_to_sql_server(self, monkeypatch):
+        monkeypatch.delenv("DB_BACKEND", raising=False)
+        assert isinstance(get_backend(), SqlServerBackend)
+
+    def test_sqlite_from_environment(self, sqlite_env):
+        backend = get_backend()
+        assert isinstance(backend, SqliteBackend)
+        assert backend.path.endswith("uploads.db")
+        conn = _get_connection()
+        assert isinstance(backend_for(conn), SqliteBackend)
+        conn.close()
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            get_backend("oracle")
+
+
+class TestDialects:
+    def test_column_type_mapping(self):
+        assert SqlServerBackend().column_type("NVARCHAR(MAX)") == "NVARCHAR(MAX)"
+        assert SqliteBackend(":memory:").column_type("SCH_NO VARCHAR(MAX)") == "SCH_NO TEXT"
+        assert SqliteBackend(":memory:").column_type("VARCHAR(64)") == "VARCHAR(64)"
+
+    def test_temp_tables(self):
+        assert SqlServerBackend().temp_table("stage") == "#stage"
+        assert SqliteBackend(":memory:").temp_table("stage") == "temp.stage"
+
+    def test_sql_server_merges_in_one_statement(self):
+        statements = SqlServerBackend().merge_statements("t", "s", "K", "D", ["A", "K", "D"], ["A", "D"])
+        assert len(statements) == 1 and statements[0].strip().startswith("MERGE INTO t WITH (HOLDLOCK)")
+
+
+class TestLocalPipeline:
+    def test_upload_and_consolidate_on_sqlite(self, sqlite_env):
+        df = pd.DataFrame({"SCH NO": [101.0, 102.0], "AMOUNT": ["1,000.50", "20"], "NOTES": ["x" * 5000, None]})
+        mapping = {"SCH NO": "SCH_NO", "AMOUNT": "AMOUNT", "NOTES": "NOTES"}
+        db_columns = list(mapping.values())
+        numeric = {"AMOUNT": "DECIMAL(18,2)"}
+        rows, _, failed = _clean_rows(df, mapping, db_columns, [], numeric)
+        assert failed == []
+        column_types = _plan_column_types(rows, db_columns, [], numeric)
+        assert column_types["NOTES"] == "VARCHAR(MAX)"
+
+        backend = get_backend()
+        conn = backend.connect()
+        for table in ["claimstbl", "mastersheet"]:
+            _prepare_table(conn, table, column_types, ["SCH_NO"], columnstore=True)
+        backend.bulk_insert(conn, "claimstbl", db_columns, rows, batch_size=1)
+        backend.consolidate(conn, "claimstbl", "mastersheet", db_columns)
+        conn.commit()
+
+        assert conn.execute("SELECT SCH_NO, AMOUNT FROM mastersheet ORDER BY SCH_NO").fetchall() == [
+            ("101", 1000.5), ("102", 20.0)
+        ]
+        conn.close()
+
+    def test_delta_merge_on_sqlite(self, sqlite_env):
+        backend = get_backend()
+        conn = backend.connect()
+        backend.create_table(conn, "claimstbl", {"SCH_NO": "VARCHAR(MAX)", "AMOUNT": "DECIMAL(18,2)"})
+        load_delta(conn, "claimstbl", ["SCH_NO", "AMOUNT"], ["SCH_NO VARCHAR(MAX)", "AMOUNT DECIMAL(18,2)"],
+                   [("1", Decimal("5.00"))], ["SCH_NO"])
+        result = load_delta(conn, "claimstbl", ["SCH_NO", "AMOUNT"], ["SCH_NO VARCHAR(MAX)", "AMOUNT DECIMAL(18,2)"],
+                            [("1", Decimal("7.25")), ("2", Decimal("1.00"))], ["SCH_NO"])
+        assert result["claimstbl"]["inserted"] == 1 and result["claimstbl"]["updated"] == 1
+        assert conn.execute("SELECT SUM(AMOUNT) FROM claimstbl").fetchone()[0] == 8.25
+        conn.close()
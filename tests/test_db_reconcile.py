@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import sqlite3
+import pytest
+import pandas as pd
+from datetime import datetime
+from db_reconcile import (
+    RECON_SOURCES, fetch_schedule_amounts, reconcile_in_database, stage_finance_amounts,
+)
+
+SOURCE = RECON_SOURCES["claims"]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE claimstbl (SCH_NO TEXT, HOD_RECOMMD_AMOUNT DECIMAL(18,2), DATE_CLAIM_RECEIVED datetime2)")
+    conn.executemany(
+        "INSERT INTO claimstbl VALUES (?, ?, ?)",
+        [
+            ("100", 50.0, "2026-01-05 00:00:00"),
+            ("100", 25.5, "2026-01-06 00:00:00"),
+            (" 200 ", 300.0, "2026-02-01 00:00:00"),
+            ("300", 10.0, "2025-12-30 00:00:00"),
+            (None, 99.0, "2026-01-05 00:00:00"),
+        ],
+    )
+    yield conn
+    conn.close()
+
+
+class TestFetchScheduleAmounts:
+    def test_groups_in_database(self, conn):
+        result = fetch_schedule_amounts(conn, SOURCE, chunk_size=1)
+        totals = dict(zip(result["Schedule Number"], result["Amount"]))
+        assert totals == {"100": 75.5, "200": 300.0, "300": 10.0}
+        assert result.set_index("Schedule Number").loc["100", "Lines"] == 2
+
+    def test_date_filter(self, conn):
+        result = fetch_schedule_amounts(conn, SOURCE, date_from=datetime(2026, 1, 1))
+        assert set(result["Schedule Number"]) == {"100", "200"}
+
+
+class TestReconcileInDatabase:
+    def test_matches_pandas_structures(self, conn):
+        finance = pd.DataFrame({"Schedule Number": ["100", "400"], "Amount": [75.5, 12.0]})
+        result = reconcile_in_database(conn, SOURCE, finance, chunk_size=2)
+
+        assert list(result["missing_in_finance"]["Schedule Number"]) == ["200", "300"]
+        assert list(result["missing_in_claims"]["Schedule Number"]) == ["400"]
+        report = result["reconciliation_report"]
+        assert list(report.columns) == ["Schedule Number", "Claims Amount", "Finance Amount", "Difference"]
+        assert report.set_index("Schedule Number").loc["100", "Difference"] == 0.0
+
+    def test_stage_is_replaced(self, conn):
+        stage_finance_amounts(conn, pd.DataFrame({"Schedule Number": ["1"], "Amount": [1.0]}))
+        stage = stage_finance_amounts(conn, pd.DataFrame({"Schedule Number": ["2"], "Amount": [2.0]}))
+        assert conn.execute(f"SELECT schedule_no FROM {stage}").fetchall() == [("2",)]
@@ -0,0 +1,30 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pandas as pd
+from datetime import datetime
+from db_upload_common import _clean_rows
+
+
+class TestCleanRows:
+    def test_orders_and_cleans_values(self):
+        df = pd.DataFrame({
+            "SCH NO": [9820.0, 17.0],
+            "AMOUNT": ["1,234.50", ""],
+            "DATE": ["05/01/2026", None],
+        })
+        mapping = {"SCH NO": "SCH_NO", "DATE": "ENC_DATE", "AMOUNT": "AMOUNT", "EXTRA": "EXTRA"}
+        rows, row_numbers, failed = _clean_rows(
+            df, mapping, list(mapping.values()), ["ENC_DATE"], {"AMOUNT": "DECIMAL(18,2)"}
+        )
+        assert failed == []
+        assert row_numbers == [1, 2]
+        assert rows[0] == ("9820", datetime(2026, 1, 5), 1234.5, None)
+        assert rows[1] == ("17", None, None, None)
+
+    def test_reports_failed_row_numbers(self):
+        df = pd.DataFrame({"DATE": ["05/01/2026", "not a date", "2026-01-07"]})
+        rows, row_numbers, failed = _clean_rows(df, {"DATE": "ENC_DATE"}, ["ENC_DATE"], ["ENC_DATE"], {})
+        assert row_numbers == [1, 3]
+        assert [row_no for row_no, _ in failed] == [2]
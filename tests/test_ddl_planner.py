@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import sqlite3
+from ddl_planner import (
+    profile_text_columns, text_type, plan_column_types, plan_alter_statements,
+    apply_column_widening, apply_indexes, column_definitions,
+)
+
+
+class TestProfileAndPlan:
+    def test_profile_lengths_and_unicode(self):
+        rows = [("12345", "Adé", None), ("1", "Bob", None)]
+        profile = profile_text_columns(rows, ["SCH_NO", "NAME", "BLANK"], ["SCH_NO", "NAME", "BLANK"])
+        assert profile == {"SCH_NO": (5, False), "NAME": (3, True), "BLANK": (0, False)}
+
+    def test_text_type_buckets(self):
+        assert text_type(5, False) == "VARCHAR(16)"
+        assert text_type(17, True) == "NVARCHAR(32)"
+        assert text_type(0, False) == "VARCHAR(256)"
+        assert text_type(5000, False) == "VARCHAR(MAX)"
+
+    def test_plan_column_types(self):
+        types = plan_column_types(
+            ["SCH_NO", "AMOUNT", "ENC_DATE", "NOTES"], ["ENC_DATE"], {"AMOUNT": "DECIMAL(18,2)"},
+            {"SCH_NO": (6, False)},
+        )
+        assert types == {"SCH_NO": "VARCHAR(16)", "AMOUNT": "DECIMAL(18,2)",
+                         "ENC_DATE": "datetime2", "NOTES": "VARCHAR(MAX)"}
+
+
+class TestPlanAlterStatements:
+    def test_widens_but_never_narrows(self):
+        existing = {"A": "VARCHAR(32)", "B": "VARCHAR(128)", "C": "VARCHAR(MAX)"}
+        planned = {"A": "VARCHAR(64)", "B": "VARCHAR(16)", "C": "VARCHAR(16)"}
+        assert plan_alter_statements("t", existing, planned) == ["ALTER TABLE t ALTER COLUMN A VARCHAR(64) NULL"]
+
+    def test_switch_to_nvarchar_drops_dependent_index(self):
+        statements = plan_alter_statements("claimstbl", {"SCH_NO": "VARCHAR(64)"}, {"SCH_NO": "NVARCHAR(16)"},
+                                           index_columns=["SCH_NO"])
+        assert statements == [
+            "DROP INDEX IF EXISTS IX_claimstbl_SCH_NO ON claimstbl",
+            "ALTER TABLE claimstbl ALTER COLUMN SCH_NO NVARCHAR(64) NULL",
+        ]
+
+    def test_adds_missing_columns(self):
+        assert plan_alter_statements("t", {"A": "VARCHAR(16)"}, {"A": "VARCHAR(16)", "B": "datetime2"}) == [
+            "ALTER TABLE t ADD B datetime2"
+        ]
+
+
+class TestApplyOnSqlite:
+    def test_adds_columns_and_indexes(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute(f"CREATE TABLE claimstbl ({', '.join(column_definitions({'SCH_NO': 'VARCHAR(16)'}))})")
+        executed = apply_column_widening(conn, "claimstbl", {"SCH_NO": "VARCHAR(64)", "MEMBER_NO": "VARCHAR(32)"})
+        assert executed == ["ALTER TABLE claimstbl ADD MEMBER_NO VARCHAR(32)"]
+        assert apply_indexes(conn, "claimstbl", ["SCH_NO", "MEMBER_NO", "ClaimNo"]) == ["ClaimNo"]
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(claimstbl)")}
+        assert indexes == {"IX_claimstbl_SCH_NO", "IX_claimstbl_MEMBER_NO"}
@@ -0,0 +1,111 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import dedup_index
+from dedup_index import HashIndex, claim_identities, claim_index, find_known_claims, hash_keys, CLAIM_INDEX
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup_index, "DEDUP_DIR", str(tmp_path / "dedup"))
+
+
+def _claims():
+    return pd.DataFrame({
+        "MEMBER NO": [12345.0, 12345.0, "AB/77", 12345.0],
+        "ENROLLEE NAME": ["ADA OBI", "ADA OBI", "JOHN DOE", "ADA OBI"],
+        "ENCOUNTER DATE (DD/MM/YYYY)": ["05/03/2024", "05/03/2024", datetime(2024, 11, 9), "bad date"],
+    })
+
+
+class TestClaimIdentities:
+    def test_builds_correct_claimno_like_the_workbook_formula(self):
+        # member number, DDMMYY of the encounter, then the line's place in its run of the same enrollee
+        assert claim_identities(_claims()).tolist() == ["12345050324" "1", "12345050324" "2", "AB/77091124" "1", None]
+
+    def test_prefers_filled_in_correct_claimno(self):
+        claims = _claims().assign(Correct_ClaimNo=["X1", "", None, 99.0])
+        assert claim_identities(claims).tolist() == ["X1", "123450503242", "AB/770911241", "99"]
+
+    def test_without_key_columns_nothing_is_identified(self):
+        assert claim_identities(pd.DataFrame({"AMOUNT": [1, 2]})).isna().all()
+
+
+class TestHashIndex:
+    def test_contains_after_add_and_reload(self):
+        index = HashIndex(CLAIM_INDEX)
+        assert index.add(["A1", "B2", "A1", None]) == 2
+        reloaded = HashIndex(CLAIM_INDEX)
+        assert len(reloaded) == 2
+        assert reloaded.contains(["B2", "C3", None, "A1"]).tolist() == [True, False, False, True]
+        assert np.all(np.diff(reloaded.hashes) >= 0)
+
+    def test_add_only_counts_new_identities(self):
+        HashIndex(CLAIM_INDEX).add(["A1"])
+        assert HashIndex(CLAIM_INDEX).add(["A1", "B2"]) == 1
+
+    def test_concurrent_instances_do_not_lose_adds(self):
+        first, second = HashIndex(CLAIM_INDEX), HashIndex(CLAIM_INDEX)
+        first.add(["A1"])
+        second.add(["B2"])
+        assert HashIndex(CLAIM_INDEX).contains(["A1", "B2"]).all()
+
+    def test_hash_hits_are_confirmed_against_the_identity(self):
+        index = HashIndex(CLAIM_INDEX)
+        index.add(["A1"])
+        # Forge a collision: a different identity stored under A1's hash
+        index.keys = np.array(["not A1"], dtype=object)
+        assert index.contains(["A1"]).tolist() == [False]
+
+    def test_colliding_hashes_are_searched_exactly(self):
+        index = HashIndex(CLAIM_INDEX)
+        index.hashes = np.repeat(hash_keys(["A1"]), 2)
+        index.keys = np.array(["other", "A1"], dtype=object)
+        assert index.contains(["A1"]).tolist() == [True]
+
+    def test_rebuild_replaces_the_index(self):
+        index = HashIndex(CLAIM_INDEX)
+        index.add(["A1"])
+        assert index.rebuild(["B2", "B2", "C3"]) == 2
+        assert HashIndex(CLAIM_INDEX).contains(["A1", "B2", "C3"]).tolist() == [False, True, True]
+
+    def test_large_lookup_is_vectorised(self):
+        index = HashIndex(CLAIM_INDEX)
+        index.rebuild([f"M{i}" for i in range(200_000)])
+        found = HashIndex(CLAIM_INDEX).contains([f"M{i}" for i in range(199_990, 200_010)])
+        assert found.tolist() == [True] * 10 + [False] * 10
+
+    def test_file_loads_without_pickle(self):
+        HashIndex(CLAIM_INDEX).add(["A1", "B22"])
+        with np.load(HashIndex(CLAIM_INDEX).path) as stored:
+            assert stored["keys"].dtype.kind == "U" and sorted(stored["keys"]) == ["A1", "B22"]
+
+    def test_reads_indexes_saved_with_object_keys(self):
+        os.makedirs(dedup_index.DEDUP_DIR)
+        np.savez(os.path.join(dedup_index.DEDUP_DIR, f"{CLAIM_INDEX}.npz"),
+                 hashes=hash_keys(["A1"]), keys=np.array(["A1"], dtype=object))
+        assert HashIndex(CLAIM_INDEX).contains(["A1"]).tolist() == [True]
+
+
+class TestClaimIndex:
+    def test_shared_until_the_file_changes(self):
+        first = claim_index()
+        first.add(["A1"])
+        assert claim_index() is first
+        HashIndex(CLAIM_INDEX).add(["B2"])  # e.g. another process
+        second = claim_index()
+        assert second is not first and second.contains(["A1", "B2"]).all()
+
+
+class TestFindKnownClaims:
+    def test_flags_claims_loaded_before(self):
+        claims = _claims()
+        HashIndex(CLAIM_INDEX).add(claim_identities(claims.iloc[:2]))
+        identities, known = find_known_claims(claims)
+        assert known.tolist() == [True, True, False, False]
+        assert identities.iloc[2] == "AB/770911241"
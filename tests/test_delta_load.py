@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import sqlite3
+import pytest
+import pandas as pd
+from datetime import datetime
+from delta_load import compute_row_hashes, load_delta, stage_table_name, ROW_KEY
+
+DB_COLUMNS = ['SCH_NO', 'MEMBER_NO', 'SERVICE', 'AMOUNT']
+COL_DEFS = ['SCH_NO TEXT', 'MEMBER_NO TEXT', 'SERVICE TEXT', 'AMOUNT DECIMAL(18,2)']
+NATURAL_KEY = ['SCH_NO', 'MEMBER_NO', 'SERVICE']
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE claimstbl ({', '.join(COL_DEFS)})")
+    conn.execute(f"CREATE TABLE [Consolidated Mastersheet] ({', '.join(COL_DEFS)})")
+    yield conn
+    conn.close()
+
+
+class TestComputeRowHashes:
+    def test_key_ignores_non_key_columns(self):
+        frame = pd.DataFrame([("1", "M1", "X", 10.0), ("1", "M1", "X", 12.0)], columns=DB_COLUMNS)
+        keys, digests = compute_row_hashes(frame.iloc[[0]], NATURAL_KEY)
+        keys2, digests2 = compute_row_hashes(frame.iloc[[1]], NATURAL_KEY)
+        assert keys[0] == keys2[0]
+        assert digests[0] != digests2[0]
+
+    def test_repeated_keys_get_distinct_ordinals(self):
+        frame = pd.DataFrame([("1", "M1", "X", 10.0)] * 3, columns=DB_COLUMNS)
+        keys, _ = compute_row_hashes(frame, NATURAL_KEY)
+        assert len(set(keys)) == 3
+
+    def test_numbers_and_dates_hash_canonically(self):
+        a = pd.DataFrame([(1, datetime(2026, 1, 2), None, 5)], columns=DB_COLUMNS)
+        b = pd.DataFrame([(1.0, datetime(2026, 1, 2), None, 5.0)], columns=DB_COLUMNS)
+        assert compute_row_hashes(a, NATURAL_KEY)[1][0] == compute_row_hashes(b, NATURAL_KEY)[1][0]
+
+
+class TestLoadDelta:
+    def test_initial_then_incremental(self, conn):
+        week1 = [("1", "M1", "X", 10.0), ("1", "M2", "Y", 20.0)]
+        result = load_delta(conn, "claimstbl", DB_COLUMNS, COL_DEFS, week1, NATURAL_KEY,
+                            consolidate_target="[Consolidated Mastersheet]")
+        assert result["claimstbl"]["inserted"] == 2
+
+        week2 = [("1", "M1", "X", 10.0), ("1", "M2", "Y", 25.0), ("2", "M3", "Z", 5.0)]
+        result = load_delta(conn, "claimstbl", DB_COLUMNS, COL_DEFS, week2, NATURAL_KEY,
+                            consolidate_target="[Consolidated Mastersheet]")
+        for target in ["claimstbl", "[Consolidated Mastersheet]"]:
+            assert result[target]["inserted"] == 1
+            assert result[target]["updated"] == 1
+            rows = conn.execute(f"SELECT MEMBER_NO, AMOUNT FROM {target} ORDER BY MEMBER_NO").fetchall()
+            assert rows == [("M1", 10), ("M2", 25), ("M3", 5)]
+
+    def test_reloading_same_file_is_noop(self, conn):
+        rows = [("1", "M1", "X", 10.0)]
+        load_delta(conn, "claimstbl", DB_COLUMNS, COL_DEFS, rows, NATURAL_KEY)
+        result = load_delta(conn, "claimstbl", DB_COLUMNS, COL_DEFS, rows, NATURAL_KEY)
+        assert result["claimstbl"] == {"inserted": 0, "updated": 0, "unkeyed": 0}
+        assert conn.execute("SELECT COUNT(*) FROM claimstbl").fetchone()[0] == 1
+
+    def test_reports_legacy_rows(self, conn):
+        conn.execute("INSERT INTO claimstbl VALUES ('9', 'M9', 'Q', 1)")
+        result = load_delta(conn, "claimstbl", DB_COLUMNS, COL_DEFS, [("1", "M1", "X", 10.0)], NATURAL_KEY)
+        assert result["claimstbl"]["unkeyed"] == 1
+        assert conn.execute(f"SELECT COUNT(*) FROM claimstbl WHERE {ROW_KEY} IS NOT NULL").fetchone()[0] == 1
+
+    def test_stage_table_name(self):
+        assert stage_table_name("claimstbl") == "claimstbl_stage"
+        assert stage_table_name("[Claims Mastersheet]") == "[Claims Mastersheet_stage]"
@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import gzip
+import io
+import json
+import zipfile
+import pandas as pd
+import pytest
+import exports
+from exports import parquet_bytes, csv_gz_bytes, bundle_bytes, export_file, cached_exports, frames_digest
+
+
+def _report():
+    return pd.DataFrame({
+        "Schedule Number": ["00123", "456", "789"],
+        "Claims Amount": [1500.25, 200.0, None],
+        "Count": [3, 1, 2],
+        "Date": pd.to_datetime(["2024-01-05", "2024-01-06", None]),
+    })
+
+
+class TestParquet:
+    def test_roundtrip(self):
+        df = _report()
+        back = pd.read_parquet(io.BytesIO(parquet_bytes(df)))
+        pd.testing.assert_frame_equal(back, df, check_dtype=False)
+
+    def test_mixed_object_column_is_written_as_text(self):
+        df = pd.DataFrame({"SCH NO": ["A1", 123, None, 4.5]})
+        back = pd.read_parquet(io.BytesIO(parquet_bytes(df)))
+        assert back["SCH NO"].tolist()[:2] == ["A1", "123"] and back["SCH NO"].isna().iloc[2]
+
+    def test_writes_one_row_group_per_chunk(self, monkeypatch):
+        import pyarrow.parquet as pq
+        monkeypatch.setattr(exports, "ROW_GROUP_SIZE", 2)
+        data = parquet_bytes(pd.DataFrame({"x": range(5)}))
+        assert pq.ParquetFile(io.BytesIO(data)).num_row_groups == 3
+
+    def test_empty_frame_keeps_columns(self):
+        back = pd.read_parquet(io.BytesIO(parquet_bytes(pd.DataFrame(columns=["a", "b"]))))
+        assert list(back.columns) == ["a", "b"] and back.empty
+
+
+class TestCsvGz:
+    def test_roundtrip(self):
+        df = _report()
+        back = pd.read_csv(io.BytesIO(gzip.decompress(csv_gz_bytes(df))), dtype={"Schedule Number": str})
+        assert back["Schedule Number"].tolist() == ["00123", "456", "789"]
+        assert back["Claims Amount"].iloc[0] == 1500.25 and back["Count"].sum() == 6
+
+
+class TestBundle:
+    def test_every_sheet_is_a_parquet_member(self):
+        sheets = {"Claims Reconciliation Report": _report(), "Missing in Finance": _report().head(1)}
+        with zipfile.ZipFile(io.BytesIO(bundle_bytes(sheets))) as bundle:
+            manifest = json.loads(bundle.read("manifest.json"))
+            assert [m["file"] for m in manifest] == ["claims_reconciliation_report.parquet", "missing_in_finance.parquet"]
+            assert [m["rows"] for m in manifest] == [3, 1]
+            back = pd.read_parquet(io.BytesIO(bundle.read("missing_in_finance.parquet")))
+        assert back["Schedule Number"].tolist() == ["00123"]
+
+
+class TestExportFile:
+    def test_names_and_mime(self):
+        sheets = {"Report": _report()}
+        assert export_file(sheets, "Report 1", "parquet")[1:] == ("Report 1.parquet", exports.PARQUET_MIME)
+        assert export_file(sheets, "Report 1", "csv.gz")[1:] == ("Report 1.csv.gz", exports.GZIP_MIME)
+        assert export_file(sheets, "Report 1", "zip")[1:] == ("Report 1.zip", exports.ZIP_MIME)
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            export_file({"Report": _report()}, "Report", "xml")
+
+
+class TestCachedExports:
+    def test_digest_follows_content(self):
+        df = _report()
+        assert frames_digest({"Report": df}) == frames_digest({"Report": df.copy()})
+        changed = df.copy()
+        changed.loc[0, "Claims Amount"] = 1.0
+        assert frames_digest({"Report": df}) != frames_digest({"Report": changed})
+        assert frames_digest({"Report": df}) != frames_digest({"Other": df})
+
+    def test_digest_of_unhashable_cells(self):
+        assert frames_digest({"Report": pd.DataFrame({"x": [[1], [2]]})})
+
+    def test_same_frames_are_built_once(self, monkeypatch):
+        calls = []
+        real = exports.export_file
+        monkeypatch.setattr(exports, "export_file", lambda *args: calls.append(args[2]) or real(*args))
+        cache = {}
+        first = cached_exports({"Report": _report()}, "report_1", cache)
+        second = cached_exports({"Report": _report()}, "report_2", cache)
+        assert sorted(calls) == sorted(exports.EXPORT_FORMATS)
+        assert [f[1] for f in first] == [f[1] for f in second]
+        assert [f[2] for f in second] == [f"report_2.{fmt}" for fmt in exports.EXPORT_FORMATS]
@@ -0,0 +1,91 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import io
+import pandas as pd
+import compilation_common
+from file_readers import detect_format, upload_format, read_tables, read_csv_table
+from upload_handle import spool_upload
+from utils import extract_schedule_data, calculate_schedule_amounts
+
+
+def _named(data, name):
+    buffer = io.BytesIO(data)
+    buffer.name = name
+    return buffer
+
+def _parquet(df):
+    buffer = io.BytesIO()
+    df.to_parquet(buffer)
+    return buffer.getvalue()
+
+def _xlsx(sheets):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for name, frame in sheets.items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+    return buffer.getvalue()
+
+
+class TestDetectFormat:
+    def test_extension_wins(self):
+        assert detect_format("Finance.CSV") == "csv"
+        assert detect_format("claims.parquet", b"PK\x03\x04") == "parquet"
+
+    def test_magic_bytes_without_extension(self):
+        assert detect_format(None, b"PAR1\x15\x04") == "parquet"
+        assert detect_format("upload", b"PK\x03\x04\x14") == "xlsx"
+        assert detect_format("upload", b"SCH NO,AMOUNT") == "csv"
+
+    def test_upload_format_of_unnamed_bytes(self):
+        assert upload_format(_parquet(pd.DataFrame({"A": [1]}))) == "parquet"
+
+
+class TestReadTables:
+    def test_csv_keeps_identifiers_as_text(self):
+        data = b"SCH NO,PROVIDER CODE,Amount,Note\n00123,0456,\"1,234.50\",\n9820,12,10.5,x\n"
+        df = read_csv_table(io.BytesIO(data))
+        assert df["SCH NO"].tolist() == ["00123", "9820"]
+        assert df["PROVIDER CODE"].tolist() == ["0456", "12"]
+        assert df["Amount"].tolist() == ["1,234.50", "10.5"]
+        assert pd.isna(df["Note"].iloc[0])
+
+    def test_flat_files_are_one_table_named_after_the_file(self):
+        df = pd.DataFrame({"SCH NO": ["9820", "9821"], "Amount": [1.5, 2.25]})
+        tables = read_tables(_named(_parquet(df), "finance week 12.parquet"))
+        assert list(tables) == ["finance week 12"]
+        pd.testing.assert_frame_equal(tables["finance week 12"], df)
+
+        csv_tables = read_tables(_named(df.to_csv(index=False).encode(), "claims.csv"))
+        assert list(csv_tables) == ["claims"]
+        assert csv_tables["claims"]["SCH NO"].tolist() == ["9820", "9821"]
+
+    def test_excel_gives_every_sheet(self):
+        tables = read_tables(_xlsx({"One": pd.DataFrame({"A": [1]}), "Two": pd.DataFrame({"B": [2]})}))
+        assert list(tables) == ["One", "Two"]
+
+    def test_csv_amounts_reconcile_like_excel(self):
+        data = b"SCH NO,AMOUNT\n9820,\"1,000.10\"\n9820,0.20\n9821,5\n"
+        df = next(iter(read_tables(_named(data, "claims.csv")).values()))
+        amounts = calculate_schedule_amounts(extract_schedule_data(df, "SCH NO", "AMOUNT"))
+        assert dict(zip(amounts["Schedule Number"], amounts["Amount"])) == {"9820": 1000.30, "9821": 5.0}
+
+
+class TestFlatCompilation:
+    def test_csv_summary_compiles_and_compares(self):
+        summary = pd.DataFrame({
+            "S/N": [1, 2, None],
+            "PROVIDER NAME": ["LIFELINE HOSPITAL", "LIFELINE HOSPITAL", "TOTAL"],
+            "CLAIM TYPE": ["FFS", "FFS", ""],
+            "AMOUNT RECOMMENDED FOR PAYMENT (N)": [100, 50, 150],
+        })
+        handle = spool_upload(summary.to_csv(index=False).encode(), name="SCH 9820 LIFELINE.csv")
+        compiled, summaries = compilation_common.compile_files([handle])
+        assert summaries[0]["Status"] == "Success" and summaries[0]["Rows"] == 2
+
+        finance = pd.DataFrame({"Claim Batch No/Sch No": ["9820"], "Claims_Advised_Amount": [150.0]})
+        finance_handle = spool_upload(_parquet(finance), name="finance.parquet")
+        comparison = compilation_common.compare_with_finance(
+            compiled, finance_handle, compilation_common.COMPILATION_CONFIGS["appeals"])
+        assert comparison["Variance"].tolist() == [0.0]
@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from datetime import date
+import pandas as pd
+import pytest
+import history_store
+from history_store import (
+    record_run, read_rollup, rebuild_rollups, load_manifest, live_runs, load_week, history_rows,
+    schedule_providers, MATCHED, AMOUNT_MISMATCH, MISSING_IN_FINANCE, MISSING_IN_CLAIMS,
+)
+
+
+@pytest.fixture(autouse=True)
+def history_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "HISTORY_DIR", str(tmp_path / "history"))
+    return tmp_path / "history"
+
+
+def _report(claims, finance):
+    schedules = sorted(set(claims) | set(finance))
+    return pd.DataFrame({
+        "Schedule Number": schedules,
+        "Claims Amount": [claims.get(s) for s in schedules],
+        "Finance Amount": [finance.get(s) for s in schedules],
+    })
+
+PROVIDERS = pd.Series({"1": "LIFELINE HOSPITAL", "2": "EVERCARE CLINIC", "3": "LIFELINE HOSPITAL"})
+WEEK_1 = date(2024, 1, 3)   # 2024-W01
+WEEK_2 = date(2024, 1, 10)  # 2024-W02
+
+
+class TestHistoryRows:
+    def test_statuses_and_kobo(self):
+        rows = history_rows(_report({"1": 100.10, "2": 50.0, "3": 7.0}, {"1": 100.10, "2": 49.99, "4": 3.0}), PROVIDERS)
+        assert rows["status"].tolist() == [MATCHED, AMOUNT_MISMATCH, MISSING_IN_FINANCE, MISSING_IN_CLAIMS]
+        assert rows["claims_kobo"].tolist()[:3] == [10010, 5000, 700]
+        assert rows["difference_kobo"].iloc[1] == 1
+        assert rows["provider"].tolist() == ["LIFELINE HOSPITAL", "EVERCARE CLINIC", "LIFELINE HOSPITAL", "Unknown"]
+
+    def test_schedule_providers_normalises_float_schedules(self):
+        claims = pd.DataFrame({"SCH NO": [1.0, 1.0, 2.0], "PROVIDER NAME": [" A ", "A", "B"]})
+        assert schedule_providers(claims, "SCH NO").to_dict() == {"1": "A", "2": "B"}
+        assert schedule_providers(claims.drop(columns="PROVIDER NAME"), "SCH NO") is None
+
+
+class TestRecordRun:
+    def test_writes_partitioned_file_and_manifest(self, history_dir):
+        run = record_run(_report({"1": 10.0}, {"1": 10.0}), "Claims Reconciliation", period=WEEK_2)
+        assert run["path"].startswith(os.path.join("runs", "year=2024", "week=02"))
+        assert (history_dir / run["path"]).exists()
+        assert [r["run_id"] for r in load_manifest()["runs"]] == [run["run_id"]]
+
+    def test_rollups_accumulate_across_weeks(self):
+        record_run(_report({"1": 100.0, "2": 50.0}, {"1": 100.0}), "Claims Reconciliation", PROVIDERS, WEEK_1)
+        record_run(_report({"3": 20.0}, {"3": 15.0, "4": 5.0}), "Claims Reconciliation", PROVIDERS, WEEK_2)
+        weekly = read_rollup("week")
+        assert weekly["week"].tolist() == [1, 2]
+        assert weekly["schedules"].tolist() == [2, 2]
+        assert weekly["claims_kobo"].tolist() == [15000, 2000]
+        assert weekly["variance_kobo"].tolist() == [5000, 1000]
+        status = read_rollup("status").set_index(["week", "status"])["schedules"]
+        assert status[(1, MISSING_IN_FINANCE)] == 1 and status[(2, MISSING_IN_CLAIMS)] == 1
+        provider = read_rollup("provider").groupby("provider")["claims_kobo"].sum()
+        assert provider["LIFELINE HOSPITAL"] == 12000 and provider["EVERCARE CLINIC"] == 5000
+
+    def test_rerun_of_a_week_supersedes_the_earlier_run(self):
+        first = record_run(_report({"1": 100.0, "2": 50.0}, {}), "Claims Reconciliation", period=WEEK_1)
+        other_source = record_run(_report({"9": 1.0}, {}), "Appeals", period=WEEK_1)
+        second = record_run(_report({"1": 100.0}, {"1": 100.0}), "Claims Reconciliation", period=WEEK_1)
+        weekly = read_rollup("week").set_index("source")
+        assert weekly.loc["Claims Reconciliation", "schedules"] == 1
+        assert weekly.loc["Claims Reconciliation", "finance_kobo"] == 10000
+        assert weekly.loc["Appeals", "schedules"] == 1
+        assert [r["run_id"] for r in live_runs()] == [other_source["run_id"], second["run_id"]]
+        assert load_manifest()["runs"][0]["superseded_by"] == second["run_id"]
+        assert os.path.exists(os.path.join(history_store.HISTORY_DIR, first["path"]))
+        status = read_rollup("status")
+        assert MISSING_IN_FINANCE not in status[status["source"] == "Claims Reconciliation"]["status"].tolist()
+
+    def test_rebuild_matches_incremental_rollups(self):
+        record_run(_report({"1": 100.0, "2": 50.0}, {"1": 90.0}), "Claims Reconciliation", PROVIDERS, WEEK_1)
+        record_run(_report({"1": 100.0}, {"1": 100.0}), "Claims Reconciliation", PROVIDERS, WEEK_1)
+        record_run(_report({"3": 20.0}, {"3": 15.0}), "Claims Reconciliation", PROVIDERS, WEEK_2)
+        incremental = {name: read_rollup(name) for name in history_store.ROLLUPS}
+        rebuild_rollups()
+        for name, keys in history_store.ROLLUPS.items():
+            pd.testing.assert_frame_equal(read_rollup(name).sort_values(keys).reset_index(drop=True),
+                                          incremental[name], check_dtype=False)
+
+    def test_load_week_returns_live_rows(self):
+        record_run(_report({"1": 100.0}, {}), "Claims Reconciliation", period=WEEK_1)
+        assert load_week("Claims Reconciliation", 2024, 1)["status"].tolist() == [MISSING_IN_FINANCE]
+        assert load_week("Claims Reconciliation", 2024, 2) is None
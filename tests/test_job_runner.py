@@ -0,0 +1,102 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import io
+import pandas as pd
+import pytest
+import job_runner
+from job_runner import (
+    submit_job, wait_for_job, get_job, list_jobs, job_artifacts, job_result, purge_old_jobs, DONE, FAILED,
+)
+from compilation_common import run_compilation_job, COMPILATION_CONFIGS
+
+
+@pytest.fixture(autouse=True)
+def job_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_runner, "JOB_DB", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(job_runner, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+    monkeypatch.setattr(job_runner, "_executor", None)
+    yield
+    if job_runner._executor is not None:
+        job_runner._executor.shutdown(wait=True)
+
+
+def _report(job, n):
+    job.progress(0.5, "halfway")
+    job.save_artifact("report.txt", b"x" * n, "text/plain")
+    return {"rows": n}
+
+
+def _explode(job):
+    raise ValueError("bad workbook")
+
+
+class TestJobRunner:
+    def test_runs_job_and_keeps_artifacts(self):
+        job_id = submit_job("report", "Build report", _report, 3)
+        job = wait_for_job(job_id, timeout=10)
+        assert job["status"] == DONE and job["progress"] == 1.0
+        assert job_result(job_id) == {"rows": 3}
+        [artifact] = job_artifacts(job_id)
+        assert artifact["file_name"] == "report.txt" and artifact["size"] == 3
+        with open(artifact["path"], "rb") as f:
+            assert f.read() == b"xxx"
+
+    def test_failure_is_recorded(self):
+        job_id = submit_job("report", "Broken", _explode)
+        job = wait_for_job(job_id, timeout=10)
+        assert job["status"] == FAILED
+        assert job["error"].startswith("bad workbook")
+
+    def test_list_by_kind_and_purge(self):
+        first = submit_job("a", "first", _report, 1)
+        second = submit_job("b", "second", _report, 1)
+        wait_for_job(first, timeout=10)
+        wait_for_job(second, timeout=10)
+        assert [job["job_id"] for job in list_jobs("a")] == [first]
+        assert purge_old_jobs(days=-1) == 2
+        assert get_job(first) is None and not os.path.exists(os.path.join(job_runner.ARTIFACT_DIR, first))
+
+    def test_list_by_owner(self):
+        mine = submit_job("c", "mine", _report, 1, owner="session-a")
+        theirs = submit_job("c", "theirs", _report, 1, owner="session-b")
+        wait_for_job(mine, timeout=10)
+        wait_for_job(theirs, timeout=10)
+        assert [job["job_id"] for job in list_jobs("c", owner="session-a")] == [mine]
+        assert {job["job_id"] for job in list_jobs("c")} == {mine, theirs}
+
+
+def _appeals_workbook():
+    sheet = pd.DataFrame([
+        ["Header"] * 3,
+        ["S/N", "AMOUNT RECOMMENDED FOR PAYMENT (N)", "PROVIDER CODE"],
+        [1, "1,000.50", "P01"],
+        [2, "250", "P02"],
+    ])
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        sheet.to_excel(writer, sheet_name="PAYMENT SUMMARY", index=False, header=False)
+    buffer.seek(0)
+    buffer.name = "Appeals Schedule 12.xlsx"
+    return buffer
+
+
+class TestCompilationJob:
+    def test_compiles_in_background(self):
+        buffer = _appeals_workbook()
+        job_id = submit_job("compilation_appeals", "Compile", run_compilation_job, [buffer], None,
+                            COMPILATION_CONFIGS["appeals"], compare=False)
+        assert wait_for_job(job_id, timeout=30)["status"] == DONE
+        result = job_result(job_id)
+        assert result["file_summary"][0]["Status"] == "Success"
+        assert len(result["compiled_data"]) == 2
+        assert sorted(os.path.splitext(a["file_name"])[1] for a in job_artifacts(job_id)) == [".parquet", ".xlsx"]
+
+    def test_comparison_errors_fail_the_job(self):
+        finance = io.BytesIO(b"not a workbook")
+        finance.name = "finance.xlsx"
+        job_id = submit_job("compilation_appeals", "Compile", run_compilation_job, [_appeals_workbook()], finance,
+                            COMPILATION_CONFIGS["appeals"], compare=True)
+        job = wait_for_job(job_id, timeout=30)
+        assert job["status"] == FAILED and job["error"]
@@ -0,0 +1,137 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import json
+import logging
+import multiprocessing
+import queue
+import types
+from concurrent.futures import ProcessPoolExecutor
+import log_setup
+from log_setup import AggregatingQueueHandler, JsonFormatter, log_timing
+
+
+def _logger(handler, name="test_log_setup"):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+def _drain(log_queue):
+    records = []
+    while not log_queue.empty():
+        records.append(log_queue.get_nowait())
+    return records
+
+
+def _child_log_handlers():
+    log_setup.configure_logging()
+    return [type(handler).__name__ for handler in log_setup._listener.handlers]
+
+
+class TestAggregatingQueueHandler:
+    def test_repeated_messages_are_summarised(self):
+        log_queue = queue.SimpleQueue()
+        handler = AggregatingQueueHandler(log_queue, burst=3, window=60)
+        logger = _logger(handler)
+        for row in range(1, 1001):
+            logger.warning(f"Row {row} failed cleaning: bad date", extra={"table": "claimstbl"})
+        logger.warning("Something else")
+        handler.flush()
+        messages = [r.getMessage() for r in _drain(log_queue)]
+        assert messages[:4] == [f"Row {n} failed cleaning: bad date" for n in (1, 2, 3)] + ["Something else"]
+        assert messages[4].startswith("Suppressed 997 similar messages")
+        assert messages[4].endswith("last: Row 1000 failed cleaning: bad date")
+
+    def test_aggregate_key_groups_different_texts(self):
+        log_queue = queue.SimpleQueue()
+        handler = AggregatingQueueHandler(log_queue, burst=1, window=60)
+        logger = _logger(handler)
+        for error in ["bad date", "bad amount", "missing member"]:
+            logger.warning(f"Row failed: {error}", extra={"aggregate": "row_failed", "table": "claimstbl"})
+        handler.flush()
+        records = _drain(log_queue)
+        assert len(records) == 2
+        assert records[1].suppressed == 2 and records[1].table == "claimstbl"
+
+    def test_new_window_emits_the_previous_summary(self, monkeypatch):
+        clock = iter([0.0, 1.0, 2.0, 100.0, 100.0, 100.0])
+        monkeypatch.setattr(log_setup.time, "monotonic", lambda: next(clock))
+        log_queue = queue.SimpleQueue()
+        logger = _logger(AggregatingQueueHandler(log_queue, burst=1, window=60))
+        for row in range(3):
+            logger.warning(f"Row {row} failed")
+        logger.warning("Row 3 failed")
+        messages = [r.getMessage() for r in _drain(log_queue)]
+        assert messages[0] == "Row 0 failed"
+        assert messages[1].startswith("Suppressed 2 similar messages") and messages[2] == "Row 3 failed"
+
+    def test_errors_are_never_suppressed(self):
+        log_queue = queue.SimpleQueue()
+        logger = _logger(AggregatingQueueHandler(log_queue, burst=1, window=60))
+        for row in range(5):
+            logger.error(f"Row {row} failed")
+        assert len(_drain(log_queue)) == 5
+
+    def test_info_is_only_aggregated_on_request(self):
+        log_queue = queue.SimpleQueue()
+        logger = _logger(AggregatingQueueHandler(log_queue, burst=1, window=60))
+        for load in range(3):
+            logger.info(f"Loaded 10 rows into claimstbl (load {load})")
+        for load in range(3):
+            logger.info(f"Batch {load} committed", extra={"aggregate": "batch_committed"})
+        assert len(_drain(log_queue)) == 4
+
+    def test_traceback_survives_the_queue(self):
+        log_queue = queue.SimpleQueue()
+        logger = _logger(AggregatingQueueHandler(log_queue))
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.error("Load failed", exc_info=True)
+        record = _drain(log_queue)[0]
+        assert record.getMessage() == "Load failed" and "ValueError: boom" in record.exc_text
+
+
+class TestJsonFormatter:
+    def test_context_fields_are_structured(self):
+        record = logging.LogRecord("config", logging.INFO, __file__, 1, "Loaded %d rows", (5,), None)
+        record.table, record.load_id, record.elapsed = "claimstbl", "abc", 1.5
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry["message"] == "Loaded 5 rows" and entry["level"] == "INFO"
+        assert (entry["table"], entry["load_id"], entry["elapsed"]) == ("claimstbl", "abc", 1.5)
+        assert "args" not in entry and "exception" not in entry
+
+
+class TestLogTiming:
+    def test_logs_elapsed_with_context(self):
+        log_queue = queue.SimpleQueue()
+        logger = _logger(AggregatingQueueHandler(log_queue))
+        with log_timing(logger, "Merged rows", table="claimstbl", rows=10):
+            pass
+        record = _drain(log_queue)[0]
+        assert record.getMessage().startswith("Merged rows in ")
+        assert record.table == "claimstbl" and record.rows == 10 and record.elapsed >= 0
+
+
+class TestConfigureLogging:
+    def test_root_logger_uses_a_single_queue_handler(self):
+        import config  # noqa: F401  (configures logging on import)
+        first = log_setup.configure_logging()
+        assert log_setup.configure_logging() is first
+        assert sum(isinstance(h, AggregatingQueueHandler) for h in logging.getLogger().handlers) == 1
+
+    def test_pool_workers_do_not_open_the_shared_log_file(self):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            handlers = pool.submit(_child_log_handlers).result(timeout=60)
+        assert handlers == ["_ConsoleHandler"]
+
+    def test_scripts_here_get_their_own_file(self, monkeypatch):
+        script = os.path.join(os.path.dirname(log_setup.__file__), "watch_ingest.py")
+        monkeypatch.setitem(sys.modules, "__main__", types.SimpleNamespace(__file__=script))
+        monkeypatch.setattr(log_setup, "LOG_FILE", os.path.join("logs", "claims_reconciler.log"))
+        assert log_setup.process_log_file() == os.path.join("logs", "watch_ingest.log")
+        monkeypatch.setitem(sys.modules, "__main__", types.SimpleNamespace(__file__="/usr/bin/streamlit"))
+        assert log_setup.process_log_file() == os.path.join("logs", "claims_reconciler.log")
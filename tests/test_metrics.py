@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import urllib.request
+import pandas as pd
+import pytest
+import metrics
+from metrics import Counter, Histogram, Registry, OPERATIONS, DURATION, ROWS, track, instrumented, start_operation
+from compilation_common import compile_files
+from upload_handle import spool_upload
+
+
+def _summary_csv(name, amounts):
+    summary = pd.DataFrame({
+        "S/N": list(range(1, len(amounts) + 1)),
+        "PROVIDER NAME": ["LIFELINE HOSPITAL"] * len(amounts),
+        "AMOUNT RECOMMENDED FOR PAYMENT (N)": amounts,
+    })
+    return spool_upload(summary.to_csv(index=False).encode(), name=name)
+
+
+class TestExposition:
+    def test_counter_and_histogram_lines(self):
+        registry = Registry()
+        runs = registry.register(Counter("runs_total", "Runs.", ["operation", "status"]))
+        latency = registry.register(Histogram("latency_seconds", "Latency.", ["operation"], buckets=(0.1, 1)))
+        runs.inc(operation="compile", status="success")
+        runs.inc(2, operation="compile", status="success")
+        for seconds in (0.05, 0.5, 3):
+            latency.observe(seconds, operation="compile")
+        lines = registry.exposition().splitlines()
+        assert lines[:3] == ["# HELP runs_total Runs.", "# TYPE runs_total counter",
+                             'runs_total{operation="compile",status="success"} 3']
+        assert lines[5:] == [
+            'latency_seconds_bucket{operation="compile",le="0.1"} 1',
+            'latency_seconds_bucket{operation="compile",le="1"} 2',
+            'latency_seconds_bucket{operation="compile",le="+Inf"} 3',
+            'latency_seconds_sum{operation="compile"} 3.55',
+            'latency_seconds_count{operation="compile"} 3',
+        ]
+
+    def test_label_values_are_escaped(self):
+        registry = Registry()
+        registry.register(Counter("c_total", "C.", ["target"])).inc(target='a "b"\\c')
+        assert 'c_total{target="a \\"b\\"\\\\c"} 1' in registry.exposition()
+
+
+class TestTracking:
+    def test_exception_counts_as_failure_and_propagates(self):
+        before = OPERATIONS.value(operation="t_track", target="x", status="failure")
+        with pytest.raises(ValueError):
+            with track("t_track", target="x"):
+                raise ValueError("boom")
+        assert OPERATIONS.value(operation="t_track", target="x", status="failure") == before + 1
+        assert DURATION.count(operation="t_track", target="x") >= 1
+
+    def test_decorator_uses_result_for_status_and_rows(self):
+        @instrumented("t_decorated", failed=lambda result: result is None, rows=len)
+        def load(rows):
+            return rows
+
+        load([1, 2, 3])
+        load(None)
+        assert OPERATIONS.value(operation="t_decorated", target="", status="success") == 1
+        assert OPERATIONS.value(operation="t_decorated", target="", status="failure") == 1
+        assert ROWS.value(operation="t_decorated", target="") == 3
+
+    def test_discarded_operations_are_not_recorded(self):
+        op = start_operation("t_discard")
+        op.discard()
+        op.finish()
+        assert DURATION.count(operation="t_discard", target="") == 0
+
+    def test_compile_files_records_rows_per_category(self):
+        before = ROWS.value(operation="compile", target="ambulance")
+        compile_files([_summary_csv("SCH 60.csv", [1, 2]), _summary_csv("SCH 61.csv", [3])], category="ambulance")
+        assert ROWS.value(operation="compile", target="ambulance") == before + 3
+
+
+class TestMetricsServer:
+    def test_serves_registry_over_http(self, monkeypatch):
+        monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+        monkeypatch.setattr(metrics, "_server", None)
+        server = metrics.start_metrics_server(port=0)
+        try:
+            assert metrics.start_metrics_server(port=0) is server
+            with track("t_http", target="claimstbl"):
+                pass
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics", timeout=5) as response:
+                assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+                body = response.read().decode()
+            assert 'claims_operations_total{operation="t_http",target="claimstbl",status="success"} 1' in body
+        finally:
+            metrics.stop_metrics_server()
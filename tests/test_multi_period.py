@@ -0,0 +1,94 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pandas as pd
+import pytest
+import multi_period
+from upload_handle import UploadHandle
+from multi_period import (
+    multi_period_reconciliation, period_extract, period_from_filename, SETTLED_LATER, TIMING_DIFFERENCE,
+    CLAIMS_AMOUNT_COLUMNS,
+)
+from history_store import MATCHED, AMOUNT_MISMATCH, MISSING_IN_FINANCE, MISSING_IN_CLAIMS
+
+
+def _rows(*rows):
+    return pd.DataFrame(rows, columns=["Period", "Schedule Number", "Amount"])
+
+CLAIMS = _rows(("W01", "1", 10.0), ("W01", "2", 20.0), ("W01", "2", 5.5), ("W02", "3", 30.0), ("W02", "4", 5.0))
+FINANCE = _rows(("W01", "1", 10.0), ("W02", "2", 25.5), ("W02", "3", 29.99), ("W02", "5", 1.0))
+
+
+class TestMultiPeriodReconciliation:
+    def test_per_period_statuses(self):
+        result = multi_period_reconciliation(CLAIMS, FINANCE, ["W01", "W02"])
+        status = result["per_period"].set_index(["Period", "Schedule Number"])["Status"]
+        assert status[("W01", "1")] == MATCHED
+        assert status[("W01", "2")] == SETTLED_LATER
+        assert status[("W02", "2")] == MISSING_IN_CLAIMS
+        assert status[("W02", "3")] == AMOUNT_MISMATCH
+        assert status[("W02", "4")] == MISSING_IN_FINANCE
+
+    def test_cumulative_detects_timing_differences(self):
+        cumulative = multi_period_reconciliation(CLAIMS, FINANCE, ["W01", "W02"])["cumulative"].set_index("Schedule Number")
+        assert cumulative.loc["2", "Status"] == TIMING_DIFFERENCE
+        assert cumulative.loc["2", "Claims Amount"] == 25.5 and cumulative.loc["2", "Lag (periods)"] == 1
+        assert (cumulative.loc["2", "First Claims Period"], cumulative.loc["2", "First Finance Period"]) == ("W01", "W02")
+        assert cumulative.loc["3", "Difference"] == pytest.approx(0.01)
+        assert cumulative.loc["5", "Status"] == MISSING_IN_CLAIMS and cumulative.loc["5", "First Claims Period"] is None
+
+    def test_period_order_is_respected(self):
+        # Listed order, not alphabetical: 'Dec' comes before 'Jan' here
+        claims = _rows(("Dec", "1", 10.0))
+        finance = _rows(("Jan", "1", 10.0))
+        cumulative = multi_period_reconciliation(claims, finance, ["Dec", "Jan"])["cumulative"]
+        assert cumulative["Lag (periods)"].tolist() == [1]
+        reversed_order = multi_period_reconciliation(claims, finance, ["Jan", "Dec"])["per_period"]
+        assert reversed_order.set_index("Period")["Status"]["Dec"] == MISSING_IN_FINANCE
+
+    def test_summary_counts_and_totals(self):
+        summary = multi_period_reconciliation(CLAIMS, FINANCE, ["W01", "W02"])["summary"]
+        assert summary["Schedules"].sum() == 6
+        w02_missing_claims = summary[(summary["Period"] == "W02") & (summary["Status"] == MISSING_IN_CLAIMS)]
+        assert w02_missing_claims["Finance Amount"].item() == 26.5
+
+    def test_unknown_period_is_rejected(self):
+        with pytest.raises(ValueError):
+            multi_period_reconciliation(CLAIMS, FINANCE, ["W01"])
+
+
+class TestPeriodInputs:
+    def test_period_from_filename(self):
+        assert period_from_filename("Claims 2024 W5.xlsx") == "2024-W05"
+        assert period_from_filename("finance_week_12.csv") == "W12"
+        assert period_from_filename("march.xlsx") == "march"
+
+    def test_period_extract_finds_the_schedule_sheet(self):
+        sheets = {"Cover": pd.DataFrame({"Note": ["x"]}),
+                  "Schedule": pd.DataFrame({"SCH NO": [1.0, 2.0], "AMOUNT": ["1,000.50", 3]})}
+        extract = period_extract(sheets, CLAIMS_AMOUNT_COLUMNS, "W03")
+        assert extract["Schedule Number"].tolist() == ["1", "2"]
+        assert extract["Amount"].tolist() == [1000.5, 3.0] and set(extract["Period"]) == {"W03"}
+        with pytest.raises(ValueError):
+            period_extract({"Cover": sheets["Cover"]}, CLAIMS_AMOUNT_COLUMNS, "W03")
+
+    def test_session_with_a_lost_workbook_is_named(self, tmp_path, monkeypatch):
+        lost = UploadHandle("0" * 64, str(tmp_path / "gone"), 10, name="claims week 3.xlsx")
+        session = {"claims": {"file_data": lost, "sheet_name": None, "schedule_col": None, "amount_col": None},
+                   "finance": None}
+        monkeypatch.setattr(multi_period, "get_session_data", lambda session_id: session)
+        with pytest.raises(ValueError, match="Session 2024-W03: the claims workbook 'claims week 3.xlsx'"):
+            multi_period._load_sessions(["2024-W03"])
+
+    def test_sessions_are_keyed_by_their_uploads(self, tmp_path, monkeypatch):
+        import upload_handle
+        monkeypatch.setattr(upload_handle, "SPOOL_DIR", str(tmp_path))
+        data = pd.DataFrame({"SCH NO": ["1"], "AMOUNT PAID": [10.0]}).to_csv(index=False).encode()
+        handle = upload_handle.spool_upload(data, name="claims.csv")
+        session = {"claims": {"file_data": handle, "sheet_name": None, "schedule_col": None, "amount_col": None},
+                   "finance": None}
+        monkeypatch.setattr(multi_period, "get_session_data", lambda session_id: session)
+        claims, finance, sources = multi_period._load_sessions(["2024-W03"])
+        assert claims[0]["Amount"].tolist() == [10.0] and finance == []
+        assert sources == [("2024-W03", "claims", handle.digest, None, None, None)]
@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import sqlite3
+import pytest
+from parallel_upload import partition_bounds, parallel_load
+
+COLUMNS = ['SCH_NO', 'AMOUNT']
+COL_DEFS = ['SCH_NO TEXT', 'AMOUNT DECIMAL(18,2) CHECK (AMOUNT >= 0)']
+
+
+@pytest.fixture
+def connect(tmp_path):
+    path = str(tmp_path / "upload.db")
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE claimstbl ({', '.join(COL_DEFS)})")
+    conn.close()
+    return lambda: sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+
+class TestPartitionBounds:
+    def test_covers_all_rows(self):
+        bounds = partition_bounds(10, 3)
+        assert bounds == [(0, 4), (4, 7), (7, 10)]
+
+    def test_never_more_partitions_than_rows(self):
+        assert partition_bounds(2, 8) == [(0, 1), (1, 2)]
+
+
+class TestParallelLoad:
+    def test_loads_all_rows_in_source_order(self, connect):
+        rows = [(str(i), float(i)) for i in range(1, 101)]
+        loaded, failed = parallel_load(connect, "claimstbl", COLUMNS, COL_DEFS, rows, list(range(1, 101)), workers=4)
+        assert (loaded, failed) == (100, [])
+        conn = connect()
+        assert [r[0] for r in conn.execute("SELECT SCH_NO FROM claimstbl")] == [str(i) for i in range(1, 101)]
+
+    def test_failure_attributed_to_source_rows_and_nothing_loaded(self, connect):
+        rows = [(str(i), -1.0 if i in (7, 88) else float(i)) for i in range(1, 101)]
+        row_numbers = [i + 1 for i in range(1, 101)]  # e.g. header row offset
+        loaded, failed = parallel_load(connect, "claimstbl", COLUMNS, COL_DEFS, rows, row_numbers, workers=4)
+        assert loaded == 0
+        assert [row_no for row_no, _ in failed] == [8, 89]
+        conn = connect()
+        assert conn.execute("SELECT COUNT(*) FROM claimstbl").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM claimstbl_load_stage").fetchone()[0] == 0
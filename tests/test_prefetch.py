@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import io
+import threading
+import pandas as pd
+import prefetch
+from prefetch import prefetch as prefetch_key, workbook_sheets, file_bytes
+import compilation_common
+
+
+def _workbook(sheets):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for name, frame in sheets.items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+    buffer.seek(0)
+    return buffer
+
+
+class TestPrefetch:
+    def test_same_key_shares_one_future(self):
+        release = threading.Event()
+        calls = []
+
+        def work(x):
+            calls.append(x)
+            release.wait(5)
+            return x * 2
+
+        first = prefetch_key(("test", "shared"), work, 21)
+        second = prefetch_key(("test", "shared"), work, 99)
+        release.set()
+        assert first is second and first.result() == 42 and calls == [21]
+
+    def test_cache_is_bounded_by_result_size(self, monkeypatch):
+        monkeypatch.setattr(prefetch, "_futures", prefetch.OrderedDict())
+        monkeypatch.setattr(prefetch, "_sizes", {})
+        monkeypatch.setattr(prefetch, "PREFETCH_MEMORY_BYTES", 2500)
+        for name in ("a", "b", "c"):
+            prefetch_key(("test", name), bytes, 1000).result()
+        assert list(prefetch._futures) == [("test", "b"), ("test", "c")]
+        assert prefetch.cached_bytes() == 2000
+        prefetch_key(("test", "big"), bytes, 10_000).result()
+        assert list(prefetch._futures) == [("test", "big")]
+
+    def test_workbook_sheets_parses_all_sheets(self):
+        buffer = _workbook({"Claims": pd.DataFrame({"SCH NO": [1, 2]}), "Other": pd.DataFrame({"A": [3]})})
+        buffer.seek(5)
+        sheets = workbook_sheets(buffer)
+        assert list(sheets) == ["Claims", "Other"]
+        assert sheets["Claims"]["SCH NO"].tolist() == [1, 2]
+        assert buffer.tell() == 5
+        assert workbook_sheets(file_bytes(buffer)) is sheets
+
+    def test_compile_files_reuses_prefetched_compile(self, monkeypatch):
+        calls = []
+        real_compile_file = compilation_common.compile_file
+
+        def counting_compile_file(name, data):
+            calls.append(name)
+            return real_compile_file(name, data)
+
+        monkeypatch.setattr(compilation_common, "compile_file", counting_compile_file)
+        monkeypatch.setattr(prefetch, "_futures", prefetch.OrderedDict())
+        buffer = _workbook({"Sheet1": pd.DataFrame({"A": [1]})})
+        buffer.name = "no_summary.xlsx"
+
+        compilation_common.prefetch_compiled_files([buffer])
+        compiled, summary = compilation_common.compile_files([buffer])
+        assert not compiled and summary[0]["Status"] == "No PAYMENT SUMMARY sheet found"
+        assert calls == ["no_summary.xlsx"]
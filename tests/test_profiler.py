@@ -0,0 +1,105 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import threading
+import time
+import profiler
+from profiler import _Sampler, hot_functions, collapsed_stacks, flamegraph_html, save_profile, load_profile, list_profiles
+
+
+STACKS = {
+    ("<module> (app.py:1)", "process (app.py:10)", "read_excel (excel.py:5)"): 6,
+    ("<module> (app.py:1)", "process (app.py:10)"): 1,
+    ("<module> (app.py:1)", "render (app.py:20)"): 3,
+}
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+class TestSampler:
+    def test_samples_thread_until_it_leaves_the_script(self):
+        sampler_box = {}
+
+        def script():
+            sampler_box["sampler"] = _Sampler(threading.get_ident(), __file__, interval=0.001)
+            sampler_box["sampler"].start()
+            _busy(0.2)
+
+        worker = threading.Thread(target=script)
+        worker.start()
+        worker.join()
+        sampler = sampler_box["sampler"]
+        sampler.join(5)
+
+        assert not sampler.is_alive()
+        assert sampler.duration > 0
+        labels = {label for stack in sampler.stacks for label in stack}
+        assert any(label.startswith("_busy (test_profiler.py") for label in labels)
+        # Frames above the script (threading internals) are dropped
+        assert all(stack[0].startswith("script (test_profiler.py") for stack in sampler.stacks)
+
+
+class TestReports:
+    def test_hot_functions_self_and_total(self):
+        table = hot_functions(STACKS, duration=1.0).set_index("Function")
+        assert table.loc["<module> (app.py:1)", "Total %"] == 100.0
+        assert table.loc["process (app.py:10)", "Total %"] == 70.0
+        assert table.loc["process (app.py:10)", "Self %"] == 10.0
+        assert table.loc["read_excel (excel.py:5)", "Self (s)"] == 0.6
+        assert hot_functions({}).empty
+
+    def test_collapsed_and_flamegraph(self):
+        folded = collapsed_stacks(STACKS).splitlines()
+        assert "<module> (app.py:1);render (app.py:20) 3" in folded
+        page = flamegraph_html(STACKS, "Claims <page>")
+        assert page.startswith("<!DOCTYPE html>")
+        assert "read_excel (excel.py:5)" in page and "Claims &lt;page&gt;" in page
+
+
+class TestStorage:
+    def test_save_load_and_retention(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+        monkeypatch.setattr(profiler, "PROFILES_KEPT", 2)
+        paths = [save_profile("Claims Reconciliation", STACKS, 1.5) for _ in range(3)]
+
+        assert list_profiles() == sorted(paths[1:], reverse=True)
+        profile = load_profile(paths[-1])
+        assert profile["page"] == "Claims Reconciliation"
+        assert profile["stacks"] == STACKS
+        assert "claims_reconciliation" in os.path.basename(paths[-1])
+
+
+class TestFragments:
+    def _armed(self, monkeypatch, fragment_ids):
+        import types
+        import streamlit as st
+        runs = []
+        monkeypatch.setattr(profiler, "get_script_run_ctx", lambda: types.SimpleNamespace(fragment_ids_this_run=fragment_ids))
+        monkeypatch.setattr(profiler, "profile_run", lambda page, script_file=None: runs.append((page, script_file)))
+        monkeypatch.setattr(st, "toast", lambda *args, **kwargs: None)
+        for key in (profiler._ARMED_KEY, profiler._ARMING_RUN_KEY, profiler._TOGGLE_KEY, profiler._PAGE_KEY):
+            st.session_state.pop(key, None)
+        st.session_state[profiler._ARMED_KEY] = True
+        st.session_state[profiler._PAGE_KEY] = "Claims Reconciliation"
+        return runs, st.session_state
+
+    def test_fragment_rerun_takes_the_armed_profile(self, monkeypatch):
+        runs, state = self._armed(monkeypatch, ["fragment-1"])
+
+        def _render_charts():
+            profiler.profile_fragment()
+
+        _render_charts()
+        _render_charts()
+        assert runs == [("Claims Reconciliation (_render_charts)", __file__)]
+        assert not state[profiler._ARMED_KEY] and not state[profiler._TOGGLE_KEY]
+
+    def test_full_run_leaves_it_to_render_profiler(self, monkeypatch):
+        runs, state = self._armed(monkeypatch, [])
+        profiler.profile_fragment()
+        assert runs == [] and state[profiler._ARMED_KEY]
@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import io
+import pickle
+import pandas as pd
+import reconciliation_view
+from reconciliation_view import ReconciliationView, view_key, detect_column, date_validation_errors, SCHEDULE_COLUMNS
+from upload_handle import spool_upload
+
+SELECTION = {
+    "claims_sheet": "PAYMENT", "finance_sheet": "finance",
+    "claims_schedule_col": "SCH NO", "claims_amount_col": "HOD RECOMMD. AMOUNT",
+    "finance_schedule_col": "Claim Batch No/Sch No", "finance_amount_col": "Claims_Advised_Amount",
+}
+
+
+def _view():
+    claims = pd.DataFrame({"SCH NO": [1, 1, 2, 3], "HOD RECOMMD. AMOUNT": ["10", "5", "7.50", "1"]})
+    finance = pd.DataFrame({"Claim Batch No/Sch No": [1, 2, 4], "Claims_Advised_Amount": [15, 8, 2]})
+    return ReconciliationView.build("key", SELECTION, claims, finance)
+
+
+class TestViewKey:
+    def test_changes_with_any_input(self):
+        claims = spool_upload(b"claims", name="claims.csv")
+        finance = spool_upload(b"finance", name="finance.csv")
+        key = view_key(claims, finance, SELECTION)
+        assert view_key(spool_upload(b"claims", name="renamed.csv"), finance, SELECTION) == key
+        assert view_key(claims, finance, {**SELECTION, "claims_amount_col": "AMOUNT"}) != key
+        assert view_key(finance, claims, SELECTION) != key
+
+    def test_detects_known_columns(self):
+        df = pd.DataFrame(columns=["S/N", "Claim Batch No/Sch No", "SCH NO"])
+        assert detect_column(df, SCHEDULE_COLUMNS) == "SCH NO"
+        assert detect_column(df, ["AMOUNT"]) is None
+
+
+class TestReconciliationView:
+    def test_tables_and_summary(self):
+        view = _view()
+        assert view.missing_in_finance["Schedule Number"].tolist() == ["3"]
+        assert view.missing_in_claims["Schedule Number"].tolist() == ["4"]
+        assert view.amount_mismatch["Schedule Number"].tolist() == ["2"]
+        summary = view.summary
+        assert (summary["total_claims_schedules"], summary["matching_schedules"], summary["discrepancies"]) == (3, 1, 2)
+        assert summary["total_claims_amount"] == 23.5 and summary["missing_amount"] == 1.0
+
+    def test_views_are_computed_once(self, monkeypatch):
+        view = _view()
+        calls = []
+        real = reconciliation_view.generate_reconciliation_report
+        monkeypatch.setattr(reconciliation_view, "generate_reconciliation_report",
+                            lambda *args: calls.append(1) or real(*args))
+        first = view.excel_report
+        view.summary, view.weekly_report, view.scatter_figure
+        assert view.excel_report is first and len(calls) == 1
+
+    def test_weekly_report_flags_mismatches(self):
+        weekly = _view().weekly_report
+        assert weekly["Claim Batch No/Sch No"].tolist() == ["1", "2"]
+        assert weekly["Status"].tolist() == ["", "Amount Mismatch"]
+        assert weekly["Variance"].tolist() == ["0.00", "-0.50"]
+
+    def test_excel_report_sheets(self):
+        sheets = pd.read_excel(io.BytesIO(_view().excel_report), sheet_name=None)
+        assert list(sheets) == ["Claims Reconciliation Report", "Missing in Finance", "Missing in Claims",
+                                "Amount Discrepancies"]
+
+    def test_survives_a_spill_to_disk(self):
+        view = _view()
+        view.excel_report, view.scatter_figure
+        restored = pickle.loads(pickle.dumps(view))
+        assert restored.excel_report == view.excel_report
+        assert restored.styled_report.data.equals(view.report)
+        assert sys.getsizeof(view) > len(view.excel_report)
+
+
+class TestDateValidationErrors:
+    def test_encounter_after_receipt(self):
+        claims = pd.DataFrame({
+            "SCH NO": [1, 2],
+            "ENCOUNTER_DATE": ["2024-03-10", "2024-03-01"],
+            "DATE_CLAIM_RECEIVED": ["2024-03-05", "2024-03-05"],
+        })
+        assert date_validation_errors(claims, "SCH NO") == [
+            {"schedule": "1", "encounter_date": "10/03/2024", "claim_received_date": "05/03/2024"}]
+        assert date_validation_errors(claims.drop(columns="ENCOUNTER_DATE"), "SCH NO") == []
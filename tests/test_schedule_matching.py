@@ -0,0 +1,90 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import time
+import pandas as pd
+import pytest
+from schedule_matching import (
+    normalize_schedule, within_one_edit, amount_similarity, ScheduleIndex, match_missing_schedules,
+    MATCH_EXACT, MATCH_NUMERIC, MATCH_EDIT, MATCH_TRIGRAM,
+)
+
+
+def _schedules(pairs):
+    return pd.DataFrame(pairs, columns=["Schedule Number", "Amount"])
+
+
+class TestNormalize:
+    @pytest.mark.parametrize("value", ["SCH 1234", "01234", "1234.0", 1234.0, 1234, "Sch. No: 1234", "sch-1234"])
+    def test_variants_share_a_key(self, value):
+        assert normalize_schedule(value) == "1234"
+
+    def test_words_starting_with_a_prefix_are_kept(self):
+        assert normalize_schedule("SCHOOL 7") == "SCHOOL7"
+
+    def test_blank(self):
+        assert normalize_schedule(None) == normalize_schedule(float("nan")) == normalize_schedule(" ") == ""
+
+
+class TestEditDistance:
+    @pytest.mark.parametrize("a, b, expected", [
+        ("1234", "1234", True), ("1234", "1235", True), ("1234", "124", True), ("1234", "12345", True),
+        ("1234", "2134", False), ("1234", "12", False), ("", "1", True),
+    ])
+    def test_within_one_edit(self, a, b, expected):
+        assert within_one_edit(a, b) is expected
+        assert within_one_edit(b, a) is expected
+
+    def test_amount_similarity(self):
+        assert amount_similarity(100, 100) == 1.0
+        assert amount_similarity(100, 90) == pytest.approx(0.9)
+        assert amount_similarity(100, pd.NA) == 0.0
+
+
+class TestScheduleIndex:
+    def test_ranks_candidates_by_key_and_amount(self):
+        index = ScheduleIndex(_schedules([("SCH 1234", 500.0), ("1243", 500.0), ("1235", 10.0), ("A1234B", 500.0)]))
+        candidates = index.candidates("01234", 500.0)
+        assert [(c["Candidate"], c["Match"]) for c in candidates] == [
+            ("SCH 1234", MATCH_EXACT), ("A1234B", MATCH_NUMERIC), ("1235", MATCH_EDIT)]
+        assert candidates[0]["Score"] == 1.0 and candidates[2]["Amount Similarity"] < 0.1
+
+    def test_trigram_block_finds_similar_keys(self):
+        index = ScheduleIndex(_schedules([("AVN-LAGOS-7781", 10.0), ("ZZZ", 10.0)]))
+        [candidate] = index.candidates("AVNLAGOS7718X", 10.0)
+        assert candidate["Candidate"] == "AVN-LAGOS-7781" and candidate["Match"] == MATCH_TRIGRAM
+        assert 0 < candidate["Key Score"] < 0.6
+
+    def test_edit_block_finds_typos(self):
+        index = ScheduleIndex(_schedules([("AVN7781LAG", 10.0)]))
+        [candidate] = index.candidates("AVN7791LAG", 10.0)
+        assert candidate["Match"] == MATCH_EDIT
+
+    def test_no_candidates_for_unrelated_keys(self):
+        assert ScheduleIndex(_schedules([("9000", 1.0)])).candidates("1234", 1.0) == []
+
+    def test_lookup_does_not_scan_every_schedule(self):
+        # 30k schedules: blocking keeps each lookup to a handful of buckets
+        finance = _schedules([(f"SCH {n:05d}", float(n)) for n in range(30_000)])
+        index = ScheduleIndex(finance)
+        started = time.perf_counter()
+        for n in range(0, 30_000, 30):
+            index.candidates(str(n + 7), float(n))
+        assert time.perf_counter() - started < 5
+
+
+class TestMatchMissingSchedules:
+    def test_candidates_per_missing_schedule(self):
+        missing = _schedules([("1234", 300.0), ("1234", 200.0), ("777", 5.0)])
+        unmatched = _schedules([("SCH-01234", 500.0), ("SCH-01234", 0.0), ("9999", 5.0)])
+        matches = match_missing_schedules(missing, unmatched)
+        assert matches["Schedule Number"].tolist() == ["1234"]
+        row = matches.iloc[0]
+        assert (row["Amount"], row["Candidate"], row["Candidate Amount"], row["Rank"]) == (500.0, "SCH-01234", 500.0, 1)
+        assert row["Amount Similarity"] == 1.0
+
+    def test_empty_inputs(self):
+        empty = _schedules([])
+        assert match_missing_schedules(empty, _schedules([("1", 1.0)])).empty
+        assert list(match_missing_schedules(_schedules([("1", 1.0)]), empty).columns)[:3] == ["Schedule Number", "Amount", "Rank"]
@@ -0,0 +1,94 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import io
+import pandas as pd
+import pytest
+import session_store
+from session_store import SessionStore, estimate_size
+
+
+def _frame(rows=1000):
+    return pd.DataFrame({
+        "Schedule": [f"SCH{i:05d}" for i in range(rows)],
+        "Amount": [i * 1.25 for i in range(rows)],
+    })
+
+
+@pytest.fixture
+def spill_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_store, "GLOBAL_BUDGET_BYTES", 10**12)
+    return str(tmp_path)
+
+
+class TestSessionStore:
+    def test_under_budget_stays_in_memory(self, spill_dir):
+        store = SessionStore(budget_bytes=10**9, spill_dir=spill_dir)
+        frame = _frame()
+        store.put("claims", frame)
+        assert store.get("claims") is frame
+        assert store.stats() == [{"key": "claims", "bytes": estimate_size(frame), "spilled": False}]
+
+    def test_over_budget_spills_least_recently_used(self, spill_dir):
+        size = estimate_size(_frame())
+        store = SessionStore(budget_bytes=int(size * 2.5), spill_dir=spill_dir)
+        store.put("a", _frame())
+        store.put("b", _frame())
+        store.get("a")
+        store.put("c", _frame())
+
+        spilled = {row["key"] for row in store.stats() if row["spilled"]}
+        assert spilled == {"b"}
+        assert store.memory_bytes <= store.budget_bytes
+
+    def test_spilled_values_round_trip(self, spill_dir):
+        store = SessionStore(budget_bytes=0, spill_dir=spill_dir)
+        frame = _frame()
+        mixed = pd.DataFrame({"Amount": [1, "NIL", 2.5]})
+        upload = io.BytesIO(b"excel bytes")
+        store.put("frame", frame)
+        store.put("mixed", mixed)
+        store.put("upload", upload)
+        store.put("frames", [frame, frame])
+
+        pd.testing.assert_frame_equal(store.get("frame"), frame)
+        assert store.get("mixed")["Amount"].tolist() == [1, "NIL", 2.5]
+        assert store.get("upload").getvalue() == b"excel bytes"
+        assert len(store.get("frames")) == 2
+
+    def test_get_rehydrates_and_removes_spill_file(self, spill_dir):
+        store = SessionStore(budget_bytes=0, spill_dir=spill_dir)
+        store.put("a", _frame())
+        store.put("b", _frame())
+        assert os.listdir(store.spill_dir)
+        store.get("a")
+        store.get("b")
+        assert len(os.listdir(store.spill_dir)) == 1
+
+    def test_pop_and_clear_delete_spill_files(self, spill_dir):
+        store = SessionStore(budget_bytes=0, spill_dir=spill_dir)
+        store.put("a", _frame())
+        store.put("b", _frame())
+        store.clear()
+        assert "a" not in store
+        assert os.listdir(store.spill_dir) == []
+
+    def test_replacing_a_key(self, spill_dir):
+        store = SessionStore(budget_bytes=10**9, spill_dir=spill_dir)
+        store.put("a", _frame(10))
+        store.put("a", _frame(20))
+        assert len(store.get("a")) == 20
+        assert store.get("missing", "default") == "default"
+
+    def test_global_budget_spills_across_sessions(self, spill_dir, monkeypatch):
+        size = estimate_size(_frame())
+        monkeypatch.setattr(session_store, "GLOBAL_BUDGET_BYTES", int(size * 1.5))
+        first = SessionStore(budget_bytes=10**9, spill_dir=spill_dir)
+        second = SessionStore(budget_bytes=10**9, spill_dir=spill_dir)
+        first.put("old", _frame())
+        second.put("new", _frame())
+
+        assert first.stats()[0]["spilled"]
+        assert not second.stats()[0]["spilled"]
+        assert session_store.total_memory_bytes() <= int(size * 1.5)
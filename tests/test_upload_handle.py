@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import io
+import pickle
+import time
+import pandas as pd
+import pytest
+import upload_handle
+from upload_handle import spool_upload, open_upload, purge_spool, persist_upload
+
+
+@pytest.fixture(autouse=True)
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_handle, "SPOOL_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _workbook():
+    buffer = io.BytesIO()
+    pd.DataFrame({"SCH NO": [1, 2], "AMOUNT": [10.5, 20]}).to_excel(buffer, index=False)
+    buffer.seek(0)
+    buffer.name = "claims.xlsx"
+    return buffer
+
+
+class TestSpoolUpload:
+    def test_same_content_is_spooled_once(self, spool_dir):
+        first = spool_upload(io.BytesIO(b"payload"), name="a.xlsx")
+        second = spool_upload(b"payload", name="b.xlsx")
+        assert first.digest == second.digest and first.path == second.path
+        assert first.size == 7 and first.name == "a.xlsx"
+        assert [p.name for p in spool_dir.iterdir()] == [first.digest]
+
+    def test_streams_are_spooled_without_moving_position(self, spool_dir):
+        path = spool_dir / "source.bin"
+        path.write_bytes(b"x" * 3_000_000)
+        with open(path, "rb") as f:
+            f.seek(10)
+            handle = spool_upload(f)
+            assert f.tell() == 10
+        assert handle.size == 3_000_000
+        assert handle.digest == spool_upload(path.read_bytes()).digest
+
+    def test_handle_is_returned_unchanged_and_pickles(self):
+        handle = spool_upload(b"abc", name="x.xlsx")
+        assert spool_upload(handle) is handle
+        assert pickle.loads(pickle.dumps(handle)) == handle
+
+
+class TestMappedFile:
+    def test_read_seek_and_buffer(self):
+        with spool_upload(b"0123456789").open() as f:
+            assert f.read(3) == b"012"
+            f.seek(-2, io.SEEK_END)
+            assert f.read() == b"89"
+            assert f.tell() == 10
+            assert bytes(f.getbuffer()[4:6]) == b"45"
+            assert f.getvalue() == b"0123456789"
+
+    def test_empty_upload(self):
+        with spool_upload(b"").open() as f:
+            assert f.read() == b""
+
+    def test_pandas_reads_mapped_workbook(self):
+        handle = spool_upload(_workbook())
+        with handle.open() as f:
+            df = pd.read_excel(f)
+        assert df["SCH NO"].tolist() == [1, 2]
+        assert handle.name == "claims.xlsx"
+
+    def test_open_upload_accepts_bytes_and_files(self):
+        assert open_upload(b"abc").read() == b"abc"
+        buffer = io.BytesIO(b"abc")
+        buffer.seek(2)
+        assert open_upload(buffer).read() == b"abc"
+
+
+class TestPurgeSpool:
+    def test_removes_only_stale_files(self, spool_dir):
+        stale = spool_upload(b"old")
+        fresh = spool_upload(b"new")
+        old_time = time.time() - 10 * 24 * 3600
+        os.utime(stale.path, (old_time, old_time))
+        assert purge_spool() == 1
+        assert not os.path.exists(stale.path) and os.path.exists(fresh.path)
+
+
+class TestPersistUpload:
+    def test_copy_outlives_the_spool(self, spool_dir, tmp_path):
+        workbook = _workbook().getvalue()  # xlsx bytes carry a timestamp; build them once
+        kept = persist_upload(workbook, str(tmp_path / "sessions"), name="claims.xlsx")
+        spooled = spool_upload(workbook)
+        os.remove(spooled.path)
+        assert kept.digest == spooled.digest and kept.name == "claims.xlsx"
+        assert os.path.dirname(kept.path) == str(tmp_path / "sessions")
+        assert pd.read_excel(kept.open())["SCH NO"].tolist() == [1, 2]
@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import random
+import time
+import pandas as pd
+import pytest
+import variance_explainer
+from variance_explainer import smallest_subset, explain_schedule, explain_variances, EXACT, WITHIN_TOLERANCE, NOT_FOUND
+from utils import extract_schedule_data, calculate_schedule_amounts, generate_reconciliation_report
+
+
+class TestSmallestSubset:
+    @pytest.mark.parametrize("picked", [(7,), (3, 50), (3, 50, 120), (3, 50, 120, 199)])
+    def test_finds_a_subset_of_the_smallest_size(self, picked):
+        rng = random.Random(picked[-1])
+        amounts = [rng.randint(1_000, 5_000_000) for _ in range(200)]
+        target = sum(amounts[i] for i in picked)
+        subset, complete = smallest_subset(amounts, target, tolerance=0)
+        assert complete and sum(amounts[i] for i in subset) == target
+        assert len(subset) <= len(picked) and len(set(subset)) == len(subset)
+
+    def test_prefers_fewer_lines(self):
+        assert smallest_subset([100, 200, 300, 600], 600, tolerance=0)[0] == (3,)
+
+    def test_tolerance(self):
+        assert smallest_subset([1000, 2050], 3000, tolerance=0)[0] is None
+        assert smallest_subset([1000, 2050], 3000, tolerance=100)[0] == (0, 1)
+
+    def test_does_not_reuse_a_line(self):
+        assert smallest_subset([500, 700], 1000, tolerance=0) == (None, True)
+        assert smallest_subset([500, 500, 700], 1000, tolerance=0)[0] == (0, 1)
+
+    def test_larger_subsets_use_the_bounded_dp(self):
+        amounts = [101, 203, 307, 409, 503, 10_000]
+        subset, _ = smallest_subset(amounts, 101 + 203 + 307 + 409 + 503, tolerance=0)
+        assert subset == (0, 1, 2, 3, 4)
+
+    def test_budget_exhaustion_is_reported(self):
+        amounts = [random.Random(i).randint(1, 10**9) * 2 for i in range(60)]
+        subset, complete = smallest_subset(amounts, 10**9 + 1, tolerance=0, max_states=50)
+        assert subset is None and not complete
+
+    def test_many_identical_lines_stay_within_budget(self):
+        started = time.perf_counter()
+        subset, complete = smallest_subset([1000] * 500, 4000, tolerance=0, time_budget=0.5)
+        assert time.perf_counter() - started < 2
+        assert complete and len(subset) == 4 and len(set(subset)) == 4
+        assert smallest_subset([1000] * 500, 4000, tolerance=0, time_budget=0) == (None, False)
+
+
+class TestExplainVariances:
+    def _data(self):
+        claims_df = pd.DataFrame({
+            "SCH NO": [1, 1, 1, 2, 2, 3],
+            "AMOUNT": [1000.00, 250.50, 75.25, 400.00, 100.00, 50.00],
+        })
+        finance_df = pd.DataFrame({"SCH NO": [1, 2, 3], "AMOUNT": [1000.00, 450.00, 50.00]})
+        claims_data = extract_schedule_data(claims_df, "SCH NO", "AMOUNT")
+        finance_data = extract_schedule_data(finance_df, "SCH NO", "AMOUNT")
+        report = generate_reconciliation_report(calculate_schedule_amounts(claims_data),
+                                                calculate_schedule_amounts(finance_data))
+        return report, claims_data
+
+    def test_suggests_sheet_rows_per_mismatched_schedule(self):
+        report, claims_data = self._data()
+        explained = explain_variances(report, claims_data, tolerance=0).set_index("Schedule Number")
+        assert list(explained.index) == ["1", "2"]
+        assert explained.loc["1", "Suggested Lines"] == "Row 3, Row 4"
+        assert explained.loc["1", "Lines Total"] == 325.75 and explained.loc["1", "Explanation"] == EXACT
+        assert explained.loc["2", "Difference"] == 50.0
+        assert explained.loc["2", "Explanation"] == NOT_FOUND and explained.loc["2", "Suggested Lines"] == ""
+
+    def test_parallel_matches_serial(self, monkeypatch):
+        rng = random.Random(3)
+        rows = [(s, rng.randint(100, 100_000) / 100) for s in range(12) for _ in range(30)]
+        claims_data = extract_schedule_data(pd.DataFrame(rows, columns=["SCH NO", "AMOUNT"]), "SCH NO", "AMOUNT")
+        claims_amounts = calculate_schedule_amounts(claims_data)
+        # Finance is short by the first two lines of each schedule
+        first_two = claims_data.groupby("Schedule Number")["Amount"].apply(lambda a: round(a.iloc[0] + a.iloc[1], 2))
+        finance_amounts = claims_amounts.assign(Amount=(claims_amounts.set_index("Schedule Number")["Amount"]
+                                                        - first_two).round(2).values)
+        report = generate_reconciliation_report(claims_amounts, finance_amounts)
+        serial = explain_variances(report, claims_data, tolerance=0, workers=1)
+        monkeypatch.setattr(variance_explainer, "PARALLEL_MIN_SCHEDULES", 2)
+        parallel = explain_variances(report, claims_data, tolerance=0, workers=2)
+        pd.testing.assert_frame_equal(serial, parallel)
+        assert (serial["Explanation"] == EXACT).all()
+
+    def test_no_mismatches(self):
+        report, claims_data = self._data()
+        matching = report[report["Schedule Number"] == "3"]
+        assert explain_variances(matching, claims_data).empty
+
+    def test_explain_schedule_within_tolerance(self):
+        rows, total, status = explain_schedule([("Row 2", 1000), ("Row 3", 2050)], 3000, tolerance=100)
+        assert (rows, total, status) == (["Row 2", "Row 3"], 3050, WITHIN_TOLERANCE)
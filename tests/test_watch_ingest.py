@@ -0,0 +1,117 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import time
+import pandas as pd
+import pytest
+import watch_ingest
+from watch_ingest import ingest, load_store, load_manifest, file_summary, watch_folder
+
+
+@pytest.fixture(autouse=True)
+def dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch_ingest, "WATCH_DIR", str(tmp_path / "incoming"))
+    monkeypatch.setattr(watch_ingest, "STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(watch_ingest, "_loaded", {})
+    os.makedirs(watch_folder("appeals"))
+
+
+def _drop(name, amounts, mtime=None):
+    path = os.path.join(watch_folder("appeals"), name)
+    pd.DataFrame({
+        "S/N": list(range(1, len(amounts) + 1)),
+        "PROVIDER NAME": ["LIFELINE HOSPITAL"] * len(amounts),
+        "AMOUNT RECOMMENDED FOR PAYMENT (N)": amounts,
+    }).to_csv(path, index=False)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+class TestIngest:
+    def test_compiles_new_files_once(self):
+        _drop("SCH 1.csv", [100, 50])
+        _drop("SCH 2.csv", [7.5])
+        assert ingest("appeals", workers=1)["compiled"] == 2
+        assert ingest("appeals", workers=1) == {"compiled": 0, "unchanged": 2, "removed": 0, "failed": 0}
+        store = load_store("appeals")
+        assert len(store) == 3 and store.file_count == 2
+        assert store.schedule_totals["Kobo"].tolist() == [15000, 750]
+
+    def test_recompiles_only_changed_content(self, monkeypatch):
+        _drop("SCH 1.csv", [100], mtime=1_000_000)
+        _drop("SCH 2.csv", [5], mtime=1_000_000)
+        ingest("appeals", workers=1)
+        version = load_manifest("appeals")["version"]
+
+        compiled = []
+        real = watch_ingest._compile_watched
+        monkeypatch.setattr(watch_ingest, "_compile_watched", lambda *job: compiled.append(job[1]) or real(*job))
+        _drop("SCH 1.csv", [100], mtime=2_000_000)  # touched, same content
+        _drop("SCH 2.csv", [6])
+        stats = ingest("appeals", workers=1)
+        assert compiled == ["SCH 2.csv"]
+        assert stats["compiled"] == 1 and stats["unchanged"] == 1
+        assert load_manifest("appeals")["version"] == version + 1
+        assert load_store("appeals").schedule_totals["Kobo"].tolist() == [10000, 600]
+
+    def test_deleted_files_leave_the_store(self):
+        path = _drop("SCH 1.csv", [100])
+        _drop("SCH 2.csv", [5])
+        ingest("appeals", workers=1)
+        parquet = load_manifest("appeals")["files"]["SCH 1.csv"]["parquet"]
+        os.remove(path)
+        assert ingest("appeals", workers=1)["removed"] == 1
+        assert list(load_manifest("appeals")["files"]) == ["SCH 2.csv"]
+        assert not os.path.exists(os.path.join(watch_ingest._store_dir("appeals"), parquet))
+        assert load_store("appeals").source_files == ["SCH 2.csv"]
+
+    def test_failures_are_recorded_and_lock_files_ignored(self):
+        with open(os.path.join(watch_folder("appeals"), "broken.xlsx"), "wb") as f:
+            f.write(b"not a workbook")
+        with open(os.path.join(watch_folder("appeals"), "~$SCH 1.xlsx"), "wb") as f:
+            f.write(b"lock")
+        assert ingest("appeals", workers=1)["failed"] == 1
+        summary = file_summary("appeals")
+        assert summary["File"].tolist() == ["broken.xlsx"]
+        assert summary["Status"].iloc[0].startswith("Error")
+        assert not load_store("appeals")
+
+    def test_process_pool_matches_inline(self):
+        for schedule in range(1, 4):
+            _drop(f"SCH {schedule}.csv", [schedule * 10])
+        assert ingest("appeals", workers=2)["compiled"] == 3
+        assert load_store("appeals").schedule_totals["Kobo"].tolist() == [1000, 2000, 3000]
+
+    def test_waits_for_a_scan_in_another_process(self):
+        _drop("SCH 1.csv", [100])
+        lock = os.path.join(watch_ingest._store_dir("appeals"), ".ingest.lock")
+        os.makedirs(os.path.dirname(lock))
+        open(lock, "w").close()
+        with pytest.raises(TimeoutError):
+            ingest("appeals", workers=1, lock_timeout=0)
+        stale = time.time() - watch_ingest.STALE_LOCK_SECONDS - 60
+        os.utime(lock, (stale, stale))
+        assert ingest("appeals", workers=1, lock_timeout=0)["compiled"] == 1
+        assert not os.path.exists(lock)
+
+
+class TestLoadStore:
+    def test_reused_until_manifest_changes(self):
+        _drop("SCH 1.csv", [1])
+        ingest("appeals", workers=1)
+        first = load_store("appeals")
+        ingest("appeals", workers=1)
+        assert load_store("appeals") is first
+        _drop("SCH 2.csv", [2])
+        ingest("appeals", workers=1)
+        assert load_store("appeals") is not first and len(load_store("appeals")) == 2
+
+    def test_copies_under_another_name_load_once(self):
+        path = _drop("SCH 1.csv", [100])
+        with open(path, "rb") as f, open(os.path.join(watch_folder("appeals"), "SCH 1_copy.csv"), "wb") as out:
+            out.write(f.read())
+        ingest("appeals", workers=1)
+        assert load_store("appeals").schedule_totals["Kobo"].tolist() == [10000]
+        assert file_summary("appeals")["Status"].tolist() == ["Success", "Skipped: duplicate of SCH 1.csv"]
@@ -0,0 +1,236 @@
+import hashlib
+import io
+import mmap
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from config import logger
+
+# Uploads are written once to a spool file named by their SHA-256 and read back through read-only
+# memory maps, so pandas/openpyxl, background jobs and the session store all share one copy on disk
+# (and in the page cache) instead of each holding its own BytesIO.
+SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "claims_upload_spool"))
+# Uploads still in use after this long (saved weekly sessions) are kept with persist_upload instead
+SPOOL_RETENTION_HOURS = 8 * 24
+_COPY_CHUNK = 1024 * 1024
+
+_purged = False
+
+
+class MappedFile(io.RawIOBase):
+    """
+    Read-only, seekable file object over a memory-mapped spool file.
+    """
+
+    def __init__(self, handle):
+        super().__init__()
+        self.handle = handle
+        self.name = handle.name
+        self._file = open(handle.path, "rb")
+        # mmap cannot map an empty file
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if handle.size else None
+        self._view = memoryview(self._map) if self._map is not None else memoryview(b"")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), len(self._view) - self._pos)
+        if n <= 0:
+            return 0
+        buffer[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._pos + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self._pos = position
+        return position
+
+    def tell(self):
+        return self._pos
+
+    def getbuffer(self):
+        """The mapped bytes as a read-only memoryview (no copy)."""
+        return self._view
+
+    def getvalue(self):
+        """The whole file as bytes, for callers that need a real bytes object (copies)."""
+        return self._view.tobytes()
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+            if self._map is not None:
+                try:
+                    self._map.close()
+                except BufferError:
+                    pass  # a caller still holds a view from getbuffer(); the map closes with it
+            self._file.close()
+        super().close()
+
+
+class UploadHandle:
+    """
+    A spooled upload: small, picklable, and cheap to keep in session state or hand to a job.
+    """
+
+    def __init__(self, digest, path, size, name=None):
+        self.digest = digest
+        self.path = path
+        self.size = size
+        self.name = name or digest
+
+    def __repr__(self):
+        return f"UploadHandle({self.name!r}, {self.size} bytes, {self.digest[:12]})"
+
+    def __eq__(self, other):
+        return isinstance(other, UploadHandle) and other.digest == self.digest and other.name == self.name
+
+    def __hash__(self):
+        return hash((self.digest, self.name))
+
+    def open(self):
+        """A new read-only MappedFile positioned at the start."""
+        return MappedFile(self)
+
+
+def _buffer_of(file):
+    """A zero-copy view of an in-memory upload, or None for streams that must be read."""
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return memoryview(file)
+    if isinstance(file, MappedFile):
+        return file.getbuffer()
+    if isinstance(file, io.BytesIO):  # includes Streamlit's UploadedFile
+        return file.getbuffer()
+    return None
+
+def _write_spool(view, digest):
+    path = os.path.join(SPOOL_DIR, digest)
+    if os.path.exists(path):
+        os.utime(path)  # keep a reused spool file from being purged
+        return path
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(view)
+    os.replace(temp_path, path)
+    return path
+
+def _spool_stream(file):
+    """Copy a stream to the spool in chunks, hashing as it goes."""
+    position = file.tell() if file.seekable() else None
+    if position is not None:
+        file.seek(0)
+    sha = hashlib.sha256()
+    size = 0
+    temp_path = os.path.join(SPOOL_DIR, f"{uuid.uuid4().hex}.tmp")
+    with open(temp_path, "wb") as out:
+        while True:
+            chunk = file.read(_COPY_CHUNK)
+            if not chunk:
+                break
+            sha.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    if position is not None:
+        file.seek(position)
+    digest = sha.hexdigest()
+    path = os.path.join(SPOOL_DIR, digest)
+    os.replace(temp_path, path)
+    return digest, path, size
+
+def spool_upload(file, name=None):
+    """
+    Write an upload to the content-addressed spool (once per distinct content).
+
+    Args:
+        file: UploadedFile, BytesIO, MappedFile, bytes, or any readable binary stream; an
+            UploadHandle is returned unchanged
+        name (str): Display name; defaults to file.name
+
+    Returns:
+        UploadHandle: Handle to the spooled bytes
+    """
+    global _purged
+    if isinstance(file, UploadHandle):
+        return file
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    if not _purged:
+        _purged = True
+        purge_spool()
+    name = name or getattr(file, "name", None)
+    view = _buffer_of(file)
+    if view is None:
+        digest, path, size = _spool_stream(file)
+    else:
+        digest = hashlib.sha256(view).hexdigest()
+        size = view.nbytes
+        path = _write_spool(view, digest)
+        if not isinstance(file, MappedFile):
+            view.release()
+    return UploadHandle(digest, path, size, name)
+
+def persist_upload(file, directory, name=None):
+    """
+    Copy an upload out of the spool into directory, named by its digest, for uploads that must
+    outlive the spool's retention and a reboot (e.g. saved weekly sessions). Nothing in directory
+    is purged.
+
+    Args:
+        file: Anything spool_upload accepts
+        directory (str): Destination directory, created if missing
+        name (str): Display name; defaults to the upload's own
+
+    Returns:
+        UploadHandle: Handle to the copy in directory
+    """
+    handle = spool_upload(file, name)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, handle.digest)
+    if not os.path.exists(path):
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(handle.path, temp_path)
+        os.replace(temp_path, path)
+    return UploadHandle(handle.digest, path, handle.size, name or handle.name)
+
+def open_upload(source):
+    """
+    A readable binary file object for an UploadHandle, spooled file, bytes or file-like object.
+    Bytes are wrapped without copying; file-like objects are rewound and returned as they are.
+    """
+    if isinstance(source, UploadHandle):
+        return source.open()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+def purge_spool(hours=SPOOL_RETENTION_HOURS):
+    """Delete spool files not written or reused within the retention period."""
+    if not os.path.isdir(SPOOL_DIR):
+        return 0
+    cutoff = time.time() - hours * 3600
+    removed = 0
+    for entry in os.scandir(SPOOL_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError as e:
+            logger.warning(f"Could not purge spool file {entry.path}: {e}")
+    return removed
@@ -12,9 +12,20 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from config import get_cc_list, get_to_email, logger
+from amounts import to_kobo, from_kobo
+from metrics import instrumented
 
 load_dotenv('secrets.env')
 
+# Common column name variations of the columns the ClaimBatch/ClaimNo/Correct_ClaimNo formulas read
+CLAIM_KEY_COLUMNS = {
+    'PROVIDER_CODE': ['PROVIDER CODE', 'PROVIDER_CODE', 'Provider Code', 'Provider_Code', 'ProviderCode'],
+    'ENCOUNTER_DATE_DD_MM_YYYY': ['ENCOUNTER DATE (DD/MM/YYYY)', 'ENCOUNTER_DATE_DD_MM_YYYY', 'ENCOUNTER_DATE', 'Encounter Date', 'Encounter_Date', 'ENC_DATE'],
+    'DATE_CLAIM_RECEIVED': ['DATE CLAIM RECEIVED ', 'DATE_CLAIM_RECEIVED', 'Date Claim Received', 'Date_Claim_Received', 'CLAIM_RECEIVED_DATE'],
+    'ENROLLEE_NAME': ['ENROLLEE NAME', 'ENROLLEE_NAME', 'Enrollee Name', 'Enrollee_Name', 'EnrolleeName'],
+    'MEMBER_NO': ['MEMBER NO', 'MEMBER_NO', 'Member No', 'Member_No', 'MemberNo', 'Member Number']
+}
+
 EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}$')
 
 def is_valid_email(email):
@@ -55,8 +66,8 @@ def extract_schedule_data(df, schedule_col, amount_col):
         else ""
     )
 
-    # Convert amounts to float, handling potential errors
-    result_df["Amount"] = pd.to_numeric(result_df["Amount"], errors="coerce")
+    # Parse amounts ("1,234.50", numbers, ...) to exact kobo, then back to a 2-place float
+    result_df["Amount"] = from_kobo(to_kobo(result_df["Amount"]))
 
     # Drop rows with missing schedule numbers or amounts
     result_df = result_df.dropna()
@@ -99,8 +110,10 @@ def calculate_schedule_amounts(df):
     Returns:
         pandas.DataFrame: DataFrame with schedule numbers and their total amounts
     """
-    # Group by schedule number and sum the amounts
-    schedule_amounts = df.groupby("Schedule Number")["Amount"].sum().reset_index()
+    # Group by schedule number and sum the amounts in kobo, so totals are exact
+    kobo = to_kobo(df["Amount"]).fillna(0).astype("int64")
+    totals = kobo.groupby(df["Schedule Number"]).sum()
+    schedule_amounts = pd.DataFrame({"Schedule Number": totals.index, "Amount": from_kobo(totals).values})
 
     return schedule_amounts
 
@@ -130,8 +143,8 @@ def generate_reconciliation_report(claims_amounts, finance_amounts):
     # Sort by schedule number
     merged = merged.sort_values("Schedule Number")
 
-    # Calculate difference
-    merged["Difference"] = merged["Claims Amount"] - merged["Finance Amount"]
+    # Calculate difference in kobo (NaN where either side is missing)
+    merged["Difference"] = from_kobo(to_kobo(merged["Claims Amount"]) - to_kobo(merged["Finance Amount"])).values
 
     return merged
 
@@ -190,14 +203,7 @@ def generate_enhanced_claims_excel(claims_df, schedule_col, amount_col):
     print(f"🔍 DEBUG UTILS: Finished writing {len(enhanced_df)} rows to worksheet")
 
     # Find the column indices for the key columns in the actual dataframe
-    # Map common column name variations to standard names
-    column_mapping = {
-        'PROVIDER_CODE': ['PROVIDER CODE', 'PROVIDER_CODE', 'Provider Code', 'Provider_Code', 'ProviderCode'],
-        'ENCOUNTER_DATE_DD_MM_YYYY': ['ENCOUNTER DATE (DD/MM/YYYY)', 'ENCOUNTER_DATE_DD_MM_YYYY', 'ENCOUNTER_DATE', 'Encounter Date', 'Encounter_Date', 'ENC_DATE'],
-        'DATE_CLAIM_RECEIVED': ['DATE CLAIM RECEIVED ', 'DATE_CLAIM_RECEIVED', 'Date Claim Received', 'Date_Claim_Received', 'CLAIM_RECEIVED_DATE'],
-        'ENROLLEE_NAME': ['ENROLLEE NAME', 'ENROLLEE_NAME', 'Enrollee Name', 'Enrollee_Name', 'EnrolleeName'],
-        'MEMBER_NO': ['MEMBER NO', 'MEMBER_NO', 'Member No', 'Member_No', 'MemberNo', 'Member Number']
-    }
+    column_mapping = CLAIM_KEY_COLUMNS
 
     # Function to find column by multiple possible names
     def find_column_index(df, possible_names):
@@ -295,6 +301,7 @@ def generate_enhanced_claims_excel(claims_df, schedule_col, amount_col):
 
     return excel_output.getvalue()
 
+@instrumented("email", target="variance", failed=lambda sent: sent is False)
 def send_variance_email(variance_type, missing_schedules=None, amount_variances=None, date_errors=None):
     """
     Send email notification for variances found during reconciliation.
@@ -303,6 +310,9 @@ def send_variance_email(variance_type, missing_schedules=None, amount_variances=
         variance_type (str): Type of variance - "missing_schedules" or "amount_variances"
         missing_schedules (list): List of schedule numbers missing in finance
         amount_variances (list): List of dictionaries with variance details
+
+    Returns:
+        bool: True once sent, False if the mail settings are missing or invalid, None if there was nothing to send
     """
     # Email configuration
     smtp_server = "smtp.office365.com"
@@ -315,14 +325,14 @@ def send_variance_email(variance_type, missing_schedules=None, amount_variances=
     if not sender_email or not sender_password:
         logger.error("Office 365 credentials not found in environment variables")
         print("Please set OFFICE_SENDER_EMAIL and OUTLOOK_APP_PASSWORD in secrets.env")
-        return
+        return False
 
     try:
         validate_email_list([recipient_email], context=f"send_variance_email/{variance_type}/to")
     except ValueError as e:
         logger.error(f"Invalid recipient email: {e}")
         print(f"Invalid recipient email: {e}")
-        return
+        return False
 
     try:
         # Create message
@@ -377,6 +387,8 @@ Amount Variances:
   Finance Amount: {variance['finance_amount']:,.2f}
   Difference: {variance['difference']:,.2f}
 """
+                if variance.get('suggested_lines'):
+                    body += f"  Suggested claim lines: {variance['suggested_lines']}\n"
 
             body += f"""
 Total Schedules with Amount Variances: {len(amount_variances)}
@@ -449,6 +461,7 @@ Avon Healthcare Ltd.
         server.quit()
 
         print(f"📧 Email sent successfully for {variance_type}")
+        return True
 
     except Exception as e:
         print(f"❌ Failed to send email: {str(e)}")
@@ -0,0 +1,232 @@
+import multiprocessing
+import numbers
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from config import logger
+from amounts import to_kobo, from_kobo, amounts_differ
+
+# Suggests which claim lines account for a schedule's amount variance: the fewest lines whose
+# amounts add up to the difference. The search is over whole kobo, so sums are exact. Subsets of up
+# to four lines are found by meeting in the middle over sorted pair sums; larger ones by a sparse
+# subset-sum DP keeping the shortest path to each reachable sum, bounded by line count, state count
+# and a time budget per schedule that also bounds the meet-in-the-middle loops.
+TOLERANCE_KOBO = 100  # ₦1
+MAX_SUBSET_LINES = 6
+# Pair sums are materialised for schedules up to this many usable lines (~2M pairs)
+MAX_PAIR_LINES = 2000
+MAX_STATES = 200_000
+TIME_BUDGET_SECONDS = 0.5
+EXPLAIN_WORKERS = 4
+# Below this many schedules a process pool costs more than it saves
+PARALLEL_MIN_SCHEDULES = 8
+# Workers are never forked from the Streamlit server, whose threads may hold locks mid-fork
+# (forkserver is missing on Windows)
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+EXACT, WITHIN_TOLERANCE, NOT_FOUND, BUDGET_EXHAUSTED = "Exact", "Within tolerance", "No matching lines", "Search budget exhausted"
+
+
+def _pair_sums(amounts, limit):
+    """All pairs of lines with sum <= limit, sorted by sum: (sums, first index, second index)."""
+    first, second = np.triu_indices(len(amounts), 1)
+    sums = amounts[first] + amounts[second]
+    keep = sums <= limit
+    order = np.argsort(sums[keep], kind="stable")
+    return sums[keep][order], first[keep][order], second[keep][order]
+
+def _closest(hits, target):
+    return min(hits, key=lambda h: (abs(h[0] - target), h[1])) if hits else None
+
+def _up_to_four(amounts, target, tolerance, deadline):
+    """
+    Smallest subset of at most four lines: single lines, then pairs, then pair sums met in the middle.
+
+    Lines with equal amounts give long runs of equal pair sums; a run whose total is already among the
+    hits is skipped whole, so the Python loops only visit pairs that can add a new total.
+
+    Returns:
+        tuple: (indices or None, complete) where complete is False if the deadline cut the search short
+    """
+    low, high = target - tolerance, target + tolerance
+    singles = np.flatnonzero((amounts >= low) & (amounts <= high))
+    if singles.size:
+        best = singles[np.argmin(np.abs(amounts[singles] - target))]
+        return (int(best),), True
+
+    sums, first, second = _pair_sums(amounts, high)
+    if not sums.size:
+        return None, True
+    pairs = np.flatnonzero((sums >= low) & (sums <= high))
+    if pairs.size:
+        best = pairs[np.argmin(np.abs(sums[pairs] - target))]
+        return (int(first[best]), int(second[best])), True
+    run_end = np.searchsorted(sums, sums, "right")
+
+    # Three lines: one line plus a disjoint pair
+    lo = np.searchsorted(sums, low - amounts, "left")
+    hi = np.searchsorted(sums, high - amounts, "right")
+    hits, totals = [], set()
+    for i in np.flatnonzero(hi > lo):
+        if time.perf_counter() > deadline:
+            return (_closest(hits, target)[1] if hits else None), False
+        p = lo[i]
+        while p < hi[i]:
+            total = int(amounts[i] + sums[p])
+            if total in totals:
+                p = run_end[p]
+            elif i != first[p] and i != second[p]:
+                hits.append((total, tuple(sorted((int(i), int(first[p]), int(second[p]))))))
+                totals.add(total)
+                break
+            else:
+                p += 1
+    if hits:
+        return _closest(hits, target)[1], True
+
+    # Four lines: two disjoint pairs. A first pair whose every total is already a hit is skipped
+    # with the rest of its run, since pairs with the same sum reach the same totals.
+    lo = np.searchsorted(sums, low - sums, "left")
+    hi = np.searchsorted(sums, high - sums, "right")
+    candidates = np.flatnonzero(hi > lo)
+    k = 0
+    while k < len(candidates):
+        if time.perf_counter() > deadline:
+            return (_closest(hits, target)[1] if hits else None), False
+        p = candidates[k]
+        used = {first[p], second[p]}
+        q, new_total = max(lo[p], p + 1), False
+        while q < hi[p]:
+            total = int(sums[p] + sums[q])
+            if total in totals:
+                q = run_end[q]
+                continue
+            new_total = True
+            if first[q] not in used and second[q] not in used:
+                hits.append((total, tuple(sorted(int(x) for x in (first[p], second[p], first[q], second[q])))))
+                totals.add(total)
+                break
+            q += 1
+        k = k + 1 if new_total else np.searchsorted(candidates, run_end[p])
+    return (_closest(hits, target)[1] if hits else None), True
+
+def _sparse_dp(amounts, target, tolerance, max_lines, max_states, deadline):
+    """Shortest path to each reachable sum, extended one line at a time until a bound is hit."""
+    paths = {0: ()}
+    complete = True
+    for i, amount in enumerate(amounts):
+        if time.perf_counter() > deadline:
+            complete = False
+            break
+        for total, path in list(paths.items()):
+            new_total = total + amount
+            if len(path) >= max_lines or new_total > target + tolerance:
+                continue
+            existing = paths.get(new_total)
+            if existing is None and len(paths) >= max_states:
+                complete = False
+            elif existing is None or len(existing) > len(path) + 1:
+                paths[new_total] = path + (i,)
+    hits = [(len(path), abs(total - target), path) for total, path in paths.items()
+            if path and abs(total - target) <= tolerance]
+    return (tuple(sorted(min(hits)[2])) if hits else None), complete
+
+def smallest_subset(amounts, target, tolerance=TOLERANCE_KOBO, max_lines=MAX_SUBSET_LINES,
+                    max_states=MAX_STATES, time_budget=TIME_BUDGET_SECONDS):
+    """
+    Fewest amounts summing to target within tolerance.
+
+    Args:
+        amounts (list): Line amounts in kobo (non-negative ints)
+        target (int): Sum to reach, in kobo
+        tolerance (int): Largest accepted |sum - target|, in kobo
+
+    Returns:
+        tuple: (indices into amounts or None, complete) where complete is False if a bound cut the search short
+    """
+    if target <= 0:
+        return None, True
+    deadline = time.perf_counter() + time_budget
+    # Lines larger than the target never help; positions map back to the caller's indices
+    positions = [i for i, amount in enumerate(amounts) if 0 < amount <= target + tolerance]
+    usable = np.array([amounts[i] for i in positions], dtype=np.int64)
+    subset, complete = None, True
+    if len(positions) <= MAX_PAIR_LINES:
+        subset, complete = _up_to_four(usable, target, tolerance, deadline)
+    if subset is None and complete and (max_lines > 4 or len(positions) > MAX_PAIR_LINES):
+        subset, complete = _sparse_dp(usable.tolist(), target, tolerance, max_lines, max_states, deadline)
+    if subset is None:
+        return None, complete
+    return tuple(sorted(positions[i] for i in subset)), complete
+
+def explain_schedule(lines, target, tolerance=TOLERANCE_KOBO, time_budget=TIME_BUDGET_SECONDS):
+    """
+    Args:
+        lines (list): (row label, amount in kobo) pairs for one schedule's claim lines
+        target (int): |Claims - Finance| in kobo
+
+    Returns:
+        tuple: (row labels of the suggested lines, their total in kobo, status)
+    """
+    amounts = [amount for _, amount in lines]
+    subset, complete = smallest_subset(amounts, target, tolerance, time_budget=time_budget)
+    if subset is None:
+        return [], 0, NOT_FOUND if complete else BUDGET_EXHAUSTED
+    total = sum(amounts[i] for i in subset)
+    return [lines[i][0] for i in subset], total, EXACT if total == target else WITHIN_TOLERANCE
+
+def _explain_batch(batch, tolerance, time_budget):
+    return [explain_schedule(lines, target, tolerance, time_budget) for lines, target in batch]
+
+def _row_label(index):
+    # extract_schedule_data keeps claims_df's index; row 1 of the sheet is the header
+    return f"Row {index + 2}" if isinstance(index, numbers.Integral) else str(index)
+
+def explain_variances(report, claims_data, tolerance=TOLERANCE_KOBO, time_budget=TIME_BUDGET_SECONDS,
+                      workers=EXPLAIN_WORKERS):
+    """
+    Suggested claim lines for every schedule whose Claims and Finance amounts differ.
+
+    Args:
+        report (pandas.DataFrame): generate_reconciliation_report output
+        claims_data (pandas.DataFrame): extract_schedule_data output for the claims sheet (one row per line)
+        tolerance (int): Accepted gap in kobo
+        time_budget (float): Seconds of search per schedule
+
+    Returns:
+        pandas.DataFrame: Schedule Number, Difference, Suggested Lines, Lines Total, Explanation
+    """
+    columns = ["Schedule Number", "Difference", "Suggested Lines", "Lines Total", "Explanation"]
+    mismatched = report[amounts_differ(report["Claims Amount"], report["Finance Amount"])]
+    if mismatched.empty:
+        return pd.DataFrame(columns=columns)
+
+    line_kobo = to_kobo(claims_data["Amount"])
+    lines_by_schedule = {
+        schedule: [(_row_label(index), int(kobo)) for index, kobo in group.items() if pd.notna(kobo)]
+        for schedule, group in line_kobo.groupby(claims_data["Schedule Number"])
+    }
+    differences = (to_kobo(mismatched["Claims Amount"]) - to_kobo(mismatched["Finance Amount"])).tolist()
+    batch = [(lines_by_schedule.get(schedule, []), abs(int(diff)))
+             for schedule, diff in zip(mismatched["Schedule Number"], differences)]
+
+    started = time.perf_counter()
+    if workers > 1 and len(batch) >= PARALLEL_MIN_SCHEDULES:
+        chunks = [batch[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD)) as pool:
+            chunk_results = list(pool.map(_explain_batch, chunks, [tolerance] * workers, [time_budget] * workers))
+        results = [None] * len(batch)
+        for offset, chunk_result in enumerate(chunk_results):
+            results[offset::workers] = chunk_result
+    else:
+        results = _explain_batch(batch, tolerance, time_budget)
+    logger.info(f"Explained {len(batch)} amount variances in {time.perf_counter() - started:.2f}s")
+
+    return pd.DataFrame({
+        "Schedule Number": mismatched["Schedule Number"].values,
+        "Difference": from_kobo(pd.Series(differences)).values,
+        "Suggested Lines": [", ".join(rows) for rows, _, _ in results],
+        "Lines Total": from_kobo(pd.Series([total if rows else None for rows, total, _ in results])).values,
+        "Explanation": [status for _, _, status in results],
+    }, columns=columns)
@@ -0,0 +1,339 @@
+"""
+Watch-folder ingestion for provider payment summaries.
+
+    python watch_ingest.py                 # poll every category folder until stopped
+    python watch_ingest.py --once          # one scan, e.g. from a scheduled task
+    python watch_ingest.py appeals --interval 30
+
+Each category (appeals, telemedicine, ambulance) has a folder under WATCH_DIR. Workbooks dropped
+there are standardized by compile_file, once per distinct content, and kept in a per-category
+store under STORE_DIR that the compilation pages load without re-parsing anything.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from config import logger
+from upload_handle import UploadHandle
+from file_readers import UPLOAD_TYPES
+from exports import parquet_bytes, render_export_buttons
+from compilation_common import COMPILATION_CONFIGS, CompiledDataset, compile_file, compare_with_finance
+from session_store import session_store
+
+# A scan stats every file and only hashes those whose mtime or size moved since the manifest saw
+# them; a file whose content hash is unchanged is not compiled again. Changed files are compiled in
+# a process pool (openpyxl parsing is CPU-bound) straight from the watched path, and each result is
+# written as its own Parquet file under files/, listed in manifest.json with the stat and hash it
+# was compiled from. Deleted files leave the manifest. Loading a store concatenates the listed
+# Parquet files once per manifest version. The daemon and the app's "Scan folder now" are separate
+# processes, so a scan holds a lock file in the category's store (created with O_EXCL) while it runs.
+WATCH_DIR = os.getenv("INGEST_WATCH_DIR", "incoming")
+STORE_DIR = os.getenv("INGEST_STORE_DIR", "compiled_store")
+POLL_SECONDS = 10
+INGEST_WORKERS = 4
+# "Scan folder now" runs inside the Streamlit server: never fork it (forkserver is missing on Windows)
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+_HASH_CHUNK = 1024 * 1024
+LOCK_TIMEOUT_SECONDS = 300
+LOCK_POLL_SECONDS = 0.5
+# A lock file older than this was left by a scan that died
+STALE_LOCK_SECONDS = 3600
+
+_lock = threading.Lock()
+_loaded = {}  # category -> (manifest version, CompiledDataset)
+
+
+def watch_folder(category):
+    return os.path.join(WATCH_DIR, category)
+
+def _store_dir(category):
+    return os.path.join(STORE_DIR, category)
+
+def _manifest_path(category):
+    return os.path.join(_store_dir(category), "manifest.json")
+
+@contextmanager
+def _store_lock(category, timeout=LOCK_TIMEOUT_SECONDS):
+    """Hold the category's store lock file, waiting up to timeout seconds for another scan to finish."""
+    path = os.path.join(_store_dir(category), ".ingest.lock")
+    os.makedirs(_store_dir(category), exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > STALE_LOCK_SECONDS:
+                    logger.warning(f"Removing stale ingest lock {path}")
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Another scan of {category} is running (lock file {path})")
+            time.sleep(LOCK_POLL_SECONDS)
+    with os.fdopen(fd, "w") as f:
+        f.write(f"{os.getpid()} {datetime.now().isoformat(timespec='seconds')}\n")
+    try:
+        yield
+    finally:
+        os.remove(path)
+
+def _atomic_write(path, write):
+    # The pages may load the store while a scan is writing it
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+def load_manifest(category):
+    """The category's manifest: {"version": n, "scanned_at": ..., "files": {relative path: entry}}."""
+    if not os.path.exists(_manifest_path(category)):
+        return {"version": 0, "scanned_at": None, "files": {}}
+    with open(_manifest_path(category)) as f:
+        return json.load(f)
+
+def _save_manifest(category, manifest):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+    _atomic_write(_manifest_path(category), write)
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def _watched_files(category):
+    """{relative path: os.stat_result} for every uploadable file in the category's folder."""
+    folder = watch_folder(category)
+    found = {}
+    for root, _, names in os.walk(folder):
+        for name in names:
+            if name.startswith(("~$", ".")) or os.path.splitext(name)[1].lstrip(".").lower() not in UPLOAD_TYPES:
+                continue  # Excel lock files and partial copies
+            path = os.path.join(root, name)
+            found[os.path.relpath(path, folder).replace(os.sep, "/")] = os.stat(path)
+    return found
+
+def _compile_watched(path, name, digest, size):
+    # Runs in a worker process; the handle reads the watched file in place
+    return compile_file(name, UploadHandle(digest, path, size, name))
+
+def _write_compiled(category, relpath, digest, frame):
+    # Keyed by name and content, so each watched path owns its file; load_store drops duplicate content
+    file_name = hashlib.sha256(f"{relpath}:{digest}".encode()).hexdigest()[:24] + ".parquet"
+    data = parquet_bytes(frame)
+
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            f.write(data)
+    _atomic_write(os.path.join(_store_dir(category), "files", file_name), write)
+    return f"files/{file_name}"
+
+def _remove_compiled(category, entry):
+    if entry.get("parquet"):
+        try:
+            os.remove(os.path.join(_store_dir(category), entry["parquet"]))
+        except FileNotFoundError:
+            pass
+
+def ingest(category, workers=INGEST_WORKERS, lock_timeout=LOCK_TIMEOUT_SECONDS):
+    """
+    Compile new and changed files in a category's watch folder into its store.
+
+    Args:
+        category (str): A COMPILATION_CONFIGS key
+        workers (int): Compile processes; 1 compiles in this process
+        lock_timeout (float): Seconds to wait for a scan running in another process
+
+    Returns:
+        dict: Counts of compiled, unchanged, removed and failed files
+
+    Raises:
+        TimeoutError: If another scan still holds the store lock after lock_timeout
+    """
+    with _lock, _store_lock(category, lock_timeout):
+        manifest = load_manifest(category)
+        entries = manifest["files"]
+        watched = _watched_files(category)
+        stats = {"compiled": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        changed = False
+
+        pending = []
+        for relpath, stat in sorted(watched.items()):
+            entry = entries.get(relpath)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                stats["unchanged"] += 1
+                continue
+            digest = file_digest(os.path.join(watch_folder(category), relpath))
+            if entry and entry["digest"] == digest:
+                # Touched or copied over with the same content
+                entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                stats["unchanged"] += 1
+                continue
+            pending.append((relpath, stat, digest))
+
+        for relpath in sorted(set(entries) - set(watched)):
+            _remove_compiled(category, entries.pop(relpath))
+            stats["removed"] += 1
+            changed = True
+
+        jobs = [(os.path.join(watch_folder(category), relpath), os.path.basename(relpath), digest, stat.st_size)
+                for relpath, stat, digest in pending]
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                     mp_context=multiprocessing.get_context(POOL_START_METHOD)) as pool:
+                results = list(pool.map(_compile_watched, *zip(*jobs)))
+        else:
+            results = [_compile_watched(*job) for job in jobs]
+
+        for (relpath, stat, digest), (frame, summary) in zip(pending, results):
+            if relpath in entries:
+                _remove_compiled(category, entries[relpath])
+            entries[relpath] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "digest": digest,
+                "status": summary["Status"],
+                "rows": summary["Rows"],
+                "schedule": summary.get("Schedule"),
+                "parquet": _write_compiled(category, relpath, digest, frame) if frame is not None else None,
+                "compiled_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            stats["compiled" if frame is not None else "failed"] += 1
+            changed = True
+
+        if changed:  # a new version makes load_store read the store again
+            manifest["version"] += 1
+        manifest["scanned_at"] = datetime.now().isoformat(timespec="seconds")
+        _save_manifest(category, manifest)
+
+    if pending or stats["removed"]:
+        logger.info(f"Watch folder {category}: {stats}")
+    return stats
+
+def _duplicates(entries):
+    """{relative path: earlier path with the same content} over the manifest entries, in path order."""
+    first, duplicates = {}, {}
+    for relpath, entry in sorted(entries.items()):
+        if entry["digest"] in first:
+            duplicates[relpath] = first[entry["digest"]]
+        else:
+            first[entry["digest"]] = relpath
+    return duplicates
+
+def file_summary(category):
+    """The store's manifest as a Processing Summary-style table, one row per watched file."""
+    entries = load_manifest(category)["files"]
+    duplicates = _duplicates(entries)
+    return pd.DataFrame(
+        [{"File": relpath, "Schedule": e["schedule"], "Rows": e["rows"],
+          "Status": f"Skipped: duplicate of {duplicates[relpath]}" if relpath in duplicates else e["status"],
+          "Compiled At": e["compiled_at"]} for relpath, e in sorted(entries.items())],
+        columns=["File", "Schedule", "Rows", "Status", "Compiled At"],
+    )
+
+def load_store(category):
+    """
+    Everything compiled from a category's watch folder.
+
+    Returns:
+        CompiledDataset: One frame over the stored files, reused until the manifest changes
+    """
+    manifest = load_manifest(category)
+    cached = _loaded.get(category)
+    if cached and cached[0] == manifest["version"]:
+        return cached[1]
+    # A workbook copied into the folder under a second name is loaded once
+    duplicates = _duplicates(manifest["files"])
+    stored = [(e["parquet"], e["schedule"]) for relpath, e in sorted(manifest["files"].items())
+              if e.get("parquet") and relpath not in duplicates]
+    frames = [pd.read_parquet(os.path.join(_store_dir(category), path)) for path, _ in stored]
+    dataset = CompiledDataset(frames, [schedule for _, schedule in stored])
+    _loaded[category] = (manifest["version"], dataset)
+    return dataset
+
+def watch(categories, interval=POLL_SECONDS, workers=INGEST_WORKERS, once=False):
+    """Ingest each category's folder every interval seconds (or once)."""
+    for category in categories:
+        os.makedirs(watch_folder(category), exist_ok=True)
+    while True:
+        for category in categories:
+            try:
+                ingest(category, workers)
+            except Exception as e:
+                logger.error(f"Watch folder scan failed for {category}: {e}", exc_info=True)
+        if once:
+            return
+        time.sleep(interval)
+
+def render_watch_store(config, finance_file=None):
+    """Watch-folder panel on a compilation page: store status, a manual scan, and loading the store."""
+    category = config["label_lower"]
+    label = config["label"]
+    session_compiled = config["session_compiled"]
+    session_comparison = config["session_comparison"]
+
+    with st.expander(f"📂 Watch folder: {os.path.abspath(watch_folder(category))}"):
+        manifest = load_manifest(category)
+        entries = manifest["files"].values()
+        compiled = sum(1 for e in entries if e.get("parquet"))
+        st.caption(f"{compiled} of {len(manifest['files'])} files compiled, "
+                   f"{sum(e['rows'] for e in entries)} rows. Last scan: {manifest['scanned_at'] or 'never'}")
+
+        c1, c2 = st.columns(2)
+        if c1.button("🔄 Scan folder now", key=f"watch_scan_{category}"):
+            try:
+                with st.spinner(f"Compiling new and changed {label} files..."):
+                    stats = ingest(category, lock_timeout=10)
+                st.success(f"{stats['compiled']} compiled, {stats['unchanged']} unchanged, "
+                           f"{stats['removed']} removed, {stats['failed']} failed")
+            except TimeoutError:
+                st.warning("The watch-folder service is scanning this folder right now; try again when it finishes.")
+
+        summary = file_summary(category)
+        if not summary.empty:
+            st.dataframe(summary, use_container_width=True, hide_index=True)
+
+        if c2.button("📥 Use watch-folder data", key=f"watch_load_{category}", disabled=not compiled):
+            dataset = load_store(category)
+            session_store().put(session_compiled, dataset)
+            st.success(f"Loaded {len(dataset)} rows from {dataset.file_count} {label} files")
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            render_export_buttons({config["sheet_name"]: dataset.frame},
+                                  f"{config['compiled_filename_prefix']}_{timestamp}", f"watch_{category}")
+            if finance_file:
+                comparison_df = compare_with_finance(dataset, finance_file, config)
+                if comparison_df is not None and not comparison_df.empty:
+                    session_store().put(session_comparison, comparison_df)
+                    st.dataframe(comparison_df, use_container_width=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("categories", nargs="*", help=f"Any of {', '.join(COMPILATION_CONFIGS)} (default: all)")
+    parser.add_argument("--interval", type=float, default=POLL_SECONDS)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--once", action="store_true")
+    args = parser.parse_args()
+    unknown = set(args.categories) - set(COMPILATION_CONFIGS)
+    if unknown:
+        parser.error(f"unknown categories: {', '.join(sorted(unknown))}")
+    watch(args.categories or list(COMPILATION_CONFIGS), args.interval, args.workers, args.once)
+
+
+if __name__ == "__main__":
+    main()